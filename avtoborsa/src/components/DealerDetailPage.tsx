@@ -64,6 +64,7 @@ const CATEGORY_AS_BRAND_MAIN_CATEGORIES = new Set(["6", "7", "8", "a", "b"]);
 type DealerDetail = {
   id: number;
   dealer_name: string;
+  public_slug?: string;
   city: string;
   address: string;
   phone: string;
@@ -148,45 +149,23 @@ const DealerDetailPage: React.FC = () => {
           return;
         }
 
-        let resolvedDealerId = extractDealerIdFromSlug(rawSlug);
+        let res = await fetch(
+          `${API_BASE_URL}/api/auth/dealers/by-slug/${encodeURIComponent(rawSlug)}/`,
+          { cache: "no-store" }
+        );
 
-        if (!resolvedDealerId) {
-          const dealersRes = await fetch(`${API_BASE_URL}/api/auth/dealers/`, {
-            cache: "no-store",
-          });
-          if (!dealersRes.ok) {
+        if (res.status === 404) {
+          // legacy "/dealers/<name>-<id>" and "/dealers/<id>" links
+          const legacyDealerId = extractDealerIdFromSlug(rawSlug);
+          if (!legacyDealerId) {
             setLoading(false);
             return;
           }
-
-          const payload = await dealersRes.json();
-          const dealersList = Array.isArray(payload)
-            ? payload
-            : Array.isArray(payload?.results)
-              ? payload.results
-              : [];
-
-          const match = dealersList.find((item: unknown) => {
-            if (!item || typeof item !== "object") return false;
-            const record = item as { id?: unknown; dealer_name?: unknown };
-            if (typeof record.dealer_name !== "string" || !record.dealer_name.trim()) return false;
-            return buildDealerSlug(record.dealer_name) === rawSlug;
-          }) as { id?: unknown } | undefined;
-
-          const idValue = Number(match?.id);
-          if (Number.isFinite(idValue) && idValue > 0) {
-            resolvedDealerId = Math.floor(idValue);
-          }
-        }
-
-        if (!resolvedDealerId) {
-          setLoading(false);
-          return;
+          res = await fetch(`${API_BASE_URL}/api/auth/dealers/${legacyDealerId}/`, {
+            cache: "no-store",
+          });
         }
 
-        const res = await fetch(`${API_BASE_URL}/api/auth/dealers/${resolvedDealerId}/`, {
-          cache: "no-store",
-        });
         if (res.ok) {
           const data = await res.json();
           setDealer(data);
@@ -207,7 +186,7 @@ const DealerDetailPage: React.FC = () => {
   useEffect(() => {
     if (!dealer) return;
 
-    const canonicalPath = buildDealerProfilePath(dealer.dealer_name, dealer.id);
+    const canonicalPath = buildDealerProfilePath(dealer.dealer_name, dealer.id, dealer.public_slug);
     if (dealerSlug !== canonicalPath.replace("/dealers/", "")) {
       navigate(canonicalPath, { replace: true });
     }
@@ -233,7 +212,7 @@ const DealerDetailPage: React.FC = () => {
 
     const title = `Kar.bg | ${dealer.dealer_name}`;
     const description = `Профил на дилър ${dealer.dealer_name} в ${dealer.city}. Общо ${dealer.listing_count} активни обяви в Kar.bg.`;
-    const dealerSlugForShare = buildDealerSlug(dealer.dealer_name);
+    const dealerSlugForShare = dealer.public_slug || buildDealerSlug(dealer.dealer_name);
     const shareImageVersion = `${dealer.listing_count}-${dealer.profile_image_url || "no-photo"}`;
     const shareImage = `${
       (API_BASE_URL || window.location.origin).replace(/\/+$/, "")
@@ -241,7 +220,7 @@ const DealerDetailPage: React.FC = () => {
       shareImageVersion
     )}`;
     const canonicalUrl = new URL(
-      buildDealerProfilePath(dealer.dealer_name, dealer.id),
+      buildDealerProfilePath(dealer.dealer_name, dealer.id, dealer.public_slug),
       window.location.origin
     ).href;
 
@@ -16,6 +16,7 @@ import { buildDealerProfilePath } from "../utils/slugify";
 type Dealer = {
   id: number;
   dealer_name: string;
+  public_slug?: string;
   city: string;
   phone: string;
   email: string;
@@ -724,7 +725,7 @@ const DealersPage: React.FC = () => {
                       style={{ ...styles.podiumCard, minHeight }}
                       onMouseEnter={() => setHoveredCard(dealer.id)}
                       onMouseLeave={() => setHoveredCard(null)}
-                      onClick={() => navigate(buildDealerProfilePath(dealer.dealer_name, dealer.id))}
+                      onClick={() => navigate(buildDealerProfilePath(dealer.dealer_name, dealer.id, dealer.public_slug))}
                     >
                       <div style={{ ...styles.podiumRank, ...rankStyles }}>#{slot.rank}</div>
                       <div style={{ display: "flex", alignItems: "center", gap: 12 }}>
@@ -783,7 +784,7 @@ const DealersPage: React.FC = () => {
                           style={styles.podiumButton}
                           onClick={(e) => {
                             e.stopPropagation();
-                            navigate(buildDealerProfilePath(dealer.dealer_name, dealer.id));
+                            navigate(buildDealerProfilePath(dealer.dealer_name, dealer.id, dealer.public_slug));
                           }}
                         >
                           Виж профил
@@ -806,7 +807,7 @@ const DealersPage: React.FC = () => {
                       }}
                       onMouseEnter={() => setHoveredCard(dealer.id)}
                       onMouseLeave={() => setHoveredCard(null)}
-                      onClick={() => navigate(buildDealerProfilePath(dealer.dealer_name, dealer.id))}
+                      onClick={() => navigate(buildDealerProfilePath(dealer.dealer_name, dealer.id, dealer.public_slug))}
                     >
                       <div style={styles.mobileRankTop}>
                         <div style={styles.mobileRankLeft}>
@@ -869,7 +870,7 @@ const DealersPage: React.FC = () => {
                           style={styles.rankButton}
                           onClick={(e) => {
                             e.stopPropagation();
-                            navigate(buildDealerProfilePath(dealer.dealer_name, dealer.id));
+                            navigate(buildDealerProfilePath(dealer.dealer_name, dealer.id, dealer.public_slug));
                           }}
                         >
                           Профил
@@ -902,7 +903,7 @@ const DealersPage: React.FC = () => {
                       }}
                       onMouseEnter={() => setHoveredCard(dealer.id)}
                       onMouseLeave={() => setHoveredCard(null)}
-                      onClick={() => navigate(buildDealerProfilePath(dealer.dealer_name, dealer.id))}
+                      onClick={() => navigate(buildDealerProfilePath(dealer.dealer_name, dealer.id, dealer.public_slug))}
                     >
                       <div style={styles.rankIndex}>#{rank}</div>
                       <div style={styles.rankAvatar}>
@@ -965,7 +966,7 @@ const DealersPage: React.FC = () => {
                           style={styles.rankButton}
                           onClick={(e) => {
                             e.stopPropagation();
-                            navigate(buildDealerProfilePath(dealer.dealer_name, dealer.id));
+                            navigate(buildDealerProfilePath(dealer.dealer_name, dealer.id, dealer.public_slug));
                           }}
                         >
                           Профил
@@ -989,7 +990,7 @@ const DealersPage: React.FC = () => {
                       }}
                       onMouseEnter={() => setHoveredCard(dealer.id)}
                       onMouseLeave={() => setHoveredCard(null)}
-                      onClick={() => navigate(buildDealerProfilePath(dealer.dealer_name, dealer.id))}
+                      onClick={() => navigate(buildDealerProfilePath(dealer.dealer_name, dealer.id, dealer.public_slug))}
                     >
                       <div style={styles.mobileRankTop}>
                         <div style={styles.mobileRankLeft}>
@@ -1052,7 +1053,7 @@ const DealersPage: React.FC = () => {
                           style={styles.rankButton}
                           onClick={(e) => {
                             e.stopPropagation();
-                            navigate(buildDealerProfilePath(dealer.dealer_name, dealer.id));
+                            navigate(buildDealerProfilePath(dealer.dealer_name, dealer.id, dealer.public_slug));
                           }}
                         >
                           Профил
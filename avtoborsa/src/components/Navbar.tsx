@@ -775,6 +775,7 @@ const Navbar: React.FC = () => {
               category?: string;
               link?: string;
               createdAt?: string;
+              seq?: number;
             };
           };
           if (payload?.type === "dealer_listings_updated") {
@@ -795,6 +796,16 @@ const Navbar: React.FC = () => {
               setNotifications(getUserNotifications(user.id));
             }
           }
+
+          const seq = payload?.notification?.seq;
+          if (
+            payload?.type === "user_notification" &&
+            typeof seq === "number" &&
+            socket?.readyState === WebSocket.OPEN
+          ) {
+            // the server resumes from the last acknowledged notification after a reconnect
+            socket.send(JSON.stringify({ action: "ack", seq }));
+          }
         } catch {
           // ignore malformed ws payloads
         }
@@ -146,6 +146,8 @@ export const buildDealerSlug = (dealerName: string, _dealerId?: number): string
 /**
  * Extract legacy dealer ID from old dealer slug or numeric id.
  * Examples: "avtokashta-12" -> 12, "12" -> 12
+ * Only a fallback: current slugs are resolved by the API first, because a
+ * dealer name may itself end in a number ("avto-24").
  */
 export const extractDealerIdFromSlug = (value: string): number | null => {
   const normalized = (value || "").trim();
@@ -163,5 +165,12 @@ export const extractDealerIdFromSlug = (value: string): number | null => {
   return parsed > 0 ? parsed : null;
 };
 
-export const buildDealerProfilePath = (dealerName: string, dealerId: number): string =>
-  `/dealers/${buildDealerSlug(dealerName, dealerId)}`;
+/**
+ * Dealer page path; prefer the API's public_slug, which carries the
+ * collision suffix ("avto-plus-x2") the name alone cannot reproduce.
+ */
+export const buildDealerProfilePath = (
+  dealerName: string,
+  dealerId: number,
+  publicSlug?: string | null
+): string => `/dealers/${(publicSlug || "").trim() || buildDealerSlug(dealerName, dealerId)}`;
@@ -0,0 +1,245 @@
+"""
+Concurrent fetcher for remote listing photos (Copart imports).
+
+Photos of one import are downloaded by a small worker pool. Each worker keeps
+one keep-alive connection per image host, bodies are streamed with a hard
+size cap, and the whole import shares a single deadline so a slow CDN cannot
+hold the request thread for minutes. Results come back in input order.
+"""
+
+import http.client
+import logging
+import queue
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+FETCH_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) KarBgCopartImporter/1.0"
+FETCH_CHUNK_SIZE = 64 * 1024
+FETCH_MAX_REDIRECTS = 3
+_REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+
+
+class _FetchFailed(Exception):
+    pass
+
+
+def _resolve_setting(name, default, minimum):
+    try:
+        value = type(default)(getattr(settings, name, default))
+    except (TypeError, ValueError):
+        value = default
+    return max(minimum, value)
+
+
+def is_allowed_image_url(url, allowed_host_tokens):
+    parsed = urllib.parse.urlparse(str(url or ""))
+    if parsed.scheme not in {"http", "https"} or not parsed.netloc:
+        return False
+    normalized_host = parsed.netloc.lower()
+    return any(token in normalized_host for token in allowed_host_tokens)
+
+
+class RemoteImageFetcher:
+    """
+    Reusable pool for downloading images from allow-listed hosts.
+
+    Use as a context manager; one instance can serve several imports (the
+    batch endpoint shares one) and closes its pooled connections on exit.
+    """
+
+    def __init__(
+        self,
+        allowed_host_tokens,
+        *,
+        max_workers=None,
+        max_bytes=12 * 1024 * 1024,
+        request_timeout=None,
+        user_agent=FETCH_USER_AGENT,
+    ):
+        self.allowed_host_tokens = tuple(allowed_host_tokens)
+        self.max_workers = max_workers or _resolve_setting("COPART_IMAGE_FETCH_WORKERS", 6, 1)
+        self.max_bytes = int(max_bytes)
+        self.request_timeout = request_timeout or _resolve_setting("COPART_IMAGE_FETCH_TIMEOUT_SECONDS", 18.0, 1.0)
+        self.user_agent = user_agent
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="remote-image-fetch")
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    # ------------------------------------------------------------------
+    # connections
+    # ------------------------------------------------------------------
+    def _get_connection(self, scheme, netloc, timeout):
+        pool = getattr(self._local, "connections", None)
+        if pool is None:
+            pool = self._local.connections = {}
+        key = (scheme, netloc)
+        connection = pool.get(key)
+        if connection is None:
+            connection_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+            connection = connection_class(netloc, timeout=timeout)
+            pool[key] = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        connection.timeout = timeout
+        if connection.sock is not None:
+            connection.sock.settimeout(timeout)
+        return connection
+
+    def _drop_connection(self, scheme, netloc):
+        pool = getattr(self._local, "connections", None) or {}
+        connection = pool.pop((scheme, netloc), None)
+        if connection is not None:
+            connection.close()
+
+    # ------------------------------------------------------------------
+    # single download
+    # ------------------------------------------------------------------
+    def _read_capped(self, response, deadline):
+        declared_length = response.getheader("Content-Length")
+        if declared_length and declared_length.isdigit() and int(declared_length) > self.max_bytes:
+            raise _FetchFailed("too large")
+        chunks = []
+        total = 0
+        while True:
+            if time.monotonic() >= deadline:
+                raise _FetchFailed("deadline")
+            chunk = response.read(FETCH_CHUNK_SIZE)
+            if not chunk:
+                break
+            total += len(chunk)
+            if total > self.max_bytes:
+                raise _FetchFailed("too large")
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    def _request(self, url, referer, deadline):
+        for _ in range(FETCH_MAX_REDIRECTS + 1):
+            if not is_allowed_image_url(url, self.allowed_host_tokens):
+                raise _FetchFailed("host not allowed")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise _FetchFailed("deadline")
+
+            parsed = urllib.parse.urlparse(url)
+            path = parsed.path or "/"
+            if parsed.query:
+                path = f"{path}?{parsed.query}"
+            headers = {"User-Agent": self.user_agent, "Accept": "image/*", "Connection": "keep-alive"}
+            if referer:
+                headers["Referer"] = referer
+
+            connection = self._get_connection(parsed.scheme, parsed.netloc, min(self.request_timeout, remaining))
+            try:
+                try:
+                    connection.request("GET", path, headers=headers)
+                    response = connection.getresponse()
+                except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                    # the server closed an idle keep-alive connection; retry once on a fresh one
+                    self._drop_connection(parsed.scheme, parsed.netloc)
+                    connection = self._get_connection(parsed.scheme, parsed.netloc, min(self.request_timeout, remaining))
+                    connection.request("GET", path, headers=headers)
+                    response = connection.getresponse()
+
+                if response.status in _REDIRECT_STATUSES:
+                    response.read()
+                    location = response.getheader("Location") or ""
+                    if not location:
+                        raise _FetchFailed("redirect without location")
+                    url = urllib.parse.urljoin(url, location)
+                    continue
+                if response.status != 200:
+                    response.read()
+                    raise _FetchFailed(f"status {response.status}")
+
+                content_type = response.getheader("Content-Type", "") or ""
+                if content_type and not content_type.lower().startswith("image/"):
+                    raise _FetchFailed("not an image")
+                data = self._read_capped(response, deadline)
+                if response.will_close:
+                    self._drop_connection(parsed.scheme, parsed.netloc)
+                return data, content_type
+            except _FetchFailed:
+                # the body may be half-read; never reuse this connection
+                self._drop_connection(parsed.scheme, parsed.netloc)
+                raise
+            except (http.client.HTTPException, OSError, ValueError) as exc:
+                self._drop_connection(parsed.scheme, parsed.netloc)
+                raise _FetchFailed(str(exc)) from exc
+        raise _FetchFailed("too many redirects")
+
+    # ------------------------------------------------------------------
+    # batch
+    # ------------------------------------------------------------------
+    def _worker(self, jobs, finished, referer, deadline):
+        while True:
+            try:
+                index, url = jobs.get_nowait()
+            except queue.Empty:
+                return
+            result = None
+            if time.monotonic() < deadline:
+                try:
+                    result = self._request(url, referer, deadline)
+                except _FetchFailed as exc:
+                    logger.info("Skipping remote image %s: %s", url, exc)
+            finished.put((index, result))
+
+    def fetch(self, urls, *, referer="", deadline_seconds=None, on_result=None):
+        """
+        Download ``urls`` and return a list of the same length holding
+        ``(bytes, content_type)`` or ``None`` for images that failed, were
+        rejected or did not finish before the deadline. ``on_result(index,
+        result)`` is called from the calling thread as each image settles.
+        """
+        urls = list(urls)
+        results = [None] * len(urls)
+        if not urls:
+            return results
+
+        if deadline_seconds is None:
+            deadline_seconds = _resolve_setting("COPART_IMPORT_IMAGES_DEADLINE_SECONDS", 45.0, 1.0)
+        deadline = time.monotonic() + deadline_seconds
+        jobs = queue.SimpleQueue()
+        for index, url in enumerate(urls):
+            jobs.put((index, url))
+        finished = queue.SimpleQueue()
+
+        for _ in range(min(self.max_workers, len(urls))):
+            self._executor.submit(self._worker, jobs, finished, referer, deadline)
+
+        pending = len(urls)
+        while pending:
+            remaining = deadline - time.monotonic()
+            try:
+                index, result = finished.get(timeout=max(0.0, remaining) + 1.0)
+            except queue.Empty:
+                # a worker is still stuck on a socket after the deadline: return what we have
+                break
+            results[index] = result
+            pending -= 1
+            if on_result is not None:
+                on_result(index, result)
+        return results
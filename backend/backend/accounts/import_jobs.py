@@ -0,0 +1,223 @@
+"""
+Background processing of Copart import jobs.
+
+By default jobs run on a small in-process thread pool right after the
+request commits. A restart loses that pool, so the first time a process
+touches the queue it requeues jobs left running and resubmits jobs left
+queued by a previous process. With ``COPART_IMPORT_JOBS_MODE = "worker"`` the
+web process only queues them and ``manage.py run_import_jobs`` processes pick
+them up.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from threading import Lock
+
+from django.conf import settings
+from django.db import close_old_connections, models, transaction as db_transaction
+from django.utils import timezone
+
+from .models import ImportedListingSource, ImportJob
+
+logger = logging.getLogger(__name__)
+
+IMPORT_JOB_MAX_ATTEMPTS = 3
+STALE_IMPORT_JOB_AFTER = timedelta(minutes=10)
+# queued longer than this in thread mode means the process that owned it is gone
+STRANDED_QUEUED_IMPORT_JOB_AFTER = timedelta(minutes=1)
+
+_IMPORT_JOB_EXECUTOR = None
+_IMPORT_JOB_EXECUTOR_LOCK = Lock()
+_STRANDED_IMPORT_JOBS_RESUMED = False
+
+
+def _resolve_import_job_mode():
+    mode = str(getattr(settings, "COPART_IMPORT_JOBS_MODE", "thread") or "thread").strip().lower()
+    return mode if mode in {"thread", "worker"} else "thread"
+
+
+def _get_import_job_executor():
+    global _IMPORT_JOB_EXECUTOR
+    if _IMPORT_JOB_EXECUTOR is not None:
+        return _IMPORT_JOB_EXECUTOR
+
+    with _IMPORT_JOB_EXECUTOR_LOCK:
+        if _IMPORT_JOB_EXECUTOR is None:
+            _IMPORT_JOB_EXECUTOR = ThreadPoolExecutor(
+                max_workers=max(1, int(getattr(settings, "COPART_IMPORT_JOB_THREADS", 2) or 2)),
+                thread_name_prefix="copart-import-job",
+            )
+    return _IMPORT_JOB_EXECUTOR
+
+
+def enqueue_import_job(job_id):
+    """Hand the job to the in-process pool once committed (worker mode leaves it queued)."""
+    enqueue_import_jobs([job_id])
+
+
+def enqueue_import_jobs(job_ids):
+    """Queue several jobs as one task so a batch import shares one image fetcher."""
+    job_ids = list(job_ids)
+    if not job_ids or _resolve_import_job_mode() == "worker":
+        return
+    resume_stranded_import_jobs()
+
+    def _enqueue():
+        _get_import_job_executor().submit(_run_import_jobs_in_thread, job_ids)
+
+    db_transaction.on_commit(_enqueue)
+
+
+def _run_import_jobs_in_thread(job_ids):
+    from .views import _build_copart_image_fetcher
+
+    close_old_connections()
+    try:
+        with _build_copart_image_fetcher() as fetcher:
+            for job_id in job_ids:
+                run_import_job(job_id, fetcher=fetcher)
+    finally:
+        close_old_connections()
+
+
+def _claim_import_job(job_id):
+    claimed = ImportJob.objects.filter(pk=job_id, status=ImportJob.STATUS_QUEUED).update(
+        status=ImportJob.STATUS_RUNNING,
+        started_at=timezone.now(),
+        attempts=models.F("attempts") + 1,
+    )
+    return bool(claimed)
+
+
+def claim_next_import_job():
+    """Oldest queued job id, claimed so concurrent workers never share one; ``None`` when idle."""
+    with db_transaction.atomic():
+        job_id = (
+            ImportJob.objects.select_for_update(skip_locked=True)
+            .filter(status=ImportJob.STATUS_QUEUED)
+            .order_by("created_at")
+            .values_list("id", flat=True)
+            .first()
+        )
+        if job_id is None or not _claim_import_job(job_id):
+            return None
+    return job_id
+
+
+def requeue_stale_import_jobs(stale_after):
+    """Put jobs whose worker died mid-run back in the queue (or fail them after too many attempts)."""
+    cutoff = timezone.now() - stale_after
+    stale = ImportJob.objects.filter(status=ImportJob.STATUS_RUNNING, started_at__lt=cutoff)
+    stale.filter(attempts__gte=IMPORT_JOB_MAX_ATTEMPTS).update(
+        status=ImportJob.STATUS_FAILED,
+        error_message="Импортът не завърши навреме.",
+        finished_at=timezone.now(),
+    )
+    return stale.update(status=ImportJob.STATUS_QUEUED)
+
+
+def resume_stranded_import_jobs():
+    """
+    Thread mode only, once per process: requeue jobs whose thread died with a
+    previous process and hand every job queued before
+    ``STRANDED_QUEUED_IMPORT_JOB_AFTER`` to this process's pool. Claiming is
+    atomic, so processes resuming the same job never run it twice.
+    """
+    global _STRANDED_IMPORT_JOBS_RESUMED
+    if _STRANDED_IMPORT_JOBS_RESUMED or _resolve_import_job_mode() == "worker":
+        return
+    with _IMPORT_JOB_EXECUTOR_LOCK:
+        if _STRANDED_IMPORT_JOBS_RESUMED:
+            return
+        _STRANDED_IMPORT_JOBS_RESUMED = True
+
+    requeued = requeue_stale_import_jobs(STALE_IMPORT_JOB_AFTER)
+    stranded_ids = list(
+        ImportJob.objects.filter(
+            status=ImportJob.STATUS_QUEUED,
+            created_at__lt=timezone.now() - STRANDED_QUEUED_IMPORT_JOB_AFTER,
+        )
+        .order_by("created_at")
+        .values_list("id", flat=True)
+    )
+    if not stranded_ids:
+        return
+    logger.info("Resuming %s stranded import job(s) (%s were running).", len(stranded_ids), requeued)
+    db_transaction.on_commit(
+        lambda: _get_import_job_executor().submit(_run_import_jobs_in_thread, stranded_ids)
+    )
+
+
+def run_import_job(job_id, *, claimed=False, fetcher=None):
+    """Fetch and ingest the photos of one job, recording progress on the row."""
+    from .views import _attach_copart_images_to_listing
+
+    if not claimed and not _claim_import_job(job_id):
+        return
+    job = ImportJob.objects.select_related("listing").filter(pk=job_id).first()
+    if job is None:
+        return
+
+    def _record_progress(done, total):
+        ImportJob.objects.filter(pk=job.pk).update(images_done=done, images_total=total)
+
+    try:
+        if job.listing is None:
+            raise ValueError("Обявата за импорта вече не съществува.")
+        import_source = None
+        if job.payload.get("import_source_id"):
+            import_source = ImportedListingSource.objects.filter(pk=job.payload["import_source_id"]).first()
+        uploaded = _attach_copart_images_to_listing(
+            job.listing,
+            job.payload,
+            fetcher=fetcher,
+            on_progress=_record_progress,
+            import_source=import_source,
+        )
+    except Exception as exc:
+        logger.warning("Import job %s failed: %s", job.pk, exc)
+        ImportJob.objects.filter(pk=job.pk).update(
+            status=ImportJob.STATUS_FAILED,
+            error_message=str(exc),
+            finished_at=timezone.now(),
+        )
+        return
+
+    ImportJob.objects.filter(pk=job.pk).update(
+        status=ImportJob.STATUS_SUCCEEDED,
+        images_done=models.F("images_total"),
+        images_uploaded=uploaded,
+        finished_at=timezone.now(),
+    )
+
+
+def build_import_job_status(job):
+    total = job.images_total or 0
+    done = min(job.images_done or 0, total) if total else 0
+    if job.status in ImportJob.FINISHED_STATUSES:
+        progress = 100
+    else:
+        progress = int(done * 100 / total) if total else 0
+    payload = {
+        "job_id": str(job.pk),
+        "status": job.status,
+        "images_total": total,
+        "images_done": done,
+        "images_uploaded": job.images_uploaded,
+        "progress": progress,
+        "error": job.error_message or "",
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "listing": None,
+    }
+    if job.listing is not None:
+        payload["listing"] = {
+            "id": job.listing.id,
+            "slug": job.listing.slug,
+            "title": job.listing.title,
+            "is_draft": job.listing.is_draft,
+        }
+    return payload
+
@@ -0,0 +1,39 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from backend.accounts.notifications import USER_NOTIFICATION_PRUNE_BATCH_SIZE, prune_user_notifications
+
+
+class Command(BaseCommand):
+    help = "Delete inbox notifications older than the retention window, in id batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than-days",
+            type=int,
+            default=None,
+            help="Retention in days (defaults to USER_NOTIFICATION_RETENTION_DAYS).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=USER_NOTIFICATION_PRUNE_BATCH_SIZE,
+            help="Rows deleted per statement.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = int(options["batch_size"])
+        if batch_size <= 0:
+            raise CommandError("--batch-size must be positive.")
+        retention_days = options["older_than_days"]
+        if retention_days is None:
+            retention_days = int(getattr(settings, "USER_NOTIFICATION_RETENTION_DAYS", 30) or 30)
+        if retention_days <= 0:
+            raise CommandError("--older-than-days must be positive.")
+
+        cutoff = timezone.now() - timedelta(days=retention_days)
+        deleted = prune_user_notifications(older_than=cutoff, batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} notifications older than {retention_days} days."))
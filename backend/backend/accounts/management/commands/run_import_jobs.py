@@ -0,0 +1,72 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from backend.accounts.import_jobs import (
+    STALE_IMPORT_JOB_AFTER,
+    claim_next_import_job,
+    requeue_stale_import_jobs,
+    run_import_job,
+)
+from backend.accounts.views import _build_copart_image_fetcher
+
+DEFAULT_SLEEP_SECONDS = 2.0
+
+
+class Command(BaseCommand):
+    help = (
+        "Process queued Copart import jobs (photo download and ingestion). "
+        "Run one or more of these when COPART_IMPORT_JOBS_MODE = \"worker\"."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Drain the queue and exit instead of polling forever.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=DEFAULT_SLEEP_SECONDS,
+            help=f"Seconds to wait when the queue is empty (default: {DEFAULT_SLEEP_SECONDS}).",
+        )
+        parser.add_argument(
+            "--stale-minutes",
+            type=float,
+            default=STALE_IMPORT_JOB_AFTER.total_seconds() / 60,
+            help="Requeue running jobs whose worker has not finished them within this many minutes.",
+        )
+
+    def handle(self, *args, **options):
+        sleep_seconds = float(options["sleep"])
+        stale_minutes = float(options["stale_minutes"])
+        if sleep_seconds < 0 or stale_minutes <= 0:
+            raise CommandError("--sleep must not be negative and --stale-minutes must be positive.")
+        stale_after = timedelta(minutes=stale_minutes)
+        run_once = bool(options["once"])
+
+        processed = 0
+        # one fetcher for the worker's lifetime keeps connections to the image CDN warm
+        with _build_copart_image_fetcher() as fetcher:
+            while True:
+                close_old_connections()
+                requeued = requeue_stale_import_jobs(stale_after)
+                if requeued:
+                    self.stdout.write(f"Requeued {requeued} stale import job(s).")
+
+                job_id = claim_next_import_job()
+                if job_id is None:
+                    if run_once:
+                        break
+                    time.sleep(sleep_seconds)
+                    continue
+
+                started_at = time.perf_counter()
+                run_import_job(job_id, claimed=True, fetcher=fetcher)
+                processed += 1
+                self.stdout.write(f"Import job {job_id} done in {time.perf_counter() - started_at:.1f}s")
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} import job(s)."))
@@ -0,0 +1,38 @@
+# Generated by Django 6.0.2 on 2026-10-19 07:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_importjob'),
+        ('listings', '0036_carimage_content_hash_imageblob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportedListingSource',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_key', models.CharField(max_length=80)),
+                ('lot_number', models.CharField(blank=True, max_length=80)),
+                ('source_url', models.URLField(blank=True, max_length=1000)),
+                ('draft_fields', models.JSONField(blank=True, default=dict)),
+                ('image_urls', models.JSONField(blank=True, default=list)),
+                ('image_hashes', models.JSONField(blank=True, default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='import_sources', to='listings.baselisting')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='imported_listing_sources', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Imported Listing Source',
+                'verbose_name_plural': 'Imported Listing Sources',
+                'constraints': [models.UniqueConstraint(fields=('user', 'source_key'), name='impsrc_user_source_key_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 6.0.2 on 2026-10-19 08:20
+
+import re
+import unicodedata
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+PUBLIC_SLUG_MAX_LENGTH = 100
+
+
+def _slugify_dealer_name(value):
+    normalized = unicodedata.normalize("NFKC", str(value or "")).strip().lower()
+    cleaned = "".join(
+        char for char in normalized if char.isalnum() or char.isspace() or char == "-"
+    )
+    compact = re.sub(r"\s+", "-", cleaned)
+    compact = re.sub(r"-{2,}", "-", compact).strip("-")
+    return compact or "dealer"
+
+
+def backfill_public_slugs(apps, schema_editor):
+    BusinessUser = apps.get_model("accounts", "BusinessUser")
+    used = set()
+    updated = []
+
+    # oldest dealer keeps the plain slug, as the old first-match lookup did
+    for dealer in BusinessUser.objects.only("id", "dealer_name").order_by("id").iterator(chunk_size=1000):
+        base_slug = _slugify_dealer_name(dealer.dealer_name)[:PUBLIC_SLUG_MAX_LENGTH - 8].strip("-") or "dealer"
+        candidate = base_slug
+        suffix = 1
+        while candidate in used:
+            suffix += 1
+            candidate = f"{base_slug}-{suffix}"
+        used.add(candidate)
+        dealer.public_slug = candidate
+        updated.append(dealer)
+        if len(updated) >= 1000:
+            BusinessUser.objects.bulk_update(updated, ["public_slug"])
+            updated = []
+    if updated:
+        BusinessUser.objects.bulk_update(updated, ["public_slug"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0012_importedlistingsource'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='businessuser',
+            name='public_slug',
+            field=models.CharField(default='', editable=False, max_length=100),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_public_slugs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='businessuser',
+            name='public_slug',
+            field=models.CharField(editable=False, max_length=100, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='privateuser',
+            index=models.Index(django.db.models.functions.text.Upper('username'), name='privateuser_username_upper_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-19 08:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0014_usernotification_usernotificationcursor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='businessuser',
+            name='share_card',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 6.0.2 on 2026-10-19 09:10
+
+import re
+import unicodedata
+
+from django.db import migrations
+
+PUBLIC_SLUG_MAX_LENGTH = 100
+
+
+def _slugify_dealer_name(value):
+    normalized = unicodedata.normalize("NFKC", str(value or "")).strip().lower()
+    cleaned = "".join(
+        char for char in normalized if char.isalnum() or char.isspace() or char == "-"
+    )
+    compact = re.sub(r"\s+", "-", cleaned)
+    compact = re.sub(r"-{2,}", "-", compact).strip("-")
+    return compact or "dealer"
+
+
+def _base_slug(dealer_name):
+    return _slugify_dealer_name(dealer_name)[:PUBLIC_SLUG_MAX_LENGTH - 8].strip("-") or "dealer"
+
+
+def rename_numeric_slug_suffixes(apps, schema_editor):
+    BusinessUser = apps.get_model("accounts", "BusinessUser")
+    used = set()
+    suffixed = []
+
+    # dealers that own their plain slug keep it; a "-2" style collision suffix
+    # becomes "-x2" so the frontend no longer reads it as a legacy dealer id
+    for dealer in BusinessUser.objects.only("id", "dealer_name", "public_slug").order_by("id").iterator(chunk_size=1000):
+        base_slug = _base_slug(dealer.dealer_name)
+        if dealer.public_slug == base_slug or re.fullmatch(rf"{re.escape(base_slug)}-x\d+", dealer.public_slug):
+            used.add(dealer.public_slug)
+        else:
+            suffixed.append(dealer)
+
+    updated = []
+    for dealer in suffixed:
+        base_slug = _base_slug(dealer.dealer_name)
+        candidate = base_slug
+        suffix = 1
+        while candidate in used:
+            suffix += 1
+            candidate = f"{base_slug}-x{suffix}"
+        used.add(candidate)
+        dealer.public_slug = candidate
+        updated.append(dealer)
+        if len(updated) >= 1000:
+            BusinessUser.objects.bulk_update(updated, ["public_slug"])
+            updated = []
+    if updated:
+        BusinessUser.objects.bulk_update(updated, ["public_slug"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0015_businessuser_share_card'),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_numeric_slug_suffixes, migrations.RunPython.noop),
+    ]
@@ -1,13 +1,19 @@
 import io
 import hashlib
 import os
+import re
 import secrets
+import unicodedata
+import uuid
 from PIL import Image as PILImage
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.validators import EmailValidator
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import InMemoryUploadedFile
-from django.db.models.signals import post_save
+from django.db.models.functions import Upper
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.utils import timezone
 
@@ -132,6 +138,133 @@ class ImportApiUsageEvent(models.Model):
         ]
 
 
+class ImportJob(models.Model):
+    """
+    Background part of a Copart import: the draft is created in the request,
+    photos are fetched and ingested by an import worker.
+    """
+
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_SUCCEEDED = "succeeded"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = (
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_SUCCEEDED, "Succeeded"),
+        (STATUS_FAILED, "Failed"),
+    )
+    FINISHED_STATUSES = (STATUS_SUCCEEDED, STATUS_FAILED)
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="import_jobs")
+    listing = models.ForeignKey(
+        "listings.BaseListing",
+        on_delete=models.SET_NULL,
+        related_name="import_jobs",
+        null=True,
+        blank=True,
+    )
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    payload = models.JSONField(default=dict, blank=True)
+    images_total = models.PositiveSmallIntegerField(default=0)
+    images_done = models.PositiveSmallIntegerField(default=0)
+    images_uploaded = models.PositiveSmallIntegerField(default=0)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error_message = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Import job {self.id} ({self.status})"
+
+    class Meta:
+        verbose_name = "Import Job"
+        verbose_name_plural = "Import Jobs"
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="impjob_status_created_idx"),
+            models.Index(fields=["user", "created_at"], name="impjob_user_created_idx"),
+        ]
+
+
+class ImportedListingSource(models.Model):
+    """
+    Which draft a Copart lot was imported into, so repeat imports of the same
+    lot return that draft instead of creating another one. Keyed per user by
+    ``lot:<lot number>`` or, without a lot number, ``url:<sha256 of source URL>``.
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="imported_listing_sources")
+    listing = models.ForeignKey(
+        "listings.BaseListing",
+        on_delete=models.CASCADE,
+        related_name="import_sources",
+    )
+    source_key = models.CharField(max_length=80)
+    lot_number = models.CharField(max_length=80, blank=True)
+    source_url = models.URLField(max_length=1000, blank=True)
+    # last imported draft values, so a refresh only rewrites what Copart changed
+    draft_fields = models.JSONField(default=dict, blank=True)
+    image_urls = models.JSONField(default=list, blank=True)
+    image_hashes = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.source_key} -> listing {self.listing_id}"
+
+    class Meta:
+        verbose_name = "Imported Listing Source"
+        verbose_name_plural = "Imported Listing Sources"
+        constraints = [
+            models.UniqueConstraint(fields=["user", "source_key"], name="impsrc_user_source_key_uniq"),
+        ]
+
+
+class UserNotification(models.Model):
+    """
+    One entry of a user's notification inbox. Rows are only ever appended;
+    the id is the delivery sequence the client acknowledges.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="notifications")
+    payload = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Notification {self.id} for user {self.user_id}"
+
+    class Meta:
+        verbose_name = "User Notification"
+        verbose_name_plural = "User Notifications"
+        indexes = [
+            models.Index(fields=["user", "id"], name="usrnotif_user_id_idx"),
+            models.Index(fields=["created_at"], name="usrnotif_created_idx"),
+        ]
+
+
+class UserNotificationCursor(models.Model):
+    """Highest notification id the user's client has acknowledged."""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="notification_cursor",
+    )
+    delivered_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Notification cursor {self.delivered_id} for user {self.user_id}"
+
+    class Meta:
+        verbose_name = "User Notification Cursor"
+        verbose_name_plural = "User Notification Cursors"
+
+
 # Signal to create UserProfile when a new User is created
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -145,6 +278,24 @@ def save_user_profile(sender, instance, **kwargs):
         instance.profile.save()
 
 
+PUBLIC_SLUG_MAX_LENGTH = 100
+DEALER_USER_CACHE_SECONDS = 60 * 60
+# listing fields behind a dealer's active listing count, the only listing data
+# on the dealer card and crawler page
+DEALER_CARD_LISTING_FIELDS = frozenset({"user", "user_id", "is_active", "is_draft", "is_archived", "created_at"})
+
+
+def slugify_dealer_name(value):
+    """Public URL segment of a dealer (``/dealers/<slug>``, ``/<slug>``), as the frontend builds it."""
+    normalized = unicodedata.normalize("NFKC", str(value or "")).strip().lower()
+    cleaned = "".join(
+        char for char in normalized if char.isalnum() or char.isspace() or char == "-"
+    )
+    compact = re.sub(r"\s+", "-", cleaned)
+    compact = re.sub(r"-{2,}", "-", compact).strip("-")
+    return compact or "dealer"
+
+
 class PrivateUser(models.Model):
     """Model for private user accounts"""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='private_profile')
@@ -159,6 +310,10 @@ class PrivateUser(models.Model):
     class Meta:
         verbose_name = "Private User"
         verbose_name_plural = "Private Users"
+        indexes = [
+            # public profile lookups use username__iexact
+            models.Index(Upper("username"), name="privateuser_username_upper_idx"),
+        ]
 
 
 class BusinessUser(models.Model):
@@ -167,6 +322,10 @@ class BusinessUser(models.Model):
 
     # Име и контакти (Name and Contacts)
     dealer_name = models.CharField(max_length=80, unique=True)
+    # slugified dealer_name, kept in sync on save; an "-x2" style suffix
+    # separates names that slugify the same way (never a bare number, which
+    # the frontend still reads as a legacy dealer id)
+    public_slug = models.CharField(max_length=PUBLIC_SLUG_MAX_LENGTH, unique=True, editable=False)
     city = models.CharField(max_length=50)
     address = models.CharField(max_length=80)
     phone = models.CharField(max_length=25)
@@ -193,6 +352,9 @@ class BusinessUser(models.Model):
     # Profile image & about
     profile_image = models.ImageField(upload_to='dealer_photos/', blank=True, null=True)
     about_text = models.TextField(blank=True, null=True)
+    # storage name of the current share card (see prerender.py), so the
+    # previous one can be deleted by whichever process renders the next
+    share_card = models.CharField(max_length=255, blank=True, default="", editable=False)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -252,11 +414,94 @@ class BusinessUser(models.Model):
             except Exception:
                 pass
 
+    def _get_base_public_slug(self):
+        # room for the collision suffix
+        return slugify_dealer_name(self.dealer_name)[:PUBLIC_SLUG_MAX_LENGTH - 8].strip("-") or "dealer"
+
+    def _has_current_public_slug(self):
+        base_slug = self._get_base_public_slug()
+        return self.public_slug == base_slug or bool(
+            re.fullmatch(rf"{re.escape(base_slug)}-x\d+", self.public_slug or "")
+        )
+
+    def _build_unique_public_slug(self):
+        base_slug = self._get_base_public_slug()
+        taken = set(
+            BusinessUser.objects.exclude(pk=self.pk)
+            .filter(public_slug__startswith=base_slug)
+            .values_list("public_slug", flat=True)
+        )
+        candidate = base_slug
+        suffix = 1
+        while candidate in taken:
+            suffix += 1
+            candidate = f"{base_slug}-x{suffix}"
+        return candidate
+
     def save(self, *args, **kwargs):
         if self.profile_image:
             self._optimize_profile_image()
+        if not self._has_current_public_slug():
+            self.public_slug = self._build_unique_public_slug()
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None and "public_slug" not in update_fields:
+                kwargs["update_fields"] = [*update_fields, "public_slug"]
         super().save(*args, **kwargs)
 
     class Meta:
         verbose_name = "Business User"
         verbose_name_plural = "Business Users"
+
+
+# Keep dealer share cards pre-rendered: the card shows the profile and the
+# active listing count, so re-render it in the background when either changes.
+@receiver(post_save, sender=BusinessUser)
+def refresh_dealer_card_on_profile_change(sender, instance, **kwargs):
+    from .prerender import schedule_dealer_card_refresh
+
+    cache.set(_dealer_user_cache_key(instance.user_id), True, DEALER_USER_CACHE_SECONDS)
+    schedule_dealer_card_refresh(instance.user_id)
+
+
+@receiver(post_delete, sender=BusinessUser)
+def cleanup_dealer_prerender(sender, instance, **kwargs):
+    from backend.listings.prerender import delete_stored_prerender_html, prerender_html_storage_dir
+    from backend.listings.storage_io import delete_paths
+
+    from .prerender import dealer_card_storage_dir
+
+    cache.delete(_dealer_user_cache_key(instance.user_id))
+    delete_stored_prerender_html(prerender_html_storage_dir("dealers", instance.pk))
+    delete_stored_prerender_html(dealer_card_storage_dir(instance.pk))
+    if instance.share_card:
+        delete_paths(default_storage, [instance.share_card])
+
+
+def _dealer_user_cache_key(user_id):
+    return f"accounts:is-dealer:{user_id}"
+
+
+def is_dealer_user(user_id):
+    """Whether ``user_id`` has a business profile; cached, and kept current by BusinessUser saves and deletes."""
+    if not user_id:
+        return False
+    cache_key = _dealer_user_cache_key(user_id)
+    is_dealer = cache.get(cache_key)
+    if is_dealer is None:
+        is_dealer = BusinessUser.objects.filter(user_id=user_id).exists()
+        cache.set(cache_key, is_dealer, DEALER_USER_CACHE_SECONDS)
+    return is_dealer
+
+
+@receiver(post_save, sender="listings.BaseListing")
+@receiver(post_delete, sender="listings.BaseListing")
+def refresh_dealer_card_on_listing_change(sender, instance, update_fields=None, **kwargs):
+    from .prerender import schedule_dealer_card_refresh
+
+    # view counters and other partial saves leave the active listing count alone
+    if update_fields is not None and not DEALER_CARD_LISTING_FIELDS.intersection(update_fields):
+        return
+    # private sellers have no card
+    if not is_dealer_user(instance.user_id):
+        return
+    schedule_dealer_card_refresh(instance.user_id)
@@ -0,0 +1,86 @@
+"""
+Durable per-user notification inbox.
+
+Each notification is one append-only ``UserNotification`` row whose id is its
+delivery sequence. ``UserNotificationCursor`` keeps the highest id the user's
+client acknowledged, so polls and WebSocket reconnects resume from there with
+a single ``(user, id)`` range query. Nothing is deleted on read; old rows are
+removed in batches by ``manage.py prune_user_notifications``.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models import Max, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import UserNotification, UserNotificationCursor
+
+USER_NOTIFICATION_PAGE_MAX = 50
+USER_NOTIFICATION_PRUNE_BATCH_SIZE = 1000
+
+
+def append_user_notification(user_id, payload):
+    """Store a notification for ``user_id`` and return its sequence id."""
+    with db_transaction.atomic():
+        # the cursor row lock orders one user's inserts, so ids commit in sequence
+        # and a range poll can never step over a row that commits later
+        UserNotificationCursor.objects.select_for_update().get_or_create(user_id=user_id)
+        notification = UserNotification.objects.create(user_id=user_id, payload=payload)
+    return notification.id
+
+
+def serialize_user_notification(notification_id, payload):
+    return {**(payload if isinstance(payload, dict) else {}), "seq": notification_id}
+
+
+def fetch_user_notifications(user_id, after_id=None, limit=20):
+    """
+    Notifications newer than ``after_id`` (or than the stored cursor when it
+    is ``None``), oldest first, each tagged with its ``seq``.
+    """
+    safe_limit = max(1, min(int(limit or 20), USER_NOTIFICATION_PAGE_MAX))
+    if after_id is None:
+        after_id = Coalesce(
+            Subquery(UserNotificationCursor.objects.filter(user_id=user_id).values("delivered_id")[:1]),
+            Value(0),
+        )
+    rows = (
+        UserNotification.objects.filter(user_id=user_id, id__gt=after_id)
+        .order_by("id")
+        .values_list("id", "payload")[:safe_limit]
+    )
+    return [serialize_user_notification(notification_id, payload) for notification_id, payload in rows]
+
+
+def acknowledge_user_notifications(user_id, seq):
+    """Move the delivered cursor up to ``seq``; it never moves back or past the user's newest row."""
+    delivered_id = (
+        UserNotification.objects.filter(user_id=user_id, id__lte=seq).aggregate(latest=Max("id"))["latest"]
+    )
+    if not delivered_id:
+        return
+    updated = UserNotificationCursor.objects.filter(user_id=user_id, delivered_id__lt=delivered_id).update(
+        delivered_id=delivered_id,
+        updated_at=timezone.now(),
+    )
+    if not updated:
+        UserNotificationCursor.objects.get_or_create(user_id=user_id, defaults={"delivered_id": delivered_id})
+
+
+def prune_user_notifications(older_than=None, batch_size=USER_NOTIFICATION_PRUNE_BATCH_SIZE):
+    """Delete notifications created before ``older_than`` in id batches; returns the number removed."""
+    if older_than is None:
+        retention_days = int(getattr(settings, "USER_NOTIFICATION_RETENTION_DAYS", 30) or 30)
+        older_than = timezone.now() - timedelta(days=retention_days)
+    queryset = UserNotification.objects.filter(created_at__lt=older_than).order_by("id")
+    deleted = 0
+    last_id = 0
+    while True:
+        ids = list(queryset.filter(id__gt=last_id).values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        last_id = ids[-1]
+        deleted += UserNotification.objects.filter(id__in=ids).delete()[0]
@@ -1,14 +1,20 @@
+import functools
 import hashlib
 import io
 import json
-import re
-import unicodedata
+import logging
+import time
 import urllib.error
 import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 from html import escape
+from threading import Lock
 from urllib.parse import quote
 
 from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction as db_transaction
 from django.http import HttpResponse
 from django.utils.cache import patch_vary_headers
 from django.utils.http import http_date, parse_http_date_safe, quote_etag
@@ -17,8 +23,19 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 
 from backend.listings.models import get_expiry_cutoff
+from backend.listings.prerender import (
+    delete_stored_prerender_html,
+    get_prerender_cache,
+    prerender_html_storage_dir,
+    prerender_html_storage_name,
+    read_stored_prerender_html,
+    store_prerender_html,
+)
+from backend.listings.storage_io import delete_paths, store_files
+
+from .models import BusinessUser, slugify_dealer_name
 
-from .models import BusinessUser
+logger = logging.getLogger(__name__)
 
 PRERENDER_PUBLIC_CACHE_SECONDS = 300
 PRERENDER_PUBLIC_STALE_SECONDS = 900
@@ -41,10 +58,29 @@ PRERENDER_BOT_SIGNATURES = (
     "discordbot",
 )
 
+# Cached pages are checked against the dealer's ETag on every hit; bump the
+# version when the markup changes so a deploy does not serve old HTML.
+PRERENDER_HTML_VERSION = 1
+PRERENDER_HTML_CACHE_SECONDS = 7 * 24 * 60 * 60
+
+# Rendered cards are keyed by their ETag, so a cached card never goes stale:
+# any change to the dealer or the listing count produces a new key.
+DEALER_CARD_CACHE_SECONDS = 7 * 24 * 60 * 60
+DEALER_CARD_STORAGE_PREFIX = "share_cards/dealers"
+DEALER_CARD_REFRESH_COALESCE_SECONDS = 5
+SITE_LOGO_CACHE_SECONDS = 60 * 60
+SITE_LOGO_RETRY_SECONDS = 5 * 60
+
 _CARD_WIDTH = 1200
 _CARD_HEIGHT = 630
 _CARD_PADDING = 56
 _LANCZOS = Image.Resampling.LANCZOS if hasattr(Image, "Resampling") else Image.LANCZOS
+_LOGO_MAX_SIZE = (250, 92)
+
+_SITE_LOGO = {"image": None, "expires_at": 0.0}
+_SITE_LOGO_LOCK = Lock()
+_DEALER_CARD_EXECUTOR = None
+_DEALER_CARD_EXECUTOR_LOCK = Lock()
 
 
 def _trim_to_value(value, fallback=""):
@@ -73,16 +109,6 @@ def _resolve_backend_base_url(request):
     return request.build_absolute_uri("/").rstrip("/")
 
 
-def _slugify_dealer_segment(value):
-    normalized = unicodedata.normalize("NFKC", str(value or "")).strip().lower()
-    cleaned = "".join(
-        char for char in normalized if char.isalnum() or char.isspace() or char == "-"
-    )
-    compact = re.sub(r"\s+", "-", cleaned)
-    compact = re.sub(r"-{2,}", "-", compact).strip("-")
-    return compact or "dealer"
-
-
 def _is_supported_prerender_bot(user_agent):
     normalized = _trim_to_value(user_agent).lower()
     if not normalized:
@@ -155,10 +181,54 @@ def _resolve_dealer_profile_image_url(request, dealer, frontend_base_url):
     if image_url.startswith("http://") or image_url.startswith("https://"):
         return image_url
     if image_url.startswith("/"):
+        if request is None:
+            backend_base_url = _trim_to_value(getattr(settings, "BACKEND_BASE_URL", ""), fallback=frontend_base_url)
+            return f"{backend_base_url.rstrip('/')}{image_url}"
         return request.build_absolute_uri(image_url)
     return f"{frontend_base_url}/{image_url.lstrip('/')}"
 
 
+def _load_dealer_photo(request, dealer, frontend_base_url):
+    """Read the profile photo straight from storage; fall back to its public URL."""
+    image_field = getattr(dealer, "profile_image", None)
+    image_name = _trim_to_value(getattr(image_field, "name", ""))
+    if not image_name:
+        return None
+    try:
+        with image_field.storage.open(image_name, "rb") as image_file:
+            with Image.open(image_file) as image:
+                return image.convert("RGB")
+    except Exception:
+        pass
+    return _fetch_image_from_url(_resolve_dealer_profile_image_url(request, dealer, frontend_base_url))
+
+
+def _get_site_logo():
+    """Decoded and downscaled site logo, fetched at most once per hour per process."""
+    now = time.monotonic()
+    if _SITE_LOGO["expires_at"] > now:
+        return _SITE_LOGO["image"]
+
+    with _SITE_LOGO_LOCK:
+        if _SITE_LOGO["expires_at"] > now:
+            return _SITE_LOGO["image"]
+        logo = None
+        for logo_url in (f"{_resolve_frontend_base_url()}/karbglogo.png", "https://www.kar.bg/karbglogo.png"):
+            logo = _fetch_image_from_url(logo_url, mode="RGBA")
+            if logo is not None:
+                break
+        if logo is not None:
+            scale = min(_LOGO_MAX_SIZE[0] / logo.width, _LOGO_MAX_SIZE[1] / logo.height, 1.0)
+            logo = logo.resize(
+                (max(1, int(logo.width * scale)), max(1, int(logo.height * scale))),
+                _LANCZOS,
+            )
+        _SITE_LOGO["image"] = logo
+        # an unreachable frontend is retried sooner than a successful fetch is refreshed
+        _SITE_LOGO["expires_at"] = now + (SITE_LOGO_CACHE_SECONDS if logo is not None else SITE_LOGO_RETRY_SECONDS)
+        return logo
+
+
 def _get_active_listing_count(dealer):
     cutoff = get_expiry_cutoff()
     return dealer.user.car_listings.filter(
@@ -170,12 +240,13 @@ def _get_active_listing_count(dealer):
 
 
 def _resolve_dealer_by_slug(dealer_slug):
-    target_slug = _slugify_dealer_segment(dealer_slug)
-    dealer_rows = (
+    target_slug = slugify_dealer_name(dealer_slug)
+    dealer = (
         BusinessUser.objects.select_related("user")
         .only(
             "id",
             "dealer_name",
+            "public_slug",
             "city",
             "address",
             "phone",
@@ -190,13 +261,10 @@ def _resolve_dealer_by_slug(dealer_slug):
             "user__id",
             "user__email",
         )
-        .order_by("id")
+        .filter(public_slug=target_slug)
+        .first()
     )
-
-    for dealer in dealer_rows:
-        if _slugify_dealer_segment(dealer.dealer_name) == target_slug:
-            return dealer, target_slug
-    return None, target_slug
+    return dealer, target_slug
 
 
 def _build_dealer_etag(dealer, slug_value, listing_count):
@@ -220,6 +288,7 @@ def _build_dealer_etag(dealer, slug_value, listing_count):
     return quote_etag(digest[:32])
 
 
+@functools.lru_cache(maxsize=32)
 def _load_font(font_size, bold=False):
     font_candidates = []
     if bold:
@@ -280,8 +349,8 @@ def _wrap_text(draw, text, font, max_width, max_lines):
     return clipped
 
 
-def _render_dealer_card_image(request, dealer, dealer_slug, listing_count):
-    frontend_base_url = _resolve_frontend_base_url()
+def _new_card_canvas():
+    """White 1200x630 card with the rounded frame and the teal accent bar."""
     canvas = Image.new("RGB", (_CARD_WIDTH, _CARD_HEIGHT), "#ffffff")
     draw = ImageDraw.Draw(canvas, "RGBA")
 
@@ -297,31 +366,15 @@ def _render_dealer_card_image(request, dealer, dealer_slug, listing_count):
         radius=10,
         fill=(15, 118, 110, 255),
     )
+    return canvas, draw
 
-    title_font = _load_font(62, bold=True)
-    subtitle_font = _load_font(30, bold=False)
-    info_font = _load_font(25, bold=False)
-    desc_font = _load_font(22, bold=False)
-    badge_font = _load_font(23, bold=True)
 
-    left_x = _CARD_PADDING + 36
+def _draw_card_logo(canvas, draw):
+    """Site logo (or the text mark) in the top-left corner; returns its bottom edge."""
     logo_anchor_x = _CARD_PADDING + 44
-    logo_bottom_y = _CARD_PADDING + 24
-    logo = None
-    for logo_url in (f"{frontend_base_url}/karbglogo.png", "https://www.kar.bg/karbglogo.png"):
-        logo = _fetch_image_from_url(logo_url, mode="RGBA")
-        if logo is not None:
-            break
-
+    logo = _get_site_logo()
     if logo is not None:
-        max_logo_width = 250
-        max_logo_height = 92
-        scale = min(max_logo_width / logo.width, max_logo_height / logo.height, 1.0)
-        logo_size = (
-            max(1, int(logo.width * scale)),
-            max(1, int(logo.height * scale)),
-        )
-        logo = logo.resize(logo_size, _LANCZOS)
+        logo_size = logo.size
         logo_x = logo_anchor_x
         logo_y = _CARD_PADDING + 18
         logo_box = [logo_x - 12, logo_y - 8, logo_x + logo_size[0] + 12, logo_y + logo_size[1] + 8]
@@ -333,12 +386,87 @@ def _render_dealer_card_image(request, dealer, dealer_slug, listing_count):
             width=1,
         )
         canvas.paste(logo, (logo_x, logo_y), logo if logo.mode == "RGBA" else None)
-        logo_bottom_y = logo_y + logo_size[1]
-    else:
-        logo_fallback_font = _load_font(44, bold=True)
-        logo_fallback_y = _CARD_PADDING + 24
-        draw.text((logo_anchor_x, logo_fallback_y), "kar.bg", font=logo_fallback_font, fill=(15, 118, 110, 255))
-        logo_bottom_y = logo_fallback_y + logo_fallback_font.size
+        return logo_y + logo_size[1]
+
+    logo_fallback_font = _load_font(44, bold=True)
+    logo_fallback_y = _CARD_PADDING + 24
+    draw.text((logo_anchor_x, logo_fallback_y), "kar.bg", font=logo_fallback_font, fill=(15, 118, 110, 255))
+    return logo_fallback_y + logo_fallback_font.size
+
+
+def _draw_card_chip(draw, text_value, x, y, font):
+    chip_bbox = draw.textbbox((0, 0), text_value, font=font)
+    chip_w = (chip_bbox[2] - chip_bbox[0]) + 28
+    chip_h = (chip_bbox[3] - chip_bbox[1]) + 16
+    draw.rounded_rectangle(
+        [x, y, x + chip_w, y + chip_h],
+        radius=16,
+        fill=(236, 253, 245, 255),
+        outline=(153, 246, 228, 255),
+        width=1,
+    )
+    draw.text((x + 14, y + 8), text_value, font=font, fill=(15, 118, 110, 255))
+    return chip_w
+
+
+def _draw_card_url_badge(draw, badge_text, x, font):
+    badge_bbox = draw.textbbox((0, 0), badge_text, font=font)
+    badge_width = (badge_bbox[2] - badge_bbox[0]) + 34
+    badge_height = (badge_bbox[3] - badge_bbox[1]) + 18
+    badge_y = _CARD_HEIGHT - 122
+    draw.rounded_rectangle(
+        [x, badge_y, x + badge_width, badge_y + badge_height],
+        radius=18,
+        fill=(15, 118, 110, 255),
+        outline=(15, 148, 136, 255),
+        width=1,
+    )
+    draw.text((x + 17, badge_y + 9), badge_text, font=font, fill=(255, 255, 255, 255))
+
+
+def _draw_card_photo(canvas, draw, photo, photo_box):
+    """
+    Framed photo slot; ``photo`` is cropped to fill it. Returns the inner box
+    when there was no photo so the caller can draw its own placeholder.
+    """
+    draw.rounded_rectangle(
+        photo_box,
+        radius=28,
+        fill=(248, 250, 252, 255),
+        outline=(203, 213, 225, 255),
+        width=2,
+    )
+    inner_box = (
+        photo_box[0] + 10,
+        photo_box[1] + 10,
+        photo_box[2] - 10,
+        photo_box[3] - 10,
+    )
+    if photo is None:
+        draw.rounded_rectangle(inner_box, radius=22, fill=(226, 232, 240, 255))
+        return inner_box
+
+    photo_w = inner_box[2] - inner_box[0]
+    photo_h = inner_box[3] - inner_box[1]
+    fitted = ImageOps.fit(photo, (photo_w, photo_h), method=_LANCZOS, centering=(0.5, 0.5))
+    mask = Image.new("L", (photo_w, photo_h), 0)
+    ImageDraw.Draw(mask).rounded_rectangle([0, 0, photo_w, photo_h], radius=22, fill=255)
+    canvas.paste(fitted, (inner_box[0], inner_box[1]), mask)
+    return None
+
+
+def _render_dealer_card_image(request, dealer, dealer_slug, listing_count):
+    frontend_base_url = _resolve_frontend_base_url()
+    canvas, draw = _new_card_canvas()
+
+    title_font = _load_font(62, bold=True)
+    subtitle_font = _load_font(30, bold=False)
+    info_font = _load_font(25, bold=False)
+    desc_font = _load_font(22, bold=False)
+    badge_font = _load_font(23, bold=True)
+
+    left_x = _CARD_PADDING + 36
+    logo_bottom_y = _draw_card_logo(canvas, draw)
 
     title_lines = _wrap_text(draw, dealer.dealer_name, title_font, max_width=610, max_lines=2)
     title_y = max(_CARD_PADDING + 78, logo_bottom_y + 16)
@@ -356,24 +484,9 @@ def _render_dealer_card_image(request, dealer, dealer_slug, listing_count):
     )
 
     info_y = title_y + 72
-
-    def _draw_info_chip(text_value, x, y):
-        chip_bbox = draw.textbbox((0, 0), text_value, font=badge_font)
-        chip_w = (chip_bbox[2] - chip_bbox[0]) + 28
-        chip_h = (chip_bbox[3] - chip_bbox[1]) + 16
-        draw.rounded_rectangle(
-            [x, y, x + chip_w, y + chip_h],
-            radius=16,
-            fill=(236, 253, 245, 255),
-            outline=(153, 246, 228, 255),
-            width=1,
-        )
-        draw.text((x + 14, y + 8), text_value, font=badge_font, fill=(15, 118, 110, 255))
-        return chip_w
-
     chip_x = left_x
-    first_chip_w = _draw_info_chip(f"Обяви: {int(listing_count)}", chip_x, info_y)
-    _draw_info_chip(f"Град: {city_label}", chip_x + first_chip_w + 10, info_y)
+    first_chip_w = _draw_card_chip(draw, f"Обяви: {int(listing_count)}", chip_x, info_y, badge_font)
+    _draw_card_chip(draw, f"Град: {city_label}", chip_x + first_chip_w + 10, info_y, badge_font)
 
     info_rows = []
     address_label = _trim_to_value(getattr(dealer, "address", ""))
@@ -408,47 +521,11 @@ def _render_dealer_card_image(request, dealer, dealer_slug, listing_count):
             draw.text((left_x, desc_y), line, font=desc_font, fill=(100, 116, 139, 255))
             desc_y += desc_font.size + 6
 
-    badge_text = f"www.kar.bg/dealers/{dealer_slug}"
-    badge_bbox = draw.textbbox((0, 0), badge_text, font=badge_font)
-    badge_width = (badge_bbox[2] - badge_bbox[0]) + 34
-    badge_height = (badge_bbox[3] - badge_bbox[1]) + 18
-    badge_x = left_x
-    badge_y = _CARD_HEIGHT - 122
-    draw.rounded_rectangle(
-        [badge_x, badge_y, badge_x + badge_width, badge_y + badge_height],
-        radius=18,
-        fill=(15, 118, 110, 255),
-        outline=(15, 148, 136, 255),
-        width=1,
-    )
-    draw.text((badge_x + 17, badge_y + 9), badge_text, font=badge_font, fill=(255, 255, 255, 255))
-
-    photo_box = (772, 172, 1074, 506)
-    draw.rounded_rectangle(
-        photo_box,
-        radius=28,
-        fill=(248, 250, 252, 255),
-        outline=(203, 213, 225, 255),
-        width=2,
-    )
+    _draw_card_url_badge(draw, f"www.kar.bg/dealers/{dealer_slug}", left_x, badge_font)
 
-    fallback_box = (
-        photo_box[0] + 10,
-        photo_box[1] + 10,
-        photo_box[2] - 10,
-        photo_box[3] - 10,
-    )
-    dealer_photo_url = _resolve_dealer_profile_image_url(request, dealer, frontend_base_url)
-    dealer_photo = _fetch_image_from_url(dealer_photo_url)
-    if dealer_photo is not None:
-        photo_w = fallback_box[2] - fallback_box[0]
-        photo_h = fallback_box[3] - fallback_box[1]
-        fitted = ImageOps.fit(dealer_photo, (photo_w, photo_h), method=_LANCZOS, centering=(0.5, 0.5))
-        mask = Image.new("L", (photo_w, photo_h), 0)
-        ImageDraw.Draw(mask).rounded_rectangle([0, 0, photo_w, photo_h], radius=22, fill=255)
-        canvas.paste(fitted, (fallback_box[0], fallback_box[1]), mask)
-    else:
-        draw.rounded_rectangle(fallback_box, radius=22, fill=(226, 232, 240, 255))
+    dealer_photo = _load_dealer_photo(request, dealer, frontend_base_url)
+    fallback_box = _draw_card_photo(canvas, draw, dealer_photo, (772, 172, 1074, 506))
+    if fallback_box is not None:
         avatar_radius = 92
         avatar_cx = (fallback_box[0] + fallback_box[2]) // 2
         avatar_cy = (fallback_box[1] + fallback_box[3]) // 2 - 8
@@ -476,6 +553,163 @@ def _render_dealer_card_image(request, dealer, dealer_slug, listing_count):
     return canvas.convert("RGB")
 
 
+def render_listing_card_image(*, title, price_label, subtitle, chips, badge_text, photo=None):
+    """
+    Listing share card on the dealer-card layout: title, price, a subtitle
+    line, fact chips, the canonical URL badge and the cover photo.
+    """
+    canvas, draw = _new_card_canvas()
+
+    title_font = _load_font(54, bold=True)
+    price_font = _load_font(52, bold=True)
+    subtitle_font = _load_font(28, bold=False)
+    badge_font = _load_font(23, bold=True)
+
+    left_x = _CARD_PADDING + 36
+    logo_bottom_y = _draw_card_logo(canvas, draw)
+
+    title_y = max(_CARD_PADDING + 78, logo_bottom_y + 16)
+    for line in _wrap_text(draw, title, title_font, max_width=610, max_lines=2):
+        draw.text((left_x, title_y), line, font=title_font, fill=(15, 23, 42, 255))
+        title_y += title_font.size + 10
+
+    draw.text((left_x, title_y + 4), price_label, font=price_font, fill=(15, 118, 110, 255))
+    subtitle_y = title_y + price_font.size + 22
+    for line in _wrap_text(draw, subtitle, subtitle_font, max_width=630, max_lines=1):
+        draw.text((left_x, subtitle_y), line, font=subtitle_font, fill=(71, 85, 105, 255))
+
+    chip_x = left_x
+    chip_y = subtitle_y + subtitle_font.size + 24
+    for chip in chips[:3]:
+        chip_w = _draw_card_chip(draw, chip, chip_x, chip_y, badge_font)
+        chip_x += chip_w + 10
+        if chip_x > 700:
+            break
+
+    _draw_card_url_badge(draw, badge_text, left_x, badge_font)
+    fallback_box = _draw_card_photo(canvas, draw, photo, (772, 172, 1074, 506))
+    if fallback_box is not None:
+        mark_font = _load_font(64, bold=True)
+        mark_bbox = draw.textbbox((0, 0), "kar.bg", font=mark_font)
+        mark_x = (fallback_box[0] + fallback_box[2] - (mark_bbox[2] - mark_bbox[0])) / 2
+        mark_y = (fallback_box[1] + fallback_box[3] - (mark_bbox[3] - mark_bbox[1])) / 2
+        draw.text((mark_x, mark_y), "kar.bg", font=mark_font, fill=(148, 163, 184, 255))
+
+    return canvas.convert("RGB")
+
+
+def encode_card_jpeg(card_image):
+    image_buffer = io.BytesIO()
+    card_image.save(image_buffer, format="JPEG", quality=90, optimize=True, progressive=True)
+    return image_buffer.getvalue()
+
+
+def _etag_digest(etag_value):
+    return str(etag_value or "").strip().strip('"')
+
+
+def dealer_card_storage_dir(dealer_id):
+    return f"{DEALER_CARD_STORAGE_PREFIX}/{int(dealer_id)}"
+
+
+def _dealer_card_storage_name(dealer_id, card_etag):
+    return f"{dealer_card_storage_dir(dealer_id)}/{_etag_digest(card_etag)}.jpg"
+
+
+def _track_dealer_card(dealer, storage_name):
+    """Point ``share_card`` at the current card and drop the dealer's older ones."""
+    previous_name = BusinessUser.objects.filter(pk=dealer.pk).values_list("share_card", flat=True).first() or ""
+    dealer.share_card = storage_name
+    if previous_name == storage_name:
+        return
+    # update(): a save() would fire the post_save card refresh again
+    BusinessUser.objects.filter(pk=dealer.pk).update(share_card=storage_name)
+    delete_stored_prerender_html(dealer_card_storage_dir(dealer.pk), keep=storage_name)
+    if previous_name and not previous_name.startswith(f"{dealer_card_storage_dir(dealer.pk)}/"):
+        delete_paths(default_storage, [previous_name])
+
+
+def get_dealer_card_bytes(dealer, dealer_slug, listing_count, card_etag, request=None):
+    """
+    Return the share card JPEG for ``card_etag``: from the cache, then from
+    storage (shared by every process), rendering and storing it only when
+    neither has it. Each dealer's cards share one storage directory, so the
+    older ones are deleted whichever process made them; ``share_card`` is
+    updated to the current card on every storage read.
+    """
+    prerender_cache = get_prerender_cache()
+    cache_key = f"prerender:dealer-card:{_etag_digest(card_etag)}"
+    card_bytes = prerender_cache.get(cache_key)
+    if card_bytes is not None:
+        return card_bytes
+
+    storage_name = _dealer_card_storage_name(dealer.pk, card_etag)
+    try:
+        with default_storage.open(storage_name, "rb") as card_file:
+            card_bytes = card_file.read()
+    except Exception:
+        card_bytes = None
+
+    if not card_bytes:
+        card_bytes = encode_card_jpeg(_render_dealer_card_image(request, dealer, dealer_slug, listing_count))
+        try:
+            store_files(default_storage, [{"path": storage_name, "content": card_bytes}])
+        except Exception as exc:
+            logger.warning("Failed to store dealer card %s: %s", storage_name, exc)
+    _track_dealer_card(dealer, storage_name)
+
+    prerender_cache.set(cache_key, card_bytes, DEALER_CARD_CACHE_SECONDS)
+    return card_bytes
+
+
+def refresh_dealer_card(user_id):
+    """Render (or confirm) the current card and crawler HTML of the dealer owned by ``user_id``."""
+    dealer = BusinessUser.objects.select_related("user").filter(user_id=user_id).first()
+    if dealer is None:
+        return None
+    dealer_slug = dealer.public_slug
+    listing_count = _get_active_listing_count(dealer)
+    card_etag = _build_dealer_etag(dealer, dealer_slug, listing_count)
+    get_dealer_card_bytes(dealer, dealer_slug, listing_count, card_etag)
+    warm_dealer_prerender_html(dealer, dealer_slug, listing_count, card_etag)
+    return card_etag
+
+
+def _get_dealer_card_executor():
+    global _DEALER_CARD_EXECUTOR
+    if _DEALER_CARD_EXECUTOR is not None:
+        return _DEALER_CARD_EXECUTOR
+
+    with _DEALER_CARD_EXECUTOR_LOCK:
+        if _DEALER_CARD_EXECUTOR is None:
+            _DEALER_CARD_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dealer-card")
+    return _DEALER_CARD_EXECUTOR
+
+
+def _refresh_dealer_card_in_thread(user_id):
+    cache.delete(f"prerender:dealer-card-pending:{user_id}")
+    close_old_connections()
+    try:
+        refresh_dealer_card(user_id)
+    except Exception as exc:
+        logger.warning("Dealer card refresh for user %s failed: %s", user_id, exc)
+    finally:
+        close_old_connections()
+
+
+def schedule_dealer_card_refresh(user_id):
+    """Re-render a dealer's card and HTML in the background after commit; bursts of changes coalesce."""
+    if not user_id:
+        return
+    if not cache.add(f"prerender:dealer-card-pending:{user_id}", 1, DEALER_CARD_REFRESH_COALESCE_SECONDS):
+        return
+
+    def _submit():
+        _get_dealer_card_executor().submit(_refresh_dealer_card_in_thread, user_id)
+
+    db_transaction.on_commit(_submit)
+
+
 @api_view(["GET"])
 @permission_classes([AllowAny])
 def prerender_dealer_card(request, dealer_slug):
@@ -515,11 +749,9 @@ def prerender_dealer_card(request, dealer_slug):
             patch_vary_headers(response, ("Accept", "User-Agent"))
             return response
 
-    card_image = _render_dealer_card_image(request, dealer, normalized_slug, listing_count)
-    image_buffer = io.BytesIO()
-    card_image.save(image_buffer, format="JPEG", quality=90, optimize=True, progressive=True)
+    card_bytes = get_dealer_card_bytes(dealer, normalized_slug, listing_count, card_etag, request=request)
 
-    response = HttpResponse(image_buffer.getvalue(), content_type="image/jpeg")
+    response = HttpResponse(card_bytes, content_type="image/jpeg")
     response["Cache-Control"] = (
         f"public, max-age={PRERENDER_PUBLIC_CACHE_SECONDS}, "
         f"stale-while-revalidate={PRERENDER_PUBLIC_STALE_SECONDS}"
@@ -532,28 +764,10 @@ def prerender_dealer_card(request, dealer_slug):
     return response
 
 
-@api_view(["GET"])
-@permission_classes([AllowAny])
-def prerender_dealer(request, dealer_slug):
-    user_agent = request.headers.get("User-Agent", "")
-    force_mode = str(request.query_params.get("force") or "").strip().lower() in {"1", "true", "yes"}
-    bot_detected = _is_supported_prerender_bot(user_agent)
-
-    if not bot_detected and not force_mode:
-        return HttpResponse(
-            "Prerender endpoint is reserved for crawler user-agents.",
-            status=403,
-            content_type="text/plain; charset=utf-8",
-        )
-
-    dealer, normalized_slug = _resolve_dealer_by_slug(dealer_slug)
-    if dealer is None:
-        return HttpResponse("Dealer not found.", status=404, content_type="text/plain; charset=utf-8")
-
+def render_dealer_prerender_html(dealer, normalized_slug, listing_count, backend_base_url):
+    """Build the crawler HTML document of a dealer page."""
     site_name = _resolve_site_name()
     frontend_base_url = _resolve_frontend_base_url()
-    backend_base_url = _resolve_backend_base_url(request)
-    listing_count = _get_active_listing_count(dealer)
     canonical_path = f"/dealers/{quote(normalized_slug, safe='-_~')}"
     canonical_url = f"{frontend_base_url}{canonical_path}"
 
@@ -569,37 +783,6 @@ def prerender_dealer(request, dealer_slug):
         f"?v={quote(share_signature, safe='-_~')}"
     )
 
-    dealer_etag = _build_dealer_etag(dealer, normalized_slug, listing_count)
-    last_modified = dealer.updated_at or dealer.created_at
-    last_modified_value = http_date(last_modified.timestamp()) if last_modified else None
-
-    if dealer_etag and _if_none_match_matches(request, dealer_etag):
-        response = HttpResponse(status=304)
-        response["ETag"] = dealer_etag
-        if last_modified_value:
-            response["Last-Modified"] = last_modified_value
-        response["Cache-Control"] = (
-            f"public, max-age={PRERENDER_PUBLIC_CACHE_SECONDS}, "
-            f"stale-while-revalidate={PRERENDER_PUBLIC_STALE_SECONDS}"
-        )
-        patch_vary_headers(response, ("User-Agent",))
-        return response
-
-    if last_modified and not request.headers.get("If-None-Match"):
-        if_modified_since = parse_http_date_safe(request.headers.get("If-Modified-Since") or "")
-        if if_modified_since is not None and int(last_modified.timestamp()) <= int(if_modified_since):
-            response = HttpResponse(status=304)
-            if dealer_etag:
-                response["ETag"] = dealer_etag
-            if last_modified_value:
-                response["Last-Modified"] = last_modified_value
-            response["Cache-Control"] = (
-                f"public, max-age={PRERENDER_PUBLIC_CACHE_SECONDS}, "
-                f"stale-while-revalidate={PRERENDER_PUBLIC_STALE_SECONDS}"
-            )
-            patch_vary_headers(response, ("User-Agent",))
-            return response
-
     dealer_schema = {
         "@context": "https://schema.org",
         "@type": "AutoDealer",
@@ -648,7 +831,109 @@ def prerender_dealer(request, dealer_slug):
 </html>
 """
 
-    response = HttpResponse(html_document, content_type="text/html; charset=utf-8")
+    return html_document
+
+
+def _dealer_html_cache_key(dealer_id):
+    return f"prerender:dealer-html:v{PRERENDER_HTML_VERSION}:{dealer_id}"
+
+
+def get_dealer_prerender_html(dealer, normalized_slug, listing_count, dealer_etag, backend_base_url):
+    """
+    Encoded HTML for ``dealer_etag``: from this process's cache, then from
+    storage, rendering it only when neither has it. One cache entry and one
+    stored document per dealer, replaced on change.
+    """
+    prerender_cache = get_prerender_cache()
+    cache_key = _dealer_html_cache_key(dealer.id)
+    cached = prerender_cache.get(cache_key)
+    if cached is not None and cached[:2] == (dealer_etag, backend_base_url):
+        return cached[2]
+
+    storage_dir = prerender_html_storage_dir("dealers", dealer.id)
+    storage_name = prerender_html_storage_name(storage_dir, dealer_etag, backend_base_url)
+    html_bytes = read_stored_prerender_html(storage_name)
+    if not html_bytes:
+        html_bytes = render_dealer_prerender_html(
+            dealer, normalized_slug, listing_count, backend_base_url
+        ).encode("utf-8")
+        store_prerender_html(storage_dir, storage_name, html_bytes)
+    prerender_cache.set(cache_key, (dealer_etag, backend_base_url, html_bytes), PRERENDER_HTML_CACHE_SECONDS)
+    return html_bytes
+
+
+def warm_dealer_prerender_html(dealer, normalized_slug, listing_count, dealer_etag):
+    """
+    Pre-render a dealer page. Needs ``BACKEND_BASE_URL`` (the share card link
+    is absolute); without it pages are cached on their first crawler request.
+    """
+    backend_base_url = _trim_to_value(getattr(settings, "BACKEND_BASE_URL", "")).rstrip("/")
+    if not backend_base_url:
+        return False
+    get_dealer_prerender_html(dealer, normalized_slug, listing_count, dealer_etag, backend_base_url)
+    return True
+
+
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def prerender_dealer(request, dealer_slug):
+    user_agent = request.headers.get("User-Agent", "")
+    force_mode = str(request.query_params.get("force") or "").strip().lower() in {"1", "true", "yes"}
+    bot_detected = _is_supported_prerender_bot(user_agent)
+
+    if not bot_detected and not force_mode:
+        return HttpResponse(
+            "Prerender endpoint is reserved for crawler user-agents.",
+            status=403,
+            content_type="text/plain; charset=utf-8",
+        )
+
+    dealer, normalized_slug = _resolve_dealer_by_slug(dealer_slug)
+    if dealer is None:
+        return HttpResponse("Dealer not found.", status=404, content_type="text/plain; charset=utf-8")
+
+    listing_count = _get_active_listing_count(dealer)
+    dealer_etag = _build_dealer_etag(dealer, normalized_slug, listing_count)
+    last_modified = dealer.updated_at or dealer.created_at
+    last_modified_value = http_date(last_modified.timestamp()) if last_modified else None
+
+    if dealer_etag and _if_none_match_matches(request, dealer_etag):
+        response = HttpResponse(status=304)
+        response["ETag"] = dealer_etag
+        if last_modified_value:
+            response["Last-Modified"] = last_modified_value
+        response["Cache-Control"] = (
+            f"public, max-age={PRERENDER_PUBLIC_CACHE_SECONDS}, "
+            f"stale-while-revalidate={PRERENDER_PUBLIC_STALE_SECONDS}"
+        )
+        patch_vary_headers(response, ("User-Agent",))
+        return response
+
+    if last_modified and not request.headers.get("If-None-Match"):
+        if_modified_since = parse_http_date_safe(request.headers.get("If-Modified-Since") or "")
+        if if_modified_since is not None and int(last_modified.timestamp()) <= int(if_modified_since):
+            response = HttpResponse(status=304)
+            if dealer_etag:
+                response["ETag"] = dealer_etag
+            if last_modified_value:
+                response["Last-Modified"] = last_modified_value
+            response["Cache-Control"] = (
+                f"public, max-age={PRERENDER_PUBLIC_CACHE_SECONDS}, "
+                f"stale-while-revalidate={PRERENDER_PUBLIC_STALE_SECONDS}"
+            )
+            patch_vary_headers(response, ("User-Agent",))
+            return response
+
+    response = HttpResponse(
+        get_dealer_prerender_html(
+            dealer,
+            normalized_slug,
+            listing_count,
+            dealer_etag,
+            _resolve_backend_base_url(request),
+        ),
+        content_type="text/html; charset=utf-8",
+    )
     response["Cache-Control"] = (
         f"public, max-age={PRERENDER_PUBLIC_CACHE_SECONDS}, "
         f"stale-while-revalidate={PRERENDER_PUBLIC_STALE_SECONDS}"
@@ -274,7 +274,7 @@ class DealerListSerializer(serializers.ModelSerializer):
     class Meta:
         model = BusinessUser
         fields = [
-            'id', 'dealer_name', 'city', 'phone', 'email',
+            'id', 'dealer_name', 'public_slug', 'city', 'phone', 'email',
             'profile_image_url', 'listing_count', 'created_at',
         ]
 
@@ -304,7 +304,7 @@ class DealerDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = BusinessUser
         fields = [
-            'id', 'dealer_name', 'city', 'address', 'phone', 'email', 'website',
+            'id', 'dealer_name', 'public_slug', 'city', 'address', 'phone', 'email', 'website',
             'company_name', 'description', 'about_text',
             'profile_image_url', 'listing_count', 'created_at',
         ]
@@ -1,9 +1,105 @@
+import io
+import os
 import re
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest.mock import patch
 
+from asgiref.sync import async_to_sync
+from channels.testing import WebsocketCommunicator
 from django.contrib.auth.models import User
 from django.core import mail
-from django.test import override_settings
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.exceptions import ValidationError
 from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from backend.listings import realtime
+from backend.notifications_consumers import NotificationsConsumer
+from . import import_jobs
+from . import notifications as inbox
+from . import prerender as accounts_prerender
+from . import views as accounts_views
+from .image_fetcher import RemoteImageFetcher
+from .import_jobs import run_import_job
+from .models import (
+    BusinessUser,
+    ImportApiUsageEvent,
+    ImportedListingSource,
+    ImportJob,
+    UserImportApiKey,
+    UserNotification,
+    UserNotificationCursor,
+)
+
+
+def _build_image_bytes(shade):
+    buffer = io.BytesIO()
+    # spread the shades so neighbouring ids never encode to identical JPEGs
+    Image.new("RGB", (32, 24), ((shade * 23) % 256, 80, 120)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+class _ImageHostHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status_code, body, content_type="image/jpeg", headers=None):
+        self.send_response(status_code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        with server.stats_lock:
+            server.client_ports.add(self.client_address[1])
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+        try:
+            path, _, query = self.path.partition("?")
+            delay = float(query.split("=", 1)[1]) if query.startswith("delay=") else 0.0
+            time.sleep(delay)
+            if path.startswith("/img/"):
+                self._send(200, _build_image_bytes(int(path.rsplit("/", 1)[1])))
+            elif path == "/big":
+                self._send(200, b"x" * 4096)
+            elif path == "/stream-big":
+                # no Content-Length: the cap has to trip while streaming
+                self.send_response(200)
+                self.send_header("Content-Type", "image/jpeg")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                for _ in range(16):
+                    self.wfile.write(b"x" * 512)
+                self.close_connection = True
+            elif path == "/page":
+                self._send(200, b"<html></html>", content_type="text/html")
+            elif path == "/moved":
+                self._send(302, b"", headers={"Location": "/img/7"})
+            elif path == "/escape":
+                self._send(302, b"", headers={"Location": "http://images.example.org/img/1"})
+            else:
+                self._send(404, b"", content_type="text/plain")
+        finally:
+            with server.stats_lock:
+                server.active -= 1
 
 
 @override_settings(ALLOWED_HOSTS=["testserver", "localhost", "127.0.0.1"])
@@ -363,3 +459,818 @@ class AdminPanelOtpAccessTests(APITestCase):
             HTTP_AUTHORIZATION=f"Bearer {access}",
         )
         self.assertEqual(admin_response.status_code, 200)
+
+
+class RemoteImageFetcherTests(APITestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _ImageHostHandler)
+        self.server.daemon_threads = True
+        self.server.stats_lock = threading.Lock()
+        self.server.client_ports = set()
+        self.server.active = 0
+        self.server.peak = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _fetcher(self, **kwargs):
+        kwargs.setdefault("max_workers", 3)
+        kwargs.setdefault("max_bytes", 2048)
+        return RemoteImageFetcher(("127.0.0.1",), **kwargs)
+
+    def test_fetches_in_parallel_keeps_order_and_reuses_connections(self):
+        urls = [f"{self.base_url}/img/{index}?delay={0.12 if index % 3 == 0 else 0.02}" for index in range(9)]
+
+        with self._fetcher() as fetcher:
+            results = fetcher.fetch(urls)
+
+        self.assertEqual([content for content, _ in results], [_build_image_bytes(index) for index in range(9)])
+        self.assertEqual(results[0][1], "image/jpeg")
+        self.assertGreater(self.server.peak, 1)
+        self.assertLessEqual(len(self.server.client_ports), 3)
+
+    def test_rejects_oversized_non_image_and_foreign_redirects(self):
+        urls = [
+            f"{self.base_url}/big",
+            f"{self.base_url}/stream-big",
+            f"{self.base_url}/page",
+            f"{self.base_url}/escape",
+            f"{self.base_url}/moved",
+            "https://images.example.org/img/1",
+        ]
+
+        with self._fetcher() as fetcher:
+            results = fetcher.fetch(urls)
+
+        self.assertEqual(results[:4], [None, None, None, None])
+        self.assertEqual(results[4][0], _build_image_bytes(7))
+        self.assertIsNone(results[5])
+
+    def test_import_deadline_bounds_the_total_time(self):
+        urls = [f"{self.base_url}/img/1"] + [f"{self.base_url}/img/{index}?delay=3" for index in range(2, 6)]
+
+        started_at = time.monotonic()
+        with self._fetcher(max_workers=2) as fetcher:
+            results = fetcher.fetch(urls, deadline_seconds=0.5)
+        elapsed = time.monotonic() - started_at
+
+        self.assertLess(elapsed, 2.0)
+        self.assertIsNotNone(results[0])
+        self.assertEqual(results[1:], [None] * 4)
+
+    def test_attach_copart_images_keeps_payload_order(self):
+        payload = {
+            "source_url": "https://www.copart.com/lot/12345678",
+            "image_urls": [
+                f"{self.base_url}/img/3?delay=0.1",
+                f"{self.base_url}/page",
+                f"{self.base_url}/img/1",
+                f"{self.base_url}/img/2",
+            ],
+        }
+        captured = {}
+
+        def fake_bulk_ingest(listing, files, **kwargs):
+            captured["files"] = [(upload.name, upload.read()) for upload in files]
+            return list(files)
+
+        with patch.object(accounts_views, "COPART_ALLOWED_IMAGE_HOST_TOKENS", ("127.0.0.1",)), patch(
+            "backend.listings.models.CarImage.bulk_ingest", side_effect=fake_bulk_ingest
+        ):
+            uploaded = accounts_views._attach_copart_images_to_listing(SimpleNamespace(id=7), payload)
+
+        self.assertEqual(uploaded, 3)
+        self.assertEqual(
+            captured["files"],
+            [
+                ("copart_7_1.jpg", _build_image_bytes(3)),
+                ("copart_7_2.jpg", _build_image_bytes(1)),
+                ("copart_7_3.jpg", _build_image_bytes(2)),
+            ],
+        )
+
+    def test_attach_copart_images_propagates_storage_failures(self):
+        payload = {
+            "source_url": "https://www.copart.com/lot/12345678",
+            "image_urls": [f"{self.base_url}/img/1"],
+        }
+
+        with patch.object(accounts_views, "COPART_ALLOWED_IMAGE_HOST_TOKENS", ("127.0.0.1",)), patch(
+            "backend.listings.models.CarImage.bulk_ingest", side_effect=RuntimeError("storage down")
+        ), self.assertRaisesMessage(RuntimeError, "storage down"):
+            accounts_views._attach_copart_images_to_listing(SimpleNamespace(id=7), payload)
+
+
+@override_settings(ALLOWED_HOSTS=["testserver", "localhost", "127.0.0.1"], COPART_IMPORT_JOBS_MODE="worker")
+class CopartImportJobTests(APITestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _ImageHostHandler)
+        self.server.daemon_threads = True
+        self.server.stats_lock = threading.Lock()
+        self.server.client_ports = set()
+        self.server.active = 0
+        self.server.peak = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        host_patch = patch.object(accounts_views, "COPART_ALLOWED_IMAGE_HOST_TOKENS", ("127.0.0.1",))
+        host_patch.start()
+        self.addCleanup(host_patch.stop)
+
+        self.user = User.objects.create_user(
+            username="import-dealer",
+            email="import-dealer@example.com",
+            password="StrongPass123!",
+            is_active=True,
+        )
+        BusinessUser.objects.create(
+            user=self.user,
+            dealer_name="Import Dealer",
+            city="Sofia",
+            address="1 Import St",
+            phone="+359888000333",
+            email="import-business@example.com",
+            username="import-dealer",
+            company_name="Import Dealer Ltd",
+            registration_address="1 Import St",
+            mol="Dealer Manager",
+            bulstat="223456789",
+            admin_name="Admin Dealer",
+            admin_phone="+359888000444",
+        )
+        self.raw_api_key = UserImportApiKey.generate_raw_key()
+        UserImportApiKey.objects.create(
+            user=self.user,
+            key_hash=UserImportApiKey.hash_key(self.raw_api_key),
+            key_prefix=self.raw_api_key[:12],
+        )
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _lot(self, image_urls, lot_number="12345678"):
+        return {
+            "source_url": f"https://www.copart.com/lot/{lot_number}",
+            "lot_number": lot_number,
+            "source_title": "2019 BMW 330I",
+            "brand": "BMW",
+            "model": "330",
+            "year": 2019,
+            "price": 12500,
+            "mileage": 64000,
+            "image_urls": image_urls,
+        }
+
+    def _import(self, image_urls, **overrides):
+        return self.client.post(
+            "/api/auth/import/copart/",
+            {**self._lot(image_urls), **overrides},
+            format="json",
+            HTTP_AUTHORIZATION=f"ApiKey {self.raw_api_key}",
+        )
+
+    def _import_batch(self, lots):
+        return self.client.post(
+            "/api/auth/import/copart/batch/",
+            {"lots": lots},
+            format="json",
+            HTTP_AUTHORIZATION=f"ApiKey {self.raw_api_key}",
+        )
+
+    def _status(self, job_id, api_key=None):
+        return self.client.get(
+            f"/api/auth/import/jobs/{job_id}/",
+            HTTP_AUTHORIZATION=f"ApiKey {api_key or self.raw_api_key}",
+        )
+
+    def test_import_returns_202_and_worker_attaches_photos(self):
+        response = self._import([f"{self.base_url}/img/{index}" for index in range(3)] + [f"{self.base_url}/page"])
+
+        self.assertEqual(response.status_code, 202)
+        self.assertTrue(response.data["is_draft"])
+        job_id = response.data["job_id"]
+        self.assertTrue(response.data["status_url"].endswith(f"/api/auth/import/jobs/{job_id}/"))
+
+        queued = self._status(job_id)
+        self.assertEqual(queued.status_code, 200)
+        self.assertEqual(queued.data["status"], ImportJob.STATUS_QUEUED)
+        self.assertEqual((queued.data["images_done"], queued.data["images_total"]), (0, 4))
+
+        call_command("run_import_jobs", once=True, stdout=io.StringIO())
+
+        finished = self._status(job_id)
+        self.assertEqual(finished.data["status"], ImportJob.STATUS_SUCCEEDED)
+        self.assertEqual(finished.data["images_done"], 4)
+        self.assertEqual(finished.data["images_uploaded"], 3)
+        self.assertEqual(finished.data["progress"], 100)
+        self.assertEqual(finished.data["listing"]["id"], response.data["id"])
+        job = ImportJob.objects.get(pk=job_id)
+        self.assertEqual(job.listing.images.count(), 3)
+        self.assertEqual(job.attempts, 1)
+
+    def test_progress_is_recorded_while_photos_settle(self):
+        response = self._import([f"{self.base_url}/img/{index}" for index in range(2)])
+        job_id = response.data["job_id"]
+        seen = []
+
+        def fake_attach(listing, payload, fetcher=None, on_progress=None, import_source=None):
+            for done in range(3):
+                on_progress(done, 2)
+                seen.append(ImportJob.objects.values_list("images_done", flat=True).get(pk=job_id))
+            return 2
+
+        with patch.object(accounts_views, "_attach_copart_images_to_listing", side_effect=fake_attach):
+            run_import_job(job_id)
+
+        self.assertEqual(seen, [0, 1, 2])
+        self.assertEqual(self._status(job_id).data["status"], ImportJob.STATUS_SUCCEEDED)
+
+    def test_failed_job_reports_error(self):
+        job_id = self._import([f"{self.base_url}/img/1"]).data["job_id"]
+
+        with patch.object(accounts_views, "_attach_copart_images_to_listing", side_effect=RuntimeError("storage down")):
+            run_import_job(job_id)
+
+        payload = self._status(job_id).data
+        self.assertEqual(payload["status"], ImportJob.STATUS_FAILED)
+        self.assertEqual(payload["error"], "storage down")
+
+    def test_failed_photo_ingest_fails_the_job(self):
+        job_id = self._import([f"{self.base_url}/img/1"]).data["job_id"]
+
+        with patch("backend.listings.models.CarImage.bulk_ingest", side_effect=RuntimeError("storage down")):
+            run_import_job(job_id)
+
+        payload = self._status(job_id).data
+        self.assertEqual(payload["status"], ImportJob.STATUS_FAILED)
+        self.assertEqual(payload["error"], "storage down")
+        self.assertEqual(payload["images_uploaded"], 0)
+
+    def test_thread_mode_resumes_jobs_stranded_by_a_restart(self):
+        queued_id = self._import([f"{self.base_url}/img/1"]).data["job_id"]
+        running_id = self._import([f"{self.base_url}/img/2"], lot_number="22345678").data["job_id"]
+        fresh_id = self._import([f"{self.base_url}/img/3"], lot_number="32345678").data["job_id"]
+        long_ago = timezone.now() - timedelta(hours=1)
+        ImportJob.objects.filter(pk__in=[queued_id, running_id]).update(created_at=long_ago)
+        ImportJob.objects.filter(pk=running_id).update(status=ImportJob.STATUS_RUNNING, started_at=long_ago)
+        submitted = []
+
+        with override_settings(COPART_IMPORT_JOBS_MODE="thread"), patch.object(
+            import_jobs, "_STRANDED_IMPORT_JOBS_RESUMED", False
+        ), patch.object(
+            import_jobs,
+            "_get_import_job_executor",
+            return_value=SimpleNamespace(submit=lambda task, job_ids: submitted.append(job_ids)),
+        ), self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self._status(fresh_id).status_code, 200)
+            self._status(fresh_id)
+
+        self.assertEqual(len(submitted), 1)
+        self.assertEqual({str(job_id) for job_id in submitted[0]}, {queued_id, running_id})
+        self.assertEqual(ImportJob.objects.get(pk=running_id).status, ImportJob.STATUS_QUEUED)
+
+    def test_import_without_photos_finishes_immediately(self):
+        response = self._import([])
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data["job_status"], ImportJob.STATUS_SUCCEEDED)
+
+    def test_status_is_scoped_to_the_key_owner(self):
+        job_id = self._import([f"{self.base_url}/img/1"]).data["job_id"]
+        other_user = User.objects.create_user(username="other", email="other@example.com", password="x")
+        other_key = UserImportApiKey.generate_raw_key()
+        UserImportApiKey.objects.create(user=other_user, key_hash=UserImportApiKey.hash_key(other_key))
+
+        self.assertEqual(self._status(job_id, api_key=other_key).status_code, 404)
+        self.assertEqual(self.client.get(f"/api/auth/import/jobs/{job_id}/").status_code, 401)
+
+    def test_batch_import_reports_each_lot_and_shares_one_fetcher(self):
+        lots = [
+            self._lot([f"{self.base_url}/img/{index}" for index in range(3)], lot_number="10000001"),
+            "not-a-lot",
+            self._lot([f"{self.base_url}/img/{index}" for index in range(3, 5)], lot_number="10000002"),
+        ]
+
+        response = self._import_batch(lots)
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual((response.data["created"], response.data["failed"]), (2, 1))
+        self.assertEqual(
+            [result["status"] for result in response.data["results"]],
+            ["created", "invalid", "created"],
+        )
+        events = ImportApiUsageEvent.objects.order_by("id")
+        self.assertEqual(
+            list(events.values_list("lot_number", "success")),
+            [("10000001", True), ("", False), ("10000002", True)],
+        )
+
+        with self.settings(COPART_IMAGE_FETCH_WORKERS=2):
+            call_command("run_import_jobs", once=True, stdout=io.StringIO())
+
+        for result, expected in zip(response.data["results"][::2], (3, 2)):
+            job = ImportJob.objects.get(pk=result["job_id"])
+            self.assertEqual(job.status, ImportJob.STATUS_SUCCEEDED)
+            self.assertEqual(job.listing.images.count(), expected)
+        # both lots went through the same two keep-alive connections
+        self.assertLessEqual(len(self.server.client_ports), 2)
+
+    def test_batch_import_rejects_oversized_batches(self):
+        with self.settings(COPART_IMPORT_BATCH_MAX_LOTS=2):
+            response = self._import_batch([self._lot([]) for _ in range(3)])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ImportJob.objects.exists())
+        self.assertEqual(self._import_batch([]).status_code, 400)
+        self.assertEqual(
+            list(ImportApiUsageEvent.objects.order_by("id").values_list("status_code", "success", "error_message")),
+            [
+                (400, False, "Може да импортирате най-много 2 лота наведнъж."),
+                (400, False, "Липсват лотове за импорт."),
+            ],
+        )
+
+    def test_batch_import_keeps_exception_text_out_of_the_response(self):
+        with patch.object(accounts_views, "_build_import_source", side_effect=RuntimeError("db secret")):
+            response = self._import_batch([self._lot([], lot_number="30000001")])
+
+        result = response.data["results"][0]
+        self.assertEqual(result["status"], "failed")
+        self.assertNotIn("details", result)
+        self.assertNotIn("db secret", str(response.data))
+        self.assertEqual(ImportApiUsageEvent.objects.get().error_message, "db secret")
+
+    def test_batch_import_reports_unexpected_failures(self):
+        with patch.object(accounts_views, "_queue_import_jobs", side_effect=RuntimeError("queue down")), self.assertLogs(
+            "backend.accounts.views", level="ERROR"
+        ):
+            response = self._import_batch([self._lot([], lot_number="30000002")])
+
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.data, {"error": "Неочаквана грешка при импорт."})
+        self.assertEqual(
+            list(ImportApiUsageEvent.objects.values_list("status_code", "success", "error_message")),
+            [(500, False, "queue down")],
+        )
+
+    def test_batch_import_requires_a_valid_key(self):
+        response = self.client.post(
+            "/api/auth/import/copart/batch/",
+            {"lots": [self._lot([])]},
+            format="json",
+            HTTP_AUTHORIZATION="ApiKey nope",
+        )
+
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(ImportApiUsageEvent.objects.get().status_code, 401)
+
+    def test_repeat_import_returns_the_existing_draft(self):
+        first = self._import([f"{self.base_url}/img/1"])
+
+        # key lookup, source lookup, key touch, usage event
+        with self.assertNumQueries(4):
+            repeat = self._import([f"{self.base_url}/img/1"])
+
+        self.assertEqual(repeat.status_code, 200)
+        self.assertTrue(repeat.data["existing"])
+        self.assertEqual(repeat.data["id"], first.data["id"])
+        self.assertIsNone(repeat.data["job_id"])
+        self.assertEqual(ImportJob.objects.count(), 1)
+        self.assertEqual(ImportedListingSource.objects.get().source_key, "lot:12345678")
+
+    def test_import_without_lot_number_is_keyed_by_source_url(self):
+        first = self._import([], lot_number="", source_url="https://www.copart.com/lot/555/")
+        repeat = self._import([], lot_number="", source_url="https://WWW.copart.com/lot/555")
+
+        self.assertEqual(repeat.status_code, 200)
+        self.assertEqual(repeat.data["id"], first.data["id"])
+        self.assertTrue(ImportedListingSource.objects.get().source_key.startswith("url:"))
+
+    def test_refresh_updates_changed_fields_and_fetches_only_new_photos(self):
+        first = self._import([f"{self.base_url}/img/{index}" for index in range(2)])
+        call_command("run_import_jobs", once=True, stdout=io.StringIO())
+        listing = ImportJob.objects.get(pk=first.data["job_id"]).listing
+        # a manual edit by the dealer survives refreshes that do not touch the field
+        type(listing).objects.filter(pk=listing.pk).update(city="Plovdiv")
+
+        refreshed = self._import(
+            [
+                f"{self.base_url}/img/0",
+                f"{self.base_url}/img/1?copy=1",
+                f"{self.base_url}/img/1",
+                f"{self.base_url}/img/2",
+            ],
+            price=13900,
+            refresh=True,
+        )
+
+        self.assertEqual(refreshed.status_code, 202)
+        self.assertEqual(refreshed.data["id"], first.data["id"])
+        self.assertEqual(refreshed.data["updated_fields"], ["price"])
+        self.assertEqual(refreshed.data["images_total"], 2)
+
+        call_command("run_import_jobs", once=True, stdout=io.StringIO())
+
+        listing.refresh_from_db()
+        self.assertEqual(int(listing.price), 13900)
+        self.assertEqual(listing.city, "Plovdiv")
+        self.assertEqual(list(listing.images.order_by("order").values_list("order", flat=True)), [0, 1, 2])
+        source = ImportedListingSource.objects.get()
+        self.assertEqual(len(source.image_hashes), 3)
+        self.assertEqual(len(source.image_urls), 4)
+
+        unchanged = self._import(
+            [f"{self.base_url}/img/{index}" for index in range(3)],
+            price=13900,
+            refresh=True,
+        )
+        self.assertEqual(unchanged.status_code, 200)
+        self.assertEqual(unchanged.data["updated_fields"], [])
+
+    def test_batch_import_matches_previously_imported_lots(self):
+        self._import([], lot_number="20000001")
+
+        response = self._import_batch([
+            self._lot([], lot_number="20000001"),
+            self._lot([], lot_number="20000002"),
+            self._lot([], lot_number="20000002"),
+        ])
+
+        self.assertEqual(
+            [result["status"] for result in response.data["results"]],
+            ["existing", "created", "invalid"],
+        )
+        self.assertEqual((response.data["created"], response.data["existing"]), (1, 1))
+        self.assertEqual(ImportedListingSource.objects.count(), 2)
+        # neither lot had photos to fetch, so nothing is processing
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Снимките се обработват", response.data["message"])
+
+    def test_import_errors_return_serializer_errors_only(self):
+        with patch.object(accounts_views, "_build_import_source", side_effect=RuntimeError("db secret")):
+            failed = self._import([], lot_number="40000001")
+
+        self.assertEqual(failed.status_code, 400)
+        self.assertEqual(failed.data, {"error": "Неуспешен импорт на обявата."})
+
+        self._import([], lot_number="40000002")
+        with patch.object(
+            accounts_views,
+            "_refresh_imported_listing",
+            side_effect=ValidationError({"price": ["Невалидна цена."]}),
+        ):
+            invalid = self._import([], lot_number="40000002", refresh=True)
+
+        self.assertEqual(invalid.status_code, 400)
+        self.assertEqual(invalid.data["details"], {"price": ["Невалидна цена."]})
+
+
+@override_settings(ALLOWED_HOSTS=["testserver", "localhost", "127.0.0.1"])
+class DealerShareCardTests(APITestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp(prefix="karbg-media-")
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, True)
+        # no network in tests: the logo falls back to the text mark
+        fetch_patch = patch.object(accounts_prerender, "_fetch_image_from_url", return_value=None)
+        fetch_patch.start()
+        self.addCleanup(fetch_patch.stop)
+        accounts_prerender._SITE_LOGO.update({"image": None, "expires_at": 0.0})
+        cache.clear()
+        caches["prerender"].clear()
+
+        self.user = User.objects.create_user(username="card-dealer", email="card@example.com", password="x")
+        self.dealer = BusinessUser.objects.create(
+            user=self.user,
+            dealer_name="Card Motors",
+            city="Sofia",
+            address="1 Card St",
+            phone="+359888000555",
+            email="card-business@example.com",
+            username="card-dealer",
+            company_name="Card Motors Ltd",
+            registration_address="1 Card St",
+            mol="Dealer Manager",
+            bulstat="323456789",
+            admin_name="Admin Dealer",
+            admin_phone="+359888000666",
+        )
+        self.url = "/prerender/dealer-card/card-motors/"
+
+    def _stored_cards(self):
+        card_dir = os.path.join(self.media_root, accounts_prerender.dealer_card_storage_dir(self.dealer.pk))
+        return sorted(os.listdir(card_dir)) if os.path.isdir(card_dir) else []
+
+    def test_card_is_rendered_once_then_served_from_cache_and_storage(self):
+        with patch.object(
+            accounts_prerender,
+            "_render_dealer_card_image",
+            wraps=accounts_prerender._render_dealer_card_image,
+        ) as render:
+            first = self.client.get(self.url)
+            second = self.client.get(self.url)
+            caches["prerender"].clear()  # another process: only storage has the card
+            third = self.client.get(self.url)
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first["Content-Type"], "image/jpeg")
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first.content, third.content)
+        self.assertEqual(self._stored_cards(), [f"{first['ETag'].strip(chr(34))}.jpg"])
+
+    def test_profile_change_replaces_the_stored_card(self):
+        first = self.client.get(self.url)
+        self.dealer.city = "Varna"
+        self.dealer.save()
+        caches["prerender"].clear()  # the next card is rendered by another process
+
+        second = self.client.get(self.url)
+
+        self.assertNotEqual(first["ETag"], second["ETag"])
+        self.assertEqual(self._stored_cards(), [f"{second['ETag'].strip(chr(34))}.jpg"])
+        self.dealer.refresh_from_db()
+        self.assertEqual(
+            self.dealer.share_card,
+            f"{accounts_prerender.dealer_card_storage_dir(self.dealer.pk)}/{second['ETag'].strip(chr(34))}.jpg",
+        )
+
+    def test_stale_profile_save_does_not_lose_the_stored_card(self):
+        response = self.client.get(self.url)
+        card_name = f"{accounts_prerender.dealer_card_storage_dir(self.dealer.pk)}/{response['ETag'].strip(chr(34))}.jpg"
+        self.dealer.save()  # loaded before the card was stored
+        self.dealer.refresh_from_db()
+        self.assertEqual(self.dealer.share_card, "")
+
+        caches["prerender"].clear()
+        with patch.object(accounts_prerender, "_render_dealer_card_image") as render:
+            self.client.get(self.url)
+
+        render.assert_not_called()
+        self.dealer.refresh_from_db()
+        self.assertEqual(self.dealer.share_card, card_name)
+        self.assertEqual(self._stored_cards(), [f"{response['ETag'].strip(chr(34))}.jpg"])
+
+    def test_refresh_prewarms_the_current_card(self):
+        card_etag = accounts_prerender.refresh_dealer_card(self.user.id)
+
+        with patch.object(accounts_prerender, "_render_dealer_card_image") as render:
+            response = self.client.get(self.url)
+
+        render.assert_not_called()
+        self.assertEqual(response["ETag"], card_etag)
+
+    @override_settings(BACKEND_BASE_URL="https://api.example.com")
+    def test_refresh_pre_renders_the_dealer_page(self):
+        page_url = "/prerender/dealer/card-motors/?force=1"
+        accounts_prerender.refresh_dealer_card(self.user.id)
+
+        with patch.object(
+            accounts_prerender,
+            "render_dealer_prerender_html",
+            wraps=accounts_prerender.render_dealer_prerender_html,
+        ) as render:
+            first = self.client.get(page_url)
+            self.dealer.city = "Varna"
+            self.dealer.save()
+            second = self.client.get(page_url)
+
+        self.assertEqual(render.call_count, 1)  # only after the change
+        self.assertIn("https://api.example.com/prerender/dealer-card/card-motors/", first.content.decode("utf-8"))
+        self.assertNotEqual(first["ETag"], second["ETag"])
+        self.assertIn("Varna", second.content.decode("utf-8"))
+
+    def test_profile_and_listing_changes_schedule_a_refresh(self):
+        from backend.listings.models import BaseListing
+
+        with patch.object(accounts_prerender, "schedule_dealer_card_refresh") as schedule:
+            self.dealer.save()
+            BaseListing.objects.create(
+                user=self.user,
+                main_category="cars",
+                price="1000.00",
+                city="Sofia",
+                phone="+359888000555",
+                email="card@example.com",
+            )
+
+        self.assertEqual([call.args for call in schedule.call_args_list], [(self.user.id,), (self.user.id,)])
+
+    def test_listing_saves_outside_the_card_fields_schedule_nothing(self):
+        from backend.listings.models import BaseListing
+
+        listing = BaseListing.objects.create(
+            user=self.user,
+            main_category="cars",
+            price="1000.00",
+            city="Sofia",
+            phone="+359888000555",
+            email="card@example.com",
+        )
+        with patch.object(accounts_prerender, "schedule_dealer_card_refresh") as schedule:
+            listing.view_count += 1
+            listing.save(update_fields=["view_count"])
+            listing.is_archived = True
+            listing.save(update_fields=["is_archived"])
+
+        self.assertEqual([call.args for call in schedule.call_args_list], [(self.user.id,)])
+
+    def test_private_seller_listing_changes_schedule_nothing(self):
+        from backend.listings.models import BaseListing
+
+        private_user = User.objects.create_user(username="private-seller", email="private@example.com", password="x")
+        with patch.object(accounts_prerender, "schedule_dealer_card_refresh") as schedule:
+            BaseListing.objects.create(
+                user=private_user,
+                main_category="cars",
+                price="1000.00",
+                city="Sofia",
+                phone="+359888000777",
+                email="private@example.com",
+            )
+
+        schedule.assert_not_called()
+
+    def test_fonts_and_logo_are_loaded_once_per_process(self):
+        self.assertIs(accounts_prerender._load_font(30, bold=True), accounts_prerender._load_font(30, bold=True))
+
+        accounts_prerender._get_site_logo()
+        accounts_prerender._get_site_logo()
+
+        self.assertEqual(accounts_prerender._fetch_image_from_url.call_count, 2)  # both logo URLs, once
+
+
+class BusinessUserPublicSlugTests(APITestCase):
+    def _create_dealer(self, index, dealer_name):
+        user = User.objects.create_user(username=f"slug-dealer-{index}", email=f"slug{index}@example.com", password="x")
+        return BusinessUser.objects.create(
+            user=user,
+            dealer_name=dealer_name,
+            city="Sofia",
+            address="1 Slug St",
+            phone=f"+35988800{index:04d}",
+            email=f"slug-business-{index}@example.com",
+            username=f"slug-dealer-{index}",
+            company_name="Slug Motors Ltd",
+            registration_address="1 Slug St",
+            mol="Dealer Manager",
+            bulstat="423456789",
+            admin_name="Admin Dealer",
+            admin_phone="+359888000777",
+        )
+
+    def test_slug_follows_the_name_and_resolves_collisions(self):
+        first = self._create_dealer(1, "Авто Плюс")
+        second = self._create_dealer(2, "авто  плюс!")
+        self.assertEqual(first.public_slug, "авто-плюс")
+        self.assertEqual(second.public_slug, "авто-плюс-x2")
+
+        second.city = "Varna"
+        second.save()
+        self.assertEqual(second.public_slug, "авто-плюс-x2")
+
+        first.dealer_name = "Auto Plus Sofia"
+        first.save(update_fields=["dealer_name"])
+        first.refresh_from_db()
+        self.assertEqual(first.public_slug, "auto-plus-sofia")
+
+    def test_dealer_api_exposes_and_resolves_the_public_slug(self):
+        self._create_dealer(1, "Авто 24")
+        second = self._create_dealer(2, "авто 24!")
+
+        response = self.client.get("/api/auth/dealers/")
+        self.assertEqual(
+            {row["public_slug"] for row in response.data},
+            {"авто-24", "авто-24-x2"},
+        )
+
+        response = self.client.get("/api/auth/dealers/by-slug/%D0%B0%D0%B2%D1%82%D0%BE-24-x2/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data["id"], response.data["public_slug"]), (second.pk, "авто-24-x2"))
+        self.assertEqual(self.client.get("/api/auth/dealers/by-slug/missing-dealer/").status_code, 404)
+
+    def test_dealer_page_is_found_with_one_indexed_lookup(self):
+        for index in range(5):
+            self._create_dealer(index, f"Filler Dealer {index}")
+        dealer = self._create_dealer(9, "Slug Motors")
+
+        with CaptureQueriesContext(connection) as queries:
+            found, slug = accounts_prerender._resolve_dealer_by_slug("Slug-Motors")
+
+        self.assertEqual((found.pk, slug), (dealer.pk, "slug-motors"))
+        self.assertEqual(len(queries), 1)
+        self.assertIn("public_slug", queries[0]["sql"])
+
+
+class _RecordingChannelLayer:
+    def __init__(self):
+        self.sent = []
+
+    async def group_send(self, group, message):
+        self.sent.append((group, message))
+
+
+class UserNotificationInboxTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="inbox-user", email="inbox@example.com", password="x")
+        self.client.force_authenticate(self.user)
+        self.seqs = [
+            inbox.append_user_notification(self.user.id, {"id": f"n-{index}", "type": "system", "title": f"#{index}"})
+            for index in range(3)
+        ]
+
+    def _cursor(self):
+        return UserNotificationCursor.objects.get(user=self.user).delivered_id
+
+    def test_poll_without_cursor_delivers_each_notification_once(self):
+        first = self.client.get("/api/auth/notifications/poll/", {"limit": 2}).json()
+        self.assertEqual([item["id"] for item in first["results"]], ["n-0", "n-1"])
+        self.assertEqual([item["seq"] for item in first["results"]], self.seqs[:2])
+        self.assertEqual(first["cursor"], self.seqs[1])
+
+        second = self.client.get("/api/auth/notifications/poll/").json()
+        self.assertEqual([item["id"] for item in second["results"]], ["n-2"])
+        self.assertEqual(self.client.get("/api/auth/notifications/poll/").json()["results"], [])
+        # nothing is deleted on read
+        self.assertEqual(UserNotification.objects.filter(user=self.user).count(), 3)
+
+    def test_after_acknowledges_and_resumes_from_it(self):
+        response = self.client.get("/api/auth/notifications/poll/", {"after": self.seqs[0]})
+
+        self.assertEqual([item["seq"] for item in response.json()["results"]], self.seqs[1:])
+        self.assertEqual(self._cursor(), self.seqs[0])
+        invalid = self.client.get("/api/auth/notifications/poll/", {"after": "latest"})
+        self.assertEqual(invalid.status_code, 400)
+
+    def test_cursor_never_moves_back_or_past_the_newest_row(self):
+        inbox.acknowledge_user_notifications(self.user.id, self.seqs[2] + 1000)
+        self.assertEqual(self._cursor(), self.seqs[2])
+        inbox.acknowledge_user_notifications(self.user.id, self.seqs[0])
+        self.assertEqual(self._cursor(), self.seqs[2])
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(inbox.fetch_user_notifications(self.user.id), [])
+        self.assertEqual(len(queries), 1)
+
+    def test_broadcast_stores_then_pushes_with_seq_after_commit(self):
+        layer = _RecordingChannelLayer()
+        with patch.object(realtime, "get_channel_layer", return_value=layer):
+            with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                realtime.broadcast_user_notification(self.user.id, {"id": "n-live", "type": "system"})
+            self.assertEqual(layer.sent, [])
+            for callback in callbacks:
+                callback()
+
+        stored = UserNotification.objects.filter(user=self.user).order_by("-id").first()
+        self.assertEqual(stored.payload["id"], "n-live")
+        group, message = layer.sent[0]
+        self.assertEqual(group, realtime.user_notifications_group_name(self.user.id))
+        self.assertEqual(message["notification"]["seq"], stored.id)
+
+    def test_prune_command_deletes_old_rows_in_batches(self):
+        old_cutoff = timezone.now() - timedelta(days=40)
+        UserNotification.objects.filter(id__in=self.seqs[:2]).update(created_at=old_cutoff)
+
+        stdout = io.StringIO()
+        call_command("prune_user_notifications", "--older-than-days", "30", "--batch-size", "1", stdout=stdout)
+
+        self.assertEqual(list(UserNotification.objects.values_list("id", flat=True)), self.seqs[2:])
+        self.assertIn("Pruned 2 notifications", stdout.getvalue())
+
+
+class NotificationsConsumerResumeTests(TransactionTestCase):
+    def test_reconnect_resumes_after_the_last_acknowledged_notification(self):
+        user = User.objects.create_user(username="inbox-ws-user", password="x")
+        token = str(RefreshToken.for_user(user).access_token)
+        seqs = [inbox.append_user_notification(user.id, {"id": f"ws-{index}"}) for index in range(3)]
+        inbox.acknowledge_user_notifications(user.id, seqs[0])
+
+        async def connect(query):
+            communicator = WebsocketCommunicator(NotificationsConsumer.as_asgi(), f"/ws/notifications/?{query}")
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            return communicator
+
+        async def scenario():
+            communicator = await connect(f"token={token}")
+            backlog = [await communicator.receive_json_from() for _ in range(2)]
+            self.assertEqual([item["notification"]["seq"] for item in backlog], seqs[1:])
+            await communicator.send_json_to({"action": "ack", "seq": seqs[2]})
+            self.assertTrue(await communicator.receive_nothing(timeout=0.3))
+            await communicator.disconnect()
+
+            resumed = await connect(f"token={token}")
+            self.assertTrue(await resumed.receive_nothing(timeout=0.3))
+            await resumed.disconnect()
+
+            replay = await connect(f"token={token}&after={seqs[1]}")
+            self.assertEqual((await replay.receive_json_from())["notification"]["id"], "ws-2")
+            await replay.disconnect()
+
+        async_to_sync(scenario)()
+        self.assertEqual(UserNotificationCursor.objects.get(user=user).delivered_id, seqs[2])
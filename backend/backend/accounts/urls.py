@@ -22,8 +22,11 @@ urlpatterns = [
     path('import-api-key/generate/', views.generate_import_api_key, name='generate_import_api_key'),
     path('import-api-key/revoke/', views.revoke_import_api_key, name='revoke_import_api_key'),
     path('import/copart/', views.import_copart_listing, name='import_copart_listing'),
+    path('import/copart/batch/', views.import_copart_listings_batch, name='import_copart_listings_batch'),
+    path('import/jobs/<uuid:job_id>/', views.import_job_status, name='import_job_status'),
     path('dealers/', views.list_dealers, name='list_dealers'),
     path('dealers/<int:pk>/', views.dealer_detail, name='dealer_detail'),
+    path('dealers/by-slug/<str:slug>/', views.dealer_detail_by_slug, name='dealer_detail_by_slug'),
     path('profile/upload-photo/', views.upload_profile_photo, name='upload_profile_photo'),
     path('profile/update-about/', views.update_about, name='update_about'),
 ]
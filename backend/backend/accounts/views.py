@@ -12,6 +12,7 @@ from decimal import Decimal, InvalidOperation
 
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from django.contrib.auth import authenticate
@@ -20,8 +21,9 @@ from django.conf import settings
 from django.core.mail import send_mail
 from django.core.cache import cache
 from django.core.files.base import ContentFile
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction as db_transaction
 from django.db.models import Prefetch
+from django.urls import reverse
 from django.utils import timezone
 from django.utils.encoding import force_bytes
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
@@ -30,7 +32,9 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.serializers import TokenRefreshSerializer
 from rest_framework.parsers import MultiPartParser, FormParser
 from backend.listings.models import get_expiry_cutoff
-from backend.listings.realtime import drain_user_notifications
+from .image_fetcher import RemoteImageFetcher
+from .import_jobs import build_import_job_status, enqueue_import_jobs, resume_stranded_import_jobs
+from .notifications import acknowledge_user_notifications, fetch_user_notifications
 from .serializers import (
     PrivateUserSerializer, BusinessUserSerializer, UserProfileSerializer,
     UserBalanceSerializer, DealerListSerializer, DealerDetailSerializer
@@ -41,6 +45,9 @@ from .models import (
     UserProfile,
     UserImportApiKey,
     ImportApiUsageEvent,
+    ImportJob,
+    ImportedListingSource,
+    slugify_dealer_name,
 )
 
 logger = logging.getLogger(__name__)
@@ -64,7 +71,7 @@ def _slugify_public_segment(value: str) -> str:
 
 def _build_public_profile_slug(user: User) -> str:
     if hasattr(user, "business_profile"):
-        return _slugify_public_segment(user.business_profile.dealer_name)
+        return user.business_profile.public_slug or _slugify_public_segment(user.business_profile.dealer_name)
     if hasattr(user, "private_profile"):
         return _slugify_public_segment(user.private_profile.username)
     fallback = user.username or user.email or f"user-{user.id}"
@@ -368,9 +375,11 @@ def _estimate_payload_bytes(request) -> int | None:
         return None
 
 
-def _log_import_api_usage(
+def _build_import_api_usage_event(
     request,
     *,
+    payload=None,
+    payload_bytes=None,
     api_key=None,
     user=None,
     listing=None,
@@ -379,7 +388,10 @@ def _log_import_api_usage(
     error_message='',
     duration_ms=None,
 ):
-    payload = request.data if hasattr(request, 'data') else {}
+    if payload is None:
+        payload = request.data if hasattr(request, 'data') else {}
+    if not isinstance(payload, dict):
+        payload = {}
     source_url = _safe_str(payload.get('source_url') or payload.get('url'), 1000)
     lot_number = _safe_str(payload.get('lot_number') or payload.get('lotNumber'), 80)
     source_host = ''
@@ -389,7 +401,8 @@ def _log_import_api_usage(
         except Exception:
             source_host = ''
 
-    payload_bytes = _estimate_payload_bytes(request)
+    if payload_bytes is None:
+        payload_bytes = _estimate_payload_bytes(request)
 
     safe_duration_ms = None
     if duration_ms is not None:
@@ -404,31 +417,35 @@ def _log_import_api_usage(
     if listing is not None:
         imported_listing_id_snapshot = getattr(listing, 'id', None)
 
+    return ImportApiUsageEvent(
+        user=user,
+        api_key=api_key,
+        imported_listing=listing,
+        imported_listing_id_snapshot=imported_listing_id_snapshot,
+        endpoint=_safe_str(request.path, 120) or '/api/auth/import/copart/',
+        request_method=_safe_str(request.method, 12) or 'POST',
+        source=_detect_import_source(request),
+        status_code=_safe_status_code(status_code),
+        success=bool(success),
+        lot_number=lot_number,
+        source_url=source_url,
+        source_host=_safe_str(source_host, 255),
+        request_ip=_safe_str(_extract_client_ip(request), 64) or None,
+        user_agent=_safe_str(request.headers.get('User-Agent'), 512),
+        extension_version=_safe_str(
+            request.headers.get('X-Karbg-Extension-Version')
+            or request.headers.get('X-Extension-Version'),
+            32,
+        ),
+        payload_bytes=payload_bytes,
+        duration_ms=safe_duration_ms,
+        error_message=_safe_str(error_message, 4000),
+    )
+
+
+def _log_import_api_usage(request, **kwargs):
     try:
-        ImportApiUsageEvent.objects.create(
-            user=user,
-            api_key=api_key,
-            imported_listing=listing,
-            imported_listing_id_snapshot=imported_listing_id_snapshot,
-            endpoint=_safe_str(request.path, 120) or '/api/auth/import/copart/',
-            request_method=_safe_str(request.method, 12) or 'POST',
-            source=_detect_import_source(request),
-            status_code=_safe_status_code(status_code),
-            success=bool(success),
-            lot_number=lot_number,
-            source_url=source_url,
-            source_host=_safe_str(source_host, 255),
-            request_ip=_safe_str(_extract_client_ip(request), 64) or None,
-            user_agent=_safe_str(request.headers.get('User-Agent'), 512),
-            extension_version=_safe_str(
-                request.headers.get('X-Karbg-Extension-Version')
-                or request.headers.get('X-Extension-Version'),
-                32,
-            ),
-            payload_bytes=payload_bytes,
-            duration_ms=safe_duration_ms,
-            error_message=_safe_str(error_message, 4000),
-        )
+        _build_import_api_usage_event(request, **kwargs).save()
     except Exception:
         # Logging should never break the import flow.
         return
@@ -632,6 +649,10 @@ COPART_ALLOWED_IMAGE_HOST_TOKENS = (
     'copartimages',
 )
 IMPORT_MAX_IMAGES = 12
+# draft fields a refresh never rewrites: publication state and the dealer's contacts
+IMPORT_REFRESH_SKIPPED_FIELDS = frozenset({
+    'main_category', 'is_draft', 'is_active', 'is_archived', 'listing_type', 'phone', 'email',
+})
 IMPORT_MAX_IMAGE_BYTES = 12 * 1024 * 1024
 IMAGE_CONTENT_TYPE_EXTENSIONS = {
     'image/jpeg': 'jpg',
@@ -719,58 +740,71 @@ def _detect_image_extension(url, content_type=''):
     return 'jpg'
 
 
-def _download_remote_image_bytes(url, referer=''):
-    request_headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) KarBgCopartImporter/1.0',
-    }
-    if referer:
-        request_headers['Referer'] = referer
-
-    request = urllib.request.Request(
-        url,
-        headers=request_headers,
-    )
-    try:
-        with urllib.request.urlopen(request, timeout=18) as response:
-            content_type = response.headers.get('Content-Type', '')
-            if content_type and not str(content_type).lower().startswith('image/'):
-                return None, None
-
-            data = response.read(IMPORT_MAX_IMAGE_BYTES + 1)
-            if not data or len(data) > IMPORT_MAX_IMAGE_BYTES:
-                return None, None
-            return data, content_type
-    except (urllib.error.URLError, urllib.error.HTTPError, TimeoutError, ValueError, OSError):
-        return None, None
+def _build_copart_image_fetcher():
+    return RemoteImageFetcher(COPART_ALLOWED_IMAGE_HOST_TOKENS, max_bytes=IMPORT_MAX_IMAGE_BYTES)
 
 
-def _attach_copart_images_to_listing(listing, payload):
+def _attach_copart_images_to_listing(listing, payload, fetcher=None, on_progress=None, import_source=None):
+    """
+    Download the payload's photos and ingest them into ``listing``. With an
+    ``import_source`` (repeat imports), photos whose bytes were already
+    imported under another URL are skipped and the fetched URLs and hashes
+    are recorded for the next refresh.
+    """
     from backend.listings.models import CarImage
 
-    image_urls = _extract_import_image_urls(payload)
+    image_urls = _extract_import_image_urls(payload)[:IMPORT_MAX_IMAGES]
     source_url = _safe_str(payload.get('source_url') or payload.get('url'), 1000)
-    uploaded_count = 0
-    for image_url in image_urls[:IMPORT_MAX_IMAGES]:
-        image_bytes, content_type = _download_remote_image_bytes(image_url, referer=source_url)
-        if not image_bytes:
-            continue
+    if not image_urls:
+        return 0
 
-        extension = _detect_image_extension(image_url, content_type=content_type)
-        file_name = f"copart_{listing.id}_{uploaded_count + 1}.{extension}"
-        content_file = ContentFile(image_bytes, name=file_name)
+    settled = []
 
-        try:
-            CarImage.objects.create(
-                listing=listing,
-                image=content_file,
-                order=uploaded_count,
-                is_cover=(uploaded_count == 0),
-            )
-            uploaded_count += 1
-        except Exception:
+    def _on_result(index, result):
+        settled.append(index)
+        if on_progress is not None:
+            on_progress(len(settled), len(image_urls))
+
+    if fetcher is None:
+        with _build_copart_image_fetcher() as own_fetcher:
+            downloads = own_fetcher.fetch(image_urls, referer=source_url, on_result=_on_result)
+    else:
+        downloads = fetcher.fetch(image_urls, referer=source_url, on_result=_on_result)
+
+    known_hashes = set(import_source.image_hashes or []) if import_source is not None else set()
+    start_order = CarImage.objects.filter(listing=listing).count() if import_source is not None else 0
+    fetched_urls = []
+    new_hashes = []
+    image_files = []
+    for image_url, download in zip(image_urls, downloads):
+        if not download or not download[0]:
             continue
+        image_bytes, content_type = download
+        fetched_urls.append(image_url)
+        content_hash = hashlib.sha256(image_bytes).hexdigest()
+        if content_hash in known_hashes:
+            continue
+        known_hashes.add(content_hash)
+        new_hashes.append(content_hash)
 
-    return uploaded_count
+        extension = _detect_image_extension(image_url, content_type=content_type)
+        file_name = f"copart_{listing.id}_{start_order + len(image_files) + 1}.{extension}"
+        image_files.append(ContentFile(image_bytes, name=file_name))
+
+    # files ingestion rejects are skipped one by one inside bulk_ingest;
+    # storage and database errors propagate so the import is reported as failed
+    created_images = CarImage.bulk_ingest(
+        listing,
+        image_files,
+        start_order=start_order,
+        assign_cover=start_order == 0,
+    )
+
+    if import_source is not None:
+        import_source.image_urls = list(dict.fromkeys([*(import_source.image_urls or []), *fetched_urls]))
+        import_source.image_hashes = [*(import_source.image_hashes or []), *new_hashes]
+        import_source.save(update_fields=['image_urls', 'image_hashes', 'updated_at'])
+    return len(created_images)
 
 
 def _build_copart_draft_payload(payload, user):
@@ -1306,6 +1340,11 @@ def get_current_user(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def poll_user_notifications(request):
+    """
+    Inbox notifications after ``after`` (acknowledging everything up to it), or
+    after the stored cursor when the client sends none; in that case the
+    returned page counts as delivered.
+    """
     raw_limit = request.query_params.get("limit")
     try:
         limit = int(raw_limit) if raw_limit is not None else 20
@@ -1313,8 +1352,19 @@ def poll_user_notifications(request):
         limit = 20
     limit = max(1, min(limit, 50))
 
-    notifications = drain_user_notifications(request.user.id, limit=limit)
-    return Response({"results": notifications}, status=status.HTTP_200_OK)
+    raw_after = request.query_params.get("after")
+    try:
+        after = max(0, int(raw_after)) if raw_after not in (None, "") else None
+    except (TypeError, ValueError):
+        return Response({'error': 'Невалиден курсор за известия.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    if after is not None:
+        acknowledge_user_notifications(request.user.id, after)
+    notifications = fetch_user_notifications(request.user.id, after_id=after, limit=limit)
+    if after is None and notifications:
+        acknowledge_user_notifications(request.user.id, notifications[-1]["seq"])
+    cursor = notifications[-1]["seq"] if notifications else after
+    return Response({"results": notifications, "cursor": cursor}, status=status.HTTP_200_OK)
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
@@ -1599,6 +1649,150 @@ def revoke_import_api_key(request):
     return Response({'deleted': bool(deleted_count)}, status=status.HTTP_200_OK)
 
 
+def _authenticate_import_api_key(request):
+    """Return ``(api_key, status_code, error)``; ``error`` is empty once the key may import."""
+    raw_key = _extract_import_api_key(request)
+    if not raw_key:
+        return None, status.HTTP_401_UNAUTHORIZED, 'Липсва API ключ.'
+
+    api_key = UserImportApiKey.objects.select_related('user', 'user__business_profile').filter(
+        key_hash=UserImportApiKey.hash_key(raw_key)
+    ).first()
+    if not api_key or not api_key.user.is_active:
+        return None, status.HTTP_401_UNAUTHORIZED, 'API ключът е невалиден.'
+    if not _has_business_profile(api_key.user):
+        return api_key, status.HTTP_403_FORBIDDEN, 'Само бизнес акаунти могат да използват import API.'
+    return api_key, status.HTTP_200_OK, ''
+
+
+def _build_import_source_key(payload):
+    """``lot:<lot number>``, else ``url:<sha256>`` of the source URL; empty when neither is sent."""
+    lot_number = _safe_str(payload.get('lot_number') or payload.get('lotNumber'), 60)
+    if lot_number:
+        return f'lot:{lot_number.lower()}'
+    source_url = _safe_str(payload.get('source_url') or payload.get('url'), 1000)
+    if not source_url:
+        return ''
+    parsed = urllib.parse.urlparse(source_url)
+    normalized = f"{parsed.netloc.lower()}{parsed.path.rstrip('/')}"
+    return f"url:{hashlib.sha256(normalized.encode('utf-8')).hexdigest()}"
+
+
+def _snapshot_draft_fields(draft_payload):
+    return json.loads(json.dumps(draft_payload, default=str))
+
+
+def _is_import_refresh(request, payload):
+    raw_value = payload.get('refresh') if isinstance(payload, dict) else None
+    if raw_value is None:
+        raw_value = request.query_params.get('refresh')
+    return _to_bool(raw_value, default=False)
+
+
+def _build_import_job(listing, payload, user, image_urls=None, import_source=None):
+    if image_urls is None:
+        image_urls = _extract_import_image_urls(payload)[:IMPORT_MAX_IMAGES]
+    job_payload = {
+        'source_url': _safe_str(payload.get('source_url') or payload.get('url'), 1000),
+        'image_urls': image_urls,
+    }
+    if import_source is not None:
+        job_payload['import_source_id'] = import_source.pk
+    job = ImportJob(
+        user=user,
+        listing=listing,
+        payload=job_payload,
+        images_total=len(image_urls),
+    )
+    if not image_urls:
+        job.status = ImportJob.STATUS_SUCCEEDED
+        job.finished_at = timezone.now()
+    return job
+
+
+def _build_import_source(listing, payload, user, source_key, draft_payload):
+    return ImportedListingSource(
+        user=user,
+        listing=listing,
+        source_key=source_key,
+        lot_number=_safe_str(payload.get('lot_number') or payload.get('lotNumber'), 80),
+        source_url=_safe_str(payload.get('source_url') or payload.get('url'), 1000),
+        draft_fields=_snapshot_draft_fields(draft_payload),
+    )
+
+
+def _refresh_imported_listing(import_source, payload, request):
+    """
+    Re-apply a repeat import to its existing draft: only draft fields whose
+    Copart value changed since the last import are written (manual edits to
+    the rest are kept), and only photo URLs not fetched before are queued.
+    Returns ``(unsaved job, changed field names)``.
+    """
+    from backend.listings.serializers import BaseListingSerializer
+
+    listing = import_source.listing
+    draft_fields = _snapshot_draft_fields(_build_copart_draft_payload(payload, import_source.user))
+    changed = {
+        name: value
+        for name, value in draft_fields.items()
+        if name not in IMPORT_REFRESH_SKIPPED_FIELDS and import_source.draft_fields.get(name) != value
+    }
+    if changed:
+        serializer = BaseListingSerializer(listing, data=changed, partial=True, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        listing = serializer.save()
+
+    known_urls = set(import_source.image_urls or [])
+    new_urls = [url for url in _extract_import_image_urls(payload)[:IMPORT_MAX_IMAGES] if url not in known_urls]
+    import_source.draft_fields = draft_fields
+    import_source.save(update_fields=['draft_fields', 'updated_at'])
+
+    job = None
+    if new_urls:
+        job = _build_import_job(listing, payload, import_source.user, image_urls=new_urls, import_source=import_source)
+    return job, sorted(changed)
+
+
+def _build_import_result(request, listing, job, *, existing=False, updated_fields=None):
+    result = {
+        'id': listing.id,
+        'slug': listing.slug,
+        'title': listing.title,
+        'is_draft': listing.is_draft,
+        'existing': existing,
+        'job_id': None,
+        'job_status': None,
+        'images_total': 0,
+        'status_url': None,
+    }
+    if updated_fields is not None:
+        result['updated_fields'] = updated_fields
+    if job is not None:
+        result.update({
+            'job_id': str(job.pk),
+            'job_status': job.status,
+            'images_total': job.images_total,
+            'status_url': request.build_absolute_uri(reverse('import_job_status', args=[job.pk])),
+        })
+    return result
+
+
+def _build_import_error(message, exc):
+    """Client payload for a failed import: serializer errors at most, never raw exception text."""
+    payload = {'error': message}
+    if isinstance(exc, ValidationError):
+        payload['details'] = exc.detail
+    else:
+        logger.warning('Copart import failed: %s', exc)
+    return payload
+
+
+def _queue_import_jobs(jobs):
+    """Bulk-insert jobs and queue the ones that still have photos to fetch."""
+    ImportJob.objects.bulk_create(jobs)
+    enqueue_import_jobs(job.pk for job in jobs if job.status == ImportJob.STATUS_QUEUED)
+
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def import_copart_listing(request):
@@ -1612,73 +1806,116 @@ def import_copart_listing(request):
     event_user = None
 
     try:
-        raw_key = _extract_import_api_key(request)
-        if not raw_key:
-            status_code = status.HTTP_401_UNAUTHORIZED
-            error_message = 'Липсва API ключ.'
-            return Response(
-                {'error': 'Липсва API ключ.'},
-                status=status_code,
-            )
+        api_key, auth_status, auth_error = _authenticate_import_api_key(request)
+        event_user = api_key.user if api_key else None
+        if auth_error:
+            status_code = auth_status
+            error_message = auth_error
+            return Response({'error': auth_error}, status=status_code)
 
-        api_key = UserImportApiKey.objects.select_related('user').filter(
-            key_hash=UserImportApiKey.hash_key(raw_key)
-        ).first()
-        if not api_key or not api_key.user.is_active:
-            status_code = status.HTTP_401_UNAUTHORIZED
-            error_message = 'API ключът е невалиден.'
-            return Response(
-                {'error': 'API ключът е невалиден.'},
-                status=status_code,
-            )
+        from backend.listings.serializers import BaseListingSerializer
 
-        event_user = api_key.user
-        if not _has_business_profile(api_key.user):
-            status_code = status.HTTP_403_FORBIDDEN
-            error_message = 'Само бизнес акаунти могат да използват import API.'
+        source_key = _build_import_source_key(request.data)
+        import_source = None
+        if source_key:
+            import_source = ImportedListingSource.objects.select_related('listing', 'user').filter(
+                user=api_key.user,
+                source_key=source_key,
+            ).first()
+
+        if import_source is not None:
+            listing = import_source.listing
+            job = None
+            updated_fields = None
+            if _is_import_refresh(request, request.data):
+                try:
+                    with db_transaction.atomic():
+                        job, updated_fields = _refresh_imported_listing(import_source, request.data, request)
+                        if job is not None:
+                            _queue_import_jobs([job])
+                except Exception as exc:
+                    status_code = status.HTTP_400_BAD_REQUEST
+                    error_message = str(exc)
+                    return Response(
+                        _build_import_error('Неуспешно обновяване на обявата.', exc),
+                        status=status_code,
+                    )
+            api_key.mark_used()
+
+            status_code = status.HTTP_202_ACCEPTED if job is not None else status.HTTP_200_OK
+            success = True
             return Response(
-                {'error': 'Само бизнес акаунти могат да използват import API.'},
+                {
+                    **_build_import_result(request, listing, job, existing=True, updated_fields=updated_fields),
+                    'message': 'Този лот вече е импортиран.' if updated_fields is None
+                    else 'Обявата е обновена от Copart.',
+                },
                 status=status_code,
             )
 
-        from backend.listings.serializers import BaseListingSerializer
-
         draft_payload = _build_copart_draft_payload(request.data, api_key.user)
         try:
             serializer = BaseListingSerializer(data=draft_payload, context={'request': request})
             serializer.is_valid(raise_exception=True)
-            listing = serializer.save(user=api_key.user)
+            with db_transaction.atomic():
+                listing = serializer.save(user=api_key.user)
+                import_source = None
+                if source_key:
+                    import_source = _build_import_source(
+                        listing, request.data, api_key.user, source_key, draft_payload
+                    )
+                    import_source.save()
+        except IntegrityError as exc:
+            # a concurrent import of the same lot won the race; answer with its draft
+            import_source = ImportedListingSource.objects.select_related('listing').filter(
+                user=api_key.user,
+                source_key=source_key,
+            ).first() if source_key else None
+            if import_source is None:
+                listing = None
+                status_code = status.HTTP_400_BAD_REQUEST
+                error_message = str(exc)
+                return Response(
+                    _build_import_error('Неуспешен импорт на обявата.', exc),
+                    status=status_code,
+                )
+            listing = import_source.listing
+            api_key.mark_used()
+            status_code = status.HTTP_200_OK
+            success = True
+            return Response(
+                {
+                    **_build_import_result(request, listing, None, existing=True),
+                    'message': 'Този лот вече е импортиран.',
+                },
+                status=status_code,
+            )
         except Exception as exc:
             status_code = status.HTTP_400_BAD_REQUEST
             error_message = str(exc)
             return Response(
-                {'error': 'Неуспешен импорт на обявата.', 'details': str(exc)},
+                _build_import_error('Неуспешен импорт на обявата.', exc),
                 status=status_code,
             )
 
-        uploaded_images = _attach_copart_images_to_listing(listing, request.data)
+        job = _build_import_job(listing, request.data, api_key.user, import_source=import_source)
+        _queue_import_jobs([job])
         api_key.mark_used()
 
-        status_code = status.HTTP_201_CREATED
+        status_code = status.HTTP_202_ACCEPTED
         success = True
         return Response(
             {
-                'id': listing.id,
-                'slug': listing.slug,
-                'title': listing.title,
-                'is_draft': listing.is_draft,
-                'images_uploaded': uploaded_images,
-                'message': 'Обявата е импортирана като чернова.',
+                **_build_import_result(request, listing, job),
+                'message': 'Обявата е импортирана като чернова. Снимките се обработват.',
             },
             status=status_code,
         )
     except Exception as exc:
+        logger.exception('Unexpected error while importing a Copart listing.')
         status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
         error_message = str(exc)
-        return Response(
-            {'error': 'Неочаквана грешка при импорт.', 'details': str(exc)},
-            status=status_code,
-        )
+        return Response({'error': 'Неочаквана грешка при импорт.'}, status=status_code)
     finally:
         duration_ms = int((time.perf_counter() - started_at) * 1000)
         _log_import_api_usage(
@@ -1693,6 +1930,244 @@ def import_copart_listing(request):
         )
 
 
+def _resolve_import_batch_max_lots():
+    try:
+        return max(1, int(getattr(settings, 'COPART_IMPORT_BATCH_MAX_LOTS', 50)))
+    except (TypeError, ValueError):
+        return 50
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def import_copart_listings_batch(request):
+    """
+    Import several Copart lots in one request. The key is checked once, every
+    lot is validated up front, lots imported before are matched with one
+    lookup, new drafts are written in one transaction and their photos are
+    fetched by one background task sharing a single fetcher.
+    """
+    started_at = time.perf_counter()
+    api_key, auth_status, auth_error = _authenticate_import_api_key(request)
+    event_user = api_key.user if api_key else None
+    if auth_error:
+        _log_import_api_usage(
+            request,
+            api_key=api_key,
+            user=event_user,
+            status_code=auth_status,
+            error_message=auth_error,
+            duration_ms=int((time.perf_counter() - started_at) * 1000),
+        )
+        return Response({'error': auth_error}, status=auth_status)
+
+    lots = request.data.get('lots') if isinstance(request.data, dict) else None
+    max_lots = _resolve_import_batch_max_lots()
+    request_error = ''
+    if not isinstance(lots, list) or not lots:
+        request_error = 'Липсват лотове за импорт.'
+    elif len(lots) > max_lots:
+        request_error = f'Може да импортирате най-много {max_lots} лота наведнъж.'
+    if request_error:
+        _log_import_api_usage(
+            request,
+            payload={},
+            api_key=api_key,
+            user=event_user,
+            status_code=status.HTTP_400_BAD_REQUEST,
+            error_message=request_error,
+            duration_ms=int((time.perf_counter() - started_at) * 1000),
+        )
+        return Response({'error': request_error}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        return _import_copart_lots(request, api_key, lots, started_at)
+    except Exception as exc:
+        logger.exception('Unexpected error while importing a Copart batch.')
+        _log_import_api_usage(
+            request,
+            payload={},
+            api_key=api_key,
+            user=event_user,
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            error_message=str(exc),
+            duration_ms=int((time.perf_counter() - started_at) * 1000),
+        )
+        return Response(
+            _build_import_error('Неочаквана грешка при импорт.', exc),
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+
+def _import_copart_lots(request, api_key, lots, started_at):
+    """Body of the batch import once the key and the lot list are valid."""
+    from backend.listings.serializers import BaseListingSerializer
+
+    event_user = api_key.user
+    refresh = _is_import_refresh(request, request.data)
+    source_keys = [_build_import_source_key(lot) if isinstance(lot, dict) else '' for lot in lots]
+    existing_sources = {
+        source.source_key: source
+        for source in ImportedListingSource.objects.select_related('listing', 'user').filter(
+            user=api_key.user,
+            source_key__in={key for key in source_keys if key},
+        )
+    }
+
+    results = []
+    to_create = []
+    to_refresh = []
+    seen_keys = set()
+    # exception text goes to the usage log and server log, never to the client
+    failure_messages = {}
+    for index, lot in enumerate(lots):
+        if not isinstance(lot, dict):
+            results.append({'index': index, 'status': 'invalid', 'error': 'Невалидни данни за лота.'})
+            continue
+        source_key = source_keys[index]
+        if source_key and source_key in seen_keys:
+            results.append({'index': index, 'status': 'invalid', 'error': 'Лотът се повтаря в заявката.'})
+            continue
+        seen_keys.add(source_key)
+
+        result = {'index': index}
+        results.append(result)
+        if source_key in existing_sources:
+            to_refresh.append((result, lot, existing_sources[source_key]))
+            continue
+
+        draft_payload = _build_copart_draft_payload(lot, api_key.user)
+        serializer = BaseListingSerializer(data=draft_payload, context={'request': request})
+        if not serializer.is_valid():
+            result.update({
+                'status': 'invalid',
+                'error': 'Неуспешен импорт на обявата.',
+                'details': serializer.errors,
+            })
+            continue
+        to_create.append((result, lot, serializer, source_key, draft_payload))
+
+    jobs = []
+    listings_by_index = {}
+    with db_transaction.atomic():
+        for result, lot, import_source in to_refresh:
+            job = None
+            updated_fields = None
+            if refresh:
+                try:
+                    with db_transaction.atomic():
+                        job, updated_fields = _refresh_imported_listing(import_source, lot, request)
+                except Exception as exc:
+                    failure_messages[result['index']] = str(exc)
+                    result.update({'status': 'failed', **_build_import_error('Неуспешно обновяване на обявата.', exc)})
+                    continue
+            if job is not None:
+                jobs.append(job)
+            listings_by_index[result['index']] = import_source.listing
+            result.update({
+                'status': 'existing',
+                **_build_import_result(
+                    request, import_source.listing, job, existing=True, updated_fields=updated_fields
+                ),
+            })
+
+        for result, lot, serializer, source_key, draft_payload in to_create:
+            try:
+                # a savepoint per lot keeps one failing save from rolling back the rest
+                with db_transaction.atomic():
+                    listing = serializer.save(user=api_key.user)
+                    import_source = None
+                    if source_key:
+                        import_source = _build_import_source(listing, lot, api_key.user, source_key, draft_payload)
+                        import_source.save()
+            except Exception as exc:
+                failure_messages[result['index']] = str(exc)
+                result.update({'status': 'failed', **_build_import_error('Неуспешен импорт на обявата.', exc)})
+                continue
+            job = _build_import_job(listing, lot, api_key.user, import_source=import_source)
+            jobs.append(job)
+            listings_by_index[result['index']] = listing
+            result.update({'status': 'created', **_build_import_result(request, listing, job)})
+        _queue_import_jobs(jobs)
+
+    created_count = sum(1 for result in results if result['status'] == 'created')
+    existing_count = sum(1 for result in results if result['status'] == 'existing')
+    if listings_by_index:
+        api_key.mark_used()
+
+    duration_ms = int((time.perf_counter() - started_at) * 1000)
+    events = []
+    for result in results:
+        lot = lots[result['index']]
+        listing = listings_by_index.get(result['index'])
+        if result['status'] == 'created':
+            lot_status = status.HTTP_202_ACCEPTED
+        elif result['status'] == 'existing':
+            lot_status = status.HTTP_202_ACCEPTED if result.get('job_id') else status.HTTP_200_OK
+        else:
+            lot_status = status.HTTP_400_BAD_REQUEST
+        events.append(_build_import_api_usage_event(
+            request,
+            payload=lot,
+            payload_bytes=len(json.dumps(lot, ensure_ascii=False, default=str).encode('utf-8')),
+            api_key=api_key,
+            user=event_user,
+            listing=listing,
+            status_code=lot_status,
+            success=listing is not None,
+            error_message=(
+                failure_messages.get(result['index'])
+                or str(result.get('details') or result.get('error') or '')
+            ),
+            duration_ms=duration_ms,
+        ))
+    try:
+        ImportApiUsageEvent.objects.bulk_create(events)
+    except Exception:
+        # Logging should never break the import flow.
+        logger.warning('Failed to log %s batch import usage events.', len(events))
+
+    message = f'Импортирани като чернови: {created_count} от {len(results)}.'
+    if any(job.status == ImportJob.STATUS_QUEUED for job in jobs):
+        message = f'{message} Снимките се обработват.'
+        response_status = status.HTTP_202_ACCEPTED
+    elif listings_by_index:
+        response_status = status.HTTP_200_OK
+    else:
+        response_status = status.HTTP_400_BAD_REQUEST
+    return Response(
+        {
+            'created': created_count,
+            'existing': existing_count,
+            'failed': len(results) - created_count - existing_count,
+            'results': results,
+            'message': message,
+        },
+        status=response_status,
+    )
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def import_job_status(request, job_id):
+    """Progress of a queued Copart import, for the extension to poll."""
+    owner = request.user if request.user.is_authenticated else None
+    raw_key = _extract_import_api_key(request)
+    if raw_key:
+        api_key = UserImportApiKey.objects.select_related('user').filter(
+            key_hash=UserImportApiKey.hash_key(raw_key)
+        ).first()
+        owner = api_key.user if api_key and api_key.user.is_active else None
+    if owner is None:
+        return Response({'error': 'API ключът е невалиден.'}, status=status.HTTP_401_UNAUTHORIZED)
+
+    # a poll after a restart is often the first queue access of the new process
+    resume_stranded_import_jobs()
+    job = ImportJob.objects.select_related('listing').filter(pk=job_id, user=owner).first()
+    if job is None:
+        return Response({'error': 'Импортът не е намерен.'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(build_import_job_status(job), status=status.HTTP_200_OK)
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def topup_balance(request):
@@ -1766,6 +2241,22 @@ def dealer_detail(request, pk):
     except BusinessUser.DoesNotExist:
         return Response({'error': 'Дилърът не е намерен.'}, status=status.HTTP_404_NOT_FOUND)
 
+    return _dealer_detail_response(request, dealer)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def dealer_detail_by_slug(request, slug):
+    """Get a dealer by the public slug used in /dealers/<slug> URLs"""
+    try:
+        dealer = BusinessUser.objects.get(public_slug=slugify_dealer_name(slug))
+    except BusinessUser.DoesNotExist:
+        return Response({'error': 'Дилърът не е намерен.'}, status=status.HTTP_404_NOT_FOUND)
+
+    return _dealer_detail_response(request, dealer)
+
+
+def _dealer_detail_response(request, dealer):
     serializer = DealerDetailSerializer(dealer, context={'request': request})
     data = serializer.data
 
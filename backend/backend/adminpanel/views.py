@@ -661,6 +661,7 @@ def admin_listing_delete(request, listing_id):
 
     deleted_listing_id = listing.id
     deleted_user_id = listing.user_id
+    deleted_main_category = listing.main_category
     listing.delete()
 
     notification_payload = {
@@ -677,7 +678,7 @@ def admin_listing_delete(request, listing_id):
         "createdAt": timezone.now().isoformat(),
     }
     broadcast_user_notification(deleted_user_id, notification_payload)
-    broadcast_dealer_listings_updated()
+    broadcast_dealer_listings_updated(deleted_listing_id, deleted_main_category, deleted_user_id)
 
     return Response(
         {
@@ -0,0 +1,188 @@
+"""
+Channel layer that fans group messages out across processes over PostgreSQL
+``LISTEN/NOTIFY``.
+
+Every daphne process keeps its sockets, groups and queues in memory exactly
+like ``InMemoryChannelLayer``. What changes is how a message gets there:
+``group_send`` (and ``send`` to a channel owned by another process) publishes
+a ``pg_notify`` on the main database, and each process that serves sockets
+holds one extra connection ``LISTEN``-ing on that channel and delivers what
+it hears to its local members. Processes that only publish (gunicorn workers,
+management commands) never open the listener. A ``send`` to a plain named
+channel (no process token) stays in the sending process, as it would with
+``InMemoryChannelLayer``.
+
+The notify goes through Django's connection, so a broadcast made inside a
+transaction is delivered on commit and dropped on rollback. Payloads are JSON
+and must fit PostgreSQL's 8000-byte notify limit. The listener needs a
+session-level connection; point it past a transaction-mode pooler.
+"""
+
+import asyncio
+import json
+import logging
+import random
+import re
+import string
+import uuid
+
+from asgiref.sync import sync_to_async
+from channels.exceptions import ChannelFull
+from channels.layers import InMemoryChannelLayer
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_PAYLOAD_MAX_BYTES = 8000
+LISTENER_RECONNECT_SECONDS = 1.0
+PROCESS_CHANNEL_PATTERN = re.compile(r"\.pg[0-9a-f]{12}!")
+
+
+class PostgresChannelLayer(InMemoryChannelLayer):
+    def __init__(self, notify_channel="channels_layer", database_alias="default", **kwargs):
+        super().__init__(**kwargs)
+        self.notify_channel = notify_channel
+        self.database_alias = database_alias
+        # channel names carry the process token so a notify reaches only the owner
+        self.process_token = uuid.uuid4().hex[:12]
+        self._listen_connection = None
+        self._listen_loop = None
+        self._listen_lock = None
+
+    # ------------------------------------------------------------------
+    # channel layer API
+    # ------------------------------------------------------------------
+    async def new_channel(self, prefix="specific."):
+        await self._ensure_listener()
+        suffix = "".join(random.choice(string.ascii_letters) for _ in range(12))
+        return f"{prefix}.pg{self.process_token}!{suffix}"
+
+    async def send(self, channel, message):
+        # only process-specific channels have an owner elsewhere to notify;
+        # plain named channels are consumed in this process, as in memory
+        if self._owns_channel(channel) or not PROCESS_CHANNEL_PATTERN.search(str(channel)):
+            await super().send(channel, message)
+            return
+        self.require_valid_channel_name(channel)
+        await self._publish({"channel": channel, "message": message})
+
+    async def receive(self, channel):
+        await self._ensure_listener()
+        return await super().receive(channel)
+
+    async def group_add(self, group, channel):
+        await self._ensure_listener()
+        await super().group_add(group, channel)
+
+    async def group_send(self, group, message):
+        assert isinstance(message, dict), "Message is not a dict"
+        self.require_valid_group_name(group)
+        await self._publish({"group": group, "message": message})
+
+    async def close(self):
+        self._stop_listener()
+
+    # ------------------------------------------------------------------
+    # publishing
+    # ------------------------------------------------------------------
+    async def _publish(self, envelope):
+        payload = json.dumps(envelope, separators=(",", ":"))
+        if len(payload.encode("utf-8")) > NOTIFY_PAYLOAD_MAX_BYTES:
+            raise ValueError("Channel layer message is larger than the PostgreSQL notify limit.")
+        # thread-sensitive: a sync caller's open transaction defers the notify until commit
+        await sync_to_async(self._notify)(payload)
+
+    def _notify(self, payload):
+        with connections[self.database_alias].cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [self.notify_channel, payload])
+
+    # ------------------------------------------------------------------
+    # listening
+    # ------------------------------------------------------------------
+    def _owns_channel(self, channel):
+        return f".pg{self.process_token}!" in channel
+
+    async def _ensure_listener(self):
+        loop = asyncio.get_running_loop()
+        if self._listen_connection is not None and self._listen_loop is loop:
+            return
+        if self._listen_lock is None or self._listen_loop is not loop:
+            self._listen_lock = asyncio.Lock()
+        async with self._listen_lock:
+            if self._listen_connection is not None and self._listen_loop is loop:
+                return
+            self._stop_listener()
+            listen_connection = await loop.run_in_executor(None, self._open_listen_connection)
+            self._listen_connection = listen_connection
+            self._listen_loop = loop
+            loop.add_reader(listen_connection.fileno(), self._on_listen_readable)
+
+    def _open_listen_connection(self):
+        import psycopg2
+        from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT, quote_ident
+
+        params = connections[self.database_alias].get_connection_params()
+        params.pop("cursor_factory", None)
+        listen_connection = psycopg2.connect(**params)
+        listen_connection.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        with listen_connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {quote_ident(self.notify_channel, cursor)}")
+        return listen_connection
+
+    def _stop_listener(self):
+        listen_connection, self._listen_connection = self._listen_connection, None
+        if listen_connection is None:
+            return
+        try:
+            if self._listen_loop is not None and not self._listen_loop.is_closed():
+                self._listen_loop.remove_reader(listen_connection.fileno())
+        except (ValueError, OSError):
+            pass
+        try:
+            listen_connection.close()
+        except Exception:
+            pass
+
+    def _on_listen_readable(self):
+        listen_connection = self._listen_connection
+        if listen_connection is None:
+            return
+        try:
+            listen_connection.poll()
+        except Exception as exc:
+            # the database went away: drop the socket and reconnect shortly
+            logger.warning("Channel layer listener lost its connection: %s", exc)
+            loop = self._listen_loop
+            self._stop_listener()
+            self._schedule_reconnect(loop)
+            return
+        while listen_connection.notifies:
+            notify = listen_connection.notifies.pop(0)
+            self._listen_loop.create_task(self._deliver(notify.payload))
+
+    def _schedule_reconnect(self, loop):
+        loop.call_later(LISTENER_RECONNECT_SECONDS, lambda: loop.create_task(self._reconnect_listener()))
+
+    async def _reconnect_listener(self):
+        try:
+            await self._ensure_listener()
+        except Exception as exc:
+            logger.warning("Channel layer listener could not reconnect: %s", exc)
+            self._schedule_reconnect(asyncio.get_running_loop())
+
+    async def _deliver(self, payload):
+        try:
+            envelope = json.loads(payload)
+        except ValueError:
+            logger.warning("Channel layer ignored a malformed notify payload.")
+            return
+        message = envelope.get("message")
+        if not isinstance(message, dict):
+            return
+        if "group" in envelope:
+            await super().group_send(envelope["group"], message)
+        elif self._owns_channel(str(envelope.get("channel") or "")):
+            try:
+                await super().send(envelope["channel"], message)
+            except ChannelFull:
+                logger.warning("Channel layer dropped a message for full channel %s.", envelope["channel"])
@@ -0,0 +1,186 @@
+import os
+import time
+from contextlib import contextmanager
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.http import FileResponse, Http404, HttpResponseBadRequest, HttpResponseRedirect
+from django.urls import reverse
+from django.views.decorators.http import require_safe
+
+from backend.media_cache_middleware import IMMUTABLE_MEDIA_CACHE_CONTROL
+
+from .models import (
+    CAR_IMAGE_AVIF_QUALITY,
+    CAR_IMAGE_AVIF_SPEED,
+    CAR_IMAGE_MAX_PIXELS,
+    CAR_IMAGE_WEBP_METHOD,
+    CAR_IMAGE_WEBP_QUALITY,
+    CarImage,
+    run_rendition_job,
+)
+from .renditions import render_derivative
+
+# Only these edges can be requested; anything else would let clients fill the
+# bucket with arbitrary sizes. A height of 0 keeps the original aspect ratio.
+DERIVATIVE_ALLOWED_DIMENSIONS = frozenset(
+    getattr(
+        settings,
+        "CAR_IMAGE_DERIVATIVE_DIMENSIONS",
+        (120, 160, 240, 320, 356, 360, 480, 600, 720, 800, 900, 1024, 1080, 1200, 1600, 2048),
+    )
+)
+DERIVATIVE_CONTENT_TYPES = {
+    "webp": "image/webp",
+    "avif": "image/avif",
+    "jpg": "image/jpeg",
+}
+DERIVATIVE_LOCK_SECONDS = 60
+DERIVATIVE_WAIT_SECONDS = 20
+DERIVATIVE_POLL_SECONDS = 0.1
+
+_DERIVATIVE_LOCKS = {}
+_DERIVATIVE_LOCKS_GUARD = Lock()
+
+
+@contextmanager
+def _single_flight(key):
+    """Serialize renders of the same derivative inside this process."""
+    with _DERIVATIVE_LOCKS_GUARD:
+        entry = _DERIVATIVE_LOCKS.setdefault(key, [Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _DERIVATIVE_LOCKS_GUARD:
+            entry[1] -= 1
+            if entry[1] <= 0:
+                _DERIVATIVE_LOCKS.pop(key, None)
+
+
+def _wait_for_other_worker(storage, path, lock_key):
+    """
+    Another process holds the render lock: poll until it has written the file
+    or released the lock. Returns ``True`` when the file showed up.
+    """
+    deadline = time.monotonic() + DERIVATIVE_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        if storage.exists(path):
+            return True
+        if cache.add(lock_key, 1, timeout=DERIVATIVE_LOCK_SECONDS):
+            return False
+        time.sleep(DERIVATIVE_POLL_SECONDS)
+    # lock holder is stuck; render ourselves rather than failing the request
+    cache.set(lock_key, 1, timeout=DERIVATIVE_LOCK_SECONDS)
+    return False
+
+
+def _render_and_store(image_obj, path, width, height, image_format):
+    content = run_rendition_job(
+        image_obj._resolve_rendition_source(),
+        {
+            "width": width,
+            "height": height,
+            "image_format": image_format,
+            "quality": CAR_IMAGE_WEBP_QUALITY,
+            "method": CAR_IMAGE_WEBP_METHOD,
+            "max_pixels": CAR_IMAGE_MAX_PIXELS,
+            "avif_quality": CAR_IMAGE_AVIF_QUALITY,
+            "avif_speed": CAR_IMAGE_AVIF_SPEED,
+        },
+        renderer=render_derivative,
+    )
+    if not content:
+        return False
+
+    storage = image_obj.image.storage
+    saved_name = storage.save(path, ContentFile(content))
+    if saved_name != path:
+        # lost a race with another writer; theirs is identical, drop ours
+        storage.delete(saved_name)
+    return True
+
+
+def ensure_derivative(image_obj, width, height, image_format):
+    """Return the storage path of the derivative, rendering it at most once."""
+    storage = image_obj.image.storage
+    path = image_obj._build_derivative_path(width, height, image_format)
+    if storage.exists(path):
+        return path
+
+    with _single_flight(path):
+        if storage.exists(path):
+            return path
+
+        lock_key = f"car-image-derivative:{path}"
+        if not cache.add(lock_key, 1, timeout=DERIVATIVE_LOCK_SECONDS):
+            if _wait_for_other_worker(storage, path, lock_key):
+                return path
+        try:
+            if storage.exists(path):
+                return path
+            if not _render_and_store(image_obj, path, width, height, image_format):
+                return None
+            return path
+        finally:
+            cache.delete(lock_key)
+
+
+def get_derivative_version(image_obj):
+    """
+    URL segment that changes whenever the photo's file does: the stored base
+    name, which for content-addressed blobs is the content hash. Derivative
+    URLs are cached as immutable, so the id alone is not a safe key.
+    """
+    base_name, _ = os.path.splitext(os.path.basename(image_obj.image.name or ""))
+    return base_name
+
+
+def build_derivative_url(image_obj, width, height, image_format):
+    return reverse(
+        "image_derivative",
+        args=[image_obj.pk, get_derivative_version(image_obj), width, height, image_format],
+    )
+
+
+def _build_file_response(storage, path, image_format):
+    try:
+        local_path = storage.path(path)
+    except (NotImplementedError, AttributeError):
+        local_path = None
+
+    if local_path:
+        response = FileResponse(open(local_path, "rb"), content_type=DERIVATIVE_CONTENT_TYPES[image_format])
+    else:
+        # remote storage: let the CDN serve the bytes
+        response = HttpResponseRedirect(storage.url(path))
+    response["Cache-Control"] = IMMUTABLE_MEDIA_CACHE_CONTROL
+    return response
+
+
+@require_safe
+def image_derivative(request, image_id, version, width, height, image_format):
+    image_format = str(image_format or "").lower()
+    if image_format == "jpeg":
+        image_format = "jpg"
+    if image_format not in DERIVATIVE_CONTENT_TYPES:
+        return HttpResponseBadRequest("Unsupported image format.")
+    if width not in DERIVATIVE_ALLOWED_DIMENSIONS:
+        return HttpResponseBadRequest("Unsupported image width.")
+    if height and height not in DERIVATIVE_ALLOWED_DIMENSIONS:
+        return HttpResponseBadRequest("Unsupported image height.")
+
+    image_obj = CarImage.objects.filter(pk=image_id).only("id", "image").first()
+    if image_obj is None or not image_obj.image:
+        raise Http404("Image not found.")
+    if version != get_derivative_version(image_obj):
+        # stale link to a replaced photo: point at the current bytes, never cache this hop
+        return HttpResponseRedirect(build_derivative_url(image_obj, width, height, image_format))
+
+    path = ensure_derivative(image_obj, width, height, image_format)
+    if not path:
+        raise Http404("Image could not be rendered.")
+    return _build_file_response(image_obj.image.storage, path, image_format)
@@ -0,0 +1,343 @@
+"""
+Syndication feed of live car listings for partner portals and vehicle ads.
+
+``/feeds/cars.<format>`` streams every live car listing as JSON Lines
+(``jsonl``), CSV (``csv``) or a vehicle-listings XML document (``xml``).
+Listings are read by keyset in ``.values()`` batches and the cover photos of a
+batch are resolved in bulk, so memory stays flat however large the
+catalogue is. ``?since=<ISO datetime>`` limits the feed to listings changed
+after that moment for incremental pulls and appends a ``status: removed``
+record for every listing that left the feed since then (archived, expired or
+deleted); deletions are kept as ``FeedTombstone`` rows for
+``FEED_TOMBSTONE_RETENTION_DAYS``, so an older ``since`` is refused and the
+partner re-pulls the full feed. Compression is left to
+``GZipMiddleware``, which gzips streaming responses chunk by chunk;
+``manage.py export_cars_feed`` writes the same feed to a file.
+"""
+
+import csv
+import io
+import json
+from datetime import datetime, time as dt_time, timedelta
+from html import escape
+from urllib.parse import quote
+
+from django.http import Http404, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+
+from django.db.models import Q
+
+from .models import (
+    FEED_TOMBSTONE_RETENTION_DAYS,
+    LISTING_EXPIRY_DAYS,
+    BaseListing,
+    CarImage,
+    FeedTombstone,
+    get_expiry_cutoff,
+)
+from .prerender import _format_price_for_schema, _resolve_frontend_base_url, _to_absolute_asset_url
+
+FEED_FORMATS = ("jsonl", "csv", "xml")
+FEED_BATCH_SIZE = 1000
+FEED_CONTENT_TYPES = {
+    "jsonl": "application/x-ndjson; charset=utf-8",
+    "csv": "text/csv; charset=utf-8",
+    "xml": "application/xml; charset=utf-8",
+}
+FEED_FIELDS = (
+    "id",
+    "url",
+    "title",
+    "brand",
+    "model",
+    "year",
+    "mileage",
+    "fuel",
+    "price",
+    "currency",
+    "city",
+    "image_url",
+    "updated_at",
+    "status",
+)
+FEED_STATUS_ACTIVE = "active"
+FEED_STATUS_REMOVED = "removed"
+
+# vehicle-listings schemas only know a fixed set of fuel types
+_XML_FUEL_TYPES = {
+    "benzin": "GASOLINE",
+    "dizel": "DIESEL",
+    "gaz_benzin": "OTHER",
+    "hibrid": "HYBRID",
+    "elektro": "ELECTRIC",
+}
+_LISTING_VALUE_FIELDS = (
+    "id",
+    "slug",
+    "title",
+    "price",
+    "currency",
+    "city",
+    "updated_at",
+    "cars_details__brand",
+    "cars_details__model",
+    "cars_details__year_from",
+    "cars_details__mileage",
+    "cars_details__fuel",
+)
+
+
+def parse_feed_since(raw_value):
+    """Aware datetime for a ``since`` value (ISO datetime or date); ``None`` when blank, ``ValueError`` when invalid."""
+    value = str(raw_value or "").strip()
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        parsed_date = parse_date(value)
+        if parsed_date is None:
+            raise ValueError(value)
+        parsed = datetime.combine(parsed_date, dt_time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def is_feed_since_too_old(since):
+    """Deletions before the tombstone window are forgotten, so such a ``since`` needs a full pull."""
+    return since is not None and since < timezone.now() - timedelta(days=FEED_TOMBSTONE_RETENTION_DAYS)
+
+
+def _get_feed_queryset(since=None):
+    queryset = BaseListing.objects.filter(
+        main_category="cars",
+        is_active=True,
+        is_draft=False,
+        is_archived=False,
+        created_at__gte=get_expiry_cutoff(),
+        cars_details__isnull=False,
+    )
+    if since is not None:
+        queryset = queryset.filter(updated_at__gt=since)
+    return queryset.order_by("id").values(*_LISTING_VALUE_FIELDS)
+
+
+def _get_removed_queryset(since):
+    """Car listings that left the feed after ``since`` but still have a row."""
+    expiry_cutoff = get_expiry_cutoff()
+    published = Q(is_active=True, is_draft=False, is_archived=False)
+    return (
+        BaseListing.objects.filter(main_category="cars")
+        .filter(
+            # unpublished (archive, deactivate and draft all go through save())
+            Q(updated_at__gt=since) & ~(published & Q(created_at__gte=expiry_cutoff))
+            # or expired while still published
+            | published & Q(created_at__gte=get_expiry_cutoff(since), created_at__lt=expiry_cutoff)
+        )
+        .order_by("id")
+        .values("id", "updated_at", "created_at", "is_active", "is_draft", "is_archived")
+    )
+
+
+def _resolve_cover_image_names(listing_ids):
+    """``{listing_id: image name}`` for a batch: flagged covers first, then the first photo of the rest."""
+    covers = {}
+    for listing_id, image_name in (
+        CarImage.objects.filter(listing_id__in=listing_ids, is_cover=True)
+        .order_by("listing_id", "order", "id")
+        .values_list("listing_id", "image")
+    ):
+        covers.setdefault(listing_id, image_name)
+    missing_ids = [listing_id for listing_id in listing_ids if listing_id not in covers]
+    if missing_ids:
+        for listing_id, image_name in (
+            CarImage.objects.filter(listing_id__in=missing_ids)
+            .order_by("listing_id", "order", "id")
+            .values_list("listing_id", "image")
+        ):
+            covers.setdefault(listing_id, image_name)
+    return covers
+
+
+def _build_feed_item(row, image_name, frontend_base_url, image_storage):
+    brand = str(row["cars_details__brand"] or "").strip()
+    model = str(row["cars_details__model"] or "").strip()
+    slug = str(row["slug"] or "").strip() or f"obiava-{row['id']}"
+    image_url = ""
+    if image_name:
+        image_url = _to_absolute_asset_url(image_storage.url(image_name), frontend_base_url)
+    return {
+        "id": row["id"],
+        "url": f"{frontend_base_url}/details/{quote(slug, safe='-_~')}",
+        "title": str(row["title"] or "").strip() or f"{brand} {model}".strip(),
+        "brand": brand,
+        "model": model,
+        "year": row["cars_details__year_from"],
+        "mileage": row["cars_details__mileage"],
+        "fuel": row["cars_details__fuel"] or "",
+        "price": _format_price_for_schema(row["price"]) or "",
+        "currency": BaseListing.normalize_currency(row["currency"]),
+        "city": str(row["city"] or "").strip(),
+        "image_url": image_url,
+        "updated_at": row["updated_at"].isoformat() if row["updated_at"] else "",
+        "status": FEED_STATUS_ACTIVE,
+    }
+
+
+def _build_removed_item(listing_id, removed_at):
+    return {"id": listing_id, "updated_at": removed_at.isoformat(), "status": FEED_STATUS_REMOVED}
+
+
+def _get_removed_at(row):
+    if row["is_active"] and not row["is_draft"] and not row["is_archived"]:
+        return row["created_at"] + timedelta(days=LISTING_EXPIRY_DAYS)
+    return row["updated_at"]
+
+
+def iter_feed_items(since=None, batch_size=FEED_BATCH_SIZE):
+    """Yield lists of feed items, one list per keyset batch."""
+    frontend_base_url = _resolve_frontend_base_url()
+    image_storage = CarImage._meta.get_field("image").storage
+    queryset = _get_feed_queryset(since)
+    last_id = 0
+    while True:
+        rows = list(queryset.filter(id__gt=last_id)[:batch_size])
+        if not rows:
+            return
+        last_id = rows[-1]["id"]
+        covers = _resolve_cover_image_names([row["id"] for row in rows])
+        yield [
+            _build_feed_item(row, covers.get(row["id"]), frontend_base_url, image_storage)
+            for row in rows
+        ]
+
+
+def iter_removed_feed_items(since, batch_size=FEED_BATCH_SIZE):
+    """Yield lists of ``removed`` records for listings that left the feed after ``since``."""
+    queryset = _get_removed_queryset(since)
+    last_id = 0
+    while True:
+        rows = list(queryset.filter(id__gt=last_id)[:batch_size])
+        if not rows:
+            break
+        last_id = rows[-1]["id"]
+        yield [_build_removed_item(row["id"], _get_removed_at(row)) for row in rows]
+
+    tombstones = FeedTombstone.objects.filter(deleted_at__gt=since).order_by("id")
+    last_id = 0
+    while True:
+        rows = list(tombstones.filter(id__gt=last_id).values_list("id", "listing_id", "deleted_at")[:batch_size])
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        yield [_build_removed_item(listing_id, deleted_at) for _, listing_id, deleted_at in rows]
+
+
+def _iter_feed_batches(since, batch_size):
+    yield from iter_feed_items(since, batch_size)
+    if since is not None:
+        yield from iter_removed_feed_items(since, batch_size)
+
+
+def _render_jsonl_batch(items):
+    return "".join(json.dumps(item, ensure_ascii=False) + "\n" for item in items)
+
+
+def _render_csv_batch(items, include_header=False):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=FEED_FIELDS, lineterminator="\n")
+    if include_header:
+        writer.writeheader()
+    writer.writerows(items)
+    return buffer.getvalue()
+
+
+def _render_xml_listing(item):
+    if item["status"] == FEED_STATUS_REMOVED:
+        return (
+            f"<listing><vehicle_id>{item['id']}</vehicle_id><status>REMOVED</status>"
+            f"<updated_at>{item['updated_at']}</updated_at></listing>\n"
+        )
+    parts = [
+        "<listing>",
+        f"<vehicle_id>{item['id']}</vehicle_id>",
+        f"<title>{escape(item['title'])}</title>",
+        f"<url>{escape(item['url'])}</url>",
+        f"<make>{escape(item['brand'])}</make>",
+        f"<model>{escape(item['model'])}</model>",
+        f"<year>{item['year']}</year>",
+        f"<mileage><value>{item['mileage']}</value><unit>KM</unit></mileage>",
+        f"<fuel_type>{_XML_FUEL_TYPES.get(item['fuel'], 'OTHER')}</fuel_type>",
+    ]
+    if item["price"]:
+        parts.append(f"<price>{item['price']} {item['currency']}</price>")
+    if item["image_url"]:
+        parts.append(f"<image><url>{escape(item['image_url'])}</url></image>")
+    if item["city"]:
+        parts.append(
+            f'<address format="simple"><component name="city">{escape(item["city"])}</component>'
+            '<component name="country">BG</component></address>'
+        )
+    parts.append("<status>ACTIVE</status>")
+    parts.append(f"<updated_at>{item['updated_at']}</updated_at>")
+    parts.append("</listing>\n")
+    return "".join(parts)
+
+
+def iter_cars_feed(feed_format, since=None, batch_size=FEED_BATCH_SIZE):
+    """Yield the encoded feed in ``feed_format``, one chunk per batch."""
+    if feed_format not in FEED_FORMATS:
+        raise ValueError(f"Unknown feed format: {feed_format}")
+
+    if feed_format == "csv":
+        header_pending = True
+        for items in _iter_feed_batches(since, batch_size):
+            yield _render_csv_batch(items, include_header=header_pending).encode("utf-8")
+            header_pending = False
+        if header_pending:
+            yield _render_csv_batch([], include_header=True).encode("utf-8")
+        return
+
+    if feed_format == "jsonl":
+        for items in _iter_feed_batches(since, batch_size):
+            yield _render_jsonl_batch(items).encode("utf-8")
+        return
+
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n<listings>\n<title>Kar.bg</title>\n'.encode("utf-8")
+    for items in _iter_feed_batches(since, batch_size):
+        yield "".join(_render_xml_listing(item) for item in items).encode("utf-8")
+    yield b"</listings>\n"
+
+
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def cars_feed(request, feed_format):
+    if feed_format not in FEED_FORMATS:
+        raise Http404("Unknown feed format.")
+    try:
+        since = parse_feed_since(request.query_params.get("since"))
+    except ValueError:
+        return Response(
+            {"detail": "Невалидна стойност за since."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if is_feed_since_too_old(since):
+        return Response(
+            {"detail": f"since е по-стар от {FEED_TOMBSTONE_RETENTION_DAYS} дни; изтеглете пълния фийд."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    response = StreamingHttpResponse(
+        iter_cars_feed(feed_format, since),
+        content_type=FEED_CONTENT_TYPES[feed_format],
+    )
+    response["Cache-Control"] = "no-cache"
+    response["Content-Disposition"] = f'inline; filename="kar-bg-cars.{feed_format}"'
+    patch_vary_headers(response, ("Accept-Encoding",))
+    return response
@@ -0,0 +1,226 @@
+"""Upload ingestion for listing photos.
+
+Runs before a ``CarImage`` row is written: the header is sniffed for format
+and dimensions (no pixel decode), unsupported or absurdly large files are
+rejected, originals above the stored-size budget are downscaled while
+decoding (JPEG ``draft()``), and bulky JPEG metadata (EXIF with maker notes
+and GPS, XMP, IPTC, comments) is dropped losslessly, keeping only the
+orientation tag. The SHA-256 of the bytes that end up in storage is
+returned so identical photos can share one stored copy.
+"""
+
+import hashlib
+import io
+import os
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image as PILImage, ImageOps
+from PIL import UnidentifiedImageError
+
+INGEST_ALLOWED_FORMATS = {"JPEG", "MPO", "PNG", "WEBP", "AVIF"}
+INGEST_JPEG_QUALITY = 90
+
+_RESAMPLING = getattr(PILImage, "Resampling", PILImage)
+_ROTATED_ORIENTATIONS = {5, 6, 7, 8}
+# JPEG segments kept as-is: APP0 (JFIF), APP2 (ICC profile), APP14 (Adobe colour transform).
+_JPEG_KEEP_MARKERS = {0xE0, 0xE2, 0xEE}
+_JPEG_SOS = 0xDA
+_JPEG_EOI = 0xD9
+
+IngestedImage = namedtuple("IngestedImage", ["file", "width", "height", "format", "changed", "content_hash"])
+ImageHeader = namedtuple("ImageHeader", ["format", "width", "height", "orientation"])
+
+
+class ImageIngestionError(ValueError):
+    """Raised for uploads that must not be stored; the message is user-facing."""
+
+
+def get_max_edge():
+    return int(getattr(settings, "CAR_IMAGE_MAX_EDGE", 4096))
+
+
+def get_max_upload_pixels():
+    return int(getattr(settings, "CAR_IMAGE_MAX_UPLOAD_PIXELS", 100_000_000))
+
+
+def _read_all(file_obj):
+    file_obj.seek(0)
+    data = file_obj.read()
+    file_obj.seek(0)
+    return data
+
+
+def sniff_image_header(file_obj):
+    """Return format, display size and EXIF orientation from the header only."""
+    file_obj.seek(0)
+    try:
+        with PILImage.open(file_obj) as image:
+            image_format = str(image.format or "").upper()
+            width, height = image.size
+            try:
+                orientation = int(image.getexif().get(0x0112) or 1)
+            except Exception:
+                orientation = 1
+    except (UnidentifiedImageError, OSError, ValueError, PILImage.DecompressionBombError):
+        raise ImageIngestionError("Файлът не е валидно изображение.")
+    finally:
+        file_obj.seek(0)
+
+    if orientation in _ROTATED_ORIENTATIONS:
+        width, height = height, width
+    return ImageHeader(image_format, width, height, orientation)
+
+
+def validate_image_upload(file_obj):
+    """Cheap pre-flight check used by views/serializers before anything is written."""
+    header = sniff_image_header(file_obj)
+    if header.format not in INGEST_ALLOWED_FORMATS:
+        raise ImageIngestionError("Неподдържан формат на изображението. Използвайте JPEG, PNG, WebP или AVIF.")
+    if header.width <= 0 or header.height <= 0:
+        raise ImageIngestionError("Файлът не е валидно изображение.")
+    if header.width * header.height > get_max_upload_pixels():
+        raise ImageIngestionError("Изображението е твърде голямо.")
+    return header
+
+
+def strip_jpeg_metadata(data, orientation=1):
+    """
+    Drop APPn/COM segments except JFIF, ICC and Adobe without touching the
+    entropy-coded data. A minimal EXIF block carrying only the orientation is
+    re-inserted so rotation still works. Returns ``None`` if the stream does
+    not look like a baseline JPEG.
+    """
+    if data[:2] != b"\xff\xd8":
+        return None
+
+    kept = [b"\xff\xd8"]
+    position = 2
+    data_length = len(data)
+    while position + 4 <= data_length:
+        if data[position] != 0xFF:
+            return None
+        marker = data[position + 1]
+        if marker == 0xFF:
+            position += 1
+            continue
+        if marker in {_JPEG_SOS, _JPEG_EOI}:
+            break
+        segment_length = int.from_bytes(data[position + 2:position + 4], "big")
+        if segment_length < 2:
+            return None
+        segment_end = position + 2 + segment_length
+        is_metadata = marker == 0xFE or (0xE0 <= marker <= 0xEF and marker not in _JPEG_KEEP_MARKERS)
+        is_mpf = marker == 0xE2 and data[position + 4:position + 8] == b"MPF\x00"
+        if not is_metadata and not is_mpf:
+            kept.append(data[position:segment_end])
+        position = segment_end
+    else:
+        return None
+
+    if orientation and orientation != 1:
+        exif = PILImage.Exif()
+        exif[0x0112] = orientation
+        exif_payload = exif.tobytes()
+        exif_segment = b"\xff\xe1" + (len(exif_payload) + 2).to_bytes(2, "big") + exif_payload
+        # EXIF must directly follow SOI/JFIF to be picked up by decoders.
+        insert_at = 2 if len(kept) > 1 and kept[1][:2] == b"\xff\xe0" else 1
+        kept.insert(insert_at, exif_segment)
+
+    kept.append(data[position:])
+    return b"".join(kept)
+
+
+def _downscale(data, header, max_edge):
+    scale = min(1.0, max_edge / float(max(header.width, header.height)))
+    target_width = max(1, int(round(header.width * scale)))
+    target_height = max(1, int(round(header.height * scale)))
+
+    with PILImage.open(io.BytesIO(data)) as image:
+        if header.format in {"JPEG", "MPO"}:
+            requested = (
+                (target_height, target_width)
+                if header.orientation in _ROTATED_ORIENTATIONS
+                else (target_width, target_height)
+            )
+            image.draft("RGB", requested)
+        image.load()
+        upright = ImageOps.exif_transpose(image)
+
+    try:
+        has_alpha = upright.mode in {"RGBA", "LA"} or (upright.mode == "P" and "transparency" in upright.info)
+        resized = upright.resize((target_width, target_height), _RESAMPLING.LANCZOS)
+    finally:
+        upright.close()
+
+    buffer = io.BytesIO()
+    try:
+        if has_alpha:
+            resized.save(buffer, format="PNG", optimize=True)
+            output_format = "PNG"
+        else:
+            if resized.mode != "RGB":
+                converted = resized.convert("RGB")
+                resized.close()
+                resized = converted
+            resized.save(buffer, format="JPEG", quality=INGEST_JPEG_QUALITY, optimize=True, progressive=True)
+            output_format = "JPEG"
+    finally:
+        resized.close()
+    return buffer.getvalue(), target_width, target_height, output_format
+
+
+def _content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def ingest_image_upload(file_obj, name=None, max_pixels=None):
+    """
+    Validate ``file_obj`` and return an :class:`IngestedImage` with the file to
+    store (the original object when nothing had to change), its upright
+    dimensions and the content hash of the stored bytes. Raises :class:`ImageIngestionError` for files that must be
+    rejected.
+    """
+    header = validate_image_upload(file_obj)
+    original_name = os.path.basename(str(name or getattr(file_obj, "name", "") or "upload"))
+    stem, _ = os.path.splitext(original_name)
+
+    max_edge = get_max_edge()
+    pixel_budget = max_pixels or int(getattr(settings, "CAR_IMAGE_MAX_PIXELS", 40_000_000))
+    needs_downscale = (
+        max(header.width, header.height) > max_edge
+        or header.width * header.height > pixel_budget
+        or header.format == "MPO"
+    )
+
+    data = _read_all(file_obj)
+    if needs_downscale:
+        if header.width * header.height > pixel_budget:
+            # the edge budget alone may still exceed the pixel budget for square-ish images
+            max_edge = min(max_edge, int((pixel_budget * max(header.width, header.height)
+                                          / float(min(header.width, header.height))) ** 0.5))
+        content, width, height, output_format = _downscale(data, header, max(1, max_edge))
+        extension = "png" if output_format == "PNG" else "jpg"
+        return IngestedImage(
+            ContentFile(content, name=f"{stem}.{extension}"),
+            width,
+            height,
+            output_format,
+            True,
+            _content_hash(content),
+        )
+
+    if header.format == "JPEG":
+        stripped = strip_jpeg_metadata(data, header.orientation)
+        if stripped is not None and len(stripped) < len(data):
+            return IngestedImage(
+                ContentFile(stripped, name=original_name),
+                header.width,
+                header.height,
+                header.format,
+                True,
+                _content_hash(stripped),
+            )
+
+    return IngestedImage(file_obj, header.width, header.height, header.format, False, _content_hash(data))
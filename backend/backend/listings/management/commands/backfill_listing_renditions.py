@@ -0,0 +1,299 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from datetime import datetime, time as dt_time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from backend.listings.models import BaseListing, CarImage, _resolve_rendition_formats
+from backend.listings.renditions import render_listing_image
+
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_CHECKPOINT_FILE = ".backfill_listing_renditions.json"
+DRY_RUN_SAMPLE_SIZE = 3
+MAX_REPORTED_FAILURES = 20
+CANDIDATE_FIELDS = (
+    "id",
+    "image",
+    "content_hash",
+    "thumbnail",
+    "original_width",
+    "original_height",
+    "low_res",
+    "renditions",
+    "created_at",
+)
+
+
+def _parse_since(raw_value):
+    value = str(raw_value or "").strip()
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        parsed_date = parse_date(value)
+        if parsed_date is None:
+            raise CommandError("--since must be an ISO date or datetime (e.g. 2025-01-31).")
+        parsed = datetime.combine(parsed_date, dt_time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _has_valid_renditions(image_obj, formats):
+    valid = image_obj._has_valid_renditions(
+        {
+            "original_width": image_obj.original_width,
+            "original_height": image_obj.original_height,
+            "renditions": image_obj.renditions,
+        }
+    )
+    if not valid:
+        return False
+    # rows rendered before a format (e.g. AVIF) was enabled still need a pass
+    payload = image_obj.renditions if isinstance(image_obj.renditions, dict) else {}
+    return all(payload.get(image_format) for image_format in formats)
+
+
+def _is_up_to_date(image_obj, formats, placeholders_only):
+    if placeholders_only:
+        payload = image_obj.renditions if isinstance(image_obj.renditions, dict) else {}
+        return bool(payload.get("placeholder"))
+    return _has_valid_renditions(image_obj, formats)
+
+
+def _process_image(image_obj, placeholders_only=False):
+    close_old_connections()
+    try:
+        if placeholders_only:
+            return image_obj.pk, image_obj.ensure_placeholder()
+        return image_obj.pk, image_obj.rebuild_renditions()
+    except Exception:
+        return image_obj.pk, False
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate renditions (or only LQIP placeholders) for existing listing images in keyset-ordered batches. "
+        "Progress is checkpointed after every batch so an interrupted run can resume."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--only-missing",
+            action="store_true",
+            help="Skip images that already have valid renditions.",
+        )
+        parser.add_argument(
+            "--since",
+            default="",
+            help="Only images uploaded on or after this ISO date/datetime.",
+        )
+        parser.add_argument(
+            "--category",
+            default="",
+            help="Only images of listings in this main category (e.g. cars, parts).",
+        )
+        parser.add_argument(
+            "--placeholders-only",
+            action="store_true",
+            help="Only add missing LQIP placeholders, derived from the stored grid rendition.",
+        )
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=int(getattr(settings, "CAR_IMAGE_RENDITION_WORKERS", 2) or 2),
+            help="Images rendered in parallel (encoding uses the rendition process pool when enabled).",
+        )
+        parser.add_argument(
+            "--checkpoint-file",
+            default="",
+            help=f"Where to store progress (default: BASE_DIR/{DEFAULT_CHECKPOINT_FILE}).",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignore an existing checkpoint and start from the first image.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Count candidates and estimate the run time without writing anything.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, int(options["batch_size"]))
+        workers = max(1, int(options["workers"]))
+        only_missing = bool(options["only_missing"])
+        placeholders_only = bool(options["placeholders_only"])
+        formats = _resolve_rendition_formats()
+        since = _parse_since(options["since"])
+        category = str(options["category"] or "").strip().lower()
+        if category and category not in BaseListing.MAIN_CATEGORY_LABELS:
+            raise CommandError(
+                f"Unknown category '{category}'. Choose from: {', '.join(BaseListing.MAIN_CATEGORY_LABELS)}."
+            )
+
+        queryset = CarImage.objects.exclude(image="").exclude(image__isnull=True)
+        if since is not None:
+            queryset = queryset.filter(created_at__gte=since)
+        if category:
+            queryset = queryset.filter(listing__main_category=category)
+        queryset = queryset.only(*CANDIDATE_FIELDS).order_by("id")
+
+        checkpoint_path = str(options["checkpoint_file"] or "").strip() or os.path.join(
+            str(settings.BASE_DIR), DEFAULT_CHECKPOINT_FILE
+        )
+        run_signature = {
+            "only_missing": only_missing,
+            "since": since.isoformat() if since else "",
+            "category": category,
+            "formats": list(formats),
+            "placeholders_only": placeholders_only,
+        }
+        last_id = 0 if options["restart"] else self._load_checkpoint(checkpoint_path, run_signature)
+        if last_id:
+            self.stdout.write(f"Resuming after image id {last_id} (checkpoint: {checkpoint_path})")
+
+        if options["dry_run"]:
+            self._estimate(queryset, last_id, batch_size, workers, only_missing, formats, placeholders_only)
+            return
+
+        processed = 0
+        succeeded = 0
+        skipped = 0
+        failed_ids = []
+        started_at = time.perf_counter()
+        process_image = partial(_process_image, placeholders_only=placeholders_only)
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rendition-backfill") if workers > 1 else None
+        try:
+            for batch in self._iter_batches(queryset, last_id, batch_size):
+                candidates = []
+                for image_obj in batch:
+                    if (only_missing or placeholders_only) and _is_up_to_date(image_obj, formats, placeholders_only):
+                        skipped += 1
+                    else:
+                        candidates.append(image_obj)
+
+                if executor is None:
+                    results = [process_image(image_obj) for image_obj in candidates]
+                else:
+                    results = list(executor.map(process_image, candidates))
+
+                for image_id, ok in results:
+                    processed += 1
+                    if ok:
+                        succeeded += 1
+                    else:
+                        failed_ids.append(image_id)
+
+                last_id = batch[-1].pk
+                self._save_checkpoint(checkpoint_path, run_signature, last_id)
+                elapsed = time.perf_counter() - started_at
+                self.stdout.write(
+                    f"  up to id {last_id}: processed={processed} failed={len(failed_ids)} "
+                    f"skipped={skipped} ({processed / elapsed if elapsed > 0 else 0.0:.2f} images/s)"
+                )
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True)
+
+        elapsed = time.perf_counter() - started_at
+        rate = processed / elapsed if elapsed > 0 else 0.0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Done: processed={processed} succeeded={succeeded} failed={len(failed_ids)} "
+                f"skipped={skipped} elapsed={elapsed:.1f}s throughput={rate:.2f} images/s"
+            )
+        )
+        if failed_ids:
+            shown = ", ".join(str(image_id) for image_id in failed_ids[:MAX_REPORTED_FAILURES])
+            more = f" (+{len(failed_ids) - MAX_REPORTED_FAILURES} more)" if len(failed_ids) > MAX_REPORTED_FAILURES else ""
+            self.stdout.write(self.style.WARNING(f"Failed image ids: {shown}{more}"))
+        self._clear_checkpoint(checkpoint_path)
+
+    def _iter_batches(self, queryset, last_id, batch_size):
+        while True:
+            batch = list(queryset.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                return
+            yield batch
+            last_id = batch[-1].pk
+
+    def _estimate(self, queryset, last_id, batch_size, workers, only_missing, formats, placeholders_only):
+        candidate_count = 0
+        skipped = 0
+        samples = []
+        for batch in self._iter_batches(queryset, last_id, batch_size):
+            for image_obj in batch:
+                if (only_missing or placeholders_only) and _is_up_to_date(image_obj, formats, placeholders_only):
+                    skipped += 1
+                    continue
+                candidate_count += 1
+                if len(samples) < DRY_RUN_SAMPLE_SIZE:
+                    samples.append(image_obj)
+
+        self.stdout.write(f"Dry run: {candidate_count} images to process, {skipped} already valid.")
+        if not samples or placeholders_only:
+            return
+
+        # Render a few candidates in memory (nothing is stored) to time the run.
+        timings = []
+        for image_obj in samples:
+            try:
+                source = image_obj._resolve_rendition_source()
+                started_at = time.perf_counter()
+                render_listing_image(source, **image_obj._build_rendition_options())
+                timings.append(time.perf_counter() - started_at)
+            except Exception:
+                continue
+        if not timings:
+            self.stdout.write(self.style.WARNING("Could not read any sample image to estimate the run time."))
+            return
+        per_image = sum(timings) / len(timings)
+        estimate = (per_image * candidate_count) / workers
+        self.stdout.write(
+            f"Estimated: {per_image:.2f}s per image, ~{estimate / 60:.1f} min with {workers} worker(s)."
+        )
+
+    def _load_checkpoint(self, path, run_signature):
+        try:
+            with open(path, "r", encoding="utf-8") as handle:
+                payload = json.load(handle)
+        except (OSError, ValueError):
+            return 0
+        if not isinstance(payload, dict) or payload.get("signature") != run_signature:
+            self.stdout.write("Ignoring checkpoint recorded for different filters.")
+            return 0
+        try:
+            return max(0, int(payload.get("last_id") or 0))
+        except (TypeError, ValueError):
+            return 0
+
+    def _save_checkpoint(self, path, run_signature, last_id):
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as handle:
+            json.dump(
+                {
+                    "signature": run_signature,
+                    "last_id": last_id,
+                    "updated_at": timezone.now().isoformat(),
+                },
+                handle,
+            )
+        os.replace(temp_path, path)
+
+    def _clear_checkpoint(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
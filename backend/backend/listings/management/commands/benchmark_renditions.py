@@ -0,0 +1,164 @@
+import io
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image as PILImage, ImageDraw
+
+from backend.listings.models import (
+    CAR_IMAGE_DETAIL_WIDTHS,
+    CAR_IMAGE_GRID_RENDITIONS,
+    CAR_IMAGE_MAX_PIXELS,
+    CAR_IMAGE_WEBP_METHOD,
+    CAR_IMAGE_WEBP_QUALITY,
+)
+from backend.listings.renditions import render_listing_image
+
+DEFAULT_WORKER_COUNTS = "1,2,4,8"
+SOURCE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
+
+
+def _build_synthetic_photo(width, height, seed):
+    """Deterministic camera-like JPEG: gradient sky, shapes and fine detail."""
+    rng = random.Random(seed)
+    image = PILImage.new("RGB", (width, height))
+    draw = ImageDraw.Draw(image)
+    top = (rng.randint(60, 160), rng.randint(90, 190), rng.randint(150, 255))
+    bottom = (rng.randint(20, 120), rng.randint(20, 120), rng.randint(20, 120))
+    for y in range(height):
+        ratio = y / float(max(1, height - 1))
+        draw.line(
+            [(0, y), (width, y)],
+            fill=tuple(int(top[i] + (bottom[i] - top[i]) * ratio) for i in range(3)),
+        )
+    for _ in range(120):
+        x0 = rng.randint(0, width)
+        y0 = rng.randint(0, height)
+        x1 = x0 + rng.randint(width // 40, width // 4)
+        y1 = y0 + rng.randint(height // 40, height // 4)
+        color = (rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255))
+        if rng.random() < 0.5:
+            draw.ellipse([x0, y0, x1, y1], fill=color)
+        else:
+            draw.rectangle([x0, y0, x1, y1], fill=color)
+    for _ in range(4000):
+        x = rng.randint(0, width - 1)
+        y = rng.randint(0, height - 1)
+        draw.line([(x, y), (x + rng.randint(-40, 40), y + rng.randint(-40, 40))], fill=(255, 255, 255))
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=90)
+    image.close()
+    return buffer.getvalue()
+
+
+def _load_source_samples(source_dir, limit):
+    if not os.path.isdir(source_dir):
+        raise CommandError(f"Source directory does not exist: {source_dir}")
+    file_names = sorted(
+        name
+        for name in os.listdir(source_dir)
+        if os.path.splitext(name)[1].lower() in SOURCE_EXTENSIONS
+    )[:limit]
+    if not file_names:
+        raise CommandError(f"No images found in {source_dir}")
+    return [os.path.join(source_dir, name) for name in file_names]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the listing image rendition engine on a process pool and report "
+        "images per second for each worker count."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            default=DEFAULT_WORKER_COUNTS,
+            help=f"Comma-separated worker counts to measure (default: {DEFAULT_WORKER_COUNTS}).",
+        )
+        parser.add_argument("--samples", type=int, default=16, help="Number of sample images.")
+        parser.add_argument("--width", type=int, default=4000, help="Synthetic sample width.")
+        parser.add_argument("--height", type=int, default=3000, help="Synthetic sample height.")
+        parser.add_argument("--seed", type=int, default=2026, help="Seed for the synthetic sample set.")
+        parser.add_argument(
+            "--source-dir",
+            default="",
+            help="Use real photos from this directory instead of the synthetic sample set.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            worker_counts = [int(value) for value in str(options["workers"]).split(",") if value.strip()]
+        except ValueError:
+            raise CommandError("--workers must be a comma-separated list of integers.")
+        worker_counts = [count for count in worker_counts if count > 0]
+        if not worker_counts:
+            raise CommandError("At least one positive worker count is required.")
+
+        sample_count = max(1, int(options["samples"]))
+        source_dir = str(options["source_dir"] or "").strip()
+        if source_dir:
+            samples = _load_source_samples(source_dir, sample_count)
+            self.stdout.write(f"Sample set: {len(samples)} files from {source_dir}")
+        else:
+            width = max(16, int(options["width"]))
+            height = max(16, int(options["height"]))
+            samples = [
+                _build_synthetic_photo(width, height, int(options["seed"]) + index)
+                for index in range(sample_count)
+            ]
+            megapixels = (width * height) / 1_000_000
+            self.stdout.write(
+                f"Sample set: {len(samples)} synthetic JPEGs at {width}x{height} ({megapixels:.1f} MP)"
+            )
+
+        render_options = {
+            "rendition_dir": "benchmark/renditions",
+            "detail_widths": CAR_IMAGE_DETAIL_WIDTHS,
+            "grid_renditions": CAR_IMAGE_GRID_RENDITIONS,
+            "quality": CAR_IMAGE_WEBP_QUALITY,
+            "method": CAR_IMAGE_WEBP_METHOD,
+            "max_pixels": CAR_IMAGE_MAX_PIXELS,
+        }
+        warmup_sample = _build_synthetic_photo(64, 48, 0)
+
+        baseline_rate = None
+        for worker_count in worker_counts:
+            with ProcessPoolExecutor(
+                max_workers=worker_count,
+                mp_context=multiprocessing.get_context("spawn"),
+            ) as pool:
+                # Spawn and import cost is not part of steady-state throughput.
+                warmups = [
+                    pool.submit(render_listing_image, warmup_sample, base_name="warmup", **render_options)
+                    for _ in range(worker_count)
+                ]
+                for future in warmups:
+                    future.result()
+
+                started_at = time.perf_counter()
+                futures = [
+                    pool.submit(
+                        render_listing_image,
+                        sample,
+                        base_name=f"sample-{index}",
+                        **render_options,
+                    )
+                    for index, sample in enumerate(samples)
+                ]
+                failures = sum(1 for future in futures if not future.result())
+                elapsed = time.perf_counter() - started_at
+
+            rate = len(samples) / elapsed if elapsed > 0 else 0.0
+            if baseline_rate is None:
+                baseline_rate = rate
+            speedup = rate / baseline_rate if baseline_rate else 0.0
+            self.stdout.write(
+                f"workers={worker_count:<2} images={len(samples):<4} "
+                f"elapsed={elapsed:7.2f}s images/s={rate:7.2f} speedup={speedup:4.2f}x"
+                + (f" failures={failures}" if failures else "")
+            )
@@ -0,0 +1,87 @@
+import gzip
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.listings.feeds import (
+    FEED_BATCH_SIZE,
+    FEED_FORMATS,
+    FEED_TOMBSTONE_RETENTION_DAYS,
+    is_feed_since_too_old,
+    iter_cars_feed,
+    parse_feed_since,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the syndication feed of live car listings (JSON Lines, CSV or vehicle-listings XML) "
+        "to a file or stdout, e.g. for partner portals that pull a static file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--format",
+            dest="feed_format",
+            choices=FEED_FORMATS,
+            default="jsonl",
+            help="Feed format.",
+        )
+        parser.add_argument(
+            "--since",
+            default="",
+            help=(
+                "Only listings changed after this ISO datetime or date, plus removed records for "
+                f"listings that left the feed (incremental feed; at most {FEED_TOMBSTONE_RETENTION_DAYS} days back)."
+            ),
+        )
+        parser.add_argument(
+            "--output",
+            default="",
+            help="Target file; stdout when omitted.",
+        )
+        parser.add_argument(
+            "--gzip",
+            action="store_true",
+            help="Gzip the output file.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=FEED_BATCH_SIZE,
+            help="Listings loaded per round trip.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = int(options["batch_size"])
+        if batch_size <= 0:
+            raise CommandError("--batch-size must be positive.")
+        try:
+            since = parse_feed_since(options["since"])
+        except ValueError:
+            raise CommandError("--since must be an ISO datetime or date.")
+        if is_feed_since_too_old(since):
+            raise CommandError(f"--since must be within the last {FEED_TOMBSTONE_RETENTION_DAYS} days; export the full feed.")
+        output_path = options["output"]
+        if options["gzip"] and not output_path:
+            raise CommandError("--gzip needs --output.")
+
+        started_at = time.perf_counter()
+        chunks = iter_cars_feed(options["feed_format"], since, batch_size)
+        if not output_path:
+            for chunk in chunks:
+                self.stdout.write(chunk.decode("utf-8"), ending="")
+            return
+
+        opener = gzip.open if options["gzip"] else open
+        written = 0
+        with opener(output_path, "wb") as output:
+            for chunk in chunks:
+                output.write(chunk)
+                written += len(chunk)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Feed written to {output_path}: {written} bytes "
+                f"in {time.perf_counter() - started_at:.1f}s."
+            )
+        )
@@ -0,0 +1,144 @@
+import posixpath
+import re
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from backend.listings.models import CarImage
+from backend.listings.storage_io import (
+    delete_paths,
+    format_bytes,
+    iter_storage_objects,
+    name_digest,
+    resolve_storage_name,
+)
+
+DEFAULT_PREFIX = "car_listings/"
+DEFAULT_GRACE_HOURS = 48
+DEFAULT_BATCH_SIZE = 1000
+REFERENCE_CHUNK_SIZE = 2000
+# on-demand derivatives: <rendition_dir>/<base>_<w>x<h>.<fmt>
+DERIVATIVE_NAME_RE = re.compile(r"^(?P<stem>.+)_\d+x\d+\.(?:webp|avif|jpg)$")
+
+
+def _derivative_stem(image_name):
+    # same layout as CarImage._get_rendition_directory / _build_derivative_path
+    image_dir = posixpath.dirname(image_name)
+    rendition_dir = posixpath.join(image_dir, "renditions") if image_dir else "car_listings/renditions"
+    base_name, _ = posixpath.splitext(posixpath.basename(image_name))
+    return posixpath.join(rendition_dir, base_name)
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete listing media objects that no CarImage references (original, thumbnail, renditions "
+        "or on-demand derivatives) and that are older than a grace period."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--prefix",
+            default=DEFAULT_PREFIX,
+            help=f"Storage prefix to scan (default: {DEFAULT_PREFIX}).",
+        )
+        parser.add_argument(
+            "--grace-hours",
+            type=float,
+            default=DEFAULT_GRACE_HOURS,
+            help="Never delete objects modified within this many hours (uploads still being saved).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Orphans collected before each delete request.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report what would be deleted and how many bytes that frees.",
+        )
+
+    def handle(self, *args, **options):
+        prefix = str(options["prefix"] or "").strip().lstrip("/")
+        if not prefix:
+            raise CommandError("--prefix must not be empty.")
+        grace_hours = float(options["grace_hours"])
+        if grace_hours < 0:
+            raise CommandError("--grace-hours must not be negative.")
+        batch_size = max(1, int(options["batch_size"]))
+        dry_run = bool(options["dry_run"])
+        storage = CarImage._meta.get_field("image").storage
+
+        started_at = time.perf_counter()
+        referenced, derivative_stems = self._collect_references(storage)
+        self.stdout.write(
+            f"Referenced: {len(referenced)} paths, {len(derivative_stems)} derivative stems "
+            f"({time.perf_counter() - started_at:.1f}s)"
+        )
+
+        cutoff = timezone.now() - timedelta(hours=grace_hours)
+        scanned = 0
+        kept = 0
+        too_recent = 0
+        orphan_count = 0
+        orphan_bytes = 0
+        deleted = 0
+        pending = []
+        for stored_object in iter_storage_objects(storage, prefix):
+            scanned += 1
+            if self._is_referenced(stored_object.name, referenced, derivative_stems):
+                kept += 1
+                continue
+            if stored_object.modified > cutoff:
+                too_recent += 1
+                continue
+
+            orphan_count += 1
+            orphan_bytes += stored_object.size
+            if dry_run:
+                if orphan_count <= 20:
+                    self.stdout.write(f"  would delete {stored_object.name} ({format_bytes(stored_object.size)})")
+                continue
+            pending.append(stored_object.name)
+            if len(pending) >= batch_size:
+                deleted += delete_paths(storage, pending)
+                pending = []
+        if pending:
+            deleted += delete_paths(storage, pending)
+
+        elapsed = time.perf_counter() - started_at
+        summary = (
+            f"scanned={scanned} referenced={kept} within_grace={too_recent} "
+            f"orphans={orphan_count} reclaimable={format_bytes(orphan_bytes)} elapsed={elapsed:.1f}s"
+        )
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f"Dry run: {summary}"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Done: {summary} deleted={deleted}"))
+
+    def _collect_references(self, storage):
+        referenced = set()
+        derivative_stems = set()
+        rows = CarImage.objects.values_list("image", "thumbnail", "renditions").order_by("id")
+        for image_name, thumbnail_name, renditions in rows.iterator(chunk_size=REFERENCE_CHUNK_SIZE):
+            for raw_name in (image_name, thumbnail_name, *CarImage._collect_rendition_paths(renditions)):
+                name = resolve_storage_name(storage, raw_name)
+                if name:
+                    referenced.add(name_digest(name))
+
+            # Derivatives are rendered on demand and never recorded on the row,
+            # so keep anything named after a referenced image. Placeholders are
+            # stored inline in ``renditions`` and have no object of their own.
+            image_name = resolve_storage_name(storage, image_name)
+            if image_name:
+                derivative_stems.add(name_digest(_derivative_stem(image_name)))
+        return referenced, derivative_stems
+
+    def _is_referenced(self, name, referenced, derivative_stems):
+        if name_digest(name) in referenced:
+            return True
+        match = DERIVATIVE_NAME_RE.match(name)
+        return bool(match and name_digest(match.group("stem")) in derivative_stems)
@@ -0,0 +1,143 @@
+import posixpath
+import time
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from backend.accounts.models import BusinessUser
+from backend.accounts.prerender import DEALER_CARD_STORAGE_PREFIX
+from backend.listings.management.commands.gc_listing_media import REFERENCE_CHUNK_SIZE
+from backend.listings.models import BaseListing
+from backend.listings.prerender import PRERENDER_HTML_CACHE_SECONDS
+from backend.listings.share_cards import SHARE_CARD_STORAGE_PREFIX
+from backend.listings.storage_io import (
+    delete_paths,
+    format_bytes,
+    iter_storage_objects,
+    name_digest,
+    resolve_storage_name,
+)
+
+# cached crawler HTML keeps pointing at a replaced card until it expires
+DEFAULT_GRACE_HOURS = PRERENDER_HTML_CACHE_SECONDS / 3600 + 24
+DEFAULT_BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete listing and dealer share cards that are no longer current. A replaced listing card "
+        "is kept until the card that replaced it is older than the grace period, so cached pages "
+        "and crawlers never point at a missing image."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace-hours",
+            type=float,
+            default=DEFAULT_GRACE_HOURS,
+            help=f"Hours a replaced card is kept (default: {DEFAULT_GRACE_HOURS:g}, the HTML cache TTL plus a day).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Cards collected before each delete request.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report what would be deleted.",
+        )
+
+    def handle(self, *args, **options):
+        grace_hours = float(options["grace_hours"])
+        if grace_hours < 0:
+            raise CommandError("--grace-hours must not be negative.")
+        self.batch_size = max(1, int(options["batch_size"]))
+        self.dry_run = bool(options["dry_run"])
+        self.cutoff = timezone.now() - timedelta(hours=grace_hours)
+        self.pending = []
+        self.deleted = 0
+        self.orphan_count = 0
+        self.orphan_bytes = 0
+
+        started_at = time.perf_counter()
+        referenced = self._collect_references()
+        scanned = 0
+        for card_dir_objects in self._iter_listing_card_dirs():
+            scanned += len(card_dir_objects)
+            self._collect_replaced_listing_cards(card_dir_objects, referenced)
+        for stored_object in iter_storage_objects(default_storage, DEALER_CARD_STORAGE_PREFIX):
+            scanned += 1
+            # dealer cards are served through a view, so a replaced one is unused at once
+            if name_digest(stored_object.name) not in referenced and stored_object.modified <= self.cutoff:
+                self._collect(stored_object)
+        self._flush()
+
+        summary = (
+            f"scanned={scanned} orphans={self.orphan_count} reclaimable={format_bytes(self.orphan_bytes)} "
+            f"elapsed={time.perf_counter() - started_at:.1f}s"
+        )
+        if self.dry_run:
+            self.stdout.write(self.style.WARNING(f"Dry run: {summary}"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Done: {summary} deleted={self.deleted}"))
+
+    def _collect_references(self):
+        referenced = set()
+        for queryset in (
+            BaseListing.objects.exclude(share_image="").values_list("share_image", flat=True),
+            BusinessUser.objects.exclude(share_card="").values_list("share_card", flat=True),
+        ):
+            for raw_name in queryset.order_by("pk").iterator(chunk_size=REFERENCE_CHUNK_SIZE):
+                name = resolve_storage_name(default_storage, raw_name)
+                if name:
+                    referenced.add(name_digest(name))
+        return referenced
+
+    def _iter_listing_card_dirs(self):
+        """Stored listing cards grouped by their ``<prefix>/<listing id>/`` directory."""
+        current_dir = None
+        group = []
+        for stored_object in iter_storage_objects(default_storage, SHARE_CARD_STORAGE_PREFIX):
+            card_dir = posixpath.dirname(stored_object.name)
+            if card_dir != current_dir and group:
+                yield group
+                group = []
+            current_dir = card_dir
+            group.append(stored_object)
+        if group:
+            yield group
+
+    def _collect_replaced_listing_cards(self, card_dir_objects, referenced):
+        # a card stopped being current when the next one was stored, so its
+        # grace period runs from the newer card's modification time
+        card_dir_objects = sorted(card_dir_objects, key=lambda stored_object: stored_object.modified)
+        for index, stored_object in enumerate(card_dir_objects):
+            if name_digest(stored_object.name) in referenced:
+                continue
+            replaced_at = (
+                card_dir_objects[index + 1].modified
+                if index + 1 < len(card_dir_objects)
+                else stored_object.modified
+            )
+            if replaced_at <= self.cutoff:
+                self._collect(stored_object)
+
+    def _collect(self, stored_object):
+        self.orphan_count += 1
+        self.orphan_bytes += stored_object.size
+        if self.dry_run:
+            if self.orphan_count <= 20:
+                self.stdout.write(f"  would delete {stored_object.name} ({format_bytes(stored_object.size)})")
+            return
+        self.pending.append(stored_object.name)
+        if len(self.pending) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        if self.pending:
+            self.deleted += delete_paths(default_storage, self.pending)
+            self.pending = []
@@ -0,0 +1,142 @@
+import time
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, Prefetch, Q
+
+from backend.accounts import prerender as dealer_prerender
+from backend.accounts.models import BusinessUser
+from backend.listings import prerender as listing_prerender
+from backend.listings.models import CarImage, get_expiry_cutoff
+from backend.listings.share_cards import build_share_card_name, generate_listing_share_card
+
+DEFAULT_BATCH_SIZE = 200
+
+
+class Command(BaseCommand):
+    help = (
+        "Render crawler pages (listing and dealer HTML) into media storage ahead of bot traffic, "
+        "e.g. after a deploy; every server process reads them from there. Listings whose share "
+        "card is out of date get it rendered first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--only",
+            choices=("listings", "dealers"),
+            default="",
+            help="Warm only listing pages or only dealer pages.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Rows loaded per round trip.",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Re-render pages even when the stored copy matches the current ETag.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = int(options["batch_size"])
+        if batch_size <= 0:
+            raise CommandError("--batch-size must be positive.")
+        only = options["only"]
+        force = bool(options["force"])
+
+        if only != "dealers":
+            started_at = time.perf_counter()
+            rendered, skipped, cards = self._warm_listings(batch_size, force)
+            self.stdout.write(
+                f"Listings: rendered={rendered} unchanged={skipped} share_cards={cards} "
+                f"elapsed={time.perf_counter() - started_at:.1f}s"
+            )
+
+        if only != "listings":
+            backend_base_url = str(getattr(settings, "BACKEND_BASE_URL", "") or "").strip().rstrip("/")
+            if not backend_base_url:
+                self.stdout.write(
+                    self.style.WARNING("Dealers skipped: BACKEND_BASE_URL is not set, pages are rendered on demand.")
+                )
+            else:
+                started_at = time.perf_counter()
+                rendered, skipped = self._warm_dealers(batch_size, force, backend_base_url)
+                self.stdout.write(
+                    f"Dealers: rendered={rendered} unchanged={skipped} "
+                    f"elapsed={time.perf_counter() - started_at:.1f}s"
+                )
+
+        self.stdout.write(self.style.SUCCESS("Prerendered pages stored."))
+
+    def _warm_listings(self, batch_size, force):
+        queryset = listing_prerender._get_live_listing_queryset().prefetch_related(
+            Prefetch("images", queryset=CarImage.objects.order_by("-is_cover", "order", "id"))
+        ).order_by("id")
+        rendered = skipped = cards = 0
+        last_id = 0
+        while True:
+            listings = list(queryset.filter(id__gt=last_id)[:batch_size])
+            if not listings:
+                break
+            last_id = listings[-1].id
+
+            for listing in listings:
+                images = list(listing.images.all())
+                card_name = build_share_card_name(listing, images[0] if images else None)
+                if listing.share_image != card_name:
+                    # render it now so the page points at the card instead of queueing a refresh
+                    listing.share_image = generate_listing_share_card(listing.id) or listing.share_image
+                    cards += 1
+
+                detail_etag = listing_prerender._build_prerender_etag(
+                    listing, listing_prerender._build_image_fingerprint(images)
+                )
+                storage_dir = listing_prerender.prerender_html_storage_dir("listings", listing.id)
+                storage_name = listing_prerender.prerender_html_storage_name(storage_dir, detail_etag)
+                if not force and default_storage.exists(storage_name):
+                    skipped += 1
+                    continue
+                html_bytes = listing_prerender.render_listing_prerender_html(listing, images).encode("utf-8")
+                listing_prerender.store_prerender_html(storage_dir, storage_name, html_bytes)
+                rendered += 1
+        return rendered, skipped, cards
+
+    def _warm_dealers(self, batch_size, force, backend_base_url):
+        live_listings = Q(
+            user__car_listings__is_active=True,
+            user__car_listings__is_draft=False,
+            user__car_listings__is_archived=False,
+            user__car_listings__created_at__gte=get_expiry_cutoff(),
+        )
+        queryset = (
+            BusinessUser.objects.select_related("user")
+            .annotate(live_listing_count=Count("user__car_listings", filter=live_listings))
+            .order_by("id")
+        )
+        rendered = skipped = 0
+        last_id = 0
+        while True:
+            dealers = list(queryset.filter(id__gt=last_id)[:batch_size])
+            if not dealers:
+                break
+            last_id = dealers[-1].id
+
+            for dealer in dealers:
+                dealer_slug = dealer.public_slug
+                dealer_etag = dealer_prerender._build_dealer_etag(dealer, dealer_slug, dealer.live_listing_count)
+                storage_dir = listing_prerender.prerender_html_storage_dir("dealers", dealer.id)
+                storage_name = listing_prerender.prerender_html_storage_name(
+                    storage_dir, dealer_etag, backend_base_url
+                )
+                if not force and default_storage.exists(storage_name):
+                    skipped += 1
+                    continue
+                html_bytes = dealer_prerender.render_dealer_prerender_html(
+                    dealer, dealer_slug, dealer.live_listing_count, backend_base_url
+                ).encode("utf-8")
+                listing_prerender.store_prerender_html(storage_dir, storage_name, html_bytes)
+                rendered += 1
+        return rendered, skipped
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-19 07:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0036_carimage_content_hash_imageblob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='baselisting',
+            name='share_image',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 6.0.2 on 2026-10-19 08:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0037_baselisting_share_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('listing_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['deleted_at'], name='feed_tombstone_deleted_idx')],
+            },
+        ),
+    ]
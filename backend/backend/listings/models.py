@@ -1,27 +1,31 @@
 # models.py
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import timedelta
 from decimal import Decimal, ROUND_HALF_UP
-import io
 import logging
+import multiprocessing
 import os
 import posixpath
+import re
 import unicodedata
 from threading import Lock
-from urllib.parse import unquote, urlparse
-
-from PIL import Image as PILImage, ImageOps
-from PIL import UnidentifiedImageError
 
 from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
 from django.db import close_old_connections, models, transaction as db_transaction
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.core.files.base import ContentFile
-from django.db.models.signals import post_delete
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.utils import timezone
 from django.utils.text import slugify
+from PIL import Image as PILImage
+
+from .ingestion import ImageIngestionError, ingest_image_upload
+from .renditions import build_placeholder, build_rendition_path, render_listing_image
+from .storage_io import delete_paths, list_names_with_prefix, store_files
 
 logger = logging.getLogger(__name__)
 
@@ -77,6 +81,8 @@ def transliterate_slug_text(value):
 # Listing promotion windows
 # ----------------------------
 LISTING_EXPIRY_DAYS = 30
+# deleted car listings are reported to incremental feed pulls for this long
+FEED_TOMBSTONE_RETENTION_DAYS = 90
 
 TOP_PLAN_1D = "1d"
 TOP_PLAN_7D = "7d"
@@ -95,6 +101,8 @@ CAR_IMAGE_GRID_RENDITIONS = (
 )
 CAR_IMAGE_WEBP_QUALITY = 82
 CAR_IMAGE_WEBP_METHOD = 4
+CAR_IMAGE_AVIF_QUALITY = int(getattr(settings, "CAR_IMAGE_AVIF_QUALITY", 50))
+CAR_IMAGE_AVIF_SPEED = 6
 CAR_IMAGE_LOW_RES_MIN_WIDTH = 800
 
 # Safety: skip extremely huge images (avoid memory spikes)
@@ -132,8 +140,34 @@ def _resolve_rendition_worker_count():
     return max(1, min(8, parsed))
 
 
+def _resolve_rendition_formats():
+    if getattr(settings, "CAR_IMAGE_AVIF_RENDITIONS", False):
+        return ("webp", "avif")
+    return ("webp",)
+
+
+def _build_renditions_payload(generated):
+    payload = {"webp": []}
+    for row in generated.get("renditions") or []:
+        payload.setdefault(str(row.get("format") or "webp"), []).append(row)
+    if generated.get("placeholder"):
+        payload["placeholder"] = generated["placeholder"]
+    return payload
+
+
+def _resolve_rendition_process_count():
+    raw_value = getattr(settings, "CAR_IMAGE_RENDITION_PROCESSES", 0)
+    try:
+        parsed = int(raw_value)
+    except (TypeError, ValueError):
+        parsed = 0
+    return max(0, min(os.cpu_count() or 1, parsed))
+
+
 _CAR_IMAGE_RENDITION_EXECUTOR = None
 _CAR_IMAGE_RENDITION_EXECUTOR_LOCK = Lock()
+_CAR_IMAGE_RENDITION_PROCESS_POOL = None
+_CAR_IMAGE_RENDITION_PROCESS_POOL_LOCK = Lock()
 _CAR_IMAGE_PENDING_RENDITIONS = set()
 _CAR_IMAGE_PENDING_RENDITIONS_LOCK = Lock()
 
@@ -152,6 +186,50 @@ def _get_car_image_rendition_executor():
     return _CAR_IMAGE_RENDITION_EXECUTOR
 
 
+def _get_car_image_rendition_process_pool():
+    """
+    Return the shared process pool for CPU-bound rendition work, or ``None``
+    when ``CAR_IMAGE_RENDITION_PROCESSES`` is 0 and renditions run in-thread.
+    Workers are spawned (not forked) so they never inherit server threads.
+    """
+    global _CAR_IMAGE_RENDITION_PROCESS_POOL
+    if _CAR_IMAGE_RENDITION_PROCESS_POOL is not None:
+        return _CAR_IMAGE_RENDITION_PROCESS_POOL
+
+    process_count = _resolve_rendition_process_count()
+    if process_count <= 0:
+        return None
+
+    with _CAR_IMAGE_RENDITION_PROCESS_POOL_LOCK:
+        if _CAR_IMAGE_RENDITION_PROCESS_POOL is None:
+            _CAR_IMAGE_RENDITION_PROCESS_POOL = ProcessPoolExecutor(
+                max_workers=process_count,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+    return _CAR_IMAGE_RENDITION_PROCESS_POOL
+
+
+def _reset_car_image_rendition_process_pool():
+    global _CAR_IMAGE_RENDITION_PROCESS_POOL
+    with _CAR_IMAGE_RENDITION_PROCESS_POOL_LOCK:
+        pool = _CAR_IMAGE_RENDITION_PROCESS_POOL
+        _CAR_IMAGE_RENDITION_PROCESS_POOL = None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def run_rendition_job(source, options, renderer=render_listing_image):
+    """Render one image on the process pool when enabled, otherwise inline."""
+    pool = _get_car_image_rendition_process_pool()
+    if pool is None:
+        return renderer(source, **options)
+    try:
+        return pool.submit(renderer, source, **options).result()
+    except BrokenProcessPool:
+        _reset_car_image_rendition_process_pool()
+        raise
+
+
 # ----------------------------
 # Time helpers
 # ----------------------------
@@ -284,6 +362,8 @@ class BaseListing(models.Model):
     vip_expires_at = models.DateTimeField(null=True, blank=True)
 
     view_count = models.PositiveIntegerField(default=0)
+    # Open Graph card (see share_cards.py); the name changes whenever the card does
+    share_image = models.CharField(max_length=255, blank=True, default="")
 
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
@@ -669,8 +749,11 @@ class BaseListing(models.Model):
 
         generated = self.generate_slug()
         if generated and generated != self.slug:
-            BaseListing.objects.filter(pk=self.pk).update(slug=generated)
+            # a new slug is a new URL: bump updated_at so sitemaps and feeds notice it
+            updated_at = timezone.now()
+            BaseListing.objects.filter(pk=self.pk).update(slug=generated, updated_at=updated_at)
             self.slug = generated
+            self.updated_at = updated_at
 
         # Price history
         if price_changed:
@@ -702,6 +785,20 @@ class BaseListingPriceHistory(models.Model):
         return f"Price change for {self.listing_id}: {self.old_price} -> {self.new_price}"
 
 
+class FeedTombstone(models.Model):
+    """A deleted car listing, kept so ``/feeds/cars.<format>?since=`` can report it as removed."""
+    listing_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["deleted_at"], name="feed_tombstone_deleted_idx"),
+        ]
+
+    def __str__(self):
+        return f"Deleted listing {self.listing_id}"
+
+
 class ListingPurchase(models.Model):
     """Persistent history of balance purchases for TOP/VIP listing actions."""
 
@@ -780,8 +877,10 @@ class ListingDetailSlugSyncMixin(models.Model):
 
         new_slug = listing.generate_slug()
         if new_slug and new_slug != listing.slug:
-            BaseListing.objects.filter(pk=listing.pk).update(slug=new_slug)
+            updated_at = timezone.now()
+            BaseListing.objects.filter(pk=listing.pk).update(slug=new_slug, updated_at=updated_at)
             listing.slug = new_slug
+            listing.updated_at = updated_at
 
 
 class CarsListing(ListingDetailSlugSyncMixin):
@@ -1176,11 +1275,52 @@ class ServicesListing(ListingDetailSlugSyncMixin):
 # ======================================================================
 # IMAGES
 # ======================================================================
+def car_image_upload_to(instance, filename):
+    """Content-addressed key for hashed uploads, dated folder otherwise."""
+    content_hash = str(getattr(instance, "content_hash", "") or "")
+    if not content_hash:
+        return posixpath.join(timezone.now().strftime("car_listings/%Y/%m/%d"), filename)
+    extension = os.path.splitext(filename)[1].lower() or ".jpg"
+    return f"car_listings/blobs/{content_hash[:2]}/{content_hash}{extension}"
+
+
+class ImageBlob(models.Model):
+    """
+    One stored original (plus its renditions) shared by every CarImage with
+    the same content hash. ``ref_count`` counts those rows; the files are
+    deleted together with the last reference.
+    """
+
+    content_hash = models.CharField(max_length=64, unique=True)
+    image = models.CharField(max_length=255, blank=True)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Image blob {self.content_hash[:12]} ({self.ref_count} refs)"
+
+    @classmethod
+    def release(cls, content_hash):
+        """Drop one reference; ``True`` when it was the last one and the files can go."""
+        if not content_hash:
+            return True
+        with db_transaction.atomic():
+            blob = cls.objects.select_for_update().filter(content_hash=content_hash).first()
+            if blob is None:
+                return not CarImage.objects.filter(content_hash=content_hash).exists()
+            if blob.ref_count > 1:
+                cls.objects.filter(pk=blob.pk).update(ref_count=models.F("ref_count") - 1)
+                return False
+            blob.delete()
+            return True
+
+
 class CarImage(models.Model):
     """Model for storing images for listings (all categories)."""
 
     listing = models.ForeignKey(BaseListing, on_delete=models.CASCADE, related_name="images")
-    image = models.ImageField(upload_to="car_listings/%Y/%m/%d/")
+    image = models.ImageField(upload_to=car_image_upload_to)
+    content_hash = models.CharField(max_length=64, blank=True, default="", db_index=True)
     thumbnail = models.ImageField(upload_to="car_listings/thumbs/%Y/%m/%d/", null=True, blank=True)
 
     original_width = models.PositiveIntegerField(null=True, blank=True)
@@ -1238,147 +1378,89 @@ class CarImage(models.Model):
             return posixpath.join(image_dir, "renditions")
         return "car_listings/renditions"
 
-    def _build_rendition_path(self, base_name, kind, width):
-        return posixpath.join(
-            self._get_rendition_directory(),
-            f"{base_name}_{kind}_{width}.webp",
-        )
+    def _build_rendition_path(self, base_name, kind, width, image_format="webp"):
+        return build_rendition_path(self._get_rendition_directory(), base_name, kind, width, image_format)
+
+    def _build_derivative_path(self, width, height, image_format):
+        image_name = os.path.basename(self.image.name or f"listing-{self.pk}")
+        base_name, _ = os.path.splitext(image_name)
+        return posixpath.join(self._get_rendition_directory(), f"{base_name}_{width}x{height}.{image_format}")
+
+    def _build_rendition_options(self):
+        image_name = os.path.basename(self.image.name or f"listing-{self.pk}")
+        base_name, _ = os.path.splitext(image_name)
+        return {
+            "base_name": base_name,
+            "rendition_dir": self._get_rendition_directory(),
+            "detail_widths": CAR_IMAGE_DETAIL_WIDTHS,
+            "grid_renditions": CAR_IMAGE_GRID_RENDITIONS,
+            "quality": CAR_IMAGE_WEBP_QUALITY,
+            "method": CAR_IMAGE_WEBP_METHOD,
+            "max_pixels": CAR_IMAGE_MAX_PIXELS,
+            "formats": _resolve_rendition_formats(),
+            "avif_quality": CAR_IMAGE_AVIF_QUALITY,
+            "avif_speed": CAR_IMAGE_AVIF_SPEED,
+        }
 
-    def _store_rendition(self, rendered_image, rendition_path):
-        buffer = io.BytesIO()
-        rendered_image.save(
-            buffer,
-            format="WEBP",
-            quality=CAR_IMAGE_WEBP_QUALITY,
-            method=CAR_IMAGE_WEBP_METHOD,
-            optimize=True,
-        )
+    def _resolve_rendition_source(self):
+        """Prefer a local path (no copy to the worker); fall back to raw bytes."""
         storage = self.image.storage
-        _delete_storage_path_safely(storage, rendition_path)
-        storage.save(rendition_path, ContentFile(buffer.getvalue()))
-        return rendition_path
+        try:
+            local_path = storage.path(self.image.name)
+        except (NotImplementedError, AttributeError):
+            local_path = None
+        if local_path and os.path.exists(local_path):
+            return local_path
+
+        self.image.open("rb")
+        try:
+            return self.image.read()
+        finally:
+            self.image.close()
 
     def _generate_webp_renditions(self):
         if not self.image:
             return None
 
         try:
-            self.image.open("rb")
-            with PILImage.open(self.image) as source_file:
-                source = ImageOps.exif_transpose(source_file).convert("RGB")
-                original_width, original_height = source.size
-
-                if original_width <= 0 or original_height <= 0:
-                    return None
-
-                # safety guard for huge images
-                if (original_width * original_height) > CAR_IMAGE_MAX_PIXELS:
-                    logger.warning(
-                        "Skipping renditions for image %s due to huge dimensions: %sx%s",
-                        self.pk, original_width, original_height
-                    )
-                    return None
-
-                image_name = os.path.basename(self.image.name or f"listing-{self.pk}")
-                base_name, _ = os.path.splitext(image_name)
-
-                resampling = getattr(PILImage, "Resampling", PILImage)
-
-                renditions = []
-                thumbnail_path = None
-
-                for detail_width in CAR_IMAGE_DETAIL_WIDTHS:
-                    if detail_width > original_width:
-                        continue
-                    detail_height = max(
-                        1,
-                        int(round((detail_width / float(original_width)) * original_height)),
-                    )
-                    resized = source.resize(
-                        (detail_width, detail_height),
-                        resampling.LANCZOS,
-                    )
-                    try:
-                        rendition_path = self._build_rendition_path(base_name, "detail", detail_width)
-                        stored_path = self._store_rendition(resized, rendition_path)
-                    finally:
-                        resized.close()
-                    renditions.append(
-                        {
-                            "width": detail_width,
-                            "height": detail_height,
-                            "kind": "detail",
-                            "format": "webp",
-                            "path": stored_path,
-                        }
-                    )
-
-                for grid_width, grid_height in CAR_IMAGE_GRID_RENDITIONS:
-                    if grid_width > original_width or grid_height > original_height:
-                        continue
-                    fitted = ImageOps.fit(
-                        source,
-                        (grid_width, grid_height),
-                        method=resampling.LANCZOS,
-                        centering=(0.5, 0.5),
-                    )
-                    try:
-                        rendition_path = self._build_rendition_path(base_name, "grid", grid_width)
-                        stored_path = self._store_rendition(fitted, rendition_path)
-                    finally:
-                        fitted.close()
-                    renditions.append(
-                        {
-                            "width": grid_width,
-                            "height": grid_height,
-                            "kind": "grid",
-                            "format": "webp",
-                            "path": stored_path,
-                        }
-                    )
-                    if thumbnail_path is None:
-                        thumbnail_path = stored_path
-
-                renditions.sort(key=lambda item: (0 if item.get("kind") == "grid" else 1, item.get("width") or 0))
-                return {
-                    "original_width": original_width,
-                    "original_height": original_height,
-                    "thumbnail_path": thumbnail_path,
-                    "renditions": renditions,
-                }
-
-        except (UnidentifiedImageError, OSError):
-            return None
-        except Exception:
-            # keep it silent to avoid breaking save()
+            generated = run_rendition_job(
+                self._resolve_rendition_source(),
+                self._build_rendition_options(),
+            )
+            if not generated:
+                return None
+
+            store_files(self.image.storage, generated.pop("files", []))
+            return generated
+        except Exception as exc:
+            # never break save() because of a rendition failure
+            logger.warning("Failed to generate renditions for image %s: %s", self.pk, exc)
             return None
-        finally:
-            try:
-                self.image.close()
-            except Exception:
-                pass
 
     def _cleanup_previous_assets(self, previous):
         if not previous or not self.image:
             return
-
-        storage = self.image.storage
+        if not ImageBlob.release(previous.get("content_hash")):
+            # other listings still show the same photo
+            return
 
         previous_image = str(previous.get("image") or "").strip()
         previous_thumbnail = str(previous.get("thumbnail") or "").strip()
         current_image = str(self.image.name or "").strip()
         current_thumbnail = str(self.thumbnail.name or "").strip() if self.thumbnail else ""
 
+        stale_paths = []
         if previous_image and previous_image != current_image:
-            _delete_storage_path_safely(storage, previous_image)
+            stale_paths.append(previous_image)
 
         # Delete only if previous thumbnail differs from current thumbnail and current image
         if previous_thumbnail and previous_thumbnail not in {current_thumbnail, current_image}:
-            _delete_storage_path_safely(storage, previous_thumbnail)
+            stale_paths.append(previous_thumbnail)
 
         for rendition_path in self._collect_rendition_paths(previous.get("renditions")):
             if rendition_path not in {current_image, current_thumbnail}:
-                _delete_storage_path_safely(storage, rendition_path)
+                stale_paths.append(rendition_path)
+        delete_paths(self.image.storage, stale_paths)
 
     @classmethod
     def _schedule_rendition_generation(cls, image_id):
@@ -1409,6 +1491,101 @@ class CarImage(models.Model):
         except Exception:
             _enqueue()
 
+    @classmethod
+    def _schedule_rendition_batch(cls, image_ids):
+        """Queue one executor job that renders ``image_ids`` in the given order."""
+        requested_ids = [image_id for image_id in image_ids if image_id]
+        if not requested_ids:
+            return
+
+        def _enqueue():
+            # claimed only once committed, so a rolled-back upload never blocks the ids
+            normalized_ids = []
+            with _CAR_IMAGE_PENDING_RENDITIONS_LOCK:
+                for image_id in requested_ids:
+                    if image_id not in _CAR_IMAGE_PENDING_RENDITIONS:
+                        _CAR_IMAGE_PENDING_RENDITIONS.add(image_id)
+                        normalized_ids.append(image_id)
+            if not normalized_ids:
+                return
+            try:
+                _get_car_image_rendition_executor().submit(
+                    cls._run_rendition_batch_task,
+                    normalized_ids,
+                )
+            except Exception:
+                with _CAR_IMAGE_PENDING_RENDITIONS_LOCK:
+                    _CAR_IMAGE_PENDING_RENDITIONS.difference_update(normalized_ids)
+
+        try:
+            db_transaction.on_commit(_enqueue)
+        except Exception:
+            _enqueue()
+
+    @classmethod
+    def _run_rendition_batch_task(cls, image_ids):
+        for image_id in image_ids:
+            try:
+                cls._run_rendition_generation_task(image_id)
+            except Exception as exc:
+                logger.warning("Batch rendition failed for image %s: %s", image_id, exc)
+
+    @classmethod
+    def bulk_ingest(cls, listing, files, *, start_order=None, assign_cover=None):
+        """
+        Create images for ``listing`` from uploaded ``files`` in one INSERT.
+
+        Order and cover are assigned in memory (the first accepted file becomes
+        the cover when the listing has none), every file goes through upload
+        ingestion, and renditions are queued as a single batch job with the
+        cover first. Files rejected by ingestion are skipped. Returns the
+        created rows.
+        """
+        files = [uploaded for uploaded in (files or []) if uploaded]
+        if not files:
+            return []
+
+        if start_order is None or assign_cover is None:
+            existing = listing.images.aggregate(
+                count=models.Count("id"),
+                covers=models.Count("id", filter=models.Q(is_cover=True)),
+            )
+            if start_order is None:
+                start_order = existing["count"] or 0
+            if assign_cover is None:
+                assign_cover = not existing["covers"]
+
+        pending = []
+        for uploaded in files:
+            image_obj = cls(listing=listing, image=uploaded)
+            try:
+                image_obj._ingest_pending_upload()
+            except ImageIngestionError as exc:
+                logger.info("Skipping rejected upload for listing %s: %s", listing.pk, exc)
+                continue
+            image_obj.order = start_order + len(pending)
+            image_obj.is_cover = bool(assign_cover and not pending)
+            pending.append(image_obj)
+        if not pending:
+            return []
+
+        with db_transaction.atomic():
+            reused = cls._claim_content_blobs(pending)
+            created = cls.objects.bulk_create(pending)
+
+        rendition_order = sorted(
+            (image_obj for image_obj in created if id(image_obj) not in reused),
+            key=lambda image_obj: (not image_obj.is_cover, image_obj.order),
+        )
+        if getattr(settings, "CAR_IMAGE_ASYNC_RENDITIONS", True):
+            cls._schedule_rendition_batch([image_obj.pk for image_obj in rendition_order])
+        else:
+            for image_obj in rendition_order:
+                image_obj.rebuild_renditions()
+        # bulk_create sends no post_save
+        _schedule_listing_prerender_refresh(listing.pk)
+        return created
+
     @classmethod
     def _run_rendition_generation_task(cls, image_id):
         close_old_connections()
@@ -1416,6 +1593,7 @@ class CarImage(models.Model):
             image_obj = cls.objects.filter(pk=image_id).only(
                 "id",
                 "image",
+                "content_hash",
                 "thumbnail",
                 "original_width",
                 "original_height",
@@ -1437,19 +1615,161 @@ class CarImage(models.Model):
             if not generated:
                 return
 
-            original_width = generated.get("original_width")
-            cls.objects.filter(pk=image_obj.pk).update(
-                thumbnail=generated.get("thumbnail_path") or None,
-                original_width=original_width,
-                original_height=generated.get("original_height"),
-                low_res=bool(original_width and original_width < CAR_IMAGE_LOW_RES_MIN_WIDTH),
-                renditions={"webp": generated.get("renditions") or []},
-            )
+            image_obj._apply_generated_renditions(generated)
         finally:
             with _CAR_IMAGE_PENDING_RENDITIONS_LOCK:
                 _CAR_IMAGE_PENDING_RENDITIONS.discard(image_id)
             close_old_connections()
 
+    def _apply_generated_renditions(self, generated):
+        """
+        Write rendition metadata with a single UPDATE, bypassing save(). Rows
+        sharing the same content hash point at the same files and get the
+        metadata too, so their own rendition jobs find nothing left to do.
+        """
+        original_width = generated.get("original_width")
+        values = {
+            "thumbnail": generated.get("thumbnail_path") or None,
+            "original_width": original_width,
+            "original_height": generated.get("original_height"),
+            "low_res": bool(original_width and original_width < CAR_IMAGE_LOW_RES_MIN_WIDTH),
+            "renditions": _build_renditions_payload(generated),
+        }
+        if self.content_hash:
+            type(self).objects.filter(content_hash=self.content_hash).update(**values)
+        else:
+            type(self).objects.filter(pk=self.pk).update(**values)
+        for field_name, value in values.items():
+            setattr(self, field_name, value)
+
+    def rebuild_renditions(self):
+        """
+        Regenerate renditions in place for batch jobs: one render, one UPDATE,
+        and removal of rendition files the new set no longer references.
+        """
+        if not self.image:
+            return False
+        previous_paths = self._collect_rendition_paths(self.renditions)
+        generated = self._generate_webp_renditions()
+        if not generated:
+            return False
+        self._apply_generated_renditions(generated)
+
+        keep_paths = self._collect_rendition_paths(self.renditions)
+        keep_paths.add(str(self.image.name or ""))
+        delete_paths(self.image.storage, previous_paths - keep_paths)
+        return True
+
+    def ensure_placeholder(self):
+        """
+        Add the LQIP placeholder to rows rendered before placeholders existed,
+        using the stored grid rendition instead of decoding the original again.
+        """
+        payload = self.renditions if isinstance(self.renditions, dict) else {}
+        if payload.get("placeholder"):
+            return False
+        grid_rows = sorted(
+            (
+                row for row in (payload.get("webp") or [])
+                if isinstance(row, dict) and row.get("kind") == "grid" and row.get("path")
+            ),
+            key=lambda row: row.get("width") or 0,
+        )
+        if not grid_rows:
+            return self.rebuild_renditions()
+
+        try:
+            with self.image.storage.open(grid_rows[0]["path"], "rb") as handle:
+                with PILImage.open(handle) as grid_image:
+                    grid_image.load()
+                    placeholder = build_placeholder(grid_image)
+        except Exception as exc:
+            logger.warning("Failed to build placeholder for image %s: %s", self.pk, exc)
+            return False
+
+        self.renditions = {**payload, "placeholder": placeholder}
+        type(self).objects.filter(pk=self.pk).update(renditions=self.renditions)
+        return True
+
+    def _ingest_pending_upload(self):
+        """
+        Sniff, downscale and strip the not-yet-stored upload, and record its
+        dimensions on the row before the first write.
+        """
+        ingested = ingest_image_upload(self.image.file, name=self.image.name, max_pixels=CAR_IMAGE_MAX_PIXELS)
+        if ingested.changed:
+            self.image = ingested.file
+        self.content_hash = ingested.content_hash
+        self.original_width = ingested.width
+        self.original_height = ingested.height
+        self.low_res = bool(ingested.width and ingested.width < CAR_IMAGE_LOW_RES_MIN_WIDTH)
+
+    @classmethod
+    def _claim_content_blobs(cls, images):
+        """
+        Take one blob reference per pending upload in ``images``. New content
+        is stored once under its content-addressed key; known content reuses
+        the stored original and, when a sibling row already has them, its
+        renditions. Returns the ``id()`` of every image whose renditions were
+        reused. Runs inside the caller's transaction, which keeps the blob
+        rows locked until commit.
+        """
+        images = [image_obj for image_obj in images if image_obj.content_hash]
+        if not images:
+            return set()
+
+        hashes = sorted({image_obj.content_hash for image_obj in images})
+        ImageBlob.objects.bulk_create(
+            [ImageBlob(content_hash=content_hash) for content_hash in hashes],
+            ignore_conflicts=True,
+        )
+        blobs = {
+            blob.content_hash: blob
+            for blob in ImageBlob.objects.select_for_update().filter(content_hash__in=hashes)
+        }
+
+        donors = {}
+        known_hashes = [content_hash for content_hash, blob in blobs.items() if blob.image]
+        if known_hashes:
+            siblings = cls.objects.filter(content_hash__in=known_hashes).only(
+                "content_hash",
+                "thumbnail",
+                "original_width",
+                "original_height",
+                "low_res",
+                "renditions",
+            ).order_by("id")
+            for sibling in siblings:
+                if sibling.content_hash not in donors and sibling._has_valid_renditions(
+                    {
+                        "original_width": sibling.original_width,
+                        "original_height": sibling.original_height,
+                        "renditions": sibling.renditions,
+                    }
+                ):
+                    donors[sibling.content_hash] = sibling
+
+        reused = set()
+        for image_obj in images:
+            blob = blobs[image_obj.content_hash]
+            blob.ref_count += 1
+            if not blob.image:
+                image_obj.image.save(os.path.basename(image_obj.image.name), image_obj.image.file, save=False)
+                blob.image = image_obj.image.name
+                continue
+
+            image_obj.image = blob.image
+            donor = donors.get(image_obj.content_hash)
+            if donor is not None:
+                image_obj.thumbnail = donor.thumbnail.name or None
+                image_obj.original_width = donor.original_width
+                image_obj.original_height = donor.original_height
+                image_obj.low_res = donor.low_res
+                image_obj.renditions = donor.renditions
+                reused.add(id(image_obj))
+        ImageBlob.objects.bulk_update(list(blobs.values()), ["image", "ref_count"])
+        return reused
+
     def save(self, *args, **kwargs):
         update_fields = kwargs.get("update_fields")
         if update_fields is not None:
@@ -1466,17 +1786,32 @@ class CarImage(models.Model):
                 super().save(*args, **kwargs)
                 return
 
+        claim_blob = False
+        if self.image and not getattr(self.image, "_committed", True):
+            self._ingest_pending_upload()
+            claim_blob = bool(self.content_hash)
+
         previous = None
         if self.pk:
             previous = CarImage.objects.filter(pk=self.pk).values(
                 "image",
+                "content_hash",
                 "thumbnail",
                 "renditions",
                 "original_width",
                 "original_height",
             ).first()
 
-        super().save(*args, **kwargs)
+        reused_renditions = False
+        if claim_blob:
+            with db_transaction.atomic():
+                reused_renditions = bool(self._claim_content_blobs([self]))
+                super().save(*args, **kwargs)
+            if previous and previous.get("content_hash") == self.content_hash:
+                # same bytes uploaded again: the row keeps a single reference
+                ImageBlob.release(self.content_hash)
+        else:
+            super().save(*args, **kwargs)
 
         if not self.image:
             return
@@ -1488,13 +1823,15 @@ class CarImage(models.Model):
         previous_image_name = str((previous or {}).get("image") or "").strip()
         image_changed = bool(previous and previous_image_name and previous_image_name != current_image_name)
 
-        should_generate = previous is None or image_changed or not self._has_valid_renditions(previous)
-        if not should_generate:
-            return
-
         if image_changed:
             self._cleanup_previous_assets(previous)
 
+        should_generate = not reused_renditions and (
+            previous is None or image_changed or not self._has_valid_renditions(previous)
+        )
+        if not should_generate:
+            return
+
         should_defer_renditions = bool(getattr(self, "_defer_renditions", False)) or (
             previous is None and bool(getattr(settings, "CAR_IMAGE_ASYNC_RENDITIONS", True))
         )
@@ -1511,9 +1848,7 @@ class CarImage(models.Model):
         self.original_width = generated.get("original_width")
         self.original_height = generated.get("original_height")
         self.low_res = bool(self.original_width and self.original_width < CAR_IMAGE_LOW_RES_MIN_WIDTH)
-        self.renditions = {
-            "webp": generated.get("renditions") or [],
-        }
+        self.renditions = _build_renditions_payload(generated)
 
         super().save(
             update_fields=[
@@ -1540,91 +1875,79 @@ class CarImage(models.Model):
         return True
 
 
-def _delete_storage_path_safely(storage, name):
-    candidates = _collect_storage_delete_candidates(storage, name)
-    if not candidates:
+def _collect_derivative_paths(image_obj):
+    """On-demand derivatives (``<base>_<w>x<h>.<fmt>``) are not tracked in ``renditions``."""
+    if not image_obj.image:
+        return []
+    rendition_dir = image_obj._get_rendition_directory()
+    base_name, _ = os.path.splitext(os.path.basename(image_obj.image.name))
+    pattern = re.compile(rf"^{re.escape(base_name)}_\d+x\d+\.(?:webp|avif|jpg)$")
+    try:
+        # list only this image's "<base>_" keys, not the whole shared rendition dir
+        names = list_names_with_prefix(image_obj.image.storage, posixpath.join(rendition_dir, f"{base_name}_"))
+    except Exception:
+        return []
+    return [name for name in names if pattern.match(posixpath.basename(name))]
+
+
+def _schedule_listing_prerender_refresh(listing_id):
+    from .prerender import schedule_listing_prerender_refresh
+
+    schedule_listing_prerender_refresh(listing_id)
+
+
+@receiver(post_save, sender=BaseListing)
+def refresh_listing_prerender(sender, instance, **kwargs):
+    """Publishing or editing a live listing re-renders its share card and crawler HTML."""
+    if instance.is_draft or not instance.is_active or instance.is_archived:
+        from .prerender import invalidate_listing_prerender_html
+
+        invalidate_listing_prerender_html(instance.pk)
         return
-    deleted_any = False
-    last_error = None
-    for candidate in candidates:
-        try:
-            storage.delete(candidate)
-            deleted_any = True
-        except Exception as exc:
-            last_error = exc
-    if not deleted_any and last_error is not None:
-        logger.warning(
-            "Failed to delete storage object '%s' after trying candidates: %s (%s)",
-            name,
-            ", ".join(candidates),
-            last_error,
-        )
+    _schedule_listing_prerender_refresh(instance.pk)
 
 
-def _collect_storage_delete_candidates(storage, raw_name):
-    normalized = str(raw_name or "").strip()
-    if not normalized:
-        return []
+@receiver(post_save, sender=CarImage)
+def refresh_listing_prerender_on_photo_change(sender, instance, **kwargs):
+    _schedule_listing_prerender_refresh(instance.listing_id)
 
-    candidates = set()
 
-    def _add_candidate(value):
-        candidate = str(value or "").strip()
-        if not candidate:
-            return
-        candidate = unquote(candidate).strip().lstrip("/")
-        if not candidate:
-            return
-        candidates.add(candidate)
-        if candidate.startswith("media/"):
-            candidates.add(candidate[len("media/"):])
-
-    _add_candidate(normalized)
-
-    if normalized.startswith("//"):
-        parsed = urlparse(f"https:{normalized}")
-        _add_candidate(parsed.path)
-    elif "://" in normalized:
-        parsed = urlparse(normalized)
-        _add_candidate(parsed.path)
-
-        path_without_slash = unquote(parsed.path or "").lstrip("/")
-        bucket_name = str(getattr(storage, "bucket_name", "") or "").strip()
-        if bucket_name and path_without_slash.startswith(f"{bucket_name}/"):
-            _add_candidate(path_without_slash[len(bucket_name) + 1:])
-
-    location_prefix = str(getattr(storage, "location", "") or "").strip().strip("/")
-    if location_prefix:
-        snapshot = list(candidates)
-        for candidate in snapshot:
-            if candidate.startswith(f"{location_prefix}/"):
-                _add_candidate(candidate[len(location_prefix) + 1:])
-            else:
-                _add_candidate(f"{location_prefix}/{candidate}")
-
-    return sorted(candidates)
-
-
-def _delete_file_field_safely(file_field):
-    name = getattr(file_field, "name", "") or ""
-    if not name:
+@receiver(post_delete, sender=BaseListing)
+def cleanup_listing_prerender(sender, instance, **kwargs):
+    from .prerender import invalidate_listing_prerender_html
+
+    invalidate_listing_prerender_html(instance.pk)
+    if instance.share_image:
+        delete_paths(default_storage, [instance.share_image])
+
+
+@receiver(post_delete, sender=BaseListing)
+def record_feed_tombstone(sender, instance, **kwargs):
+    if instance.main_category != "cars":
         return
-    try:
-        _delete_storage_path_safely(file_field.storage, name)
-    except Exception:
-        pass
+    FeedTombstone.objects.create(listing_id=instance.pk)
+    # past the retention window a partner has to re-pull the full feed anyway
+    if cache.add("feeds:tombstone-prune", 1, 3600):
+        FeedTombstone.objects.filter(
+            deleted_at__lt=timezone.now() - timedelta(days=FEED_TOMBSTONE_RETENTION_DAYS)
+        ).delete()
 
 
 @receiver(post_delete, sender=CarImage)
 def cleanup_car_image_files(sender, instance, **kwargs):
-    """Ensure image files are removed from storage when CarImage rows are deleted."""
-    _delete_file_field_safely(instance.thumbnail)
-    for rendition_path in CarImage._collect_rendition_paths(getattr(instance, "renditions", {}) or {}):
-        try:
-            _delete_storage_path_safely(instance.image.storage, rendition_path)
-        except Exception:
-            pass
-    _delete_file_field_safely(instance.image)
+    """
+    Ensure image files are removed from storage when CarImage rows are deleted.
+    Content-addressed files are only removed with the last reference.
+    """
+    _schedule_listing_prerender_refresh(instance.listing_id)
+    if not ImageBlob.release(getattr(instance, "content_hash", "")):
+        return
+    paths = [getattr(instance.thumbnail, "name", "") or ""]
+    paths.extend(CarImage._collect_rendition_paths(getattr(instance, "renditions", {}) or {}))
+    paths.extend(_collect_derivative_paths(instance))
+    paths.append(getattr(instance.image, "name", "") or "")
+    # one DeleteObjects request per image instead of one DELETE per file
+    delete_paths(instance.image.storage, paths)
 
 
 # ======================================================================
@@ -1,10 +1,16 @@
 import hashlib
 import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal, InvalidOperation
 from html import escape
+from threading import Lock
 from urllib.parse import quote
 
 from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction as db_transaction
 from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils.cache import patch_vary_headers
@@ -13,10 +19,23 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 
 from .models import CarImage, BaseListing, get_expiry_cutoff
+from .renditions import RENDITION_FORMATS, RENDITION_MIME_TYPES
 from .serializers import _build_listing_display_title, _canonical_main_category
+from .storage_io import delete_paths, list_names_with_prefix, store_files
+
+logger = logging.getLogger(__name__)
 
 PRERENDER_PUBLIC_CACHE_SECONDS = 300
 PRERENDER_PUBLIC_STALE_SECONDS = 900
+# Cached documents are checked against the listing's ETag on every hit; bump
+# the version when the markup changes so a deploy does not serve old HTML.
+PRERENDER_HTML_VERSION = 1
+PRERENDER_HTML_CACHE_SECONDS = 7 * 24 * 60 * 60
+# Rendered documents are stored once per ETag, so every process (and
+# ``manage.py prerender_warm``) shares them; the "prerender" cache is only a
+# per-process copy in front of storage.
+PRERENDER_HTML_STORAGE_PREFIX = "prerender_html"
+PRERENDER_REFRESH_COALESCE_SECONDS = 5
 PRERENDER_BOT_SIGNATURES = (
     "googlebot",
     "bingbot",
@@ -47,6 +66,9 @@ VEHICLE_SEO_MAIN_CATEGORIES = {
     "trailer",
 }
 
+_PRERENDER_REFRESH_EXECUTOR = None
+_PRERENDER_REFRESH_EXECUTOR_LOCK = Lock()
+
 
 def _to_positive_int(value):
     try:
@@ -240,6 +262,30 @@ def _build_image_srcset(image_candidates):
     return ", ".join(f"{item['url']} {item['width']}w" for item in image_candidates)
 
 
+def _collect_picture_sources(image_obj, frontend_base_url):
+    renditions_payload = getattr(image_obj, "renditions", None)
+    if not isinstance(renditions_payload, dict):
+        return []
+
+    sources = []
+    for image_format in RENDITION_FORMATS:
+        rows = renditions_payload.get(image_format)
+        if not isinstance(rows, list):
+            continue
+        parts = []
+        for row in sorted(
+            (row for row in rows if isinstance(row, dict)),
+            key=lambda row: _to_positive_int(row.get("width")) or 0,
+        ):
+            width = _to_positive_int(row.get("width"))
+            absolute_url = _to_absolute_asset_url(_trim_to_value(row.get("url") or row.get("path")), frontend_base_url)
+            if width and absolute_url:
+                parts.append(f"{absolute_url} {width}w")
+        if parts:
+            sources.append({"type": RENDITION_MIME_TYPES[image_format], "srcset": ", ".join(parts)})
+    return sources
+
+
 def _build_listing_image_alt(display_title, city, site_name):
     city_part = _trim_to_value(city, fallback="България")
     title_part = _trim_to_value(display_title, fallback="Обява")
@@ -324,23 +370,54 @@ def _drop_none_values(payload):
     return payload
 
 
-def _build_prerender_etag(listing, images):
+def _resolve_share_card_url(listing, cover, frontend_base_url):
+    """
+    URL of the pre-generated share card when it matches the listing's current
+    state. Otherwise a refresh is queued and the cover photo is used meanwhile;
+    cards are never rendered on a crawler request.
+    """
+    from .share_cards import build_share_card_name
+
+    share_image = _trim_to_value(getattr(listing, "share_image", ""))
+    if share_image and share_image == build_share_card_name(listing, cover):
+        try:
+            return _to_absolute_asset_url(default_storage.url(share_image), frontend_base_url)
+        except Exception:
+            return ""
+    schedule_listing_prerender_refresh(listing.id)
+    return ""
+
+
+def _get_prerender_image_fingerprint(listing_id):
+    """Narrow columns of the listing's photos in display order; enough for the ETag without loading rows."""
+    return list(
+        CarImage.objects.filter(listing_id=listing_id)
+        .order_by("-is_cover", "order", "id")
+        .values_list("id", "image", "thumbnail", "original_width")
+    )
+
+
+def _build_image_fingerprint(images):
+    """The same fingerprint for already loaded ``images``."""
+    return [
+        (image.id, getattr(image.image, "name", ""), getattr(image.thumbnail, "name", ""), image.original_width)
+        for image in images
+    ]
+
+
+def _build_prerender_etag(listing, image_fingerprint):
+    # renditions land together with thumbnail and original_width, so the
+    # narrow columns change whenever the rendered <picture> markup would
     fingerprint = {
         "id": listing.id,
         "slug": _normalize_slug(listing),
         "updated_at": int(listing.updated_at.timestamp()) if listing.updated_at else 0,
         "price": str(getattr(listing, "price", "")),
         "currency": _normalize_listing_currency(getattr(listing, "currency", None)),
-        "view_count": int(getattr(listing, "view_count", 0) or 0),
+        "share_image": _trim_to_value(getattr(listing, "share_image", "")),
         "images": [
-            {
-                "id": image.id,
-                "updated_at": int(image.created_at.timestamp()) if getattr(image, "created_at", None) else 0,
-                "image": _trim_to_value(getattr(image.image, "name", "")),
-                "thumbnail": _trim_to_value(getattr(image.thumbnail, "name", "")),
-                "renditions": getattr(image, "renditions", None),
-            }
-            for image in images
+            [image_id, _trim_to_value(image_name), _trim_to_value(thumbnail_name), original_width]
+            for image_id, image_name, thumbnail_name, original_width in image_fingerprint
         ],
     }
     digest = hashlib.sha256(
@@ -377,37 +454,24 @@ def _if_none_match_matches(request, current_etag):
     return False
 
 
-@api_view(["GET"])
-@permission_classes([AllowAny])
-def prerender_listing(request, listing_id):
-    """Return pre-rendered HTML for crawler requests on detail listing pages."""
-    user_agent = request.headers.get("User-Agent", "")
-    force_mode = str(request.query_params.get("force") or "").strip().lower() in {"1", "true", "yes"}
-    bot_detected = _is_supported_prerender_bot(user_agent)
-
-    if not bot_detected and not force_mode:
-        return HttpResponse(
-            "Prerender endpoint is reserved for crawler user-agents.",
-            status=403,
-            content_type="text/plain; charset=utf-8",
-        )
-
-    cutoff = get_expiry_cutoff()
-    listing_queryset = (
+def _get_live_listing_queryset():
+    return (
         BaseListing.objects.filter(
             is_active=True,
             is_draft=False,
             is_archived=False,
-            created_at__gte=cutoff,
+            created_at__gte=get_expiry_cutoff(),
         )
         .select_related("cars_details")
     )
-    listing = get_object_or_404(listing_queryset, pk=listing_id)
-    images = list(
-        CarImage.objects.filter(listing_id=listing.id)
-        .order_by("-is_cover", "order", "id")
-    )
 
+
+def _get_prerender_images(listing_id):
+    return list(CarImage.objects.filter(listing_id=listing_id).order_by("-is_cover", "order", "id"))
+
+
+def render_listing_prerender_html(listing, images):
+    """Build the crawler HTML document of a live listing (``images`` in display order)."""
     frontend_base_url = _resolve_frontend_base_url()
     site_name = _resolve_site_name()
     canonical_slug = _normalize_slug(listing)
@@ -455,6 +519,7 @@ def prerender_listing(request, listing_id):
             {
                 "src": main_src,
                 "srcset": _build_image_srcset(candidates),
+                "sources": _collect_picture_sources(image_obj, frontend_base_url),
                 "sizes": "(max-width: 768px) 100vw, 50vw",
                 "alt": image_alt,
                 "loading": "eager" if index == 0 else "lazy",
@@ -463,6 +528,9 @@ def prerender_listing(request, listing_id):
         )
 
     og_image = first_share_image_url or first_image_url or default_share_image
+    share_card_url = _resolve_share_card_url(listing, images[0] if images else None, frontend_base_url)
+    if share_card_url:
+        og_image = share_card_url
     breadcrumbs = _build_breadcrumb_items(listing, frontend_base_url, canonical_path)
 
     vehicle_schema = _drop_none_values(
@@ -541,15 +609,20 @@ def prerender_listing(request, listing_id):
 
     gallery_html = "".join(
         (
-            "<figure>"
-            f"<img src=\"{escape(row['src'])}\""
+            "<figure><picture>"
+            + "".join(
+                f"<source type=\"{escape(source['type'])}\" srcset=\"{escape(source['srcset'])}\""
+                f" sizes=\"{escape(row['sizes'])}\" />"
+                for source in row["sources"]
+            )
+            + f"<img src=\"{escape(row['src'])}\""
             + (f" srcset=\"{escape(row['srcset'])}\"" if row["srcset"] else "")
             + f" sizes=\"{escape(row['sizes'])}\""
             + f" alt=\"{escape(row['alt'])}\""
             + f" loading=\"{escape(row['loading'])}\""
             + f" decoding=\"async\" fetchpriority=\"{escape(row['fetchpriority'])}\""
             + " />"
-            "</figure>"
+            "</picture></figure>"
         )
         for row in gallery_rows
     )
@@ -641,7 +714,156 @@ def prerender_listing(request, listing_id):
 </html>
 """
 
-    detail_etag = _build_prerender_etag(listing, images)
+    return html_document
+
+
+def get_prerender_cache():
+    return caches["prerender"]
+
+
+def prerender_html_storage_dir(kind, object_id):
+    return f"{PRERENDER_HTML_STORAGE_PREFIX}/v{PRERENDER_HTML_VERSION}/{kind}/{object_id}"
+
+
+def prerender_html_storage_name(storage_dir, *etag_parts):
+    digest = hashlib.sha256("|".join(str(part) for part in etag_parts).encode("utf-8")).hexdigest()[:32]
+    return f"{storage_dir}/{digest}.html"
+
+
+def read_stored_prerender_html(storage_name):
+    try:
+        with default_storage.open(storage_name, "rb") as html_file:
+            return html_file.read()
+    except Exception:
+        return None
+
+
+def store_prerender_html(storage_dir, storage_name, html_bytes):
+    """Store the document of the current ETag and drop the ones of older ETags."""
+    try:
+        store_files(default_storage, [{"path": storage_name, "content": html_bytes}])
+    except Exception as exc:
+        logger.warning("Failed to store prerendered page %s: %s", storage_name, exc)
+        return
+    delete_stored_prerender_html(storage_dir, keep=storage_name)
+
+
+def delete_stored_prerender_html(storage_dir, keep=""):
+    try:
+        stale_names = [name for name in list_names_with_prefix(default_storage, f"{storage_dir}/") if name != keep]
+        if stale_names:
+            delete_paths(default_storage, stale_names)
+    except Exception as exc:
+        logger.warning("Failed to clean prerendered pages in %s: %s", storage_dir, exc)
+
+
+def _listing_html_cache_key(listing_id):
+    return f"prerender:listing-html:v{PRERENDER_HTML_VERSION}:{listing_id}"
+
+
+def get_listing_prerender_html(listing, detail_etag, images=None):
+    """
+    Encoded HTML for ``detail_etag``: from this process's cache, then from
+    storage, rendering it (and loading ``images`` when not given) only when
+    neither has it. One cache entry and one stored document per listing, so a
+    change replaces them instead of leaving old documents behind.
+    """
+    prerender_cache = get_prerender_cache()
+    cache_key = _listing_html_cache_key(listing.id)
+    cached = prerender_cache.get(cache_key)
+    if cached is not None and cached[0] == detail_etag:
+        return cached[1]
+
+    storage_dir = prerender_html_storage_dir("listings", listing.id)
+    storage_name = prerender_html_storage_name(storage_dir, detail_etag)
+    html_bytes = read_stored_prerender_html(storage_name)
+    if not html_bytes:
+        if images is None:
+            images = _get_prerender_images(listing.id)
+        html_bytes = render_listing_prerender_html(listing, images).encode("utf-8")
+        store_prerender_html(storage_dir, storage_name, html_bytes)
+    prerender_cache.set(cache_key, (detail_etag, html_bytes), PRERENDER_HTML_CACHE_SECONDS)
+    return html_bytes
+
+
+def warm_listing_prerender_html(listing_id):
+    """Pre-render a live listing's HTML; drafts and removed listings lose their documents."""
+    listing = _get_live_listing_queryset().filter(pk=listing_id).first()
+    if listing is None:
+        invalidate_listing_prerender_html(listing_id)
+        return ""
+    images = _get_prerender_images(listing.id)
+    detail_etag = _build_prerender_etag(listing, _build_image_fingerprint(images))
+    get_listing_prerender_html(listing, detail_etag, images)
+    return detail_etag
+
+
+def invalidate_listing_prerender_html(listing_id):
+    get_prerender_cache().delete(_listing_html_cache_key(listing_id))
+    delete_stored_prerender_html(prerender_html_storage_dir("listings", listing_id))
+
+
+def refresh_listing_prerender(listing_id):
+    """Bring the listing's share card and cached crawler HTML in line with its current state."""
+    from .share_cards import generate_listing_share_card
+
+    generate_listing_share_card(listing_id)
+    return warm_listing_prerender_html(listing_id)
+
+
+def _get_prerender_refresh_executor():
+    global _PRERENDER_REFRESH_EXECUTOR
+    if _PRERENDER_REFRESH_EXECUTOR is not None:
+        return _PRERENDER_REFRESH_EXECUTOR
+
+    with _PRERENDER_REFRESH_EXECUTOR_LOCK:
+        if _PRERENDER_REFRESH_EXECUTOR is None:
+            _PRERENDER_REFRESH_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="listing-prerender")
+    return _PRERENDER_REFRESH_EXECUTOR
+
+
+def _refresh_listing_prerender_in_thread(listing_id):
+    cache.delete(f"prerender:listing-refresh-pending:{listing_id}")
+    close_old_connections()
+    try:
+        refresh_listing_prerender(listing_id)
+    except Exception as exc:
+        logger.warning("Prerender refresh for listing %s failed: %s", listing_id, exc)
+    finally:
+        close_old_connections()
+
+
+def schedule_listing_prerender_refresh(listing_id):
+    """Re-render the listing's card and HTML after commit; bursts of edits coalesce into one pass."""
+    if not listing_id:
+        return
+    if not cache.add(f"prerender:listing-refresh-pending:{listing_id}", 1, PRERENDER_REFRESH_COALESCE_SECONDS):
+        return
+
+    def _submit():
+        _get_prerender_refresh_executor().submit(_refresh_listing_prerender_in_thread, listing_id)
+
+    db_transaction.on_commit(_submit)
+
+
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def prerender_listing(request, listing_id):
+    """Return pre-rendered HTML for crawler requests on detail listing pages."""
+    user_agent = request.headers.get("User-Agent", "")
+    force_mode = str(request.query_params.get("force") or "").strip().lower() in {"1", "true", "yes"}
+    bot_detected = _is_supported_prerender_bot(user_agent)
+
+    if not bot_detected and not force_mode:
+        return HttpResponse(
+            "Prerender endpoint is reserved for crawler user-agents.",
+            status=403,
+            content_type="text/plain; charset=utf-8",
+        )
+
+    listing = get_object_or_404(_get_live_listing_queryset(), pk=listing_id)
+    # photos are only loaded when the page has to be rendered
+    detail_etag = _build_prerender_etag(listing, _get_prerender_image_fingerprint(listing.id))
     last_modified = listing.updated_at or listing.created_at
     last_modified_value = http_date(last_modified.timestamp()) if last_modified else None
 
@@ -672,7 +894,10 @@ def prerender_listing(request, listing_id):
             patch_vary_headers(response, ("User-Agent",))
             return response
 
-    response = HttpResponse(html_document, content_type="text/html; charset=utf-8")
+    response = HttpResponse(
+        get_listing_prerender_html(listing, detail_etag),
+        content_type="text/html; charset=utf-8",
+    )
     response["Cache-Control"] = (
         f"public, max-age={PRERENDER_PUBLIC_CACHE_SECONDS}, "
         f"stale-while-revalidate={PRERENDER_PUBLIC_STALE_SECONDS}"
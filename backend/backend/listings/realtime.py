@@ -1,97 +1,192 @@
 from __future__ import annotations
 
+import asyncio
+import logging
+import threading
 from datetime import datetime, timezone
 
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
-from django.core.cache import cache
+from django.conf import settings
+from django.db import close_old_connections, transaction as db_transaction
 
+logger = logging.getLogger(__name__)
 
 DEALER_NOTIFICATIONS_GROUP = "dealer-notifications"
+DEALER_LISTINGS_GROUP_PREFIX = "dealer-listings"
+CATEGORY_LISTINGS_GROUP_PREFIX = "category-listings"
 USER_NOTIFICATIONS_GROUP_PREFIX = "user-notifications"
-USER_NOTIFICATION_QUEUE_CACHE_PREFIX = "user-notification-queue"
-USER_NOTIFICATION_QUEUE_TTL_SECONDS = 7 * 24 * 60 * 60
-USER_NOTIFICATION_QUEUE_MAX_ITEMS = 50
 
+# an event names at most this many listings or dealers; past that it asks clients
+# for a full refresh, which keeps it under the PostgreSQL layer's notify limit
+LISTING_UPDATES_MAX_IDS = 200
+LISTING_UPDATES_SEND_TIMEOUT_SECONDS = 10
 
-def broadcast_dealer_listings_updated() -> None:
-    channel_layer = get_channel_layer()
-    if channel_layer is None:
-        return
+# listing_id -> (main_category, owner user id), filled after commit and sent once per window
+_PENDING_LISTING_UPDATES = {}
+_PENDING_LISTING_UPDATES_LOCK = threading.Lock()
+_LISTING_UPDATES_TIMER = None
+# the ASGI server loop seen when the window opened; the in-memory layer's
+# waiters live there, so the timer thread has to send on it
+_LISTING_UPDATES_LOOP = None
 
-    async_to_sync(channel_layer.group_send)(
-        DEALER_NOTIFICATIONS_GROUP,
-        {
-            "type": "dealer_listings_updated",
-            "timestamp": datetime.now(timezone.utc).isoformat(),
-        },
-    )
 
+def dealer_listings_group_name(dealer_id: int) -> str:
+    return f"{DEALER_LISTINGS_GROUP_PREFIX}-{int(dealer_id)}"
 
-def user_notifications_group_name(user_id: int) -> str:
-    return f"{USER_NOTIFICATIONS_GROUP_PREFIX}-{int(user_id)}"
 
+def category_listings_group_name(category: str) -> str:
+    return f"{CATEGORY_LISTINGS_GROUP_PREFIX}-{category}"
 
-def _user_notification_queue_cache_key(user_id: int) -> str:
-    return f"{USER_NOTIFICATION_QUEUE_CACHE_PREFIX}:{int(user_id)}"
 
+def _resolve_listing_updates_window_seconds() -> float:
+    try:
+        window_ms = int(getattr(settings, "REALTIME_LISTING_UPDATES_WINDOW_MS", 500))
+    except (TypeError, ValueError):
+        window_ms = 500
+    return max(0, window_ms) / 1000
 
-def queue_user_notification(user_id: int, notification: dict) -> None:
-    if not user_id or not isinstance(notification, dict):
-        return
 
-    cache_key = _user_notification_queue_cache_key(user_id)
-    queue = cache.get(cache_key)
-    if not isinstance(queue, list):
-        queue = []
+async def _get_running_loop():
+    return asyncio.get_running_loop()
 
-    notification_id = str(notification.get("id") or "").strip()
-    if notification_id:
-        queue = [item for item in queue if str(item.get("id") or "").strip() != notification_id]
-
-    queue.insert(0, notification)
-    cache.set(
-        cache_key,
-        queue[:USER_NOTIFICATION_QUEUE_MAX_ITEMS],
-        timeout=USER_NOTIFICATION_QUEUE_TTL_SECONDS,
-    )
 
+def _capture_server_loop():
+    """The server's event loop when called from an ASGI request thread, else ``None``."""
+    # outside a server async_to_sync runs on a throwaway loop, closed by now
+    loop = async_to_sync(_get_running_loop)()
+    return None if loop.is_closed() else loop
 
-def drain_user_notifications(user_id: int, limit: int = 20) -> list[dict]:
-    if not user_id:
-        return []
 
-    safe_limit = max(1, min(int(limit or 20), USER_NOTIFICATION_QUEUE_MAX_ITEMS))
-    cache_key = _user_notification_queue_cache_key(user_id)
-    queue = cache.get(cache_key)
-    if not isinstance(queue, list) or not queue:
-        return []
-
-    drained = queue[:safe_limit]
-    remaining = queue[safe_limit:]
-    if remaining:
-        cache.set(cache_key, remaining, timeout=USER_NOTIFICATION_QUEUE_TTL_SECONDS)
-    else:
-        cache.delete(cache_key)
-    return drained
+def broadcast_dealer_listings_updated(listing_id: int, main_category: str, user_id: int) -> None:
+    """
+    Announce a changed listing once the surrounding transaction commits.
 
-
-def broadcast_user_notification(user_id: int, notification: dict) -> None:
-    if not user_id or not isinstance(notification, dict):
+    Changes are buffered per process and sent together when the window closes,
+    so a bulk edit produces one event instead of one refetch per listing.
+    """
+    if not listing_id:
         return
 
-    queue_user_notification(user_id, notification)
+    def _buffer():
+        global _LISTING_UPDATES_TIMER, _LISTING_UPDATES_LOOP
+        window_seconds = _resolve_listing_updates_window_seconds()
+        server_loop = _capture_server_loop() if window_seconds and _LISTING_UPDATES_TIMER is None else None
+        with _PENDING_LISTING_UPDATES_LOCK:
+            _PENDING_LISTING_UPDATES[int(listing_id)] = (str(main_category or ""), user_id)
+            if window_seconds and _LISTING_UPDATES_TIMER is None:
+                timer = threading.Timer(window_seconds, _flush_listing_updates_in_thread)
+                timer.daemon = True
+                _LISTING_UPDATES_TIMER = timer
+                _LISTING_UPDATES_LOOP = server_loop
+                timer.start()
+        if not window_seconds:
+            flush_listing_updates()
+
+    db_transaction.on_commit(_buffer)
+
+
+def _flush_listing_updates_in_thread() -> None:
+    close_old_connections()
+    try:
+        flush_listing_updates()
+    except Exception:
+        logger.exception("Listing update broadcast failed")
+    finally:
+        close_old_connections()
+
+
+def _build_listing_updates_event(updates: dict, dealer_ids_by_user: dict, timestamp: str) -> dict:
+    listing_ids = sorted(updates)
+    dealer_ids = sorted(
+        {dealer_ids_by_user[user_id] for _, user_id in updates.values() if user_id in dealer_ids_by_user}
+    )
+    full_refresh = len(listing_ids) > LISTING_UPDATES_MAX_IDS or len(dealer_ids) > LISTING_UPDATES_MAX_IDS
+    return {
+        "type": "dealer_listings_updated",
+        "timestamp": timestamp,
+        "listing_ids": [] if full_refresh else listing_ids,
+        "categories": sorted({category for category, _ in updates.values() if category}),
+        "dealer_ids": [] if full_refresh else dealer_ids,
+        "full_refresh": full_refresh,
+    }
+
+
+def flush_listing_updates() -> None:
+    """Send the buffered listing changes now: once to everyone, then sliced per dealer and per category."""
+    from backend.accounts.models import BusinessUser
+
+    global _LISTING_UPDATES_TIMER, _LISTING_UPDATES_LOOP
+    with _PENDING_LISTING_UPDATES_LOCK:
+        updates = dict(_PENDING_LISTING_UPDATES)
+        _PENDING_LISTING_UPDATES.clear()
+        timer, _LISTING_UPDATES_TIMER = _LISTING_UPDATES_TIMER, None
+        server_loop, _LISTING_UPDATES_LOOP = _LISTING_UPDATES_LOOP, None
+    if timer is not None:
+        timer.cancel()
+    if not updates:
+        return
 
     channel_layer = get_channel_layer()
     if channel_layer is None:
         return
 
-    async_to_sync(channel_layer.group_send)(
-        user_notifications_group_name(user_id),
-        {
-            "type": "user_notification",
-            "timestamp": datetime.now(timezone.utc).isoformat(),
-            "notification": notification,
-        },
-    )
+    user_ids = {user_id for _, user_id in updates.values() if user_id}
+    dealer_ids_by_user = dict(
+        BusinessUser.objects.filter(user_id__in=user_ids).values_list("user_id", "id")
+    ) if user_ids else {}
+    timestamp = datetime.now(timezone.utc).isoformat()
+
+    by_group = {DEALER_NOTIFICATIONS_GROUP: updates}
+    for listing_id, (category, user_id) in updates.items():
+        if user_id in dealer_ids_by_user:
+            group = dealer_listings_group_name(dealer_ids_by_user[user_id])
+            by_group.setdefault(group, {})[listing_id] = (category, user_id)
+        if category:
+            group = category_listings_group_name(category)
+            by_group.setdefault(group, {})[listing_id] = (category, user_id)
+
+    async def _send_all():
+        for group, group_updates in by_group.items():
+            try:
+                await channel_layer.group_send(
+                    group, _build_listing_updates_event(group_updates, dealer_ids_by_user, timestamp)
+                )
+            except Exception:
+                # one failed audience must not silence the rest
+                logger.exception("Listing update broadcast to %s failed", group)
+
+    if server_loop is not None and server_loop.is_running():
+        asyncio.run_coroutine_threadsafe(_send_all(), server_loop).result(LISTING_UPDATES_SEND_TIMEOUT_SECONDS)
+    else:
+        async_to_sync(_send_all)()
+
+
+def user_notifications_group_name(user_id: int) -> str:
+    return f"{USER_NOTIFICATIONS_GROUP_PREFIX}-{int(user_id)}"
+
+
+def broadcast_user_notification(user_id: int, notification: dict) -> None:
+    """Store the notification in the user's inbox and push it to their sockets after commit."""
+    from backend.accounts.notifications import append_user_notification, serialize_user_notification
+
+    if not user_id or not isinstance(notification, dict):
+        return
 
+    notification_id = append_user_notification(user_id, notification)
+    payload = serialize_user_notification(notification_id, notification)
+
+    def _send():
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+        async_to_sync(channel_layer.group_send)(
+            user_notifications_group_name(user_id),
+            {
+                "type": "user_notification",
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "notification": payload,
+            },
+        )
+
+    db_transaction.on_commit(_send)
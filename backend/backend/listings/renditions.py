@@ -0,0 +1,413 @@
+"""Pillow-only rendition engine for listing images.
+
+Everything in this module works on raw bytes or filesystem paths and returns
+plain dicts, so it can run inside a ``ProcessPoolExecutor`` worker without
+Django models, storage backends or database connections. ``CarImage`` reads
+the original, hands it to :func:`render_listing_image`, stores the returned
+files and writes the metadata back with a single ``UPDATE``.
+"""
+
+import base64
+import io
+import logging
+import math
+import os
+import posixpath
+
+from PIL import Image as PILImage, ImageOps
+from PIL import UnidentifiedImageError, features
+
+logger = logging.getLogger(__name__)
+
+_RESAMPLING = getattr(PILImage, "Resampling", PILImage)
+# EXIF orientations that swap width and height (transpose/rotate 90/transverse/rotate 270)
+_ROTATED_ORIENTATIONS = {5, 6, 7, 8}
+# Keep at least this much resolution above the decode target before the first
+# Lanczos pass so reduce()'s box filter does not soften the renditions.
+_REDUCE_HEADROOM = 2
+# Best-first; browsers pick the first <picture> source type they support.
+RENDITION_FORMATS = ("avif", "webp")
+RENDITION_MIME_TYPES = {
+    "avif": "image/avif",
+    "webp": "image/webp",
+}
+# Low-quality image placeholder: a tiny WebP inlined as a data URI (~150-300 bytes).
+PLACEHOLDER_MAX_EDGE = 20
+PLACEHOLDER_WEBP_QUALITY = 40
+
+
+def _open_source(source):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return PILImage.open(io.BytesIO(bytes(source)))
+    return PILImage.open(os.fspath(source))
+
+
+def build_rendition_path(rendition_dir, base_name, kind, width, image_format="webp"):
+    return posixpath.join(rendition_dir, f"{base_name}_{kind}_{width}.{image_format}")
+
+
+def encode_webp(image, quality, method):
+    buffer = io.BytesIO()
+    image.save(
+        buffer,
+        format="WEBP",
+        quality=quality,
+        method=method,
+        optimize=True,
+    )
+    return buffer.getvalue()
+
+
+def encode_avif(image, quality, speed):
+    buffer = io.BytesIO()
+    image.save(
+        buffer,
+        format="AVIF",
+        quality=quality,
+        speed=speed,
+    )
+    return buffer.getvalue()
+
+
+def build_placeholder(image):
+    """Return a ``data:`` URI with a ~20px WebP preview of ``image``."""
+    preview = image.copy()
+    try:
+        preview.thumbnail((PLACEHOLDER_MAX_EDGE, PLACEHOLDER_MAX_EDGE), _RESAMPLING.BILINEAR)
+        if preview.mode != "RGB":
+            preview = preview.convert("RGB")
+        content = encode_webp(preview, PLACEHOLDER_WEBP_QUALITY, 4)
+    finally:
+        preview.close()
+    return "data:image/webp;base64," + base64.b64encode(content).decode("ascii")
+
+
+def _resolve_output_formats(formats):
+    resolved = []
+    for image_format in formats or ("webp",):
+        normalized = str(image_format or "").strip().lower()
+        if normalized not in RENDITION_MIME_TYPES or normalized in resolved:
+            continue
+        if normalized == "avif" and not features.check("avif"):
+            logger.warning("AVIF renditions requested but Pillow was built without AVIF support")
+            continue
+        resolved.append(normalized)
+    # WebP is the baseline every client gets (thumbnail, srcset_webp).
+    if "webp" not in resolved:
+        resolved.insert(0, "webp")
+    return resolved
+
+
+def _exif_orientation(image):
+    try:
+        return int(image.getexif().get(0x0112) or 1)
+    except Exception:
+        return 1
+
+
+def _oriented_size(source_file):
+    """Display size from the header (EXIF rotation applied) without decoding pixels."""
+    stored_width, stored_height = source_file.size
+    rotated = _exif_orientation(source_file) in _ROTATED_ORIENTATIONS
+    if rotated:
+        return stored_height, stored_width, True
+    return stored_width, stored_height, False
+
+
+def _decode_scaled(source_file, decode_width, decode_height, rotated):
+    """
+    Decode ``source_file`` once, no smaller than ``decode_width`` x ``decode_height``
+    (display orientation), and return an upright RGB image. Takes ownership of
+    ``source_file``.
+    """
+    try:
+        if source_file.format == "JPEG":
+            requested = (decode_height, decode_width) if rotated else (decode_width, decode_height)
+            source_file.draft("RGB", requested)
+
+        # draft() only changes the decoder scale; load() is the single full decode.
+        source_file.load()
+        ImageOps.exif_transpose(source_file, in_place=True)
+        if source_file.mode == "RGB":
+            current, source_file = source_file, None
+        else:
+            current = source_file.convert("RGB")
+    finally:
+        if source_file is not None:
+            source_file.close()
+
+    reduce_factor = min(
+        current.width // max(1, decode_width * _REDUCE_HEADROOM),
+        current.height // max(1, decode_height * _REDUCE_HEADROOM),
+    )
+    if reduce_factor >= 2:
+        reduced = current.reduce(reduce_factor)
+        current.close()
+        current = reduced
+    return current
+
+
+def _plan_rendition_stages(original_width, original_height, detail_widths, grid_renditions):
+    """
+    Return the rendition stages largest-first so each one can be derived from
+    the previous output instead of from the full-resolution original.
+    """
+    stages = []
+    for detail_width in detail_widths:
+        if detail_width > original_width:
+            continue
+        detail_height = max(
+            1,
+            int(round((detail_width / float(original_width)) * original_height)),
+        )
+        stages.append(("detail", detail_width, detail_height))
+    for grid_width, grid_height in grid_renditions:
+        if grid_width > original_width or grid_height > original_height:
+            continue
+        stages.append(("grid", grid_width, grid_height))
+    stages.sort(key=lambda stage: (stage[1], stage[2]), reverse=True)
+    return stages
+
+
+def _required_decode_size(original_width, original_height, stages):
+    """Smallest decode size (same aspect as the original) that covers every stage."""
+    scale = 0.0
+    for kind, width, height in stages:
+        if kind == "grid":
+            # ImageOps.fit crops to the target aspect, so both axes must be covered.
+            scale = max(scale, width / float(original_width), height / float(original_height))
+        else:
+            scale = max(scale, width / float(original_width))
+    scale = min(1.0, scale)
+    return (
+        max(1, int(math.ceil(original_width * scale))),
+        max(1, int(math.ceil(original_height * scale))),
+    )
+
+
+def _covers(image, stages):
+    for kind, width, height in stages:
+        if image.width < width:
+            return False
+        if kind == "grid" and image.height < height:
+            return False
+    return True
+
+
+def render_listing_image(
+    source,
+    *,
+    base_name,
+    rendition_dir,
+    detail_widths,
+    grid_renditions,
+    quality,
+    method,
+    max_pixels,
+    formats=("webp",),
+    avif_quality=50,
+    avif_speed=6,
+):
+    """
+    Decode ``source`` (bytes or a path) once and encode every configured rendition.
+
+    Each size is encoded as WebP and, when listed in ``formats`` and supported
+    by Pillow, as AVIF from the same resampled buffer.
+
+    Dimensions and orientation are read from the header first, so oversized
+    images are rejected without decoding. JPEGs are decoded with ``draft()`` at
+    the smallest DCT scale that still covers the largest rendition, and other
+    formats are ``reduce()``-d before the first resample. Renditions cascade
+    largest-first (1600 -> 1200 -> 600 grid), each derived from the previous
+    output, and every intermediate buffer is closed as soon as it is no longer
+    needed.
+
+    Returns ``None`` when the image cannot be decoded or is too large, otherwise
+    a dict with the original dimensions, the rendition metadata rows and a
+    ``files`` list of ``{"path", "content"}`` items ready to be stored.
+    """
+    output_formats = _resolve_output_formats(formats)
+    try:
+        source_file = _open_source(source)
+    except (UnidentifiedImageError, OSError, ValueError):
+        return None
+
+    renditions = []
+    files = []
+    thumbnail_path = None
+    placeholder = None
+    current = None
+
+    try:
+        stored_width, stored_height = source_file.size
+        if stored_width <= 0 or stored_height <= 0:
+            return None
+
+        # safety guard for huge images (checked on the header, before decoding)
+        if (stored_width * stored_height) > max_pixels:
+            logger.warning(
+                "Skipping renditions for %s due to huge dimensions: %sx%s",
+                base_name, stored_width, stored_height
+            )
+            return None
+
+        original_width, original_height, rotated = _oriented_size(source_file)
+        stages = _plan_rendition_stages(original_width, original_height, detail_widths, grid_renditions)
+        if not stages:
+            # smaller than every rendition; nothing to decode
+            return {
+                "original_width": original_width,
+                "original_height": original_height,
+                "thumbnail_path": None,
+                "placeholder": None,
+                "renditions": [],
+                "files": [],
+            }
+        decode_width, decode_height = _required_decode_size(original_width, original_height, stages)
+
+        decode_source, source_file = source_file, None
+        current = _decode_scaled(decode_source, decode_width, decode_height, rotated)
+
+        for index, (kind, width, height) in enumerate(stages):
+            if kind == "grid":
+                rendered = ImageOps.fit(
+                    current,
+                    (width, height),
+                    method=_RESAMPLING.LANCZOS,
+                    centering=(0.5, 0.5),
+                )
+            else:
+                rendered = current.resize((width, height), _RESAMPLING.LANCZOS)
+
+            for image_format in output_formats:
+                if image_format == "avif":
+                    content = encode_avif(rendered, avif_quality, avif_speed)
+                else:
+                    content = encode_webp(rendered, quality, method)
+                rendition_path = build_rendition_path(rendition_dir, base_name, kind, width, image_format)
+                files.append({"path": rendition_path, "content": content})
+                renditions.append(
+                    {
+                        "width": width,
+                        "height": height,
+                        "kind": kind,
+                        "format": image_format,
+                        "path": rendition_path,
+                    }
+                )
+                if kind == "grid" and image_format == "webp" and thumbnail_path is None:
+                    thumbnail_path = rendition_path
+
+            # Placeholder follows the grid crop, which is what list cards show.
+            if kind == "grid" and placeholder is None:
+                placeholder = build_placeholder(rendered)
+
+            # Cascade: the next stage resamples this output unless it is a crop
+            # or too small for what is left (e.g. very wide panoramas vs. grid).
+            if kind == "detail" and _covers(rendered, stages[index + 1:]):
+                current.close()
+                current = rendered
+            else:
+                rendered.close()
+
+        if placeholder is None:
+            placeholder = build_placeholder(current)
+    except (UnidentifiedImageError, OSError, ValueError):
+        return None
+    finally:
+        if current is not None:
+            current.close()
+        if source_file is not None:
+            source_file.close()
+
+    renditions.sort(key=lambda item: (0 if item.get("kind") == "grid" else 1, item.get("width") or 0))
+    return {
+        "original_width": original_width,
+        "original_height": original_height,
+        "thumbnail_path": thumbnail_path,
+        "placeholder": placeholder,
+        "renditions": renditions,
+        "files": files,
+    }
+
+
+def render_derivative(
+    source,
+    *,
+    width,
+    height,
+    image_format,
+    quality,
+    method,
+    max_pixels,
+    avif_quality=50,
+    avif_speed=6,
+):
+    """
+    Render a single on-demand size: ``height == 0`` keeps the aspect ratio,
+    otherwise the image is center-cropped to ``width`` x ``height``. Never
+    upscales; the requested box is shrunk to fit the original instead.
+
+    Returns the encoded bytes, or ``None`` when the image cannot be decoded,
+    is too large or ``image_format`` is not available.
+    """
+    if image_format == "avif" and not features.check("avif"):
+        return None
+    try:
+        source_file = _open_source(source)
+    except (UnidentifiedImageError, OSError, ValueError):
+        return None
+
+    current = None
+    try:
+        original_width, original_height, rotated = _oriented_size(source_file)
+        if original_width <= 0 or original_height <= 0 or (original_width * original_height) > max_pixels:
+            return None
+
+        scale = min(1.0, width / float(original_width))
+        if height:
+            scale = min(1.0, max(scale, height / float(original_height)))
+            target_width = min(width, original_width)
+            target_height = min(height, original_height)
+            if target_width * height != target_height * width:
+                # keep the requested aspect ratio when the original is too small
+                ratio = min(target_width / float(width), target_height / float(height))
+                target_width = max(1, int(round(width * ratio)))
+                target_height = max(1, int(round(height * ratio)))
+        else:
+            target_width = max(1, int(round(original_width * scale)))
+            target_height = max(1, int(round(original_height * scale)))
+
+        decode_source, source_file = source_file, None
+        current = _decode_scaled(
+            decode_source,
+            max(1, int(math.ceil(original_width * scale))),
+            max(1, int(math.ceil(original_height * scale))),
+            rotated,
+        )
+        if height:
+            rendered = ImageOps.fit(
+                current,
+                (target_width, target_height),
+                method=_RESAMPLING.LANCZOS,
+                centering=(0.5, 0.5),
+            )
+        else:
+            rendered = current.resize((target_width, target_height), _RESAMPLING.LANCZOS)
+        current.close()
+        current = rendered
+
+        if image_format == "avif":
+            return encode_avif(current, avif_quality, avif_speed)
+        if image_format == "jpg":
+            buffer = io.BytesIO()
+            current.save(buffer, format="JPEG", quality=quality, optimize=True, progressive=True)
+            return buffer.getvalue()
+        return encode_webp(current, quality, method)
+    except (UnidentifiedImageError, OSError, ValueError):
+        return None
+    finally:
+        if current is not None:
+            current.close()
+        if source_file is not None:
+            source_file.close()
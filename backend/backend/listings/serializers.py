@@ -26,6 +26,8 @@ from .models import (
     LISTING_DEFAULT_CURRENCY,
 )
 from decimal import Decimal, InvalidOperation
+from .ingestion import ImageIngestionError, validate_image_upload
+from .renditions import RENDITION_FORMATS, RENDITION_MIME_TYPES
 from .risk_scoring import (
     describe_risk_flags_bg,
     evaluate_listing_risk,
@@ -92,12 +94,12 @@ def _image_original_path(image_obj):
     return _file_field_name(image_field)
 
 
-def _extract_webp_renditions(image_obj):
+def _extract_renditions(image_obj, image_format='webp'):
     if not image_obj:
         return []
 
     payload = getattr(image_obj, 'renditions', None)
-    raw_items = payload.get('webp') if isinstance(payload, dict) else None
+    raw_items = payload.get(image_format) if isinstance(payload, dict) else None
 
     normalized = []
     if isinstance(raw_items, list):
@@ -113,18 +115,17 @@ def _extract_webp_renditions(image_obj):
                 continue
             height = _to_positive_int(raw.get('height'))
             kind = str(raw.get('kind') or '').strip() or ('grid' if width <= 600 else 'detail')
-            image_format = str(raw.get('format') or 'webp').strip().lower() or 'webp'
             normalized.append(
                 {
                     'width': width,
                     'height': height,
                     'kind': kind,
-                    'format': image_format,
+                    'format': str(raw.get('format') or image_format).strip().lower() or image_format,
                     'path': path,
                 }
             )
 
-    if not normalized:
+    if not normalized and image_format == 'webp':
         thumbnail_field = getattr(image_obj, 'thumbnail', None)
         thumbnail_path = _file_field_name(thumbnail_field)
         if thumbnail_path:
@@ -148,6 +149,7 @@ def _serialize_image_renditions(
     allowed_kinds=None,
     allowed_widths=None,
     max_width=None,
+    image_format='webp',
 ):
     serialized = []
     normalized_allowed_kinds = {
@@ -162,7 +164,7 @@ def _serialize_image_renditions(
     normalized_allowed_widths.discard(None)
     normalized_max_width = _to_positive_int(max_width)
 
-    for item in _extract_webp_renditions(image_obj):
+    for item in _extract_renditions(image_obj, image_format):
         kind = str(item.get('kind') or 'detail').strip().lower() or 'detail'
         width = _to_positive_int(item.get('width'))
         if width is None:
@@ -210,6 +212,30 @@ def _build_srcset_webp(
     return ", ".join(parts)
 
 
+def _build_picture_sources(image_obj, **options):
+    """``<source type srcset>`` rows, best format first, for a ``<picture>`` element."""
+    sources = []
+    for image_format in RENDITION_FORMATS:
+        items = _serialize_image_renditions(image_obj, image_format=image_format, **options)
+        if not items:
+            continue
+        sources.append(
+            {
+                'type': RENDITION_MIME_TYPES[image_format],
+                'srcset': ", ".join(f"{item['url']} {item['width']}w" for item in items),
+            }
+        )
+    return sources
+
+
+def _image_placeholder(image_obj):
+    payload = getattr(image_obj, 'renditions', None) if image_obj else None
+    if not isinstance(payload, dict):
+        return None
+    placeholder = payload.get('placeholder')
+    return placeholder if isinstance(placeholder, str) and placeholder.startswith('data:image/') else None
+
+
 def _parse_positive_limit(value):
     number = _to_positive_int(value)
     return number if number and number > 0 else None
@@ -519,6 +545,8 @@ class CarImageSerializer(serializers.ModelSerializer):
     original_url = serializers.SerializerMethodField()
     renditions = serializers.SerializerMethodField()
     srcset_webp = serializers.SerializerMethodField()
+    sources = serializers.SerializerMethodField()
+    placeholder = serializers.SerializerMethodField()
 
     class Meta:
         model = CarImage
@@ -529,6 +557,8 @@ class CarImageSerializer(serializers.ModelSerializer):
             'thumbnail',
             'renditions',
             'srcset_webp',
+            'sources',
+            'placeholder',
             'original_width',
             'original_height',
             'low_res',
@@ -541,6 +571,8 @@ class CarImageSerializer(serializers.ModelSerializer):
             'original_url',
             'renditions',
             'srcset_webp',
+            'sources',
+            'placeholder',
             'original_width',
             'original_height',
             'low_res',
@@ -559,6 +591,12 @@ class CarImageSerializer(serializers.ModelSerializer):
     def get_srcset_webp(self, obj):
         return _build_srcset_webp(obj, **self._rendition_options())
 
+    def get_sources(self, obj):
+        return _build_picture_sources(obj, **self._rendition_options())
+
+    def get_placeholder(self, obj):
+        return _image_placeholder(obj)
+
 
 class CarImageListSerializer(CarImageSerializer):
     """Compact image payload for list/grid cards."""
@@ -570,6 +608,8 @@ class CarImageListSerializer(CarImageSerializer):
             'original_url',
             'thumbnail',
             'renditions',
+            'sources',
+            'placeholder',
             'order',
             'is_cover',
         ]
@@ -593,6 +633,7 @@ class CarImageDetailSerializer(CarImageSerializer):
             'original_url',
             'thumbnail',
             'renditions',
+            'sources',
             'original_width',
             'original_height',
             'low_res',
@@ -627,6 +668,7 @@ class BaseListingLiteSerializer(ListingPriceFieldsMixin, serializers.ModelSerial
     fuel_display = serializers.SerializerMethodField()
     listing_type_display = serializers.SerializerMethodField()
     image_url = serializers.SerializerMethodField()
+    image_placeholder = serializers.SerializerMethodField()
     photo = serializers.SerializerMethodField()
     price_change = serializers.SerializerMethodField()
     part_for = serializers.SerializerMethodField()
@@ -637,7 +679,7 @@ class BaseListingLiteSerializer(ListingPriceFieldsMixin, serializers.ModelSerial
         fields = [
             'id', 'slug', 'main_category', 'title', 'display_title', 'brand', 'model', 'year_from', 'price', 'currency', 'price_eur', 'price_bgn', 'mileage',
             'fuel', 'fuel_display', 'power', 'city', 'created_at',
-            'listing_type', 'listing_type_display', 'image_url', 'photo', 'price_change',
+            'listing_type', 'listing_type_display', 'image_url', 'image_placeholder', 'photo', 'price_change',
             'is_kaparirano',
             'part_for', 'part_element',
         ]
@@ -677,6 +719,9 @@ class BaseListingLiteSerializer(ListingPriceFieldsMixin, serializers.ModelSerial
             return _normalize_media_path(first_image)
         return _select_image_url(self._get_cover_image(obj), preferred_kind='grid', preferred_width=600)
 
+    def get_image_placeholder(self, obj):
+        return _image_placeholder(self._get_cover_image(obj))
+
     def get_photo(self, obj):
         image_obj = self._get_cover_image(obj)
         if not image_obj:
@@ -751,6 +796,7 @@ class BaseListingListSerializer(ListingPriceFieldsMixin, serializers.ModelSerial
     category_display = serializers.SerializerMethodField()
     listing_type_display = serializers.SerializerMethodField()
     image_url = serializers.SerializerMethodField()
+    image_placeholder = serializers.SerializerMethodField()
     photo = serializers.SerializerMethodField()
     images = serializers.SerializerMethodField()
     is_favorited = serializers.SerializerMethodField()
@@ -768,7 +814,7 @@ class BaseListingListSerializer(ListingPriceFieldsMixin, serializers.ModelSerial
             'description_preview', 'created_at', 'updated_at',
             'listing_type', 'listing_type_display',
             'is_active', 'is_draft', 'is_archived', 'is_kaparirano',
-            'image_url', 'photo', 'images', 'is_favorited', 'seller_name', 'seller_type', 'price_change'
+            'image_url', 'image_placeholder', 'photo', 'images', 'is_favorited', 'seller_name', 'seller_type', 'price_change'
         ]
         read_only_fields = fields
 
@@ -807,6 +853,9 @@ class BaseListingListSerializer(ListingPriceFieldsMixin, serializers.ModelSerial
             return _normalize_media_path(first_image)
         return None
 
+    def get_image_placeholder(self, obj):
+        return _image_placeholder(self._get_cover_image(obj))
+
     def get_photo(self, obj):
         image_obj = self._get_cover_image(obj)
         if not image_obj:
@@ -920,7 +969,7 @@ class BaseListingSearchCompactSerializer(BaseListingListSerializer):
             'fuel_display', 'gearbox_display', 'category_display', 'condition_display',
             'description_preview', 'created_at', 'updated_at',
             'listing_type', 'listing_type_display',
-            'is_kaparirano', 'image_url', 'photo', 'images', 'is_favorited', 'seller_name', 'seller_type', 'price_change'
+            'is_kaparirano', 'image_url', 'image_placeholder', 'photo', 'images', 'is_favorited', 'seller_name', 'seller_type', 'price_change'
         ]
         read_only_fields = fields
 
@@ -1618,6 +1667,14 @@ class BaseListingSerializer(ListingPriceFieldsMixin, serializers.ModelSerializer
             payload[field_name] = str(raw_value).strip()
         return payload
 
+    def validate_images_upload(self, value):
+        for image in value or []:
+            try:
+                validate_image_upload(image)
+            except ImageIngestionError as exc:
+                raise serializers.ValidationError(str(exc))
+        return value
+
     def validate(self, attrs):
         main_category = _canonical_main_category(
             attrs.get("main_category", self.instance.main_category if self.instance else "cars"),
@@ -2002,14 +2059,7 @@ class BaseListingSerializer(ListingPriceFieldsMixin, serializers.ModelSerializer
         listing = BaseListing.objects.create(**validated_data)
         self._upsert_details(listing, detail_payload)
 
-        for index, image in enumerate(images_data):
-            is_cover = index == 0 and len(images_data) > 0
-            CarImage.objects.create(
-                listing=listing,
-                image=image,
-                order=index,
-                is_cover=is_cover
-            )
+        CarImage.bulk_ingest(listing, images_data, start_order=0, assign_cover=True)
 
         return listing
 
@@ -2027,14 +2077,7 @@ class BaseListingSerializer(ListingPriceFieldsMixin, serializers.ModelSerializer
         instance.save()
         self._upsert_details(instance, detail_payload)
 
-        existing_count = instance.images.count()
-        for index, image in enumerate(images_data):
-            CarImage.objects.create(
-                listing=instance,
-                image=image,
-                order=existing_count + index,
-                is_cover=False
-            )
+        CarImage.bulk_ingest(instance, images_data)
 
         return instance
 
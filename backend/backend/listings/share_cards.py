@@ -0,0 +1,147 @@
+"""
+Open Graph share cards for listings.
+
+A card (title, price, key facts and the cover photo on the dealer-card
+layout) is rendered in the background when a listing is published or its
+price, title or photos change, never on a crawler request. Cards are stored
+once under a name derived from everything drawn on them, so a stored card is
+immutable and ``BaseListing.share_image`` simply switches to the new name.
+Cached pages and crawlers may still point at the previous card, so it is left
+in place for ``manage.py gc_share_cards`` to delete after a grace period.
+"""
+
+import hashlib
+import json
+import logging
+from urllib.parse import quote
+
+from django.core.files.storage import default_storage
+from PIL import Image as PILImage
+
+from backend.accounts.prerender import encode_card_jpeg, render_listing_card_image
+
+from .models import BaseListing, CarImage
+from .prerender import (
+    _format_mileage_label,
+    _format_price_label,
+    _normalize_listing_title,
+    _normalize_slug,
+    _to_positive_int,
+    _trim_to_value,
+)
+from .storage_io import resolve_storage_name, store_files
+
+logger = logging.getLogger(__name__)
+
+SHARE_CARD_STORAGE_PREFIX = "share_cards/listings"
+SHARE_CARD_SOURCE_MIN_WIDTH = 600
+
+
+def _get_cover_image(listing_id):
+    return (
+        CarImage.objects.filter(listing_id=listing_id)
+        .only("id", "image", "renditions", "is_cover", "order")
+        .order_by("-is_cover", "order", "id")
+        .first()
+    )
+
+
+def _pick_cover_source_name(cover):
+    """Smallest WebP rendition that still fills the photo slot; the original otherwise."""
+    renditions = getattr(cover, "renditions", None)
+    rows = renditions.get("webp") if isinstance(renditions, dict) else None
+    candidates = []
+    for row in rows or []:
+        if not isinstance(row, dict):
+            continue
+        width = _to_positive_int(row.get("width"))
+        path = _trim_to_value(row.get("path") or row.get("url"))
+        if width and path and width >= SHARE_CARD_SOURCE_MIN_WIDTH:
+            candidates.append((width, path))
+    if candidates:
+        return min(candidates)[1]
+    return _trim_to_value(getattr(cover.image, "name", ""))
+
+
+def _build_card_fields(listing, cover):
+    facts = []
+    year = _to_positive_int(getattr(listing, "year_from", None))
+    if year:
+        facts.append(str(year))
+    if _to_positive_int(getattr(listing, "mileage", None)):
+        facts.append(_format_mileage_label(listing.mileage))
+    fuel_label = _trim_to_value(listing.get_fuel_display())
+    if fuel_label:
+        facts.append(fuel_label)
+
+    return {
+        "title": _normalize_listing_title(listing),
+        "price_label": _format_price_label(listing.price, getattr(listing, "currency", None)),
+        "subtitle": _trim_to_value(listing.city, fallback="България"),
+        "chips": facts,
+        "badge_text": f"www.kar.bg/details/{quote(_normalize_slug(listing), safe='-_~')}"[:60],
+        # the original's name, not the rendition picked for drawing, so finishing
+        # renditions later does not count as a photo change
+        "cover": _trim_to_value(getattr(cover.image, "name", "")) if cover is not None else "",
+    }
+
+
+def build_share_card_name(listing, cover):
+    """Storage name of the card for the listing's current title, price, facts and cover photo."""
+    fields = _build_card_fields(listing, cover)
+    digest = hashlib.sha256(
+        json.dumps(fields, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    ).hexdigest()[:24]
+    return f"{SHARE_CARD_STORAGE_PREFIX}/{listing.id}/{digest}.jpg"
+
+
+def _load_cover_photo(cover_name):
+    if not cover_name:
+        return None
+    storage = CarImage._meta.get_field("image").storage
+    try:
+        with storage.open(resolve_storage_name(storage, cover_name), "rb") as cover_file:
+            with PILImage.open(cover_file) as image:
+                image.draft("RGB", (600, 600))
+                return image.convert("RGB")
+    except Exception as exc:
+        logger.info("Share card cover %s could not be read: %s", cover_name, exc)
+        return None
+
+
+def render_listing_share_card(listing, cover):
+    fields = _build_card_fields(listing, cover)
+    card_image = render_listing_card_image(
+        title=fields["title"],
+        price_label=fields["price_label"],
+        subtitle=fields["subtitle"],
+        chips=fields["chips"],
+        badge_text=fields["badge_text"],
+        photo=_load_cover_photo(_pick_cover_source_name(cover)) if cover is not None else None,
+    )
+    return encode_card_jpeg(card_image)
+
+
+def generate_listing_share_card(listing_id):
+    """
+    Make sure the published listing has the card for its current state.
+    Returns the card's storage name, or ``""`` for drafts and missing listings.
+    """
+    listing = (
+        BaseListing.objects.filter(pk=listing_id, is_draft=False, is_active=True, is_archived=False)
+        .select_related("cars_details")
+        .first()
+    )
+    if listing is None:
+        return ""
+
+    cover = _get_cover_image(listing.id)
+    card_name = build_share_card_name(listing, cover)
+    if listing.share_image == card_name:
+        return card_name
+
+    store_files(default_storage, [{"path": card_name, "content": render_listing_share_card(listing, cover)}])
+    # update() keeps updated_at (and the listing's own post_save) out of it
+    BaseListing.objects.filter(pk=listing.id).update(share_image=card_name)
+    return card_name
+
@@ -0,0 +1,218 @@
+"""
+XML sitemaps for crawlers.
+
+``/sitemap.xml`` is a sitemap index pointing at one sitemap per id range of
+live listings and of dealers (``/sitemaps/listings-<n>.xml``). Ranges are
+``SITEMAP_CHUNK_SIZE`` ids wide, so no sitemap exceeds the 50k-URL limit and a
+listing always stays in the same sitemap. A range is fingerprinted with one
+aggregate over the primary key (row count, id sum, newest ``updated_at``);
+its XML is cached against that fingerprint and only rebuilt when the range
+changed. Rebuilds walk the range by keyset and are streamed to the client.
+Sitemap bytes go to the ``prerender`` cache, away from the small hot keys of
+the default cache.
+"""
+
+import hashlib
+from html import escape
+from urllib.parse import quote
+
+from django.conf import settings
+from django.db.models import Count, F, IntegerField, Max, Sum, Value
+from django.db.models.functions import Cast
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import quote_etag
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny
+
+from backend.accounts.models import BusinessUser
+
+from .models import BaseListing, get_expiry_cutoff
+from .prerender import _if_none_match_matches, _resolve_frontend_base_url, get_prerender_cache
+
+SITEMAP_MAX_URLS = 50_000
+SITEMAP_QUERY_BATCH_SIZE = 2000
+SITEMAP_CACHE_SECONDS = 24 * 60 * 60
+SITEMAP_INDEX_CACHE_SECONDS = 5 * 60
+SITEMAP_PUBLIC_CACHE_SECONDS = 60 * 60
+SITEMAP_SECTIONS = ("listings", "dealers")
+
+_XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+_SITEMAP_NAMESPACE = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+
+def _resolve_chunk_size():
+    try:
+        chunk_size = int(getattr(settings, "SITEMAP_CHUNK_SIZE", SITEMAP_MAX_URLS))
+    except (TypeError, ValueError):
+        chunk_size = SITEMAP_MAX_URLS
+    return max(1, min(SITEMAP_MAX_URLS, chunk_size))
+
+
+def _get_section_queryset(section):
+    if section == "listings":
+        return BaseListing.objects.filter(
+            is_active=True,
+            is_draft=False,
+            is_archived=False,
+            created_at__gte=get_expiry_cutoff(),
+        )
+    return BusinessUser.objects.all()
+
+
+def _format_lastmod(value):
+    return value.replace(microsecond=0).isoformat() if value else ""
+
+
+def _build_fingerprint(section, chunk_size, count, id_sum, last_modified):
+    # full precision: two saves within one second must still change the fingerprint
+    raw_value = f"{section}:{chunk_size}:{count}:{id_sum}:{last_modified.isoformat() if last_modified else ''}"
+    return hashlib.sha256(raw_value.encode("utf-8")).hexdigest()[:32]
+
+
+def _collect_section_chunks(section, chunk_size):
+    """``[(chunk, fingerprint, last_modified)]`` for every non-empty id range, in one grouped query."""
+    rows = (
+        _get_section_queryset(section)
+        .annotate(chunk=Cast(F("id") / Value(chunk_size), output_field=IntegerField()))
+        .values("chunk")
+        .annotate(count=Count("id"), id_sum=Sum("id"), last_modified=Max("updated_at"))
+        .order_by("chunk")
+    )
+    return [
+        (
+            row["chunk"],
+            _build_fingerprint(section, chunk_size, row["count"], row["id_sum"], row["last_modified"]),
+            row["last_modified"],
+        )
+        for row in rows
+    ]
+
+
+def _get_chunk_fingerprint(section, chunk, chunk_size):
+    start_id = chunk * chunk_size
+    summary = (
+        _get_section_queryset(section)
+        .filter(id__gte=start_id, id__lt=start_id + chunk_size)
+        .aggregate(count=Count("id"), id_sum=Sum("id"), last_modified=Max("updated_at"))
+    )
+    if not summary["count"]:
+        return None
+    return _build_fingerprint(section, chunk_size, summary["count"], summary["id_sum"], summary["last_modified"])
+
+
+def _chunk_cache_key(section, chunk, chunk_size):
+    return f"sitemap:{section}:{chunk_size}:{chunk}"
+
+
+def _build_url_entry(location, last_modified):
+    lastmod = _format_lastmod(last_modified)
+    lastmod_xml = f"<lastmod>{lastmod}</lastmod>" if lastmod else ""
+    return f"<url><loc>{escape(location)}</loc>{lastmod_xml}</url>\n"
+
+
+def _iter_section_entries(section, chunk, chunk_size):
+    frontend_base_url = _resolve_frontend_base_url()
+    start_id = chunk * chunk_size
+    end_id = start_id + chunk_size
+    if section == "listings":
+        fields = ("id", "slug", "updated_at")
+    else:
+        fields = ("id", "public_slug", "updated_at")
+    queryset = _get_section_queryset(section).filter(id__lt=end_id).order_by("id").values(*fields)
+
+    last_id = start_id - 1
+    while True:
+        rows = list(queryset.filter(id__gt=last_id)[:SITEMAP_QUERY_BATCH_SIZE])
+        if not rows:
+            return
+        last_id = rows[-1]["id"]
+        entries = []
+        for row in rows:
+            if section == "listings":
+                slug = str(row["slug"] or "").strip() or f"obiava-{row['id']}"
+                location = f"{frontend_base_url}/details/{quote(slug, safe='-_~')}"
+            else:
+                location = f"{frontend_base_url}/dealers/{quote(row['public_slug'], safe='-_~')}"
+            entries.append(_build_url_entry(location, row["updated_at"]))
+        yield "".join(entries).encode("utf-8")
+
+
+def _stream_and_cache_chunk(section, chunk, chunk_size, fingerprint):
+    parts = [f'{_XML_HEADER}<urlset xmlns="{_SITEMAP_NAMESPACE}">\n'.encode("utf-8")]
+    yield parts[0]
+    for part in _iter_section_entries(section, chunk, chunk_size):
+        parts.append(part)
+        yield part
+    parts.append(b"</urlset>\n")
+    yield parts[-1]
+    # only a fully sent sitemap is cached
+    get_prerender_cache().set(
+        _chunk_cache_key(section, chunk, chunk_size), (fingerprint, b"".join(parts)), SITEMAP_CACHE_SECONDS
+    )
+
+
+def build_sitemap_index():
+    """Encoded sitemap index; cached briefly since it costs one grouped query per section."""
+    chunk_size = _resolve_chunk_size()
+    cache_key = f"sitemap:index:{chunk_size}"
+    cached = get_prerender_cache().get(cache_key)
+    if cached is not None:
+        return cached
+
+    frontend_base_url = _resolve_frontend_base_url()
+    entries = []
+    for section in SITEMAP_SECTIONS:
+        for chunk, _, last_modified in _collect_section_chunks(section, chunk_size):
+            location = f"{frontend_base_url}/sitemaps/{section}-{chunk}.xml"
+            lastmod = _format_lastmod(last_modified)
+            lastmod_xml = f"<lastmod>{lastmod}</lastmod>" if lastmod else ""
+            entries.append(f"<sitemap><loc>{escape(location)}</loc>{lastmod_xml}</sitemap>\n")
+    index_bytes = (
+        f'{_XML_HEADER}<sitemapindex xmlns="{_SITEMAP_NAMESPACE}">\n'
+        + "".join(entries)
+        + "</sitemapindex>\n"
+    ).encode("utf-8")
+    get_prerender_cache().set(cache_key, index_bytes, SITEMAP_INDEX_CACHE_SECONDS)
+    return index_bytes
+
+
+def _apply_sitemap_headers(response, etag=None):
+    response["Cache-Control"] = f"public, max-age={SITEMAP_PUBLIC_CACHE_SECONDS}"
+    if etag:
+        response["ETag"] = etag
+    patch_vary_headers(response, ("Accept-Encoding",))
+    return response
+
+
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def sitemap_index(request):
+    return _apply_sitemap_headers(
+        HttpResponse(build_sitemap_index(), content_type="application/xml; charset=utf-8")
+    )
+
+
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def sitemap_chunk(request, section, chunk):
+    if section not in SITEMAP_SECTIONS:
+        raise Http404("Unknown sitemap.")
+    chunk_size = _resolve_chunk_size()
+    fingerprint = _get_chunk_fingerprint(section, chunk, chunk_size)
+    if fingerprint is None:
+        raise Http404("Empty sitemap.")
+
+    etag = quote_etag(fingerprint)
+    if _if_none_match_matches(request, etag):
+        return _apply_sitemap_headers(HttpResponse(status=304), etag)
+
+    cached = get_prerender_cache().get(_chunk_cache_key(section, chunk, chunk_size))
+    if cached is not None and cached[0] == fingerprint:
+        response = HttpResponse(cached[1], content_type="application/xml; charset=utf-8")
+    else:
+        response = StreamingHttpResponse(
+            _stream_and_cache_chunk(section, chunk, chunk_size, fingerprint),
+            content_type="application/xml; charset=utf-8",
+        )
+    return _apply_sitemap_headers(response, etag)
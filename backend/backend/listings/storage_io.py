@@ -0,0 +1,329 @@
+"""
+Storage I/O for listing media.
+
+Rendition uploads and deletions go through here instead of one storage call
+per file. On S3-compatible storage (DigitalOcean Spaces) a single,
+connection-pooled boto3 client is shared by every thread: uploads of one
+image run in parallel and deletions are sent as ``DeleteObjects`` batches.
+Any other storage backend (local ``FileSystemStorage`` in development) is
+driven through the regular storage API.
+"""
+
+import hashlib
+import logging
+import mimetypes
+import os
+import posixpath
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone as dt_timezone
+from threading import Lock
+from urllib.parse import unquote, urlparse
+
+from botocore.config import Config
+from django.conf import settings
+from django.core.files.base import ContentFile
+from storages.backends.s3 import S3Storage
+from storages.utils import clean_name
+
+logger = logging.getLogger(__name__)
+
+S3_DELETE_BATCH_SIZE = 1000  # DeleteObjects hard limit
+S3_LIST_PAGE_SIZE = 1000
+
+StoredObject = namedtuple("StoredObject", ["name", "size", "modified"])
+
+_STORAGE_IO_EXECUTOR = None
+_STORAGE_IO_EXECUTOR_LOCK = Lock()
+_S3_CLIENTS = {}
+_S3_CLIENTS_LOCK = Lock()
+
+
+def _resolve_storage_io_worker_count():
+    raw_value = getattr(settings, "MEDIA_STORAGE_IO_WORKERS", 8)
+    try:
+        parsed = int(raw_value)
+    except (TypeError, ValueError):
+        parsed = 8
+    return max(1, min(32, parsed))
+
+
+def _get_storage_io_executor():
+    global _STORAGE_IO_EXECUTOR
+    if _STORAGE_IO_EXECUTOR is not None:
+        return _STORAGE_IO_EXECUTOR
+
+    with _STORAGE_IO_EXECUTOR_LOCK:
+        if _STORAGE_IO_EXECUTOR is None:
+            _STORAGE_IO_EXECUTOR = ThreadPoolExecutor(
+                max_workers=_resolve_storage_io_worker_count(),
+                thread_name_prefix="media-storage-io",
+            )
+    return _STORAGE_IO_EXECUTOR
+
+
+def _is_s3_storage(storage):
+    return isinstance(storage, S3Storage)
+
+
+def _build_s3_client(storage):
+    # One pool slot per I/O worker plus headroom for request threads.
+    config = storage.client_config.merge(
+        Config(
+            max_pool_connections=_resolve_storage_io_worker_count() + 4,
+            tcp_keepalive=True,
+        )
+    )
+    return storage._create_session().client(
+        "s3",
+        region_name=storage.region_name,
+        use_ssl=storage.use_ssl,
+        endpoint_url=storage.endpoint_url,
+        config=config,
+        verify=storage.verify,
+    )
+
+
+def get_s3_client(storage):
+    """Return the process-wide boto3 client for ``storage`` (clients are thread-safe)."""
+    client_key = (
+        storage.endpoint_url,
+        storage.region_name,
+        storage.access_key,
+        storage.session_profile,
+    )
+    client = _S3_CLIENTS.get(client_key)
+    if client is not None:
+        return client
+    with _S3_CLIENTS_LOCK:
+        client = _S3_CLIENTS.get(client_key)
+        if client is None:
+            client = _build_s3_client(storage)
+            _S3_CLIENTS[client_key] = client
+    return client
+
+
+def resolve_storage_name(storage, raw_name):
+    """
+    Turn a stored value (storage name, ``/media/...`` path or absolute CDN URL
+    from older rows) into the storage-relative name, without probing storage.
+    """
+    value = unquote(str(raw_name or "").strip())
+    if not value:
+        return ""
+
+    is_url = value.startswith("//") or "://" in value
+    if value.startswith("//"):
+        value = urlparse(f"https:{value}").path
+    elif "://" in value:
+        value = urlparse(value).path
+    value = value.lstrip("/")
+
+    bucket_name = str(getattr(storage, "bucket_name", "") or "").strip()
+    if is_url and bucket_name and value.startswith(f"{bucket_name}/"):
+        value = value[len(bucket_name) + 1:]
+
+    media_prefix = urlparse(str(settings.MEDIA_URL or "")).path.strip("/")
+    if media_prefix and value.startswith(f"{media_prefix}/"):
+        value = value[len(media_prefix) + 1:]
+
+    location_prefix = str(getattr(storage, "location", "") or "").strip().strip("/")
+    if location_prefix and value.startswith(f"{location_prefix}/"):
+        value = value[len(location_prefix) + 1:]
+    return value
+
+
+def _resolve_s3_key(storage, name):
+    return storage._normalize_name(clean_name(name))
+
+
+def _put_s3_object(storage, client, path, content):
+    key = _resolve_s3_key(storage, path)
+    params = storage.get_object_parameters(key)
+    if "ContentType" not in params:
+        content_type, _ = mimetypes.guess_type(key)
+        params["ContentType"] = content_type or storage.default_content_type
+    if "ACL" not in params and storage.default_acl:
+        params["ACL"] = storage.default_acl
+    # PUT replaces the object in place, so there is nothing to delete first.
+    client.put_object(Bucket=storage.bucket_name, Key=key, Body=content, **params)
+    return path
+
+
+def _replace_file(storage, path, content):
+    try:
+        storage.delete(path)
+    except Exception:
+        pass
+    saved_name = storage.save(path, ContentFile(content))
+    if saved_name != path:
+        logger.warning("Storage stored '%s' as '%s' instead of overwriting it.", path, saved_name)
+    return saved_name
+
+
+def store_files(storage, files):
+    """
+    Write ``files`` (``{"path", "content"}`` dicts, content as bytes) to their
+    exact paths, replacing existing objects. Uploads run in parallel on the
+    shared I/O pool; the first failure is re-raised once all uploads settled.
+    """
+    files = [item for item in files or [] if item.get("path")]
+    if not files:
+        return []
+
+    if _is_s3_storage(storage):
+        client = get_s3_client(storage)
+
+        def write(item):
+            return _put_s3_object(storage, client, item["path"], item["content"])
+    else:
+
+        def write(item):
+            return _replace_file(storage, item["path"], item["content"])
+
+    if len(files) == 1:
+        return [write(files[0])]
+
+    futures = [_get_storage_io_executor().submit(write, item) for item in files]
+    stored_paths = []
+    first_error = None
+    for future in futures:
+        try:
+            stored_paths.append(future.result())
+        except Exception as exc:
+            first_error = first_error or exc
+    if first_error is not None:
+        raise first_error
+    return stored_paths
+
+
+def delete_paths(storage, names):
+    """
+    Best-effort removal of ``names``. S3 keys are resolved once and deleted in
+    ``DeleteObjects`` batches; failures are logged, never raised.
+    """
+    resolved = []
+    seen = set()
+    for raw_name in names or []:
+        name = resolve_storage_name(storage, raw_name)
+        if name and name not in seen:
+            seen.add(name)
+            resolved.append(name)
+    if not resolved:
+        return 0
+
+    if not _is_s3_storage(storage):
+        deleted = 0
+        for name in resolved:
+            try:
+                storage.delete(name)
+                deleted += 1
+            except Exception as exc:
+                logger.warning("Failed to delete storage object '%s': %s", name, exc)
+        return deleted
+
+    client = get_s3_client(storage)
+    keys = [_resolve_s3_key(storage, name) for name in resolved]
+    deleted = 0
+    for start in range(0, len(keys), S3_DELETE_BATCH_SIZE):
+        batch = keys[start:start + S3_DELETE_BATCH_SIZE]
+        try:
+            response = client.delete_objects(
+                Bucket=storage.bucket_name,
+                Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+            )
+        except Exception as exc:
+            logger.warning("Failed to delete %s storage objects: %s", len(batch), exc)
+            continue
+        errors = response.get("Errors") or []
+        for error in errors[:10]:
+            logger.warning(
+                "Failed to delete storage object '%s': %s",
+                error.get("Key"),
+                error.get("Message") or error.get("Code"),
+            )
+        deleted += len(batch) - len(errors)
+    return deleted
+
+
+def iter_storage_objects(storage, prefix):
+    """
+    Yield :class:`StoredObject` rows (storage-relative name, size in bytes,
+    aware modification time) for everything under ``prefix``, one listing
+    page at a time so memory does not grow with the bucket.
+    """
+    prefix = str(prefix or "").strip().strip("/")
+    if _is_s3_storage(storage):
+        location_prefix = str(storage.location or "").strip().strip("/")
+        key_prefix = _resolve_s3_key(storage, prefix) if prefix else location_prefix
+        key_prefix = f"{key_prefix}/" if key_prefix else ""
+        paginator = get_s3_client(storage).get_paginator("list_objects_v2")
+        pages = paginator.paginate(
+            Bucket=storage.bucket_name,
+            Prefix=key_prefix,
+            PaginationConfig={"PageSize": S3_LIST_PAGE_SIZE},
+        )
+        for page in pages:
+            for entry in page.get("Contents", ()):
+                key = entry["Key"]
+                if location_prefix and key.startswith(f"{location_prefix}/"):
+                    key = key[len(location_prefix) + 1:]
+                yield StoredObject(key, int(entry.get("Size") or 0), entry["LastModified"])
+        return
+
+    root = storage.path("")
+    start_dir = storage.path(prefix) if prefix else root
+    for dir_path, dir_names, file_names in os.walk(start_dir):
+        dir_names.sort()
+        for file_name in sorted(file_names):
+            full_path = os.path.join(dir_path, file_name)
+            try:
+                stat_result = os.stat(full_path)
+            except OSError:
+                continue
+            name = os.path.relpath(full_path, root).replace(os.sep, "/")
+            modified = datetime.fromtimestamp(stat_result.st_mtime, tz=dt_timezone.utc)
+            yield StoredObject(name, stat_result.st_size, modified)
+
+
+def list_names_with_prefix(storage, name_prefix):
+    """
+    Storage-relative names that start with ``name_prefix`` (a directory plus
+    the leading part of a file name). On S3 this is one ``Prefix`` listing of
+    just those keys rather than the whole directory.
+    """
+    name_prefix = str(name_prefix or "").lstrip("/")
+    directory, file_prefix = posixpath.split(name_prefix)
+    if _is_s3_storage(storage):
+        location_prefix = str(storage.location or "").strip().strip("/")
+        paginator = get_s3_client(storage).get_paginator("list_objects_v2")
+        pages = paginator.paginate(
+            Bucket=storage.bucket_name,
+            Prefix=_resolve_s3_key(storage, name_prefix),
+            PaginationConfig={"PageSize": S3_LIST_PAGE_SIZE},
+        )
+        names = []
+        for page in pages:
+            for entry in page.get("Contents", ()):
+                key = entry["Key"]
+                if location_prefix and key.startswith(f"{location_prefix}/"):
+                    key = key[len(location_prefix) + 1:]
+                names.append(key)
+        return names
+
+    try:
+        _, file_names = storage.listdir(directory)
+    except (FileNotFoundError, NotADirectoryError):
+        return []
+    return [posixpath.join(directory, name) for name in file_names if name.startswith(file_prefix)]
+
+
+def name_digest(name):
+    """Compact digest of a storage name for the garbage collectors' reference sets."""
+    # 8-byte digests keep millions of references in memory; a collision can
+    # only keep an orphan alive, never delete a referenced file.
+    return int.from_bytes(hashlib.blake2b(name.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def format_bytes(size):
+    return f"{size} bytes ({size / (1024 * 1024):.1f} MB)"
@@ -1,16 +1,62 @@
-﻿from decimal import Decimal
+﻿import asyncio
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+import gzip
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import skipUnless
+from unittest.mock import patch
+from xml.etree import ElementTree
+
+from PIL import Image as PILImage
+
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import InMemoryChannelLayer, get_channel_layer
+from channels.testing import WebsocketCommunicator
 
 from django.contrib.auth import get_user_model
 from django.core import mail
-from django.core.cache import cache
+from django.core.cache import cache, caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.text import slugify
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
 
+from backend.accounts import prerender as accounts_prerender
 from backend.accounts.models import BusinessUser, PrivateUser
-from .models import BaseListing, CarsListing, MotoListing, PartsListing, transliterate_slug_text
-from .serializers import BaseListingSerializer, _build_moto_meta_features
+from backend import notifications_consumers
+from backend.channel_layers import PostgresChannelLayer
+from . import derivatives as listing_derivatives
+from . import feeds as listing_feeds
+from .ingestion import strip_jpeg_metadata
+from . import models as listing_models
+from . import prerender as listing_prerender
+from . import realtime
+from . import share_cards
+from . import storage_io
+from .models import BaseListing, CarImage, CarsListing, ImageBlob, MotoListing, PartsListing, transliterate_slug_text
+from .renditions import render_listing_image
+from .serializers import (
+    BaseListingLiteSerializer,
+    BaseListingSerializer,
+    CarImageListSerializer,
+    CarImageSerializer,
+    _build_moto_meta_features,
+)
 
 
 def _create_cars_listing(user, **overrides):
@@ -69,6 +115,18 @@ def _create_cars_listing(user, **overrides):
     return listing
 
 
+def _build_jpeg_bytes(width=1800, height=1200, color=(40, 90, 160)):
+    buffer = io.BytesIO()
+    image = PILImage.new("RGB", (width, height), color)
+    image.save(buffer, format="JPEG", quality=85)
+    image.close()
+    return buffer.getvalue()
+
+
+def _build_jpeg_upload(name="photo.jpg", **kwargs):
+    return SimpleUploadedFile(name, _build_jpeg_bytes(**kwargs), content_type="image/jpeg")
+
+
 def _create_parts_listing(user, **overrides):
     listing_payload = {
         "user": user,
@@ -1175,6 +1233,11 @@ class ListingDetailSerializerPersistenceTests(APITestCase):
 
 class ListingPrerenderCurrencyTests(APITestCase):
     def setUp(self):
+        self.media_root = tempfile.mkdtemp(prefix="karbg-media-")
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, True)
         user_model = get_user_model()
         self.owner = user_model.objects.create_user(
             username="prerender-owner",
@@ -1391,6 +1454,16 @@ class PublicProfileListingsTests(APITestCase):
         self.assertEqual(response.data["profile"]["title"], "Dealer Company One")
         self.assertEqual(response.data["listing_count"], 1)
 
+    def test_business_profile_is_looked_up_by_its_public_slug(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/profiles/Dealer-Company-One/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        business_queries = [query["sql"] for query in queries if 'FROM "accounts_businessuser"' in query["sql"]]
+        self.assertIn('"accounts_businessuser"."public_slug" = ', business_queries[0])
+        # no scan over every dealer
+        self.assertTrue(all(" WHERE " in sql for sql in business_queries))
+
 
 class ListingCarsDetailsQueryTests(APITestCase):
     def setUp(self):
@@ -1459,3 +1532,1670 @@ class ListingCarsDetailsQueryTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(results), 1)
         self.assertEqual(results[0]["brand"], "BMW")
+
+
+class CarImageRenditionEngineTests(APITestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp(prefix="karbg-media-")
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media_root,
+            CAR_IMAGE_ASYNC_RENDITIONS=False,
+        )
+        self.settings_override.enable()
+        user_model = get_user_model()
+        self.owner = user_model.objects.create_user(
+            username="rendition-owner",
+            email="rendition-owner@example.com",
+            password="testpass123",
+        )
+        self.listing = _create_cars_listing(self.owner)
+
+    def tearDown(self):
+        listing_models._reset_car_image_rendition_process_pool()
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def _render_options(self):
+        return {
+            "base_name": "sample",
+            "rendition_dir": "car_listings/renditions",
+            "detail_widths": listing_models.CAR_IMAGE_DETAIL_WIDTHS,
+            "grid_renditions": listing_models.CAR_IMAGE_GRID_RENDITIONS,
+            "quality": listing_models.CAR_IMAGE_WEBP_QUALITY,
+            "method": listing_models.CAR_IMAGE_WEBP_METHOD,
+            "max_pixels": listing_models.CAR_IMAGE_MAX_PIXELS,
+        }
+
+    def test_engine_renders_from_bytes_without_model_instances(self):
+        generated = render_listing_image(_build_jpeg_bytes(), **self._render_options())
+
+        self.assertEqual(generated["original_width"], 1800)
+        self.assertEqual(generated["original_height"], 1200)
+        self.assertEqual(
+            [(row["kind"], row["width"]) for row in generated["renditions"]],
+            [("grid", 600), ("detail", 1200), ("detail", 1600)],
+        )
+        self.assertEqual(generated["thumbnail_path"], "car_listings/renditions/sample_grid_600.webp")
+        self.assertEqual(
+            {item["path"] for item in generated["files"]},
+            {row["path"] for row in generated["renditions"]},
+        )
+        for item in generated["files"]:
+            with PILImage.open(io.BytesIO(item["content"])) as rendered:
+                self.assertEqual(rendered.format, "WEBP")
+
+    def test_engine_draft_decode_keeps_exact_rendition_sizes(self):
+        generated = render_listing_image(_build_jpeg_bytes(width=4000, height=3000), **self._render_options())
+
+        self.assertEqual((generated["original_width"], generated["original_height"]), (4000, 3000))
+        sizes = {}
+        for item in generated["files"]:
+            with PILImage.open(io.BytesIO(item["content"])) as rendered:
+                sizes[item["path"].rsplit("/", 1)[-1]] = rendered.size
+        self.assertEqual(
+            sizes,
+            {
+                "sample_grid_600.webp": (600, 356),
+                "sample_detail_1200.webp": (1200, 900),
+                "sample_detail_1600.webp": (1600, 1200),
+            },
+        )
+
+    def test_engine_reports_exif_rotated_dimensions(self):
+        buffer = io.BytesIO()
+        image = PILImage.new("RGB", (2400, 1600), (40, 90, 160))
+        exif = image.getexif()
+        exif[0x0112] = 6
+        image.save(buffer, format="JPEG", quality=85, exif=exif.tobytes())
+        image.close()
+
+        generated = render_listing_image(buffer.getvalue(), **self._render_options())
+
+        self.assertEqual((generated["original_width"], generated["original_height"]), (1600, 2400))
+        detail = [row for row in generated["renditions"] if row["kind"] == "detail"]
+        self.assertEqual([(row["width"], row["height"]) for row in detail], [(1200, 1800), (1600, 2400)])
+
+    def test_engine_renders_grid_from_source_for_wide_panoramas(self):
+        generated = render_listing_image(
+            _build_jpeg_bytes(width=4800, height=800),
+            **self._render_options(),
+        )
+
+        grid_item = next(item for item in generated["files"] if "_grid_" in item["path"])
+        with PILImage.open(io.BytesIO(grid_item["content"])) as rendered:
+            self.assertEqual(rendered.size, (600, 356))
+
+    def test_engine_skips_images_above_pixel_limit(self):
+        options = self._render_options()
+        options["max_pixels"] = 1000
+
+        self.assertIsNone(render_listing_image(_build_jpeg_bytes(), **options))
+
+    def test_car_image_save_stores_renditions_and_metadata(self):
+        image = CarImage.objects.create(listing=self.listing, image=_build_jpeg_upload(), order=0, is_cover=True)
+        image.refresh_from_db()
+
+        self.assertEqual(image.original_width, 1800)
+        self.assertFalse(image.low_res)
+        paths = CarImage._collect_rendition_paths(image.renditions)
+        self.assertEqual(len(paths), 3)
+        for path in paths:
+            self.assertTrue(os.path.exists(os.path.join(self.media_root, path)))
+        self.assertTrue(str(image.thumbnail.name).endswith("_grid_600.webp"))
+
+    def test_car_image_renditions_run_on_process_pool_when_enabled(self):
+        with override_settings(CAR_IMAGE_RENDITION_PROCESSES=1):
+            listing_models._reset_car_image_rendition_process_pool()
+            self.assertIsNotNone(listing_models._get_car_image_rendition_process_pool())
+            image = CarImage.objects.create(listing=self.listing, image=_build_jpeg_upload(), order=0)
+
+        image.refresh_from_db()
+        self.assertEqual(image.original_height, 1200)
+        self.assertEqual(len(image.renditions.get("webp") or []), 3)
+
+    def test_avif_renditions_are_exposed_as_picture_sources(self):
+        with override_settings(CAR_IMAGE_AVIF_RENDITIONS=True):
+            image = CarImage.objects.create(listing=self.listing, image=_build_jpeg_upload(), order=0, is_cover=True)
+        image.refresh_from_db()
+
+        self.assertEqual(
+            [(row["kind"], row["width"]) for row in image.renditions["avif"]],
+            [("grid", 600), ("detail", 1200), ("detail", 1600)],
+        )
+        self.assertTrue(image.thumbnail.name.endswith("_grid_600.webp"))
+        with image.image.storage.open(image.renditions["avif"][0]["path"], "rb") as handle:
+            with PILImage.open(handle) as rendered:
+                self.assertEqual(rendered.format, "AVIF")
+
+        payload = CarImageSerializer(image).data
+        self.assertEqual([source["type"] for source in payload["sources"]], ["image/avif", "image/webp"])
+        self.assertIn("_detail_1600.avif 1600w", payload["sources"][0]["srcset"])
+        self.assertEqual({row["format"] for row in payload["renditions"]}, {"webp"})
+        grid_payload = CarImageListSerializer(image).data
+        self.assertNotIn("_detail_", grid_payload["sources"][0]["srcset"])
+
+        response = self.client.get(f"{reverse('prerender_listing', args=[self.listing.id])}?force=1")
+        html = response.content.decode("utf-8")
+        self.assertIn('<source type="image/avif" srcset="', html)
+        self.assertIn('<source type="image/webp" srcset="', html)
+
+    def test_renditions_include_inline_placeholder_for_list_payloads(self):
+        image = CarImage.objects.create(listing=self.listing, image=_build_jpeg_upload(), order=0, is_cover=True)
+        image.refresh_from_db()
+
+        placeholder = image.renditions["placeholder"]
+        self.assertTrue(placeholder.startswith("data:image/webp;base64,"))
+        self.assertLess(len(placeholder), 600)
+        self.assertEqual(CarImageListSerializer(image).data["placeholder"], placeholder)
+        self.assertEqual(BaseListingLiteSerializer(self.listing).data["image_placeholder"], placeholder)
+
+    def test_derivative_endpoint_renders_once_and_serves_from_storage(self):
+        image = CarImage.objects.create(listing=self.listing, image=_build_jpeg_upload(), order=0)
+        url = listing_derivatives.build_derivative_url(image, 800, 0, "webp")
+
+        with patch.object(
+            listing_derivatives, "run_rendition_job", wraps=listing_derivatives.run_rendition_job
+        ) as render_job:
+            first = self.client.get(url)
+            first_body = b"".join(first.streaming_content)
+            second = self.client.get(url)
+            second_body = b"".join(second.streaming_content)
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first["Content-Type"], "image/webp")
+        self.assertEqual(first["Cache-Control"], "public, max-age=31536000, immutable")
+        self.assertEqual(render_job.call_count, 1)
+        self.assertEqual(first_body, second_body)
+        with PILImage.open(io.BytesIO(first_body)) as rendered:
+            self.assertEqual(rendered.size, (800, 533))
+
+        image.delete()
+        self.assertFalse(os.listdir(os.path.join(self.media_root, os.path.dirname(image.image.name), "renditions")))
+
+    def test_derivative_endpoint_crops_without_upscaling(self):
+        image = CarImage.objects.create(
+            listing=self.listing,
+            image=_build_jpeg_upload(width=900, height=600),
+            order=0,
+        )
+
+        response = self.client.get(listing_derivatives.build_derivative_url(image, 1200, 600, "jpg"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+        with PILImage.open(io.BytesIO(b"".join(response.streaming_content))) as rendered:
+            self.assertEqual(rendered.size, (900, 450))
+
+    def test_derivative_endpoint_rejects_unlisted_sizes(self):
+        image = CarImage.objects.create(listing=self.listing, image=_build_jpeg_upload(), order=0)
+
+        response = self.client.get(listing_derivatives.build_derivative_url(image, 801, 0, "webp"))
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse("image_derivative", args=[image.id + 100, "x", 800, 0, "webp"]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_derivative_url_carries_the_file_version(self):
+        image = CarImage.objects.create(listing=self.listing, image=_build_jpeg_upload(), order=0)
+        url = listing_derivatives.build_derivative_url(image, 800, 0, "webp")
+        self.assertIn(f"/{listing_derivatives.get_derivative_version(image)}/", url)
+
+        stale = self.client.get(reverse("image_derivative", args=[image.id, "replaced-photo", 800, 0, "webp"]))
+
+        self.assertEqual(stale.status_code, 302)
+        self.assertEqual(stale["Location"], url)
+        self.assertNotIn("immutable", stale.get("Cache-Control", ""))
+
+    def test_concurrent_derivative_requests_share_one_render(self):
+        image = CarImage.objects.create(listing=self.listing, image=_build_jpeg_upload(), order=0)
+        original_job = listing_derivatives.run_rendition_job
+        calls = []
+
+        def slow_job(*args, **kwargs):
+            calls.append(1)
+            time.sleep(0.2)
+            return original_job(*args, **kwargs)
+
+        results = []
+        with patch.object(listing_derivatives, "run_rendition_job", side_effect=slow_job):
+            threads = [
+                threading.Thread(
+                    target=lambda: results.append(listing_derivatives.ensure_derivative(image, 480, 0, "webp"))
+                )
+                for _ in range(4)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(set(results)), 1)
+        self.assertTrue(image.image.storage.exists(results[0]))
+
+class BackfillListingRenditionsCommandTests(APITestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp(prefix="karbg-media-")
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media_root,
+            CAR_IMAGE_ASYNC_RENDITIONS=False,
+        )
+        self.settings_override.enable()
+        user_model = get_user_model()
+        self.owner = user_model.objects.create_user(
+            username="backfill-owner",
+            email="backfill-owner@example.com",
+            password="testpass123",
+        )
+        self.listing = _create_cars_listing(self.owner)
+        self.checkpoint_file = os.path.join(self.media_root, "backfill.json")
+        self.images = [
+            CarImage.objects.create(
+                listing=self.listing,
+                image=_build_jpeg_upload(color=(40, 90, 160 + index)),
+                order=index,
+            )
+            for index in range(3)
+        ]
+        # first two behave like legacy rows uploaded before renditions existed
+        CarImage.objects.filter(pk__in=[self.images[0].pk, self.images[1].pk]).update(
+            thumbnail=None,
+            original_width=None,
+            original_height=None,
+            renditions={},
+        )
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def _run(self, *args):
+        output = io.StringIO()
+        call_command(
+            "backfill_listing_renditions",
+            "--workers=1",
+            f"--checkpoint-file={self.checkpoint_file}",
+            *args,
+            stdout=output,
+        )
+        return output.getvalue()
+
+    def test_only_missing_rebuilds_legacy_rows_and_skips_valid_ones(self):
+        output = self._run("--only-missing", "--batch-size=2")
+
+        self.assertIn("processed=2 succeeded=2 failed=0 skipped=1", output)
+        for image in CarImage.objects.filter(pk__in=[self.images[0].pk, self.images[1].pk]):
+            self.assertEqual(image.original_width, 1800)
+            self.assertEqual(len(image.renditions.get("webp") or []), 3)
+        self.assertFalse(os.path.exists(self.checkpoint_file))
+
+    def test_resumes_after_checkpointed_id(self):
+        with open(self.checkpoint_file, "w", encoding="utf-8") as handle:
+            json.dump(
+                {
+                    "signature": {
+                        "only_missing": True,
+                        "since": "",
+                        "category": "",
+                        "formats": ["webp"],
+                        "placeholders_only": False,
+                    },
+                    "last_id": self.images[0].pk,
+                },
+                handle,
+            )
+
+        output = self._run("--only-missing")
+
+        self.assertIn(f"Resuming after image id {self.images[0].pk}", output)
+        self.assertIn("processed=1 succeeded=1", output)
+        self.images[0].refresh_from_db()
+        self.images[1].refresh_from_db()
+        self.assertIsNone(self.images[0].original_width)
+        self.assertEqual(self.images[1].original_width, 1800)
+
+    def test_dry_run_estimates_without_writing(self):
+        output = self._run("--only-missing", "--dry-run", "--category=cars")
+
+        self.assertIn("Dry run: 2 images to process, 1 already valid.", output)
+        self.assertIn("Estimated:", output)
+        self.images[0].refresh_from_db()
+        self.assertIsNone(self.images[0].original_width)
+
+    def test_category_filter_excludes_other_listings(self):
+        output = self._run("--only-missing", "--category=parts")
+
+        self.assertIn("processed=0", output)
+
+    def test_placeholders_only_derives_placeholder_from_grid_rendition(self):
+        image = self.images[2]
+        image.refresh_from_db()
+        renditions = dict(image.renditions)
+        renditions.pop("placeholder")
+        CarImage.objects.filter(pk=image.pk).update(renditions=renditions)
+
+        output = self._run("--placeholders-only")
+
+        self.assertIn("processed=3 succeeded=3", output)
+        image.refresh_from_db()
+        self.assertTrue(image.renditions["placeholder"].startswith("data:image/webp;base64,"))
+        self.assertEqual(image.renditions["webp"], renditions["webp"])
+
+
+class CarImageIngestionTests(APITestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp(prefix="karbg-media-")
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media_root,
+            CAR_IMAGE_ASYNC_RENDITIONS=True,
+            CAR_IMAGE_MAX_EDGE=2000,
+        )
+        self.settings_override.enable()
+        user_model = get_user_model()
+        self.owner = user_model.objects.create_user(
+            username="ingest-owner",
+            email="ingest-owner@example.com",
+            password="testpass123",
+        )
+        self.listing = _create_cars_listing(self.owner)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def _build_exif_heavy_jpeg(self, width=1200, height=800, orientation=6):
+        buffer = io.BytesIO()
+        image = PILImage.new("RGB", (width, height), (120, 30, 30))
+        exif = image.getexif()
+        exif[0x0112] = orientation
+        exif[0x010F] = "Camera Maker"
+        exif.get_ifd(0x8769)[0x927C] = b"\x00" * 40_000  # maker note
+        image.save(buffer, format="JPEG", quality=85, exif=exif.tobytes(), comment=b"x" * 2000)
+        image.close()
+        return buffer.getvalue()
+
+    def test_oversized_upload_is_downscaled_before_it_is_stored(self):
+        image = CarImage.objects.create(
+            listing=self.listing,
+            image=_build_jpeg_upload(name="huge.jpg", width=4800, height=3200),
+            order=0,
+        )
+
+        self.assertEqual((image.original_width, image.original_height), (2000, 1333))
+        with PILImage.open(image.image.path) as stored:
+            self.assertEqual(stored.size, (2000, 1333))
+        self.assertEqual(
+            CarImage.objects.filter(pk=image.pk).values_list("original_width", flat=True).get(),
+            2000,
+        )
+
+    def test_heavy_metadata_is_stripped_but_orientation_kept(self):
+        raw = self._build_exif_heavy_jpeg()
+        image = CarImage.objects.create(
+            listing=self.listing,
+            image=SimpleUploadedFile("exif.jpg", raw, content_type="image/jpeg"),
+            order=0,
+        )
+
+        self.assertEqual((image.original_width, image.original_height), (800, 1200))
+        self.assertLess(os.path.getsize(image.image.path), len(raw) - 40_000)
+        with PILImage.open(image.image.path) as stored:
+            exif = stored.getexif()
+            self.assertEqual(exif.get(0x0112), 6)
+            self.assertNotIn(0x010F, exif)
+            self.assertNotIn("comment", stored.info)
+            stored.load()
+
+    def test_strip_jpeg_metadata_ignores_non_jpeg_streams(self):
+        self.assertIsNone(strip_jpeg_metadata(b"\x89PNG\r\n\x1a\n"))
+
+    def test_upload_endpoint_rejects_non_images_before_writing(self):
+        self.client.force_authenticate(user=self.owner)
+        response = self.client.post(
+            reverse("upload_images", args=[self.listing.id]),
+            {
+                "images": [
+                    _build_jpeg_upload(name="ok.jpg"),
+                    SimpleUploadedFile("notes.jpg", b"not an image", content_type="image/jpeg"),
+                ]
+            },
+            format="multipart",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("notes.jpg", response.data["error"])
+        self.assertFalse(CarImage.objects.filter(listing=self.listing).exists())
+
+
+class CarImageBulkIngestTests(APITestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp(prefix="karbg-media-")
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root, CAR_IMAGE_ASYNC_RENDITIONS=True)
+        self.settings_override.enable()
+        user_model = get_user_model()
+        self.owner = user_model.objects.create_user(
+            username="bulk-owner",
+            email="bulk-owner@example.com",
+            password="testpass123",
+        )
+        self.listing = _create_cars_listing(self.owner)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def _uploads(self, count):
+        self.upload_seed = getattr(self, "upload_seed", 0) + count
+        return [
+            _build_jpeg_upload(
+                name=f"photo-{index}.jpg",
+                width=320,
+                height=240,
+                color=(40, 90, (self.upload_seed * 8 + index) % 256),
+            )
+            for index in range(count)
+        ]
+
+    def test_bulk_ingest_uses_constant_queries_and_one_rendition_job(self):
+        other_listing = _create_cars_listing(self.owner)
+        with self.captureOnCommitCallbacks(execute=False) as small_callbacks:
+            with self.assertNumQueries(7):
+                CarImage.bulk_ingest(other_listing, self._uploads(2))
+
+        with patch.object(CarImage, "_run_rendition_batch_task") as batch_task:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                with self.assertNumQueries(7):
+                    created = CarImage.bulk_ingest(self.listing, self._uploads(6))
+            listing_models._get_car_image_rendition_executor().submit(lambda: None).result()
+
+        self.assertEqual(len(small_callbacks), 1)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual([image.order for image in created], list(range(6)))
+        self.assertEqual([image.is_cover for image in created], [True] + [False] * 5)
+        self.assertEqual(batch_task.call_args.args[0][0], created[0].pk)
+        self.assertEqual(len(batch_task.call_args.args[0]), 6)
+        stored = CarImage.objects.get(pk=created[3].pk)
+        self.assertTrue(stored.image.storage.exists(stored.image.name))
+        self.assertEqual(stored.original_width, 320)
+
+    def test_bulk_ingest_appends_after_existing_images_and_skips_rejected_files(self):
+        CarImage.bulk_ingest(self.listing, self._uploads(2))
+        uploads = self._uploads(1) + [SimpleUploadedFile("broken.jpg", b"nope", content_type="image/jpeg")]
+
+        created = CarImage.bulk_ingest(self.listing, uploads)
+
+        self.assertEqual([(image.order, image.is_cover) for image in created], [(2, False)])
+        self.assertEqual(self.listing.images.filter(is_cover=True).count(), 1)
+
+    def test_synchronous_mode_renders_cover_first(self):
+        with override_settings(CAR_IMAGE_ASYNC_RENDITIONS=False):
+            created = CarImage.bulk_ingest(
+                self.listing,
+                [_build_jpeg_upload(name=f"photo-{index}.jpg") for index in range(2)],
+            )
+
+        for image in CarImage.objects.filter(pk__in=[image.pk for image in created]):
+            self.assertEqual(len(image.renditions.get("webp") or []), 3)
+
+
+class UpdateListingImagesTests(APITestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp(prefix="karbg-media-")
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root, CAR_IMAGE_ASYNC_RENDITIONS=True)
+        self.settings_override.enable()
+        user_model = get_user_model()
+        self.owner = user_model.objects.create_user(
+            username="reorder-owner",
+            email="reorder-owner@example.com",
+            password="testpass123",
+        )
+        self.client.force_authenticate(user=self.owner)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def _listing_with_images(self, count):
+        listing = _create_cars_listing(self.owner)
+        images = CarImage.bulk_ingest(
+            listing,
+            [_build_jpeg_upload(name=f"photo-{index}.jpg", width=64, height=48) for index in range(count)],
+        )
+        return listing, images
+
+    def _reverse_payload(self, images):
+        return {
+            "images": [
+                {"id": image.id, "order": position, "is_cover": position == 0}
+                for position, image in enumerate(reversed(images))
+            ]
+        }
+
+    def test_reorder_moves_cover_and_prunes_in_one_pass(self):
+        listing, images = self._listing_with_images(4)
+        payload = self._reverse_payload(images[1:])
+        payload["prune_missing"] = True
+
+        response = self.client.patch(reverse("update_images", args=[listing.id]), payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        expected_ids = [images[3].id, images[2].id, images[1].id]
+        self.assertEqual([row["id"] for row in response.data["images"]], expected_ids)
+        self.assertEqual([row["is_cover"] for row in response.data["images"]], [True, False, False])
+        self.assertEqual(
+            list(listing.images.order_by("order").values_list("id", "is_cover")),
+            [(expected_ids[0], True), (expected_ids[1], False), (expected_ids[2], False)],
+        )
+
+    def test_query_count_does_not_grow_with_photo_count(self):
+        small_listing, small_images = self._listing_with_images(2)
+        large_listing, large_images = self._listing_with_images(8)
+
+        def count_queries(listing, images):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.patch(
+                    reverse("update_images", args=[listing.id]),
+                    self._reverse_payload(images),
+                    format="json",
+                )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return len(context.captured_queries)
+
+        self.assertEqual(count_queries(small_listing, small_images), count_queries(large_listing, large_images))
+
+    def test_unknown_image_id_is_rejected_without_changes(self):
+        listing, images = self._listing_with_images(2)
+        other_listing, other_images = self._listing_with_images(1)
+
+        response = self.client.patch(
+            reverse("update_images", args=[listing.id]),
+            {"images": [{"id": images[1].id, "order": 0, "is_cover": True}, {"id": other_images[0].id}]},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertTrue(CarImage.objects.get(pk=images[0].pk).is_cover)
+
+
+class _FilesystemS3Client:
+    """S3 stand-in backed by a temp directory; records calls and upload concurrency."""
+
+    def __init__(self, root, put_delay=0.0):
+        self.root = root
+        self.put_delay = put_delay
+        self.calls = []
+        self.active_puts = 0
+        self.peak_puts = 0
+        self._lock = threading.Lock()
+
+    def _object_path(self, bucket, key):
+        return os.path.join(self.root, bucket, *key.split("/"))
+
+    def put_object(self, Bucket, Key, Body, **params):
+        with self._lock:
+            self.calls.append(("put_object", Key, params))
+            self.active_puts += 1
+            self.peak_puts = max(self.peak_puts, self.active_puts)
+        try:
+            time.sleep(self.put_delay)
+            path = self._object_path(Bucket, Key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as handle:
+                handle.write(Body)
+        finally:
+            with self._lock:
+                self.active_puts -= 1
+        return {}
+
+    def delete_objects(self, Bucket, Delete):
+        keys = [item["Key"] for item in Delete["Objects"]]
+        with self._lock:
+            self.calls.append(("delete_objects", keys, {}))
+        for key in keys:
+            try:
+                os.remove(self._object_path(Bucket, key))
+            except FileNotFoundError:
+                pass
+        return {}
+
+    def exists(self, bucket, key):
+        return os.path.exists(self._object_path(bucket, key))
+
+    def get_paginator(self, operation_name):
+        client = self
+
+        class _Paginator:
+            def paginate(self, Bucket, Prefix="", PaginationConfig=None):
+                page_size = (PaginationConfig or {}).get("PageSize", 1000)
+                bucket_root = os.path.join(client.root, Bucket)
+                keys = sorted(
+                    os.path.relpath(os.path.join(dir_path, file_name), bucket_root).replace(os.sep, "/")
+                    for dir_path, _, file_names in os.walk(bucket_root)
+                    for file_name in file_names
+                )
+                keys = [key for key in keys if key.startswith(Prefix)]
+                for start in range(0, len(keys), page_size):
+                    contents = []
+                    for key in keys[start:start + page_size]:
+                        stat_result = os.stat(client._object_path(Bucket, key))
+                        contents.append({
+                            "Key": key,
+                            "Size": stat_result.st_size,
+                            "LastModified": datetime.fromtimestamp(stat_result.st_mtime, tz=dt_timezone.utc),
+                        })
+                    yield {"Contents": contents}
+
+        return _Paginator()
+
+
+class StorageIOTests(APITestCase):
+    def setUp(self):
+        from storages.backends.s3 import S3Storage
+
+        self.root = tempfile.mkdtemp(prefix="karbg-s3-")
+        self.client_fake = _FilesystemS3Client(self.root, put_delay=0.05)
+        self.storage = S3Storage(
+            bucket_name="media-bucket",
+            location="media-loc",
+            access_key="test",
+            secret_key="test",
+            endpoint_url="https://fra1.example-spaces.test",
+            default_acl="public-read",
+            object_parameters={"CacheControl": "public, max-age=31536000, immutable"},
+        )
+        storage_io._S3_CLIENTS.clear()
+        self.build_patch = patch.object(storage_io, "_build_s3_client", return_value=self.client_fake)
+        self.build_client = self.build_patch.start()
+
+    def tearDown(self):
+        self.build_patch.stop()
+        storage_io._S3_CLIENTS.clear()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_store_files_uploads_renditions_in_parallel_with_one_shared_client(self):
+        files = [
+            {"path": f"car_listings/renditions/photo_{kind}.webp", "content": b"RIFF" + kind.encode()}
+            for kind in ("grid_356", "grid_600", "detail_1200", "detail_1600")
+        ]
+
+        stored = storage_io.store_files(self.storage, files)
+
+        self.assertEqual(stored, [item["path"] for item in files])
+        self.assertEqual(self.build_client.call_count, 1)
+        self.assertGreater(self.client_fake.peak_puts, 1)
+        for item in files:
+            self.assertTrue(self.client_fake.exists("media-bucket", f"media-loc/{item['path']}"))
+        _, key, params = self.client_fake.calls[0]
+        self.assertTrue(key.startswith("media-loc/car_listings/renditions/"))
+        self.assertEqual(params["ContentType"], "image/webp")
+        self.assertEqual(params["ACL"], "public-read")
+        self.assertEqual(params["CacheControl"], "public, max-age=31536000, immutable")
+
+    def test_delete_paths_batches_delete_objects_at_1000_keys(self):
+        names = [f"car_listings/2026/10/photo-{index}.jpg" for index in range(2500)]
+        storage_io.store_files(self.storage, [{"path": names[0], "content": b"jpeg"}])
+
+        deleted = storage_io.delete_paths(self.storage, names + names[:10])
+
+        delete_calls = [keys for name, keys, _ in self.client_fake.calls if name == "delete_objects"]
+        self.assertEqual([len(keys) for keys in delete_calls], [1000, 1000, 500])
+        self.assertEqual(deleted, 2500)
+        self.assertEqual(delete_calls[0][0], "media-loc/car_listings/2026/10/photo-0.jpg")
+        self.assertFalse(self.client_fake.exists("media-bucket", "media-loc/car_listings/2026/10/photo-0.jpg"))
+
+    def test_resolve_storage_name_maps_legacy_values_to_one_key(self):
+        expected = "car_listings/2026/10/photo.jpg"
+        for raw_name in (
+            expected,
+            f"/{expected}",
+            f"/media/{expected}",
+            f"media-loc/{expected}",
+            f"https://media-bucket.fra1.cdn.example-spaces.test/media-loc/{expected}",
+            f"https://fra1.example-spaces.test/media-bucket/media-loc/{expected}",
+            f"//media-bucket.fra1.cdn.example-spaces.test/media-loc/{expected}",
+        ):
+            with self.subTest(raw_name=raw_name):
+                self.assertEqual(storage_io.resolve_storage_name(self.storage, raw_name), expected)
+
+    def test_iter_storage_objects_strips_location_prefix(self):
+        storage_io.store_files(
+            self.storage,
+            [
+                {"path": "car_listings/2026/10/a.jpg", "content": b"12345"},
+                {"path": "car_listings/2026/10/renditions/a_grid_356.webp", "content": b"123"},
+                {"path": "dealer_photos/logo.png", "content": b"1"},
+            ],
+        )
+
+        objects = list(storage_io.iter_storage_objects(self.storage, "car_listings/"))
+
+        self.assertEqual(
+            [(item.name, item.size) for item in objects],
+            [("car_listings/2026/10/a.jpg", 5), ("car_listings/2026/10/renditions/a_grid_356.webp", 3)],
+        )
+
+    def test_deleting_car_image_removes_all_files_in_one_call(self):
+        media_root = tempfile.mkdtemp(prefix="karbg-media-")
+        self.addCleanup(shutil.rmtree, media_root, True)
+        user = get_user_model().objects.create_user(
+            username="storage-io-owner",
+            email="storage-io-owner@example.com",
+            password="testpass123",
+        )
+        with override_settings(MEDIA_ROOT=media_root, CAR_IMAGE_ASYNC_RENDITIONS=False):
+            listing = _create_cars_listing(user)
+            image = CarImage.objects.create(listing=listing, image=_build_jpeg_upload(width=1400, height=900))
+            file_paths = [image.image.path] + [
+                os.path.join(media_root, *path.split("/"))
+                for path in CarImage._collect_rendition_paths(image.renditions)
+            ]
+            self.assertTrue(all(os.path.exists(path) for path in file_paths))
+
+            with patch.object(listing_models, "delete_paths", wraps=listing_models.delete_paths) as delete_spy:
+                image.delete()
+
+        self.assertEqual(delete_spy.call_count, 1)
+        self.assertFalse(any(os.path.exists(path) for path in file_paths))
+
+
+class GcListingMediaCommandTests(APITestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp(prefix="karbg-media-")
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root, CAR_IMAGE_ASYNC_RENDITIONS=False)
+        self.settings_override.enable()
+        user = get_user_model().objects.create_user(
+            username="gc-owner",
+            email="gc-owner@example.com",
+            password="testpass123",
+        )
+        listing = _create_cars_listing(user)
+        self.image = CarImage.objects.create(listing=listing, image=_build_jpeg_upload(width=1400, height=900))
+        self.referenced_paths = [self.image.image.name, *CarImage._collect_rendition_paths(self.image.renditions)]
+        self.derivative_path = self._write(self.image._build_derivative_path(320, 0, "avif"), b"avif")
+        self.old_orphans = [
+            self._write("car_listings/2026/01/02/gone.jpg", b"x" * 700),
+            self._write("car_listings/2026/01/02/renditions/gone_grid_356.webp", b"x" * 300),
+            self._write("car_listings/2026/01/02/renditions/gone_320x0.webp", b"x" * 24),
+        ]
+        self.fresh_orphan = self._write("car_listings/2026/10/19/uploading.jpg", b"x" * 50)
+
+        old_timestamp = time.time() - 10 * 24 * 3600
+        for name in [*self.referenced_paths, self.derivative_path, *self.old_orphans]:
+            os.utime(self._path(name), (old_timestamp, old_timestamp))
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def _path(self, name):
+        return os.path.join(self.media_root, *name.split("/"))
+
+    def _write(self, name, content):
+        path = self._path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as handle:
+            handle.write(content)
+        return name
+
+    def test_dry_run_reports_reclaimable_bytes_without_deleting(self):
+        output = io.StringIO()
+        call_command("gc_listing_media", "--dry-run", stdout=output)
+
+        self.assertIn("orphans=3", output.getvalue())
+        self.assertIn("reclaimable=1024 bytes", output.getvalue())
+        self.assertIn("within_grace=1", output.getvalue())
+        self.assertTrue(all(os.path.exists(self._path(name)) for name in self.old_orphans))
+
+    def test_deletes_only_unreferenced_objects_past_the_grace_period(self):
+        call_command("gc_listing_media", "--batch-size", "2", stdout=io.StringIO())
+
+        self.assertFalse(any(os.path.exists(self._path(name)) for name in self.old_orphans))
+        for name in [*self.referenced_paths, self.derivative_path, self.fresh_orphan]:
+            self.assertTrue(os.path.exists(self._path(name)), name)
+
+
+class ContentAddressedImageTests(APITestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp(prefix="karbg-media-")
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root, CAR_IMAGE_ASYNC_RENDITIONS=False)
+        self.settings_override.enable()
+        self.owner = get_user_model().objects.create_user(
+            username="dedup-owner",
+            email="dedup-owner@example.com",
+            password="testpass123",
+        )
+        self.photo_bytes = _build_jpeg_bytes(width=1400, height=900)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def _upload(self, name="photo.jpg"):
+        return SimpleUploadedFile(name, self.photo_bytes, content_type="image/jpeg")
+
+    def _stored_paths(self, image):
+        return [image.image.name, *CarImage._collect_rendition_paths(image.renditions)]
+
+    def _exists(self, name):
+        return os.path.exists(os.path.join(self.media_root, *name.split("/")))
+
+    def test_duplicate_upload_reuses_original_and_renditions(self):
+        first_listing = _create_cars_listing(self.owner)
+        second_listing = _create_cars_listing(self.owner)
+
+        with patch.object(
+            CarImage, "_generate_webp_renditions", autospec=True, side_effect=CarImage._generate_webp_renditions
+        ) as render_spy:
+            first = CarImage.objects.create(listing=first_listing, image=self._upload("a.jpg"))
+            second = CarImage.objects.create(listing=second_listing, image=self._upload("b.jpg"))
+
+        self.assertEqual(render_spy.call_count, 1)
+        self.assertEqual(first.content_hash, second.content_hash)
+        self.assertTrue(first.image.name.startswith(f"car_listings/blobs/{first.content_hash[:2]}/"))
+        self.assertEqual(second.image.name, first.image.name)
+        self.assertEqual(second.renditions, first.renditions)
+        self.assertEqual(ImageBlob.objects.get(content_hash=first.content_hash).ref_count, 2)
+
+    def test_bulk_ingest_duplicates_share_one_blob(self):
+        listing = _create_cars_listing(self.owner)
+
+        created = CarImage.bulk_ingest(listing, [self._upload("a.jpg"), self._upload("b.jpg")])
+
+        self.assertEqual(len({image.image.name for image in created}), 1)
+        self.assertEqual(ImageBlob.objects.get().ref_count, 2)
+        refreshed = list(CarImage.objects.filter(listing=listing).order_by("order"))
+        self.assertTrue(refreshed[1].renditions)
+        self.assertEqual(refreshed[0].renditions, refreshed[1].renditions)
+
+    def test_files_are_deleted_only_with_the_last_reference(self):
+        first = CarImage.objects.create(listing=_create_cars_listing(self.owner), image=self._upload())
+        second = CarImage.objects.create(listing=_create_cars_listing(self.owner), image=self._upload())
+        stored_paths = self._stored_paths(first)
+
+        first.delete()
+        self.assertTrue(all(self._exists(name) for name in stored_paths))
+        self.assertEqual(ImageBlob.objects.get().ref_count, 1)
+
+        second.delete()
+        self.assertFalse(any(self._exists(name) for name in stored_paths))
+        self.assertFalse(ImageBlob.objects.exists())
+
+
+class ListingShareCardTests(APITestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp(prefix="karbg-media-")
+        settings_override = override_settings(MEDIA_ROOT=self.media_root, CAR_IMAGE_ASYNC_RENDITIONS=False)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, True)
+        # no network in tests: the logo falls back to the text mark
+        fetch_patch = patch.object(accounts_prerender, "_fetch_image_from_url", return_value=None)
+        fetch_patch.start()
+        self.addCleanup(fetch_patch.stop)
+        accounts_prerender._SITE_LOGO.update({"image": None, "expires_at": 0.0})
+        cache.clear()
+
+        self.owner = get_user_model().objects.create_user(
+            username="share-card-owner",
+            email="share-card-owner@example.com",
+            password="testpass123",
+        )
+        self.listing = _create_cars_listing(self.owner)
+        CarImage.objects.create(listing=self.listing, image=_build_jpeg_upload(), is_cover=True)
+
+    def _exists(self, name):
+        return os.path.exists(os.path.join(self.media_root, *name.split("/")))
+
+    def test_card_is_stored_once_per_listing_state(self):
+        with patch.object(
+            share_cards, "render_listing_share_card", wraps=share_cards.render_listing_share_card
+        ) as render:
+            card_name = share_cards.generate_listing_share_card(self.listing.id)
+            again = share_cards.generate_listing_share_card(self.listing.id)
+
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(again, card_name)
+        self.assertTrue(card_name.startswith(f"{share_cards.SHARE_CARD_STORAGE_PREFIX}/{self.listing.id}/"))
+        self.assertTrue(self._exists(card_name))
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.share_image, card_name)
+        with PILImage.open(os.path.join(self.media_root, *card_name.split("/"))) as card:
+            self.assertEqual(card.size, (1200, 630))
+
+    def test_price_change_replaces_the_stored_card(self):
+        first_name = share_cards.generate_listing_share_card(self.listing.id)
+        BaseListing.objects.filter(pk=self.listing.pk).update(price="18500.00")
+
+        second_name = share_cards.generate_listing_share_card(self.listing.id)
+
+        self.assertNotEqual(first_name, second_name)
+        self.assertTrue(self._exists(second_name))
+        # cached pages may still link the old card until the GC grace period ends
+        self.assertTrue(self._exists(first_name))
+
+        call_command("gc_share_cards", stdout=io.StringIO())
+        self.assertTrue(self._exists(first_name))
+
+        call_command("gc_share_cards", "--grace-hours", "0", stdout=io.StringIO())
+        self.assertFalse(self._exists(first_name))
+        self.assertTrue(self._exists(second_name))
+
+    def test_gc_share_cards_keeps_current_cards_and_drops_orphans(self):
+        card_name = share_cards.generate_listing_share_card(self.listing.id)
+        orphan_dealer_card = f"{accounts_prerender.DEALER_CARD_STORAGE_PREFIX}/deleted-dealer.jpg"
+        default_storage.save(orphan_dealer_card, ContentFile(b"card"))
+
+        output = io.StringIO()
+        call_command("gc_share_cards", "--grace-hours", "0", "--dry-run", stdout=output)
+        self.assertIn(f"would delete {orphan_dealer_card}", output.getvalue())
+        self.assertTrue(self._exists(orphan_dealer_card))
+
+        call_command("gc_share_cards", "--grace-hours", "0", stdout=io.StringIO())
+        self.assertFalse(self._exists(orphan_dealer_card))
+        self.assertTrue(self._exists(card_name))
+
+    def test_drafts_get_no_card(self):
+        BaseListing.objects.filter(pk=self.listing.pk).update(is_draft=True)
+
+        self.assertEqual(share_cards.generate_listing_share_card(self.listing.id), "")
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.share_image, "")
+
+    def test_prerender_uses_the_current_card_and_queues_stale_ones(self):
+        url = f"{reverse('prerender_listing', args=[self.listing.id])}?force=1"
+        with patch.object(listing_prerender, "schedule_listing_prerender_refresh") as schedule:
+            stale_html = self.client.get(url).content.decode("utf-8")
+        schedule.assert_called_once_with(self.listing.id)
+        self.assertNotIn(share_cards.SHARE_CARD_STORAGE_PREFIX, stale_html)
+
+        card_name = share_cards.generate_listing_share_card(self.listing.id)
+        with patch.object(listing_prerender, "schedule_listing_prerender_refresh") as schedule:
+            html = self.client.get(url).content.decode("utf-8")
+        schedule.assert_not_called()
+        self.assertIn('<meta property="og:image" content="http', html)
+        self.assertIn(card_name, html)
+
+    def test_publishing_and_reordering_schedule_a_refresh(self):
+        with patch.object(listing_prerender, "schedule_listing_prerender_refresh") as schedule:
+            draft = _create_cars_listing(self.owner, is_draft=True)
+            schedule.assert_not_called()
+            draft.is_draft = False
+            draft.save()
+        schedule.assert_called_with(draft.id)
+
+        first = self.listing.images.get()
+        second = CarImage.objects.create(listing=self.listing, image=_build_jpeg_upload(color=(200, 30, 30)))
+        self.client.force_authenticate(self.owner)
+        with patch("backend.listings.views.schedule_listing_prerender_refresh") as schedule:
+            response = self.client.patch(
+                reverse("update_images", args=[self.listing.id]),
+                {"images": [{"id": second.id, "order": 0, "is_cover": True}, {"id": first.id, "order": 1}]},
+                format="json",
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.content)
+        schedule.assert_called_once_with(self.listing.id)
+
+
+class ListingPrerenderCacheTests(APITestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp(prefix="karbg-media-")
+        settings_override = override_settings(MEDIA_ROOT=self.media_root, CAR_IMAGE_ASYNC_RENDITIONS=False)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, True)
+        fetch_patch = patch.object(accounts_prerender, "_fetch_image_from_url", return_value=None)
+        fetch_patch.start()
+        self.addCleanup(fetch_patch.stop)
+        accounts_prerender._SITE_LOGO.update({"image": None, "expires_at": 0.0})
+        cache.clear()
+        caches["prerender"].clear()
+
+        self.owner = get_user_model().objects.create_user(
+            username="prerender-cache-owner",
+            email="prerender-cache-owner@example.com",
+            password="testpass123",
+        )
+        self.listing = _create_cars_listing(self.owner)
+        CarImage.objects.create(listing=self.listing, image=_build_jpeg_upload(), is_cover=True)
+        self.url = f"{reverse('prerender_listing', args=[self.listing.id])}?force=1"
+
+    def _render_spy(self):
+        return patch.object(
+            listing_prerender,
+            "render_listing_prerender_html",
+            wraps=listing_prerender.render_listing_prerender_html,
+        )
+
+    def test_html_is_rendered_once_per_etag(self):
+        with self._render_spy() as render:
+            first = self.client.get(self.url)
+            second = self.client.get(self.url)
+            not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        listing = BaseListing.objects.get(pk=self.listing.pk)
+        listing.price = Decimal("18500.00")
+        listing.save()
+        with self._render_spy() as render:
+            changed = self.client.get(self.url)
+        self.assertEqual(render.call_count, 1)
+        self.assertNotEqual(changed["ETag"], first["ETag"])
+        self.assertIn("18 500", changed.content.decode("utf-8"))
+
+    def test_other_processes_read_the_stored_page(self):
+        first = self.client.get(self.url)
+        caches["prerender"].clear()  # another process: only storage has the page
+
+        with self._render_spy() as render:
+            second = self.client.get(self.url)
+
+        render.assert_not_called()
+        self.assertEqual(first.content, second.content)
+
+    def test_cached_page_does_not_load_photo_rows(self):
+        self.client.get(self.url)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(any('"renditions"' in query["sql"] for query in queries.captured_queries))
+
+    def test_refresh_pre_renders_card_and_html(self):
+        detail_etag = listing_prerender.refresh_listing_prerender(self.listing.id)
+
+        with self._render_spy() as render:
+            response = self.client.get(self.url)
+        render.assert_not_called()
+        self.assertEqual(response["ETag"], detail_etag)
+        self.listing.refresh_from_db()
+        self.assertIn(self.listing.share_image, response.content.decode("utf-8"))
+
+    def test_unpublishing_drops_the_cached_page(self):
+        listing_prerender.warm_listing_prerender_html(self.listing.id)
+        cache_key = listing_prerender._listing_html_cache_key(self.listing.id)
+        storage_dir = os.path.join(
+            self.media_root, *listing_prerender.prerender_html_storage_dir("listings", self.listing.id).split("/")
+        )
+        self.assertIsNotNone(caches["prerender"].get(cache_key))
+        self.assertEqual(len(os.listdir(storage_dir)), 1)
+
+        self.listing.is_draft = True
+        self.listing.save()
+
+        self.assertIsNone(caches["prerender"].get(cache_key))
+        self.assertEqual(os.listdir(storage_dir), [])
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_prerender_warm_command_stores_pages_for_every_process(self):
+        other = _create_cars_listing(self.owner, model="530d")
+        stdout = io.StringIO()
+
+        with patch.object(
+            listing_prerender, "render_listing_prerender_html", wraps=listing_prerender.render_listing_prerender_html
+        ) as render:
+            call_command("prerender_warm", "--only", "listings", "--batch-size", "1", stdout=stdout)
+            call_command("prerender_warm", "--only", "listings", stdout=stdout)
+            self.client.get(self.url)
+            self.client.get(f"{reverse('prerender_listing', args=[other.id])}?force=1")
+
+        self.assertEqual(render.call_count, 2)
+        self.assertIn("rendered=2", stdout.getvalue())
+        self.assertIn("unchanged=2", stdout.getvalue())
+        self.listing.refresh_from_db()
+        self.assertTrue(self.listing.share_image)
+
+
+@override_settings(SITEMAP_CHUNK_SIZE=10, FRONTEND_BASE_URL="https://www.kar.bg")
+class SitemapTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        caches["prerender"].clear()
+        self.owner = get_user_model().objects.create_user(
+            username="sitemap-owner",
+            email="sitemap-owner@example.com",
+            password="testpass123",
+        )
+        self.listings = [_create_cars_listing(self.owner, model=f"Model {index}") for index in range(12)]
+        self.draft = _create_cars_listing(self.owner, is_draft=True)
+
+    def _chunk_url(self, listing):
+        return reverse("sitemap_chunk", kwargs={"section": "listings", "chunk": listing.id // 10})
+
+    def _read(self, response):
+        if response.streaming:
+            return b"".join(response.streaming_content).decode("utf-8")
+        return response.content.decode("utf-8")
+
+    def test_index_points_at_one_sitemap_per_id_range(self):
+        response = self.client.get("/sitemap.xml")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        index = response.content.decode("utf-8")
+        expected_chunks = sorted({listing.id // 10 for listing in self.listings})
+        for chunk in expected_chunks:
+            self.assertIn(f"<loc>https://www.kar.bg/sitemaps/listings-{chunk}.xml</loc>", index)
+        self.assertEqual(index.count("<sitemap>"), len(expected_chunks))
+        self.assertIn("<lastmod>", index)
+
+    def test_chunk_lists_live_listings_with_lastmod(self):
+        listing = self.listings[0]
+        listing.refresh_from_db()
+
+        response = self.client.get(self._chunk_url(listing))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        body = self._read(response)
+        self.assertTrue(body.startswith('<?xml version="1.0" encoding="UTF-8"?>'))
+        self.assertIn(f"<loc>https://www.kar.bg/details/{listing.slug}</loc>", body)
+        self.assertIn(f"<lastmod>{listing.updated_at.replace(microsecond=0).isoformat()}</lastmod>", body)
+        self.draft.refresh_from_db()
+        self.assertNotIn(f"/details/{self.draft.slug}<", body)
+
+    def test_unchanged_chunks_are_served_from_cache(self):
+        first_url = self._chunk_url(self.listings[0])
+        last_url = self._chunk_url(self.listings[-1])
+        first_body = self._read(self.client.get(first_url))
+        self._read(self.client.get(last_url))
+
+        with CaptureQueriesContext(connection) as queries:
+            cached = self.client.get(first_url)
+        self.assertFalse(cached.streaming)
+        self.assertEqual(cached.content.decode("utf-8"), first_body)
+        self.assertEqual(len(queries), 1)  # the range fingerprint only
+        self.assertIsNone(cache.get(f"sitemap:listings:10:{self.listings[0].id // 10}"))
+
+        BaseListing.objects.filter(pk=self.listings[-1].pk).update(is_archived=True)
+        self.assertFalse(self.client.get(first_url).streaming)
+        rebuilt = self.client.get(last_url)
+        self.assertTrue(rebuilt.streaming)
+        self.assertNotIn(f"obiava-{self.listings[-1].id}-", self._read(rebuilt))
+
+    def test_slug_changes_rebuild_the_chunk(self):
+        listing = self.listings[0]
+        url = self._chunk_url(listing)
+        self._read(self.client.get(url))
+
+        details = CarsListing.objects.get(listing=listing)
+        details.model = "Renamed"
+        details.save()
+        listing.refresh_from_db()
+
+        rebuilt = self.client.get(url)
+        self.assertTrue(rebuilt.streaming)
+        self.assertIn(f"<loc>https://www.kar.bg/details/{listing.slug}</loc>", self._read(rebuilt))
+
+    def test_chunk_supports_etags_and_rejects_unknown_sections(self):
+        url = self._chunk_url(self.listings[0])
+        response = self.client.get(url)
+        self._read(response)
+
+        not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        unknown = self.client.get(reverse("sitemap_chunk", kwargs={"section": "photos", "chunk": 0}))
+        self.assertEqual(unknown.status_code, status.HTTP_404_NOT_FOUND)
+        empty = self.client.get(reverse("sitemap_chunk", kwargs={"section": "listings", "chunk": 9999}))
+        self.assertEqual(empty.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_dealer_sitemap_uses_public_slugs(self):
+        dealer_user = get_user_model().objects.create_user(username="sitemap-dealer", password="x")
+        dealer = BusinessUser.objects.create(
+            user=dealer_user,
+            dealer_name="Sitemap Motors",
+            city="Sofia",
+            address="1 Map St",
+            phone="+359888000901",
+            email="sitemap-dealer@example.com",
+            username="sitemap-dealer",
+            company_name="Sitemap Motors Ltd",
+            registration_address="1 Map St",
+            mol="Manager",
+            bulstat="523456789",
+            admin_name="Admin",
+            admin_phone="+359888000902",
+        )
+
+        index = self.client.get("/sitemap.xml").content.decode("utf-8")
+        self.assertIn(f"/sitemaps/dealers-{dealer.id // 10}.xml", index)
+        body = self._read(
+            self.client.get(reverse("sitemap_chunk", kwargs={"section": "dealers", "chunk": dealer.id // 10}))
+        )
+        self.assertIn("<loc>https://www.kar.bg/dealers/sitemap-motors</loc>", body)
+
+
+class CarsFeedTests(APITestCase):
+    def setUp(self):
+        self.owner = get_user_model().objects.create_user(
+            username="feed-owner",
+            email="feed-owner@example.com",
+            password="testpass123",
+        )
+        self.listings = [_create_cars_listing(self.owner, model=f"Model {index}") for index in range(5)]
+        self.draft = _create_cars_listing(self.owner, is_draft=True)
+        self.electric = _create_cars_listing(self.owner, brand="Tesla", model="Model 3", fuel="elektro")
+        # bulk_create skips renditions; the feed only needs stored names
+        CarImage.objects.bulk_create(
+            [
+                CarImage(listing=self.listings[0], image="car_listings/feed-second.jpg", order=1),
+                CarImage(listing=self.listings[0], image="car_listings/feed-cover.jpg", order=2, is_cover=True),
+                CarImage(listing=self.listings[1], image="car_listings/feed-first.jpg", order=0),
+            ]
+        )
+
+    def _read(self, response):
+        return b"".join(response.streaming_content)
+
+    def _jsonl_items(self, response):
+        return [json.loads(line) for line in self._read(response).decode("utf-8").splitlines()]
+
+    def test_jsonl_lists_live_car_listings_with_cover_images(self):
+        response = self.client.get(reverse("cars_feed", kwargs={"feed_format": "jsonl"}))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertTrue(response["Content-Type"].startswith("application/x-ndjson"))
+        items = {item["id"]: item for item in self._jsonl_items(response)}
+        expected_ids = {listing.id for listing in self.listings} | {self.electric.id}
+        self.assertEqual(set(items), expected_ids)
+
+        first = items[self.listings[0].id]
+        self.listings[0].refresh_from_db()
+        self.assertTrue(first["url"].endswith(f"/details/{self.listings[0].slug}"))
+        self.assertEqual(
+            (first["brand"], first["model"], first["year"], first["mileage"], first["fuel"]),
+            ("BMW", "Model 0", 2020, 120000, "dizel"),
+        )
+        self.assertEqual(first["price"], "20000.00")
+        self.assertTrue(first["image_url"].endswith("/car_listings/feed-cover.jpg"))
+        self.assertTrue(items[self.listings[1].id]["image_url"].endswith("/car_listings/feed-first.jpg"))
+        self.assertEqual(items[self.listings[2].id]["image_url"], "")
+
+    def test_feed_queries_stay_per_batch(self):
+        with CaptureQueriesContext(connection) as queries:
+            chunks = list(listing_feeds.iter_cars_feed("jsonl", batch_size=2))
+
+        self.assertEqual(len(chunks), 3)
+        # per batch: the listing rows, the flagged covers and the first photo of the rest; plus the empty tail
+        self.assertLessEqual(len(queries), 3 * 3 + 1)
+
+    def test_csv_and_xml_formats(self):
+        csv_body = self._read(self.client.get(reverse("cars_feed", kwargs={"feed_format": "csv"}))).decode("utf-8")
+        csv_lines = csv_body.splitlines()
+        self.assertEqual(csv_lines[0], ",".join(listing_feeds.FEED_FIELDS))
+        self.assertEqual(len(csv_lines), 1 + 6)
+
+        xml_response = self.client.get(reverse("cars_feed", kwargs={"feed_format": "xml"}))
+        self.assertTrue(xml_response["Content-Type"].startswith("application/xml"))
+        root = ElementTree.fromstring(self._read(xml_response))
+        self.assertEqual(root.tag, "listings")
+        vehicles = {int(node.findtext("vehicle_id")): node for node in root.findall("listing")}
+        self.assertEqual(len(vehicles), 6)
+        tesla = vehicles[self.electric.id]
+        self.assertEqual(tesla.findtext("make"), "Tesla")
+        self.assertEqual(tesla.findtext("fuel_type"), "ELECTRIC")
+        self.assertEqual(tesla.findtext("mileage/value"), "120000")
+        self.assertEqual(tesla.findtext("price"), "20000.00 EUR")
+
+    def test_since_returns_only_changed_listings(self):
+        cutoff = datetime(2030, 1, 1, tzinfo=dt_timezone.utc)
+        BaseListing.objects.filter(pk=self.listings[3].pk).update(updated_at=datetime(2030, 2, 1, tzinfo=dt_timezone.utc))
+
+        response = self.client.get(
+            reverse("cars_feed", kwargs={"feed_format": "jsonl"}), {"since": cutoff.isoformat()}
+        )
+        self.assertEqual([item["id"] for item in self._jsonl_items(response)], [self.listings[3].id])
+
+        invalid = self.client.get(reverse("cars_feed", kwargs={"feed_format": "jsonl"}), {"since": "yesterday"})
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+        unknown = self.client.get(reverse("cars_feed", kwargs={"feed_format": "rss"}))
+        self.assertEqual(unknown.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_since_reports_listings_that_left_the_feed(self):
+        since = timezone.now() - timedelta(days=1)
+        unchanged = _create_cars_listing(self.owner, model="Unchanged")
+        BaseListing.objects.filter(pk__in=[listing.pk for listing in [*self.listings, unchanged, self.electric]]).update(
+            updated_at=since - timedelta(hours=1)
+        )
+        self.listings[0].is_archived = True
+        self.listings[0].save()
+        # published, but its expiry window closed after since
+        BaseListing.objects.filter(pk=self.listings[1].pk).update(
+            created_at=timezone.now() - timedelta(days=listing_models.LISTING_EXPIRY_DAYS, hours=12)
+        )
+        deleted_id = self.listings[2].id
+        self.listings[2].delete()
+
+        response = self.client.get(
+            reverse("cars_feed", kwargs={"feed_format": "jsonl"}), {"since": since.isoformat()}
+        )
+        items = {item["id"]: item for item in self._jsonl_items(response)}
+        removed_ids = {self.listings[0].id, self.listings[1].id, deleted_id, self.draft.id}
+        self.assertEqual(set(items), removed_ids)
+        self.assertEqual({item["status"] for item in items.values()}, {"removed"})
+
+        root = ElementTree.fromstring(
+            self._read(
+                self.client.get(reverse("cars_feed", kwargs={"feed_format": "xml"}), {"since": since.isoformat()})
+            )
+        )
+        self.assertEqual(
+            {int(node.findtext("vehicle_id")) for node in root.findall("listing") if node.findtext("status") == "REMOVED"},
+            removed_ids,
+        )
+        full_items = self._jsonl_items(self.client.get(reverse("cars_feed", kwargs={"feed_format": "jsonl"})))
+        self.assertEqual({item["status"] for item in full_items}, {"active"})
+
+        too_old = timezone.now() - timedelta(days=listing_models.FEED_TOMBSTONE_RETENTION_DAYS + 1)
+        response = self.client.get(
+            reverse("cars_feed", kwargs={"feed_format": "jsonl"}), {"since": too_old.isoformat()}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        with self.assertRaises(CommandError):
+            call_command("export_cars_feed", "--since", too_old.isoformat(), stdout=io.StringIO())
+
+    def test_feed_is_gzipped_for_clients_that_accept_it(self):
+        response = self.client.get(
+            reverse("cars_feed", kwargs={"feed_format": "jsonl"}), HTTP_ACCEPT_ENCODING="gzip"
+        )
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        lines = gzip.decompress(self._read(response)).decode("utf-8").splitlines()
+        self.assertEqual(len(lines), 6)
+
+    def test_export_command_writes_gzipped_file(self):
+        output_dir = tempfile.mkdtemp(prefix="karbg-feed-")
+        self.addCleanup(shutil.rmtree, output_dir, True)
+        output_path = os.path.join(output_dir, "cars.csv.gz")
+
+        stdout = io.StringIO()
+        call_command("export_cars_feed", "--format", "csv", "--output", output_path, "--gzip", stdout=stdout)
+
+        with gzip.open(output_path, "rt", encoding="utf-8") as feed_file:
+            self.assertEqual(len(feed_file.read().splitlines()), 1 + 6)
+        self.assertIn("Feed written", stdout.getvalue())
+
+        jsonl_stdout = io.StringIO()
+        call_command("export_cars_feed", "--batch-size", "2", stdout=jsonl_stdout)
+        self.assertEqual(len(jsonl_stdout.getvalue().splitlines()), 6)
+
+
+class PostgresChannelLayerRoutingTests(APITestCase):
+    """Two layers stand in for two daphne processes sharing one notify channel."""
+
+    def _build_processes(self):
+        bus = []
+        layers = [PostgresChannelLayer(), PostgresChannelLayer()]
+        for layer in layers:
+            layer._notify = bus.append
+            layer._ensure_listener = self._noop
+        return layers, bus
+
+    async def _noop(self):
+        return None
+
+    async def _flush_bus(self, layers, bus):
+        while bus:
+            payload = bus.pop(0)
+            for layer in layers:
+                await layer._deliver(payload)
+
+    def test_group_send_reaches_members_in_every_process(self):
+        async def scenario():
+            layers, bus = self._build_processes()
+            channels = [await layer.new_channel() for layer in layers]
+            for layer, channel in zip(layers, channels):
+                await layer.group_add("dealer-notifications", channel)
+
+            await layers[0].group_send("dealer-notifications", {"type": "dealer_listings_updated", "n": 1})
+            self.assertEqual(len(bus), 1)
+            await self._flush_bus(layers, bus)
+            return [await asyncio.wait_for(layer.receive(channel), 1) for layer, channel in zip(layers, channels)]
+
+        received = async_to_sync(scenario)()
+        self.assertEqual([message["n"] for message in received], [1, 1])
+
+    def test_direct_send_is_delivered_only_by_the_owning_process(self):
+        async def scenario():
+            layers, bus = self._build_processes()
+            remote_channel = await layers[1].new_channel()
+            await layers[0].send(remote_channel, {"type": "ping"})
+            await self._flush_bus(layers, bus)
+            message = await asyncio.wait_for(layers[1].receive(remote_channel), 1)
+            return message, layers[0].channels
+
+        message, foreign_queues = async_to_sync(scenario)()
+        self.assertEqual(message["type"], "ping")
+        self.assertEqual(foreign_queues, {})
+
+    def test_send_to_a_named_channel_stays_in_process(self):
+        async def scenario():
+            layers, bus = self._build_processes()
+            await layers[0].send("thumbnails", {"type": "thumbnail.render", "n": 1})
+            published = list(bus)
+            message = await asyncio.wait_for(layers[0].receive("thumbnails"), 1)
+            return published, message
+
+        published, message = async_to_sync(scenario)()
+        self.assertEqual(published, [])
+        self.assertEqual(message["n"], 1)
+
+    def test_oversized_messages_are_rejected(self):
+        layers, _ = self._build_processes()
+        with self.assertRaises(ValueError):
+            async_to_sync(layers[0].group_send)("dealer-notifications", {"type": "big", "body": "x" * 9000})
+
+
+def _channel_layer_fanout_worker(ready, results):
+    async def listen():
+        layer = PostgresChannelLayer(notify_channel="channels_layer_test")
+        channel = await layer.new_channel()
+        await layer.group_add("fanout-test", channel)
+        ready.put(channel)
+        message = await asyncio.wait_for(layer.receive(channel), 10)
+        results.put(message["text"])
+        await layer.close()
+
+    asyncio.run(listen())
+
+
+@skipUnless(connection.vendor == "postgresql", "LISTEN/NOTIFY needs PostgreSQL")
+class PostgresChannelLayerFanOutTests(TransactionTestCase):
+    def test_group_send_fans_out_to_other_processes(self):
+        # forked children must not share the parent's database socket
+        connection.close()
+        context = multiprocessing.get_context("fork")
+        ready, results = context.Queue(), context.Queue()
+        workers = [context.Process(target=_channel_layer_fanout_worker, args=(ready, results)) for _ in range(3)]
+        for worker in workers:
+            worker.start()
+        try:
+            channels = {ready.get(timeout=10) for _ in workers}
+            self.assertEqual(len(channels), 3)
+
+            async_to_sync(PostgresChannelLayer(notify_channel="channels_layer_test").group_send)(
+                "fanout-test", {"type": "fanout", "text": "hello"}
+            )
+            self.assertEqual([results.get(timeout=10) for _ in workers], ["hello"] * 3)
+        finally:
+            for worker in workers:
+                worker.join(timeout=5)
+                if worker.is_alive():
+                    worker.terminate()
+
+
+class _RecordingChannelLayer:
+    def __init__(self):
+        self.sent = {}
+
+    async def group_send(self, group, message):
+        self.sent[group] = message
+
+
+class ListingUpdateBroadcastTests(APITestCase):
+    def setUp(self):
+        realtime.flush_listing_updates()
+        self.layer = _RecordingChannelLayer()
+        layer_patch = patch.object(realtime, "get_channel_layer", return_value=self.layer)
+        layer_patch.start()
+        self.addCleanup(layer_patch.stop)
+
+        dealer_user = get_user_model().objects.create_user(username="broadcast-dealer", password="x")
+        self.dealer = BusinessUser.objects.create(
+            user=dealer_user,
+            dealer_name="Broadcast Motors",
+            city="Sofia",
+            address="1 Push St",
+            phone="+359888000911",
+            email="broadcast-dealer@example.com",
+            username="broadcast-dealer",
+            company_name="Broadcast Motors Ltd",
+            registration_address="1 Push St",
+            mol="Manager",
+            bulstat="623456789",
+            admin_name="Admin",
+            admin_phone="+359888000912",
+        )
+        self.dealer_user = dealer_user
+
+    @override_settings(REALTIME_LISTING_UPDATES_WINDOW_MS=60_000)
+    def test_changes_in_one_window_become_one_event_per_audience(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            realtime.broadcast_dealer_listings_updated(11, "cars", self.dealer_user.id)
+            realtime.broadcast_dealer_listings_updated(12, "moto", self.dealer_user.id)
+            realtime.broadcast_dealer_listings_updated(11, "cars", self.dealer_user.id)
+            realtime.broadcast_dealer_listings_updated(13, "cars", None)
+        self.assertEqual(self.layer.sent, {})
+
+        realtime.flush_listing_updates()
+
+        everyone = self.layer.sent[realtime.DEALER_NOTIFICATIONS_GROUP]
+        self.assertEqual(everyone["type"], "dealer_listings_updated")
+        self.assertEqual(everyone["listing_ids"], [11, 12, 13])
+        self.assertEqual(everyone["categories"], ["cars", "moto"])
+        self.assertEqual(everyone["dealer_ids"], [self.dealer.id])
+        dealer_event = self.layer.sent[realtime.dealer_listings_group_name(self.dealer.id)]
+        self.assertEqual(dealer_event["listing_ids"], [11, 12])
+        self.assertEqual(self.layer.sent[realtime.category_listings_group_name("cars")]["listing_ids"], [11, 13])
+        self.assertEqual(self.layer.sent[realtime.category_listings_group_name("moto")]["listing_ids"], [12])
+        self.assertEqual(len(self.layer.sent), 4)
+
+    def test_rolled_back_changes_are_never_broadcast(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            realtime.broadcast_dealer_listings_updated(21, "cars", self.dealer_user.id)
+        realtime.flush_listing_updates()
+
+        self.assertEqual(self.layer.sent, {})
+
+    @override_settings(REALTIME_LISTING_UPDATES_WINDOW_MS=50)
+    def test_window_timer_sends_the_buffer(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            realtime.broadcast_dealer_listings_updated(31, "cars", None)
+            realtime.broadcast_dealer_listings_updated(32, "cars", None)
+
+        deadline = time.monotonic() + 2
+        while not self.layer.sent and time.monotonic() < deadline:
+            time.sleep(0.02)
+        self.assertEqual(self.layer.sent[realtime.DEALER_NOTIFICATIONS_GROUP]["listing_ids"], [31, 32])
+
+    @override_settings(REALTIME_LISTING_UPDATES_WINDOW_MS=50)
+    def test_window_timer_wakes_in_memory_receivers_on_the_server_loop(self):
+        layer = InMemoryChannelLayer()
+
+        async def scenario():
+            channel = await layer.new_channel()
+            await layer.group_add(realtime.DEALER_NOTIFICATIONS_GROUP, channel)
+
+            def commit_change():
+                with self.captureOnCommitCallbacks(execute=True):
+                    realtime.broadcast_dealer_listings_updated(41, "cars", None)
+
+            await sync_to_async(commit_change)()
+            started_at = time.monotonic()
+            message = await asyncio.wait_for(layer.receive(channel), 5)
+            return message, time.monotonic() - started_at
+
+        with patch.object(realtime, "get_channel_layer", return_value=layer):
+            message, waited = async_to_sync(scenario)()
+        self.assertEqual(message["listing_ids"], [41])
+        # a send from another loop would only be noticed when this loop next woke up
+        self.assertLess(waited, 1)
+
+    @override_settings(REALTIME_LISTING_UPDATES_WINDOW_MS=60_000)
+    def test_large_windows_ask_for_a_full_refresh(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for listing_id in range(1, realtime.LISTING_UPDATES_MAX_IDS + 2):
+                realtime.broadcast_dealer_listings_updated(listing_id, "cars" if listing_id > 1 else "moto", None)
+        realtime.flush_listing_updates()
+
+        everyone = self.layer.sent[realtime.DEALER_NOTIFICATIONS_GROUP]
+        self.assertEqual((everyone["listing_ids"], everyone["full_refresh"]), ([], True))
+        self.assertEqual(everyone["categories"], ["cars", "moto"])
+        moto = self.layer.sent[realtime.category_listings_group_name("moto")]
+        self.assertEqual((moto["listing_ids"], moto["full_refresh"]), ([1], False))
+
+    @override_settings(REALTIME_LISTING_UPDATES_WINDOW_MS=60_000)
+    def test_a_failed_group_does_not_stop_the_others(self):
+        sent = self.layer.sent
+
+        async def group_send(group, message):
+            if group == realtime.DEALER_NOTIFICATIONS_GROUP:
+                raise ValueError("Channel layer message is larger than the PostgreSQL notify limit.")
+            sent[group] = message
+
+        self.layer.group_send = group_send
+        with self.captureOnCommitCallbacks(execute=True):
+            realtime.broadcast_dealer_listings_updated(51, "cars", self.dealer_user.id)
+        with self.assertLogs("backend.listings.realtime", level="ERROR"):
+            realtime.flush_listing_updates()
+
+        self.assertEqual(
+            set(sent),
+            {realtime.dealer_listings_group_name(self.dealer.id), realtime.category_listings_group_name("cars")},
+        )
+
+
+class NotificationsConsumerSubscriptionTests(APITestCase):
+    def setUp(self):
+        async def anonymous(query_string):
+            return None
+
+        user_patch = patch.object(notifications_consumers, "_resolve_user_id_from_query_string", anonymous)
+        user_patch.start()
+        self.addCleanup(user_patch.stop)
+
+    def test_subscriptions_narrow_the_socket_to_dealers_and_categories(self):
+        async def scenario():
+            channel_layer = get_channel_layer()
+            communicator = WebsocketCommunicator(
+                notifications_consumers.NotificationsConsumer.as_asgi(), "/ws/notifications/"
+            )
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+
+            await communicator.send_json_to({"action": "subscribe", "dealer_id": 7})
+            self.assertEqual((await communicator.receive_json_from())["groups"], ["dealer-listings-7"])
+            await communicator.send_json_to({"action": "subscribe", "category": "spaceships"})
+            self.assertEqual((await communicator.receive_json_from())["type"], "subscription_error")
+
+            event = {
+                "type": "dealer_listings_updated",
+                "timestamp": "t",
+                "listing_ids": [5],
+                "categories": ["cars"],
+                "dealer_ids": [7],
+            }
+            await channel_layer.group_send(realtime.DEALER_NOTIFICATIONS_GROUP, {**event, "listing_ids": [4]})
+            await channel_layer.group_send(realtime.dealer_listings_group_name(7), event)
+            received = await communicator.receive_json_from()
+            self.assertEqual(received["listing_ids"], [5])
+            self.assertTrue(await communicator.receive_nothing())
+
+            await communicator.send_json_to({"action": "unsubscribe", "dealer_id": 7})
+            self.assertEqual((await communicator.receive_json_from())["groups"], [])
+            await channel_layer.group_send(realtime.DEALER_NOTIFICATIONS_GROUP, event)
+            self.assertEqual((await communicator.receive_json_from())["dealer_ids"], [7])
+            await communicator.disconnect()
+
+        async_to_sync(scenario)()
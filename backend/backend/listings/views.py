@@ -20,7 +20,7 @@ from django.core.cache import cache
 from django.utils.cache import patch_cache_control, patch_vary_headers
 from django.utils import timezone
 from django.utils.http import http_date, parse_http_date_safe, quote_etag
-from backend.accounts.models import UserProfile, PrivateUser, BusinessUser
+from backend.accounts.models import UserProfile, PrivateUser, BusinessUser, slugify_dealer_name
 from .models import (
     BaseListing,
     CarImage,
@@ -45,7 +45,9 @@ from .serializers import (
     CarImageDetailSerializer,
     FavoriteSerializer,
 )
+from .ingestion import ImageIngestionError, validate_image_upload
 from .realtime import broadcast_dealer_listings_updated
+from .prerender import schedule_listing_prerender_refresh
 
 
 TOP_LISTING_PRICE_1D_EUR = Decimal("2.49")
@@ -1499,7 +1501,7 @@ class BaseListingViewSet(viewsets.ModelViewSet):
                     ]
                 )
         _invalidate_latest_listings_cache()
-        broadcast_dealer_listings_updated()
+        broadcast_dealer_listings_updated(listing.id, listing.main_category, listing.user_id)
 
     def perform_update(self, serializer):
         """Update listing - only owner can update"""
@@ -1621,15 +1623,16 @@ class BaseListingViewSet(viewsets.ModelViewSet):
             elif draft_state_update_fields:
                 updated.save(update_fields=draft_state_update_fields)
         _invalidate_latest_listings_cache()
-        broadcast_dealer_listings_updated()
+        broadcast_dealer_listings_updated(updated.id, updated.main_category, updated.user_id)
 
     def perform_destroy(self, instance):
         """Delete listing - only owner can delete"""
         if instance.user != self.request.user:
             raise PermissionDenied("You can only delete your own listings")
+        deleted_listing_id = instance.id
         instance.delete()
         _invalidate_latest_listings_cache()
-        broadcast_dealer_listings_updated()
+        broadcast_dealer_listings_updated(deleted_listing_id, instance.main_category, instance.user_id)
 
 
 @api_view(['GET'])
@@ -1736,12 +1739,11 @@ def get_public_profile_listings(request, profile_slug: str):
         profile_title = private_profile.username
         normalized_slug = _slugify_public_segment(private_profile.username)
     else:
-        business_profiles = BusinessUser.objects.select_related("user").all()
-        business_profile = None
-        for candidate in business_profiles:
-            if _slugify_public_segment(candidate.dealer_name) == normalized_slug:
-                business_profile = candidate
-                break
+        business_profile = (
+            BusinessUser.objects.select_related("user")
+            .filter(public_slug=slugify_dealer_name(raw_slug))
+            .first()
+        )
 
         if business_profile is not None:
             profile_user = business_profile.user
@@ -1826,7 +1828,7 @@ def delete_listing(request, listing_id):
 
     listing.delete()
     _invalidate_latest_listings_cache()
-    broadcast_dealer_listings_updated()
+    broadcast_dealer_listings_updated(listing_id, listing.main_category, listing.user_id)
     return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -1886,7 +1888,7 @@ def republish_listing(request, listing_id):
 
         listing.save()
     _invalidate_latest_listings_cache()
-    broadcast_dealer_listings_updated()
+    broadcast_dealer_listings_updated(listing.id, listing.main_category, listing.user_id)
 
     serializer = BaseListingSerializer(listing, context={'request': request})
     return Response(serializer.data, status=status.HTTP_200_OK)
@@ -2031,20 +2033,19 @@ def upload_listing_images(request, listing_id):
     listing = get_object_or_404(BaseListing, id=listing_id, user=request.user)
 
     images = request.FILES.getlist('images')
-    existing_count = listing.images.count()
-    assign_cover_to_first_upload = existing_count == 0
-    for index, image in enumerate(images):
-        is_cover = assign_cover_to_first_upload and index == 0
-        CarImage.objects.create(
-            listing=listing,
-            image=image,
-            order=existing_count + index,
-            is_cover=is_cover
-        )
+    for image in images:
+        try:
+            validate_image_upload(image)
+        except ImageIngestionError as exc:
+            return Response(
+                {'error': f'{image.name}: {exc}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+    created_images = CarImage.bulk_ingest(listing, images)
     _invalidate_latest_listings_cache()
 
     return Response(
-        {'message': f'Успешно качени изображения: {len(images)}'},
+        {'message': f'Успешно качени изображения: {len(created_images)}'},
         status=status.HTTP_201_CREATED
     )
 
@@ -2062,7 +2063,7 @@ def update_listing_images(request, listing_id):
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    updated_image_ids = []
+    requested_changes = {}
     for index, image_data in enumerate(images_data):
         if not isinstance(image_data, dict):
             return Response(
@@ -2089,37 +2090,52 @@ def update_listing_images(request, listing_id):
         except (TypeError, ValueError):
             order = index
         is_cover = image_data.get('is_cover', False) in {True, 'true', '1', 1}
+        requested_changes[image_id] = (order, is_cover)
 
-        try:
-            image = CarImage.objects.get(id=image_id, listing=listing)
-            image.order = order
-            image.is_cover = is_cover
-            image.save(update_fields=['order', 'is_cover'])
-            updated_image_ids.append(image_id)
-        except CarImage.DoesNotExist:
+    images_by_id = {image.id: image for image in listing.images.all()}
+    for image_id in requested_changes:
+        if image_id not in images_by_id:
             return Response(
                 {'error': f'Изображение {image_id} не е намерено'},
                 status=status.HTTP_404_NOT_FOUND
             )
 
     prune_missing = request.data.get('prune_missing', False) in {True, 'true', '1', 1}
-    if prune_missing:
-        listing.images.exclude(id__in=updated_image_ids).delete()
-
-    images_qs = listing.images.all()
-    selected_cover = images_qs.filter(is_cover=True).order_by('order', 'id').first()
-    if selected_cover is None:
-        selected_cover = images_qs.order_by('order', 'id').first()
-    if selected_cover is not None:
-        images_qs.exclude(id=selected_cover.id).update(is_cover=False)
-        if not selected_cover.is_cover:
-            images_qs.filter(id=selected_cover.id).update(is_cover=True)
+    pruned_ids = []
+    remaining_images = []
+    for image_id, image in images_by_id.items():
+        if prune_missing and image_id not in requested_changes:
+            pruned_ids.append(image_id)
+        else:
+            remaining_images.append(image)
+
+    original_state = {image.id: (image.order, image.is_cover) for image in remaining_images}
+    for image in remaining_images:
+        if image.id in requested_changes:
+            image.order, image.is_cover = requested_changes[image.id]
+    remaining_images.sort(key=lambda image: (image.order, image.id))
+
+    # exactly one cover: the first flagged image in display order, else the first image
+    selected_cover = next((image for image in remaining_images if image.is_cover), None)
+    if selected_cover is None and remaining_images:
+        selected_cover = remaining_images[0]
+    changed_images = []
+    for image in remaining_images:
+        image.is_cover = image is selected_cover
+        if (image.order, image.is_cover) != original_state[image.id]:
+            changed_images.append(image)
+
+    with db_transaction.atomic():
+        if pruned_ids:
+            CarImage.objects.filter(listing=listing, id__in=pruned_ids).delete()
+        if changed_images:
+            CarImage.objects.bulk_update(changed_images, ['order', 'is_cover'])
+        if changed_images or pruned_ids:
+            # bulk_update sends no signals; a new cover means a new share card
+            schedule_listing_prerender_refresh(listing.id)
     _invalidate_latest_listings_cache()
 
-    serializer = CarImageSerializer(
-        listing.images.order_by('order', 'id'),
-        many=True
-    )
+    serializer = CarImageSerializer(remaining_images, many=True)
 
     return Response(
         {'message': 'Изображенията са обновени успешно.', 'images': serializer.data},
@@ -17,6 +17,7 @@ class MediaCacheControlMiddleware:
         if not media_url.startswith("/"):
             media_url = f"/{media_url}"
         self.media_url_prefix = f"{media_url.rstrip('/')}/"
+        self.derivative_url_prefix = "/media/r/"
 
     def __call__(self, request):
         response = self.get_response(request)
@@ -25,6 +26,10 @@ class MediaCacheControlMiddleware:
             return response
         if response.status_code not in {200, 304}:
             return response
+        if request.path.startswith(self.derivative_url_prefix):
+            # the path carries the photo's file version, so id/version/size/format is stable
+            response["Cache-Control"] = IMMUTABLE_MEDIA_CACHE_CONTROL
+            return response
         if not request.path.startswith(self.media_url_prefix):
             return response
 
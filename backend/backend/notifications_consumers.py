@@ -4,7 +4,18 @@ from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
-from backend.listings.realtime import user_notifications_group_name
+from backend.accounts.notifications import (
+    USER_NOTIFICATION_PAGE_MAX,
+    acknowledge_user_notifications,
+    fetch_user_notifications,
+)
+from backend.listings.models import BaseListing
+from backend.listings.realtime import (
+    DEALER_NOTIFICATIONS_GROUP,
+    category_listings_group_name,
+    dealer_listings_group_name,
+    user_notifications_group_name,
+)
 
 
 @database_sync_to_async
@@ -26,28 +37,125 @@ def _resolve_user_id_from_query_string(query_string: bytes) -> int | None:
     return int(user.id)
 
 
+def _parse_after_from_query_string(query_string: bytes) -> int | None:
+    raw_query = (query_string or b"").decode("utf-8", errors="ignore")
+    raw_after = (parse_qs(raw_query).get("after") or [None])[0]
+    try:
+        return max(0, int(raw_after)) if raw_after else None
+    except (TypeError, ValueError):
+        return None
+
+
+@database_sync_to_async
+def _fetch_notification_backlog(user_id: int, after_id: int | None) -> list[dict]:
+    if after_id is not None:
+        acknowledge_user_notifications(user_id, after_id)
+    return fetch_user_notifications(user_id, after_id=after_id, limit=USER_NOTIFICATION_PAGE_MAX)
+
+
+@database_sync_to_async
+def _acknowledge_notifications(user_id: int, seq: int) -> None:
+    acknowledge_user_notifications(user_id, seq)
+
+
 class NotificationsConsumer(AsyncJsonWebsocketConsumer):
-    GROUP_NAME = "dealer-notifications"
+    """
+    Realtime notifications for the navbar and the dealer pages.
+
+    Every socket starts on the site-wide listing updates. Sending
+    ``{"action": "subscribe", "dealer_id": 7}`` or ``{"action": "subscribe",
+    "category": "cars"}`` narrows it to those dealers/categories instead;
+    ``unsubscribe`` drops one again and the socket falls back to everything
+    once no subscription is left.
+
+    Signed-in sockets first get the inbox notifications they have not
+    acknowledged (after ``?after=<seq>`` or the stored cursor) and confirm
+    them with ``{"action": "ack", "seq": 42}``.
+    """
+
+    GROUP_NAME = DEALER_NOTIFICATIONS_GROUP
+    MAX_SUBSCRIPTIONS = 50
 
     async def connect(self):
         self.user_group_name = None
+        self.user_id = None
+        self.subscribed_groups = set()
         await self.channel_layer.group_add(self.GROUP_NAME, self.channel_name)
         user_id = await _resolve_user_id_from_query_string(self.scope.get("query_string", b""))
         if user_id:
+            self.user_id = user_id
             self.user_group_name = user_notifications_group_name(user_id)
             await self.channel_layer.group_add(self.user_group_name, self.channel_name)
         await self.accept()
+        if user_id:
+            # joined the group first: a notification racing the backlog arrives twice, never zero times
+            backlog = await _fetch_notification_backlog(
+                user_id, _parse_after_from_query_string(self.scope.get("query_string", b""))
+            )
+            for notification in backlog:
+                await self.send_json({"type": "user_notification", "timestamp": None, "notification": notification})
 
     async def disconnect(self, close_code):
         await self.channel_layer.group_discard(self.GROUP_NAME, self.channel_name)
         if self.user_group_name:
             await self.channel_layer.group_discard(self.user_group_name, self.channel_name)
+        for group in self.subscribed_groups:
+            await self.channel_layer.group_discard(group, self.channel_name)
+
+    def _resolve_subscription_group(self, content):
+        dealer_id = content.get("dealer_id")
+        if dealer_id is not None:
+            try:
+                dealer_id = int(dealer_id)
+            except (TypeError, ValueError):
+                return None
+            return dealer_listings_group_name(dealer_id) if dealer_id > 0 else None
+        category = str(content.get("category") or "").strip()
+        if category in BaseListing.MAIN_CATEGORY_LABELS:
+            return category_listings_group_name(category)
+        return None
+
+    async def receive_json(self, content, **kwargs):
+        if not isinstance(content, dict):
+            return
+        action = content.get("action")
+        if action == "ack":
+            try:
+                seq = int(content.get("seq"))
+            except (TypeError, ValueError):
+                return
+            if self.user_id and seq > 0:
+                await _acknowledge_notifications(self.user_id, seq)
+            return
+        if action not in {"subscribe", "unsubscribe"}:
+            return
+        group = self._resolve_subscription_group(content)
+        if group is None:
+            await self.send_json({"type": "subscription_error", "action": action})
+            return
+
+        if action == "subscribe":
+            if group not in self.subscribed_groups and len(self.subscribed_groups) < self.MAX_SUBSCRIPTIONS:
+                if not self.subscribed_groups:
+                    await self.channel_layer.group_discard(self.GROUP_NAME, self.channel_name)
+                self.subscribed_groups.add(group)
+                await self.channel_layer.group_add(group, self.channel_name)
+        elif group in self.subscribed_groups:
+            self.subscribed_groups.discard(group)
+            await self.channel_layer.group_discard(group, self.channel_name)
+            if not self.subscribed_groups:
+                await self.channel_layer.group_add(self.GROUP_NAME, self.channel_name)
+        await self.send_json({"type": "subscriptions", "groups": sorted(self.subscribed_groups)})
 
     async def dealer_listings_updated(self, event):
         await self.send_json(
             {
                 "type": "dealer_listings_updated",
                 "timestamp": event.get("timestamp"),
+                "listing_ids": event.get("listing_ids") or [],
+                "categories": event.get("categories") or [],
+                "dealer_ids": event.get("dealer_ids") or [],
+                "full_refresh": bool(event.get("full_refresh")),
             }
         )
 
@@ -59,4 +167,3 @@ class NotificationsConsumer(AsyncJsonWebsocketConsumer):
                 "notification": event.get("notification"),
             }
         )
-
@@ -204,11 +204,31 @@ TEMPLATES = [
 WSGI_APPLICATION = "backend.wsgi.application"
 ASGI_APPLICATION = "backend.asgi.application"
 
-CHANNEL_LAYERS = {
-    "default": {
-        "BACKEND": "channels.layers.InMemoryChannelLayer",
+# Realtime channel layer: "memory" only reaches sockets of the same process,
+# "postgres" fans group messages out to every process over LISTEN/NOTIFY on the main database.
+CHANNEL_LAYER_BACKEND = os.getenv("CHANNEL_LAYER_BACKEND", "memory").strip().lower() or "memory"
+if CHANNEL_LAYER_BACKEND not in {"memory", "postgres"}:
+    raise ImproperlyConfigured("CHANNEL_LAYER_BACKEND must be 'memory' or 'postgres'.")
+if CHANNEL_LAYER_BACKEND == "postgres":
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "backend.channel_layers.PostgresChannelLayer",
+            "CONFIG": {
+                "notify_channel": os.getenv("CHANNEL_LAYER_NOTIFY_CHANNEL", "channels_layer").strip() or "channels_layer",
+            },
+        }
     }
-}
+else:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels.layers.InMemoryChannelLayer",
+        }
+    }
+# Listing changes are buffered for this long after commit and broadcast as one
+# event per window (0 sends each change right after its commit).
+REALTIME_LISTING_UPDATES_WINDOW_MS = max(0, _env_int("REALTIME_LISTING_UPDATES_WINDOW_MS", 500))
+# Inbox notifications older than this are removed by `manage.py prune_user_notifications`.
+USER_NOTIFICATION_RETENTION_DAYS = max(1, _env_int("USER_NOTIFICATION_RETENTION_DAYS", 30))
 
 
 DATABASES = {
@@ -490,6 +510,32 @@ try:
     CAR_IMAGE_RENDITION_WORKERS = max(1, int(os.getenv("CAR_IMAGE_RENDITION_WORKERS", "2")))
 except (TypeError, ValueError):
     CAR_IMAGE_RENDITION_WORKERS = 2
+# CPU-bound resize/encode work runs in this many spawned processes so it does not
+# compete with the ASGI server for the GIL. 0 keeps rendering in the worker threads.
+CAR_IMAGE_RENDITION_PROCESSES = max(0, _env_int("CAR_IMAGE_RENDITION_PROCESSES", 0))
+# Encode an AVIF copy of every rendition next to the WebP one (roughly 2-3x the
+# encode time, noticeably smaller files for browsers that support it).
+CAR_IMAGE_AVIF_RENDITIONS = _env_flag("CAR_IMAGE_AVIF_RENDITIONS", default=False)
+CAR_IMAGE_AVIF_QUALITY = min(100, max(1, _env_int("CAR_IMAGE_AVIF_QUALITY", 50)))
+# Uploads are downscaled to this longest edge before they are stored, and
+# rejected outright above CAR_IMAGE_MAX_UPLOAD_PIXELS (decompression-bomb guard).
+CAR_IMAGE_MAX_EDGE = max(1600, _env_int("CAR_IMAGE_MAX_EDGE", 4096))
+CAR_IMAGE_MAX_UPLOAD_PIXELS = max(1, _env_int("CAR_IMAGE_MAX_UPLOAD_PIXELS", 100_000_000))
+# Parallel uploads/deletes against media storage; also sizes the shared S3 connection pool.
+MEDIA_STORAGE_IO_WORKERS = max(1, _env_int("MEDIA_STORAGE_IO_WORKERS", 8))
+# Copart import photo downloads: parallel connections per import, per-request
+# socket timeout and the wall-clock budget for all photos of one import.
+COPART_IMAGE_FETCH_WORKERS = max(1, _env_int("COPART_IMAGE_FETCH_WORKERS", 6))
+COPART_IMAGE_FETCH_TIMEOUT_SECONDS = max(1, _env_int("COPART_IMAGE_FETCH_TIMEOUT_SECONDS", 18))
+COPART_IMPORT_IMAGES_DEADLINE_SECONDS = max(1, _env_int("COPART_IMPORT_IMAGES_DEADLINE_SECONDS", 45))
+# Copart imports answer 202 and fetch photos in the background: "thread" runs the
+# jobs on a small in-process pool, "worker" leaves them for `manage.py run_import_jobs`.
+COPART_IMPORT_JOBS_MODE = os.getenv("COPART_IMPORT_JOBS_MODE", "thread").strip().lower() or "thread"
+COPART_IMPORT_JOB_THREADS = max(1, _env_int("COPART_IMPORT_JOB_THREADS", 2))
+# Upper bound on lots accepted by one batch import request.
+COPART_IMPORT_BATCH_MAX_LOTS = max(1, _env_int("COPART_IMPORT_BATCH_MAX_LOTS", 50))
+# Width of the id range covered by one sitemap file; the sitemap protocol caps a file at 50k URLs.
+SITEMAP_CHUNK_SIZE = min(50_000, max(1, _env_int("SITEMAP_CHUNK_SIZE", 50_000)))
 
 
 CACHES = {
@@ -497,7 +543,15 @@ CACHES = {
         "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
         "LOCATION": "karbg-local-cache",
         "TIMEOUT": 300,
-    }
+    },
+    # Per-process copy of crawler HTML and share card bytes (both also kept in
+    # media storage). A separate cache so large entries never cull "default".
+    "prerender": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "karbg-prerender-cache",
+        "TIMEOUT": 7 * 24 * 60 * 60,
+        "OPTIONS": {"MAX_ENTRIES": max(1, _env_int("PRERENDER_CACHE_MAX_ENTRIES", 1000))},
+    },
 }
 
 
@@ -4,7 +4,10 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.http import HttpResponseRedirect
 from backend.public_api.views import public_api_docs
+from backend.listings.derivatives import image_derivative
+from backend.listings.feeds import cars_feed
 from backend.listings.prerender import prerender_listing
+from backend.listings.sitemaps import sitemap_chunk, sitemap_index
 from backend.accounts.prerender import prerender_dealer, prerender_dealer_card
 
 
@@ -16,9 +19,17 @@ def redirect_to_frontend_admin(request, path=""):
     return HttpResponseRedirect(target)
 
 urlpatterns = [
+    path(
+        'media/r/<int:image_id>/<str:version>/<int:width>x<int:height>.<str:image_format>',
+        image_derivative,
+        name='image_derivative',
+    ),
     path('prerender/listing/<int:listing_id>/', prerender_listing, name='prerender_listing'),
     path('prerender/dealer/<str:dealer_slug>/', prerender_dealer, name='prerender_dealer'),
     path('prerender/dealer-card/<str:dealer_slug>/', prerender_dealer_card, name='prerender_dealer_card'),
+    path('sitemap.xml', sitemap_index, name='sitemap_index'),
+    path('sitemaps/<slug:section>-<int:chunk>.xml', sitemap_chunk, name='sitemap_chunk'),
+    path('feeds/cars.<str:feed_format>', cars_feed, name='cars_feed'),
     path('admin/', redirect_to_frontend_admin),
     path('admin/<path:path>/', redirect_to_frontend_admin),
     path('django-admin/', admin.site.urls),
@@ -3,6 +3,9 @@ const SETTINGS_KEYS = {
   backendUrl: "karbgBackendUrl",
   apiKey: "karbgApiKey",
 };
+const IMPORT_JOB_POLL_INTERVAL_MS = 1500;
+const IMPORT_JOB_POLL_TIMEOUT_MS = 120000;
+const FINISHED_JOB_STATUSES = new Set(["succeeded", "failed"]);
 
 function normalizeBackendUrl(rawUrl) {
   const value = String(rawUrl || "").trim();
@@ -24,6 +27,36 @@ async function getSettings() {
   };
 }
 
+function sleep(ms) {
+  return new Promise((resolve) => setTimeout(resolve, ms));
+}
+
+async function waitForImportJob(backendUrl, apiKey, jobId) {
+  // photos are fetched in the background after the draft is created
+  const endpoint = `${backendUrl}/api/auth/import/jobs/${encodeURIComponent(jobId)}/`;
+  const deadline = Date.now() + IMPORT_JOB_POLL_TIMEOUT_MS;
+  let lastStatus = null;
+
+  while (Date.now() < deadline) {
+    await sleep(IMPORT_JOB_POLL_INTERVAL_MS);
+    try {
+      const response = await fetch(endpoint, {
+        headers: { Authorization: `ApiKey ${apiKey}` },
+      });
+      if (!response.ok) {
+        return lastStatus;
+      }
+      lastStatus = await response.json();
+    } catch (error) {
+      continue;
+    }
+    if (FINISHED_JOB_STATUSES.has(lastStatus?.status)) {
+      return lastStatus;
+    }
+  }
+  return lastStatus;
+}
+
 async function importCopartListing(payload) {
   const { backendUrl, apiKey } = await getSettings();
 
@@ -67,10 +100,12 @@ async function importCopartListing(payload) {
     };
   }
 
+  const job = data?.job_id ? await waitForImportJob(backendUrl, apiKey, data.job_id) : null;
   return {
     ok: true,
     status: response.status,
     data,
+    job,
   };
 }
 
@@ -838,11 +838,21 @@ function onImportClick(button) {
         return;
       }
 
-      const uploaded = Number(result?.data?.images_uploaded || 0);
       button.textContent = "Добавено в Kar.bg";
       button.style.background = "#0f766e";
       button.style.borderColor = "#0f766e";
-      showToast(`Обявата е изпратена като чернова (${uploaded} снимки).`, false);
+
+      const job = result?.job;
+      if (!result?.data?.job_id) {
+        showToast("Обявата вече е в Kar.bg и снимките са актуални.", false);
+      } else if (job?.status === "succeeded") {
+        const uploaded = Number(job.images_uploaded || 0);
+        showToast(`Обявата е изпратена като чернова (${uploaded} снимки).`, false);
+      } else if (job?.status === "failed") {
+        showToast("Черновата е създадена, но снимките не бяха импортирани.", true);
+      } else {
+        showToast("Черновата е създадена. Снимките още се качват.", false);
+      }
     }
   );
 }